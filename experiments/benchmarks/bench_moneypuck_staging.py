@@ -0,0 +1,82 @@
+"""
+Benchmark: MoneyPuck skater ingest, raw CSV vs typed Parquet staging
+--------------------------------------------------------------------
+Writes synthetic per-team skater CSVs as wide as MoneyPuck's (the kept columns
+plus --extra-columns unused ones) and times a full build of
+fact_skater_game_situation three ways:
+  csv_auto     read_csv_auto over every CSV (the previous ingest),
+  first_stage  staging (CSV -> typed Parquet -> season files) + load,
+  rebuild      load from already staged season files (later full re-ingests).
+Checks that all three produce the same table.
+
+Usage:
+    python experiments/benchmarks/bench_moneypuck_staging.py
+    python experiments/benchmarks/bench_moneypuck_staging.py --seasons 4 --teams 32 --rows 12000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from nhl_bets.common.moneypuck_ingest import SKATER_COLUMNS, SKATER_CSV_TYPES, ingest_group, list_group_files
+
+def write_csvs(root, seasons, teams, rows, extra_columns):
+    header = list(SKATER_CSV_TYPES) + [f"extraStat{i}" for i in range(extra_columns)]
+    rng = random.Random(7)
+    for season in range(2024 - seasons + 1, 2025):
+        group_dir = os.path.join(root, str(season), "regular", "skaters")
+        os.makedirs(group_dir)
+        for team in range(teams):
+            lines = [",".join(header)]
+            for i in range(rows):
+                game_id = season * 1000000 + 20000 + i // 100
+                fixed = [str(8470000 + team * 40 + i % 20), str(game_id), f"{season}1008", f"T{team}", "OPP",
+                         "HOME", "C", ("all", "5on5", "5on4", "4on5", "other")[i % 5], f"{rng.uniform(0, 1500):.1f}"]
+                stats = [f"{rng.random() * 3:.1f}" for _ in range(len(SKATER_CSV_TYPES) - len(fixed))]
+                lines.append(",".join(fixed + stats + [f"{rng.random():.4f}" for _ in range(extra_columns)]))
+            with open(os.path.join(group_dir, f"T{team}.csv"), "w") as f:
+                f.write("\n".join(lines) + "\n")
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 3)
+
+def main():
+    parser = argparse.ArgumentParser(description="MoneyPuck CSV vs staged Parquet ingest time")
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--teams", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=4000, help="Rows per team CSV")
+    parser.add_argument("--extra-columns", type=int, default=130, help="Unused columns per CSV")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mp-bench-") as tmp:
+        root, staging = os.path.join(tmp, "gbg"), os.path.join(tmp, "staging")
+        write_csvs(root, args.seasons, args.teams, args.rows, args.extra_columns)
+        files = list_group_files(root, 2024 - args.seasons + 1, 2024, "regular", "skaters")
+        cons = {name: duckdb.connect() for name in ("csv_auto", "first_stage", "rebuild")}
+
+        results = {
+            "csv_auto": timed(lambda: cons["csv_auto"].execute(f"""
+                CREATE TABLE fact_skater_game_situation AS
+                SELECT {SKATER_COLUMNS} FROM read_csv_auto({files}, union_by_name=True)""")),
+            "first_stage": timed(lambda: ingest_group(cons["first_stage"], root, "skaters", files, False, staging)),
+            "rebuild": timed(lambda: ingest_group(cons["rebuild"], root, "skaters", files, False, staging)),
+        }
+        tables = {name: con.execute("SELECT * FROM fact_skater_game_situation ORDER BY ALL").fetchall()
+                  for name, con in cons.items()}
+        if not tables["csv_auto"] == tables["first_stage"] == tables["rebuild"]:
+            raise AssertionError("Staged ingest differs from the read_csv_auto ingest")
+
+    print(pd.DataFrame([{"files": len(files), "rows": len(tables["rebuild"]), **results}]).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: fact_prop_odds insert latency vs table size
+------------------------------------------------------
+Grows a scratch odds lake to each target size with synthetic captures, then
+times insert_odds_records for one fresh polling batch and for a replay of it.
+With row_key dedup scoped to the batch's own partition, latency should stay
+flat as the history grows.
+
+Usage:
+    python experiments/benchmarks/bench_odds_insert.py --sizes 1000000,10000000,100000000
+    python experiments/benchmarks/bench_odds_insert.py --sizes 100000,1000000 --batch-rows 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from nhl_bets.common.db_init import ODDS_LAKE_COLUMN_NAMES, initialize_phase11_tables, insert_odds_records
+from nhl_bets.common.odds_lake import sql_literal
+from nhl_bets.common.storage import odds_row_key
+
+START_TS = datetime(2025, 10, 1)
+CAPTURE_INTERVAL_S = 300
+
+def synthetic_odds_sql(from_rows, to_rows, batch_rows):
+    """Wide synthetic odds rows (no row_key), batch_rows per capture, in capture order."""
+    return f"""
+    SELECT
+        'UNABATED' AS source_vendor,
+        TIMESTAMP '{START_TS:%Y-%m-%d %H:%M:%S}' + to_seconds(CAST(i // {batch_rows} AS BIGINT) * {CAPTURE_INTERVAL_S}) AS capture_ts_utc,
+        CAST(i // {batch_rows} % 16 AS TEXT) AS event_id_vendor,
+        'EDM @ TOR' AS event_name_raw,
+        CAST(NULL AS TIMESTAMP) AS event_start_ts_utc,
+        'TOR' AS home_team,
+        'EDM' AS away_team,
+        CAST(i % {batch_rows} // 40 AS TEXT) AS player_id_vendor,
+        'Player ' || CAST(i % {batch_rows} // 40 AS TEXT) AS player_name_raw,
+        ['POINTS', 'SOG', 'ASSISTS', 'BLOCKS', 'GOALS'][CAST(i % 5 AS INTEGER) + 1] AS market_type,
+        0.5 + (i // 5 % 4) AS line,
+        CASE WHEN i % 2 = 0 THEN 'OVER' ELSE 'UNDER' END AS side,
+        CAST(i // 20 % 2 AS TEXT) AS book_id_vendor,
+        'Book' AS book_name_raw,
+        -110 AS odds_american,
+        1.91 AS odds_decimal,
+        FALSE AS is_live,
+        'bench.json' AS raw_payload_path,
+        'capture-' || CAST(i // {batch_rows} AS TEXT) AS raw_payload_hash
+    FROM range({from_rows}, {to_rows}) t(i)
+    """
+
+def grow_lake(con, lake_root, from_rows, to_rows, batch_rows):
+    """Appends synthetic rows (batch_rows per capture, in capture order) up to to_rows."""
+    con.execute(f"""
+    COPY (
+        SELECT {", ".join(ODDS_LAKE_COLUMN_NAMES)}, CAST(capture_ts_utc AS DATE) AS capture_date
+        FROM ({synthetic_odds_sql(from_rows, to_rows, batch_rows)})
+    ) TO {sql_literal(lake_root)} (
+        FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (source_vendor, capture_date),
+        FILENAME_PATTERN 'bench-{{uuid}}', OVERWRITE_OR_IGNORE
+    )
+    """)
+
+def make_batch(capture_idx, batch_rows):
+    """One polling cycle's records for a capture after everything already stored."""
+    capture_ts = START_TS + timedelta(seconds=capture_idx * CAPTURE_INTERVAL_S)
+    markets = ['POINTS', 'SOG', 'ASSISTS', 'BLOCKS', 'GOALS']
+    records = [{
+        "source_vendor": "UNABATED",
+        "capture_ts_utc": capture_ts,
+        "event_id_vendor": str(capture_idx % 16),
+        "event_name_raw": "EDM @ TOR",
+        "event_start_ts_utc": None,
+        "home_team": "TOR",
+        "away_team": "EDM",
+        "player_id_vendor": str(i // 40),
+        "player_name_raw": f"Player {i // 40}",
+        "market_type": markets[i % 5],
+        "line": 0.5 + (i // 5 % 4),
+        "side": "OVER" if i % 2 == 0 else "UNDER",
+        "book_id_vendor": str(i // 20 % 2),
+        "book_name_raw": "Book",
+        "odds_american": -110,
+        "odds_decimal": 1.91,
+        "is_live": False,
+        "raw_payload_path": "bench.json",
+        "raw_payload_hash": f"capture-{capture_idx}",
+    } for i in range(batch_rows)]
+    # Parsers attach row_key at parse time
+    for record in records:
+        record["row_key"] = odds_row_key(record)
+    return pd.DataFrame(records)
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def run(sizes, batch_rows):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        con = duckdb.connect(os.path.join(tmp, "bench.duckdb"))
+        lake_root = os.path.join(tmp, "odds_lake")
+        initialize_phase11_tables(con, lake_root=lake_root)
+        current = 0
+        for size in sizes:
+            # 1. Grow to the target size (whole captures only)
+            target = size - size % batch_rows
+            print(f"Growing odds lake to {target:,} rows...")
+            grow_lake(con, lake_root, current, target, batch_rows)
+            current = target
+
+            # 2. Fresh batch, then an identical replay (all duplicates)
+            batch = make_batch(current // batch_rows, batch_rows)
+            insert_s = timed(lambda: insert_odds_records(con, batch, lake_root=lake_root))
+            replay_s = timed(lambda: insert_odds_records(con, batch, lake_root=lake_root))
+            row = {"table_rows": current, "batch_rows": batch_rows,
+                   "insert_s": round(insert_s, 4), "replay_s": round(replay_s, 4)}
+
+            # Keep the table at whole-capture boundaries for the next size step
+            current += batch_rows
+            results.append(row)
+            print(row)
+        con.close()
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="fact_prop_odds insert latency vs table size")
+    parser.add_argument("--sizes", default="1000000,10000000,100000000", help="Comma-separated table sizes")
+    parser.add_argument("--batch-rows", type=int, default=5000, help="Rows per polling batch")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    df = run(sizes, args.batch_rows)
+    print("\n--- INSERT LATENCY ---")
+    print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: odds lake bytes and scan time, stored vs derived row_key
+-------------------------------------------------------------------
+Writes the same synthetic odds history twice: with row_key stored in every
+file (the previous layout) and without it (current layout, row_key derived
+by the fact_prop_odds view). Reports bytes on disk, the largest columns, and
+the time of a typical aggregate scan on each. The history is the capture-shaped
+one from bench_odds_normalized.py (per-capture payload hashes, named teams,
+players and books, moving prices).
+
+Usage:
+    python experiments/benchmarks/bench_odds_layout.py --rows 5000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_odds_normalized import realistic_odds_sql
+from nhl_bets.common.db_init import ODDS_LAKE_COLUMN_NAMES, ODDS_ROW_KEY_SQL, initialize_phase11_tables
+from nhl_bets.common.odds_lake import lake_scan_sql, list_partitions, sql_literal
+
+SCAN_SQL = """
+SELECT market_type, side, book_id_vendor, count(*), avg(odds_decimal)
+FROM {relation} GROUP BY ALL
+"""
+
+def write_lake(con, source, root, store_row_key):
+    row_key = f", {ODDS_ROW_KEY_SQL} AS row_key" if store_row_key else ""
+    con.execute(f"""
+    COPY (
+        SELECT {", ".join(ODDS_LAKE_COLUMN_NAMES)}{row_key}, CAST(capture_ts_utc AS DATE) AS capture_date
+        FROM ({source}) ORDER BY capture_ts_utc
+    ) TO {sql_literal(root)} (
+        FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (source_vendor, capture_date), OVERWRITE_OR_IGNORE
+    )
+    """)
+
+def column_bytes(con, root):
+    files = [f for part in list_partitions(root) for f in part["files"]]
+    file_list = "[" + ", ".join(sql_literal(f) for f in files) + "]"
+    return con.execute(f"""
+    SELECT path_in_schema AS column_name, sum(total_compressed_size) AS bytes
+    FROM parquet_metadata({file_list}) GROUP BY 1 ORDER BY 2 DESC LIMIT 3
+    """).df()
+
+def timed_query(con, sql, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        con.execute(sql).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run(rows, batch_rows, captures_per_day):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        con = duckdb.connect(os.path.join(tmp, "bench.duckdb"))
+        stored_root = os.path.join(tmp, "lake_stored_key")
+        lake_root = os.path.join(tmp, "odds_lake")
+        initialize_phase11_tables(con, lake_root=lake_root)
+
+        print(f"Writing {rows:,} rows in both layouts...")
+        source = realistic_odds_sql(rows, batch_rows, captures_per_day)
+        write_lake(con, source, stored_root, store_row_key=True)
+        write_lake(con, source, lake_root, store_row_key=False)
+
+        for layout, root, relation in (("row_key stored", stored_root, lake_scan_sql(stored_root)),
+                                       ("row_key derived", lake_root, "fact_prop_odds")):
+            print(f"\n{layout}: largest columns")
+            print(column_bytes(con, root).to_string(index=False))
+            results.append({
+                "layout": layout,
+                "bytes": sum(os.path.getsize(f) for part in list_partitions(root) for f in part["files"]),
+                "scan_s": round(timed_query(con, SCAN_SQL.format(relation=relation)), 4),
+            })
+        con.close()
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Odds lake bytes/scan: stored vs derived row_key")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Synthetic rows to write")
+    parser.add_argument("--batch-rows", type=int, default=4800, help="Rows per capture (one payload)")
+    parser.add_argument("--captures-per-day", type=int, default=96, help="Captures per day across vendors")
+    args = parser.parse_args()
+
+    df = run(args.rows, args.batch_rows, args.captures_per_day)
+    print("\n--- ODDS LAKE LAYOUT ---")
+    print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
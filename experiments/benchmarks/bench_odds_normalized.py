@@ -0,0 +1,251 @@
+"""
+Benchmark: wide odds lake vs a surrogate-keyed (normalized) layout
+-------------------------------------------------------------------
+Writes the same synthetic odds history in two layouts and compares bytes and
+query times:
+
+  wide        the current lake: one Parquet row per quote with every string
+              column (event/team/player/book names, payload path and hash)
+  normalized  lake rows carry integer surrogate keys (payload, event, player,
+              book) and 1-byte codes for market and side; the strings live in
+              small dimension tables (payload path/hash in a payload table, as
+              raw_odds_payloads would hold them), and a compatibility view joins
+              them back into the fact_prop_odds column set
+
+Unlike bench_odds_layout.py, the history is shaped like real captures: three
+vendors, a new 64-character payload hash and path per capture, ~12 games a day
+with full team names, 40 named players per game, 8 books, and prices that move
+between captures. Queries: an aggregate on names, a player-history lookup, and
+one full-width day export, each through the wide view, the compatibility view
+and (aggregate only) the normalized keys directly.
+
+Usage:
+    python experiments/benchmarks/bench_odds_normalized.py --rows 5000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from nhl_bets.common.db_init import ODDS_LAKE_COLUMN_NAMES
+from nhl_bets.common.odds_lake import HIVE_TYPES, list_partitions, sql_literal
+
+TEAMS = [
+    "Anaheim Ducks", "Boston Bruins", "Buffalo Sabres", "Calgary Flames", "Carolina Hurricanes",
+    "Chicago Blackhawks", "Colorado Avalanche", "Columbus Blue Jackets", "Dallas Stars", "Detroit Red Wings",
+    "Edmonton Oilers", "Florida Panthers", "Los Angeles Kings", "Minnesota Wild", "Montreal Canadiens",
+    "Nashville Predators", "New Jersey Devils", "New York Islanders", "New York Rangers", "Ottawa Senators",
+    "Philadelphia Flyers", "Pittsburgh Penguins", "San Jose Sharks", "Seattle Kraken", "St. Louis Blues",
+    "Tampa Bay Lightning", "Toronto Maple Leafs", "Utah Hockey Club", "Vancouver Canucks", "Vegas Golden Knights",
+    "Washington Capitals", "Winnipeg Jets",
+]
+FIRST = ["Connor", "Leon", "Auston", "Mitch", "Nathan", "Cale", "Nikita", "David", "Sidney", "Alex",
+         "Jack", "Quinn", "Elias", "Brady", "Matthew", "Kirill", "Artemi", "Jason", "Mikko", "Sebastian"]
+LAST = ["McDavid", "Draisaitl", "Matthews", "Marner", "MacKinnon", "Makar", "Kucherov", "Pastrnak", "Crosby",
+        "Ovechkin", "Hughes", "Pettersson", "Tkachuk", "Barzal", "Kaprizov", "Panarin", "Robertson",
+        "Rantanen", "Aho", "Point", "Eichel", "Stamkos", "Kane", "Larkin", "Nylander"]
+MARKETS = ["POINTS", "SOG", "ASSISTS", "GOALS", "BLOCKS"]
+SIDES = ["OVER", "UNDER"]
+VENDORS = ["UNABATED", "PLAYNOW", "ODDSSHARK"]
+BOOKS = 8
+GAMES_PER_DAY = 12
+PLAYERS_PER_GAME = 40
+
+def realistic_odds_sql(rows, batch_rows, captures_per_day):
+    """Wide odds rows, batch_rows per capture (one payload), in capture order."""
+    rows_per_game = batch_rows // GAMES_PER_DAY
+    rows_per_player = rows_per_game // PLAYERS_PER_GAME
+    return f"""
+    WITH base AS (
+        SELECT
+            i,
+            i // {batch_rows} AS c,
+            i // {batch_rows} // {captures_per_day} AS d,
+            i % {batch_rows} // {rows_per_game} AS g,
+            i % {rows_per_game} // {rows_per_player} AS p,
+            i % {rows_per_player} AS r
+        FROM range({rows}) t(i)
+    ),
+    keyed AS (
+        SELECT *, d * {GAMES_PER_DAY} + g AS event_no, (d * {GAMES_PER_DAY} + g) * 7 % 32 AS home_idx,
+               ((d * {GAMES_PER_DAY} + g) * 7 + 3) % 32 AS away_idx, r % {BOOKS} AS book_no,
+               r // {BOOKS} % 2 AS side_no, (p + r // {BOOKS * 2}) % 5 AS market_no
+        FROM base
+    )
+    SELECT
+        {VENDORS}[c % 3 + 1] AS source_vendor,
+        TIMESTAMP '2025-10-01' + to_minutes(CAST(c * (1440 // {captures_per_day}) AS BIGINT)) AS capture_ts_utc,
+        CAST(100000 + event_no AS TEXT) AS event_id_vendor,
+        {TEAMS}[away_idx + 1] || ' @ ' || {TEAMS}[home_idx + 1] AS event_name_raw,
+        TIMESTAMP '2025-10-01 23:00' + to_days(CAST(d AS BIGINT)) AS event_start_ts_utc,
+        {TEAMS}[home_idx + 1] AS home_team,
+        {TEAMS}[away_idx + 1] AS away_team,
+        CAST(8470000 + (CASE WHEN p < 20 THEN home_idx ELSE away_idx END) * 20 + p % 20 AS TEXT) AS player_id_vendor,
+        {FIRST}[CAST(hash(home_idx * 100 + p) % {len(FIRST)} AS BIGINT) + 1] || ' '
+            || {LAST}[CAST(hash(away_idx * 100 + p) % {len(LAST)} AS BIGINT) + 1] AS player_name_raw,
+        {MARKETS}[market_no + 1] AS market_type,
+        0.5 + CAST(hash(event_no, p, market_no) % 4 AS BIGINT) AS line,
+        {SIDES}[side_no + 1] AS side,
+        CAST(book_no AS TEXT) AS book_id_vendor,
+        'Sportsbook ' || CAST(book_no AS TEXT) AS book_name_raw,
+        CAST(-250 + CAST(hash(event_no, p, book_no, side_no, c // 6) % 500 AS BIGINT) AS INTEGER) AS odds_american,
+        round(1.2 + CAST(hash(event_no, p, book_no, side_no, c // 6) % 300 AS BIGINT) / 100.0, 2) AS odds_decimal,
+        FALSE AS is_live,
+        {VENDORS}[c % 3 + 1] || '/objects/' || substr(md5(CAST(c AS TEXT)), 1, 2) || '/'
+            || md5(CAST(c AS TEXT)) || md5(CAST(c + 1 AS TEXT)) || '.json.gz' AS raw_payload_path,
+        md5(CAST(c AS TEXT)) || md5(CAST(c + 1 AS TEXT)) AS raw_payload_hash
+    FROM keyed
+    """
+
+def write_partitioned(con, select_sql, root):
+    con.execute(f"""
+    COPY ({select_sql}) TO {sql_literal(root)} (
+        FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (source_vendor, capture_date), OVERWRITE_OR_IGNORE
+    )
+    """)
+
+def build_normalized(con, root):
+    """Dimension tables from the wide staging table, then the keyed lake and its compatibility view."""
+    con.execute(f"CREATE TYPE odds_market AS ENUM {tuple(MARKETS)}")
+    con.execute(f"CREATE TYPE odds_side AS ENUM {tuple(SIDES)}")
+    con.execute("""
+    CREATE TABLE dim_odds_payloads AS
+    SELECT row_number() OVER (ORDER BY raw_payload_hash)::INTEGER AS payload_id, raw_payload_hash, raw_payload_path
+    FROM (SELECT DISTINCT raw_payload_hash, raw_payload_path FROM wide)
+    """)
+    con.execute("""
+    CREATE TABLE dim_odds_events AS
+    SELECT row_number() OVER (ORDER BY source_vendor, event_id_vendor)::INTEGER AS event_key, *
+    FROM (SELECT source_vendor, event_id_vendor, any_value(event_name_raw) AS event_name_raw,
+                 any_value(event_start_ts_utc) AS event_start_ts_utc, any_value(home_team) AS home_team,
+                 any_value(away_team) AS away_team
+          FROM wide GROUP BY ALL)
+    """)
+    con.execute("""
+    CREATE TABLE dim_odds_players AS
+    SELECT row_number() OVER (ORDER BY source_vendor, player_id_vendor, player_name_raw)::INTEGER AS player_key, *
+    FROM (SELECT DISTINCT source_vendor, player_id_vendor, player_name_raw FROM wide)
+    """)
+    con.execute("""
+    CREATE TABLE dim_odds_books AS
+    SELECT row_number() OVER (ORDER BY source_vendor, book_id_vendor)::SMALLINT AS book_key, *
+    FROM (SELECT DISTINCT source_vendor, book_id_vendor, book_name_raw FROM wide)
+    """)
+    write_partitioned(con, """
+    SELECT w.source_vendor, CAST(w.capture_ts_utc AS DATE) AS capture_date, w.capture_ts_utc,
+           p.payload_id, e.event_key, pl.player_key, b.book_key,
+           CAST(enum_code(CAST(w.market_type AS odds_market)) AS UTINYINT) AS market_code,
+           CAST(enum_code(CAST(w.side AS odds_side)) AS UTINYINT) AS side_code,
+           w.line, w.odds_american, w.odds_decimal, w.is_live
+    FROM wide w
+    JOIN dim_odds_payloads p USING (raw_payload_hash)
+    JOIN dim_odds_events e USING (source_vendor, event_id_vendor)
+    JOIN dim_odds_players pl ON pl.source_vendor = w.source_vendor
+     AND pl.player_id_vendor IS NOT DISTINCT FROM w.player_id_vendor AND pl.player_name_raw IS NOT DISTINCT FROM w.player_name_raw
+    JOIN dim_odds_books b USING (source_vendor, book_id_vendor)
+    ORDER BY w.capture_ts_utc
+    """, root)
+    scan = (f"read_parquet({sql_literal(os.path.join(root, '*', '*', '*.parquet'))}, hive_partitioning = true, "
+            f"hive_types = {HIVE_TYPES})")
+    con.execute(f"CREATE VIEW normalized_lake AS SELECT * FROM {scan}")
+    con.execute(f"""
+    CREATE VIEW fact_prop_odds_compat AS
+    SELECT o.source_vendor, o.capture_ts_utc, e.event_id_vendor, e.event_name_raw, e.event_start_ts_utc,
+           e.home_team, e.away_team, pl.player_id_vendor, pl.player_name_raw,
+           enum_range(NULL::odds_market)[o.market_code + 1] AS market_type, o.line,
+           enum_range(NULL::odds_side)[o.side_code + 1] AS side, b.book_id_vendor, b.book_name_raw,
+           o.odds_american, o.odds_decimal, o.is_live, p.raw_payload_path, p.raw_payload_hash, o.capture_date
+    FROM normalized_lake o
+    JOIN dim_odds_payloads p USING (payload_id)
+    JOIN dim_odds_events e USING (event_key)
+    JOIN dim_odds_players pl USING (player_key)
+    JOIN dim_odds_books b USING (book_key)
+    """)
+
+def lake_bytes(root):
+    return sum(os.path.getsize(f) for part in list_partitions(root) for f in part["files"])
+
+def dimension_bytes(con, tmp):
+    """Dimension tables as they would be stored (ZSTD Parquet)."""
+    total = 0
+    for table in ("dim_odds_payloads", "dim_odds_events", "dim_odds_players", "dim_odds_books"):
+        path = os.path.join(tmp, f"{table}.parquet")
+        con.execute(f"COPY {table} TO {sql_literal(path)} (FORMAT PARQUET, COMPRESSION ZSTD)")
+        total += os.path.getsize(path)
+    return total
+
+def timed_query(con, sql, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        con.execute(sql).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+QUERIES = {
+    "aggregate by book/market/side": """
+        SELECT book_name_raw, market_type, side, count(*), avg(odds_decimal) FROM {relation} GROUP BY ALL""",
+    "one player's price history": """
+        SELECT capture_ts_utc, book_name_raw, market_type, line, side, odds_decimal FROM {relation}
+        WHERE player_name_raw = '{player}' AND event_id_vendor = '{event}'""",
+    "full-width day export": """
+        SELECT * FROM {relation} WHERE capture_date = DATE '2025-10-02'""",
+}
+NATIVE_AGGREGATE = """
+    SELECT book_key, market_code, side_code, count(*), avg(odds_decimal) FROM normalized_lake GROUP BY ALL"""
+
+def run(rows, batch_rows, captures_per_day):
+    with tempfile.TemporaryDirectory() as tmp:
+        con = duckdb.connect(os.path.join(tmp, "bench.duckdb"))
+        wide_root = os.path.join(tmp, "wide")
+        normalized_root = os.path.join(tmp, "normalized")
+
+        print(f"Generating {rows:,} rows...")
+        con.execute(f"CREATE TABLE wide AS {realistic_odds_sql(rows, batch_rows, captures_per_day)}")
+        write_partitioned(con, f"""
+            SELECT {", ".join(ODDS_LAKE_COLUMN_NAMES)}, CAST(capture_ts_utc AS DATE) AS capture_date
+            FROM wide ORDER BY capture_ts_utc
+        """, wide_root)
+        build_normalized(con, normalized_root)
+        con.execute(f"""
+        CREATE VIEW wide_lake AS SELECT * FROM read_parquet({sql_literal(os.path.join(wide_root, '*', '*', '*.parquet'))},
+            hive_partitioning = true, hive_types = {HIVE_TYPES})
+        """)
+        player, event = con.execute("SELECT player_name_raw, event_id_vendor FROM wide LIMIT 1").fetchone()
+        con.execute("DROP TABLE wide")
+
+        results = [
+            {"layout": "wide", "query": "bytes on disk", "value": lake_bytes(wide_root)},
+            {"layout": "normalized", "query": "bytes on disk",
+             "value": lake_bytes(normalized_root) + dimension_bytes(con, tmp)},
+        ]
+        for name, sql in QUERIES.items():
+            for layout, relation in (("wide", "wide_lake"), ("normalized (compat view)", "fact_prop_odds_compat")):
+                seconds = timed_query(con, sql.format(relation=relation, player=player.replace("'", "''"), event=event))
+                results.append({"layout": layout, "query": f"{name} (s)", "value": round(seconds, 4)})
+        results.append({"layout": "normalized (keys only)", "query": "aggregate by book/market/side (s)",
+                        "value": round(timed_query(con, NATIVE_AGGREGATE), 4)})
+        con.close()
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Odds lake bytes/query time: wide vs surrogate-keyed layout")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Synthetic rows to write")
+    parser.add_argument("--batch-rows", type=int, default=4800, help="Rows per capture (one payload)")
+    parser.add_argument("--captures-per-day", type=int, default=96, help="Captures per day across vendors")
+    args = parser.parse_args()
+
+    df = run(args.rows, args.batch_rows, args.captures_per_day)
+    print("\n--- WIDE VS NORMALIZED ODDS LAYOUT ---")
+    print(df.pivot(index="query", columns="layout", values="value").to_string(float_format=lambda v: f"{v:,.4g}"))
+
+if __name__ == "__main__":
+    main()
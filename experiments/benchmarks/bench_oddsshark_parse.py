@@ -0,0 +1,98 @@
+"""
+Benchmark: OddsShark prop page parse time
+-----------------------------------------
+Times OddsSharkClient.parse_snapshot over saved HTML pages with each available
+BeautifulSoup backend and checks that every backend yields the same records.
+--scale repeats the game blocks of each market container to emulate a full slate.
+
+Usage:
+    python experiments/benchmarks/bench_oddsshark_parse.py
+    python experiments/benchmarks/bench_oddsshark_parse.py --html "outputs/odds/raw/objects/*/*.html.*" --scale 1
+"""
+
+import argparse
+import copy
+import glob
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from nhl_bets.common.storage import load_raw_payload
+from nhl_bets.scrapers import oddsshark_client
+from nhl_bets.scrapers.oddsshark_client import OddsSharkClient
+
+DEFAULT_HTML = os.path.join(os.path.dirname(__file__), "..", "..", "tests", "fixtures", "odds_payloads", "oddsshark.html")
+CAPTURE_TS = datetime(2026, 1, 5, 18, 0, tzinfo=timezone.utc)
+
+def available_backends():
+    backends = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    return backends
+
+def scale_page(html, scale):
+    """Repeats every non-header child of each market container scale times."""
+    if scale <= 1:
+        return html
+    soup = BeautifulSoup(html, "html.parser")
+    for container in soup.select(".player-props--container.tab"):
+        blocks = [c for c in container.find_all(recursive=False) if "player-props--header" not in c.get("class", [])]
+        for _ in range(scale - 1):
+            for block in blocks:
+                container.append(copy.copy(block))
+    return str(soup)
+
+def timed_parse(html, backend, repeat):
+    oddsshark_client.HTML_PARSER = backend
+    client = OddsSharkClient()
+    best, table = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        table = client.parse_snapshot(html, "bench.html", "bench", CAPTURE_TS)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, table
+
+def run(paths, scale, repeat):
+    results = []
+    for path in paths:
+        html = scale_page(load_raw_payload(path, "html"), scale)
+        reference = None
+        for backend in available_backends():
+            seconds, table = timed_parse(html, backend, repeat)
+            if reference is None:
+                reference = table
+            elif not table.equals(reference):
+                raise AssertionError(f"{backend} output differs from {available_backends()[0]} for {path}")
+            row = {"file": os.path.basename(path), "html_kb": len(html) // 1024, "backend": backend,
+                   "records": table.num_rows, "parse_s": round(seconds, 4),
+                   "records_per_s": round(table.num_rows / seconds) if seconds else None}
+            results.append(row)
+            print(row)
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="OddsShark HTML parse time")
+    parser.add_argument("--html", default=DEFAULT_HTML, help="Saved page or glob (plain, .gz or .zst raw objects)")
+    parser.add_argument("--scale", type=int, default=200, help="Repeat each container's game blocks this many times")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per backend (best is reported)")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.html))
+    if not paths:
+        parser.error(f"No HTML files match {args.html}")
+    df = run(paths, args.scale, args.repeat)
+    print("\n--- PARSE TIME ---")
+    print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
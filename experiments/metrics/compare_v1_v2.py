@@ -1,6 +1,12 @@
 import pandas as pd
-import duckdb
 import os
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 V1_PATH = 'outputs/backtest_reports/backtest_bets_v1_leaked.csv'
@@ -57,7 +63,7 @@ def analyze():
     # The heuristic triggers when OPPONENT is B2B.
     print("\n--- Backup Signal Analysis (Opponent B2B) ---")
     
-    con = duckdb.connect(DB_PATH)
+    con = get_replica_connection(DB_PATH)
     con.register('df_v2', df_v2)
     
     # We need to find games where OPPONENT is B2B
@@ -1,14 +1,20 @@
-import duckdb
 import pandas as pd
 import numpy as np
 import os
 from sklearn.metrics import log_loss, brier_score_loss
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 REPORTS_DIR = 'outputs/backtest_reports'
 
 def main():
-    con = duckdb.connect(DB_PATH)
+    con = get_replica_connection(DB_PATH)
     
     # Define splits (hardcoded for now to match fit script, or passed via args - sticking to defaults)
     TRAIN_END = '2023-06-30'
@@ -1,11 +1,18 @@
 
-import duckdb
 import pandas as pd
+import os
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 
 def evaluate_profitability():
-    con = duckdb.connect(DB_PATH)
+    con = get_replica_connection(DB_PATH)
     
     df = con.execute("SELECT * FROM fact_backtest_bets WHERE result != 'PENDING'").df()
     
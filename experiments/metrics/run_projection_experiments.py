@@ -1,5 +1,4 @@
 
-import duckdb
 import pandas as pd
 import numpy as np
 import sys
@@ -7,6 +6,12 @@ import os
 from sklearn.metrics import log_loss, brier_score_loss
 import time
 
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
+
 # Add root to path
 sys.path.append(os.getcwd())
 
@@ -15,7 +20,7 @@ from nhl_bets.projections.single_game_model import compute_game_probs
 DB_PATH = "data/db/nhl_backtest.duckdb"
 
 def load_data(limit=None):
-    con = duckdb.connect(DB_PATH)
+    con = get_replica_connection(DB_PATH)
     # Select games from 2023-2025 where we have full L40 history
     # This ensures a fair comparison between L20 and L40
     query = """
@@ -1,16 +1,23 @@
 
-import duckdb
 import pandas as pd
 import numpy as np
 import time
 from sklearn.metrics import log_loss, brier_score_loss
 from scipy.stats import nbinom
+import os
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
 
 DB_PATH = "data/db/nhl_backtest.duckdb"
 ALPHA_SOG = 0.35 # Fixed Alpha from THEORY
 
 def load_data():
-    con = duckdb.connect(DB_PATH)
+    con = get_replica_connection(DB_PATH)
     # Select games from 2023-2025
     query = """
     SELECT *
@@ -1,8 +1,15 @@
 
-import duckdb
+import os
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
 
 db_path = "data/db/nhl_backtest.duckdb"
-con = duckdb.connect(db_path)
+con = get_db_connection(db_path, read_only=True)
 
 query = """
 SELECT 
@@ -1,9 +1,15 @@
 import joblib
 import glob
-import duckdb
 import pandas as pd
 import math
 import os
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
 
 DB_PATH = r'data/db/nhl_backtest.duckdb'
 CALIB_DIR = r'data/models/calibrators'
@@ -26,7 +32,7 @@ def verify_artifacts():
 
 def verify_db_counts():
     print("\n--- 2. Verifying DB Counts ---")
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH, read_only=True)
     tables = ['fact_calibration_dataset', 'dim_calibrators', 'fact_probabilities_calibrated', 'fact_probabilities']
     counts = {}
     for t in tables:
@@ -52,7 +58,7 @@ def verify_db_counts():
 def verify_holdout_eval():
     print("\n--- 3. Verifying Hold-out Evaluation (Log Loss) ---")
     # Strict held-out range check
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH, read_only=True)
     start='2024-10-01'
     end='2025-06-30'
     
@@ -93,7 +99,7 @@ def verify_holdout_eval():
 
 def verify_deltas():
     print("\n--- 4. Verifying Probability Deltas ---")
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH, read_only=True)
     q='''
     SELECT
       AVG(ABS(d.p_over_calibrated - b.p_over)) AS mean_abs_delta,
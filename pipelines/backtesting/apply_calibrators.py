@@ -1,9 +1,16 @@
-import duckdb
 import pandas as pd
 import numpy as np
 import joblib
 import argparse
 import sys
+import os
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.db_replica import publish_replica
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 
@@ -12,7 +19,7 @@ def main():
     parser.add_argument('--version', type=str, default='v1')
     args = parser.parse_args()
     
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH)
     
     print(f"Loading calibrators metadata for version {args.version}...")
     calibs = con.execute("SELECT * FROM dim_calibrators WHERE calibrator_version = ?", [args.version]).df()
@@ -69,6 +76,7 @@ def main():
     # Validation
     print("Sample of calibrated data:")
     print(con.execute("SELECT * FROM fact_probabilities_calibrated LIMIT 5").df())
+    publish_replica(con, DB_PATH, tables=("fact_probabilities_calibrated",))
     
     con.close()
 
@@ -1,12 +1,19 @@
-import duckdb
 import pandas as pd
 import numpy as np
 import os
 import joblib
 from scipy.special import logit
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.db_replica import publish_replica
 
 def apply_calibrators(db_path, model_dir):
-    con = duckdb.connect(db_path)
+    con = get_db_connection(db_path)
     
     # 1. Load probabilities
     df = con.execute("SELECT * FROM fact_probabilities").df()
@@ -52,6 +59,7 @@ def apply_calibrators(db_path, model_dir):
     # Write back to DuckDB
     print("Writing calibrated probabilities to fact_probabilities...")
     con.execute("CREATE OR REPLACE TABLE fact_probabilities AS SELECT * FROM df")
+    publish_replica(con, db_path, tables=("fact_probabilities",))
     con.close()
     print("Done.")
 
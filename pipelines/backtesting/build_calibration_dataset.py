@@ -1,12 +1,18 @@
-import duckdb
 import pandas as pd
 import sys
 import os
 
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.db_replica import publish_replica
+
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 
 def main():
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH)
     
     print("Building fact_calibration_dataset...")
     
@@ -101,6 +107,7 @@ def main():
         
         sample = con.execute("SELECT * FROM fact_calibration_dataset LIMIT 5").df()
         print(sample)
+        publish_replica(con, DB_PATH, tables=("fact_calibration_dataset",))
         
     except Exception as e:
         print(f"Error building calibration dataset: {e}")
@@ -1,95 +1,107 @@
-import duckdb
 import argparse
+from datetime import datetime
 import sys
+import os
 
-def build_goalie_features(db_path, start_season=None, end_season=None, force=False):
-    conn = duckdb.connect(db_path)
-    
-    # Enable performance pragmas
-    conn.execute("SET memory_limit = '8GB';")
-    conn.execute("SET threads = 8;")
-    conn.execute("SET temp_directory = './duckdb_temp/';")
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.feature_refresh import diff_features, rebuild_features, update_features
 
-    if not force:
-        tables = conn.sql("SHOW TABLES").fetchall()
-        if ('fact_goalie_features',) in tables:
-            print("Table 'fact_goalie_features' already exists. Use --force to overwrite.")
-            return
+FEATURES_SQL = """
+WITH goalie_games AS (
+    SELECT
+        player_id as goalie_id,
+        game_id,
+        game_date,
+        season,
+        team,
+        goals_against,
+        x_goals_against,
+        toi_seconds
+    FROM {source}
+    WHERE situation = 'all'
+),
+rolling_sums AS (
+    SELECT
+        goalie_id,
+        game_id,
+        game_date,
+        season,
+        team,
+        
+        -- L10 Rolling Sums (Excluding current game)
+        SUM(goals_against) OVER (
+            PARTITION BY goalie_id 
+            ORDER BY game_date, game_id
+            ROWS BETWEEN 10 PRECEDING AND 1 PRECEDING
+        ) as sum_ga_L10,
+        
+        SUM(x_goals_against) OVER (
+            PARTITION BY goalie_id 
+            ORDER BY game_date, game_id
+            ROWS BETWEEN 10 PRECEDING AND 1 PRECEDING
+        ) as sum_xga_L10,
+        
+        SUM(toi_seconds) OVER (
+            PARTITION BY goalie_id 
+            ORDER BY game_date, game_id
+            ROWS BETWEEN 10 PRECEDING AND 1 PRECEDING
+        ) as sum_toi_L10
 
-    print("Building fact_goalie_features...")
-    
-    season_filter = ""
-    if start_season:
-        season_filter += f" AND season >= {start_season}"
-    if end_season:
-        season_filter += f" AND season <= {end_season}"
+    FROM goalie_games
+),
+calc_metrics AS (
+    SELECT
+        *,
+        -- Safe division for GSAx60
+        -- Formula: (Sum_xGA_L10 - Sum_GA_L10) / (Sum_TOI_L10 / 3600)
+        CASE 
+            WHEN sum_toi_L10 IS NULL OR sum_toi_L10 = 0 THEN 0 
+            ELSE (sum_xga_L10 - sum_ga_L10) / (sum_toi_L10 / 3600)
+        END as goalie_gsax60_L10
+    FROM rolling_sums
+)
+SELECT
+    *
+FROM calc_metrics
+"""
 
-    query = """
-    CREATE OR REPLACE TABLE fact_goalie_features AS
-    WITH goalie_games AS (
-        SELECT
-            player_id as goalie_id,
-            game_id,
-            game_date,
-            season,
-            team,
-            goals_against,
-            x_goals_against,
-            toi_seconds
-        FROM fact_goalie_game_situation
-        WHERE situation = 'all'
-    ),
-    rolling_sums AS (
-        SELECT
-            goalie_id,
-            game_id,
-            game_date,
-            season,
-            team,
-            
-            -- L10 Rolling Sums (Excluding current game)
-            SUM(goals_against) OVER (
-                PARTITION BY goalie_id 
-                ORDER BY game_date 
-                ROWS BETWEEN 10 PRECEDING AND 1 PRECEDING
-            ) as sum_ga_L10,
-            
-            SUM(x_goals_against) OVER (
-                PARTITION BY goalie_id 
-                ORDER BY game_date 
-                ROWS BETWEEN 10 PRECEDING AND 1 PRECEDING
-            ) as sum_xga_L10,
-            
-            SUM(toi_seconds) OVER (
-                PARTITION BY goalie_id 
-                ORDER BY game_date 
-                ROWS BETWEEN 10 PRECEDING AND 1 PRECEDING
-            ) as sum_toi_L10
+SPEC = {
+    "table": "fact_goalie_features",
+    "source": "fact_goalie_game_situation",
+    "select_sql": FEATURES_SQL,
+    "rows_sql": "SELECT player_id as goalie_id, game_id, game_date, season FROM {source} WHERE situation = 'all'",
+    "keys": ("goalie_id", "game_id"),
+    "order": "game_date, game_id",
+    "windows": [("goalie_id", 10)]
+}
 
-        FROM goalie_games
-    ),
-    calc_metrics AS (
-        SELECT
-            *,
-            -- Safe division for GSAx60
-            -- Formula: (Sum_xGA_L10 - Sum_GA_L10) / (Sum_TOI_L10 / 3600)
-            CASE 
-                WHEN sum_toi_L10 IS NULL OR sum_toi_L10 = 0 THEN 0 
-                ELSE (sum_xga_L10 - sum_ga_L10) / (sum_toi_L10 / 3600)
-            END as goalie_gsax60_L10
-        FROM rolling_sums
-    )
-    SELECT
-        *
-    FROM calc_metrics
-    WHERE 1=1 {season_filter}
-    """
-    
-    formatted_query = query.format(season_filter=season_filter)
-    
+def build_goalie_features(db_path, start_season=None, end_season=None, force=False, incremental=False, verify=False,
+                          since=None):
+    conn = get_db_connection(db_path)
     try:
-        conn.execute(formatted_query)
-        count = conn.sql("SELECT COUNT(*) FROM fact_goalie_features").fetchone()[0]
+        if verify:
+            diff = diff_features(conn, SPEC, start_season, end_season)
+            print(f"fact_goalie_features vs full rebuild: {diff}")
+            return diff
+
+        if incremental:
+            result = update_features(conn, SPEC, start_season, end_season, since)
+            print(f"Updated fact_goalie_features: {result['rows']} rows from {result['new_from']} "
+                  f"({result['context_rows']} source rows read from {result['context_from']}).")
+            return result
+
+        if not force:
+            tables = conn.sql("SHOW TABLES").fetchall()
+            if ('fact_goalie_features',) in tables:
+                print("Table 'fact_goalie_features' already exists. Use --force to overwrite or --incremental to update.")
+                return
+
+        print("Building fact_goalie_features...")
+        count = rebuild_features(conn, SPEC, start_season, end_season)
         print(f"Created fact_goalie_features with {count} rows.")
     except Exception as e:
         print(f"Error executing query: {e}")
@@ -102,7 +114,14 @@ if __name__ == "__main__":
     parser.add_argument("--start-season", type=int)
     parser.add_argument("--end-season", type=int)
     parser.add_argument("--force", action="store_true")
+    parser.add_argument("--incremental", action="store_true", help="Compute features only for games added since the last build")
+    parser.add_argument("--verify", action="store_true", help="Diff the stored table against a full rebuild (nothing is written)")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="With --incremental, also recompute from this game date (source rows corrected in place)")
     args = parser.parse_args()
 
     db_path = "data/db/nhl_backtest.duckdb"
-    build_goalie_features(db_path, args.start_season, args.end_season, args.force)
+    diff = build_goalie_features(db_path, args.start_season, args.end_season, args.force, args.incremental, args.verify,
+                                 args.since)
+    if args.verify and (diff["missing"] or diff["extra"] or diff["mismatched"]):
+        sys.exit(1)
@@ -1,10 +1,16 @@
-import duckdb
 import pandas as pd
 import sys
 import argparse
 import os
 from datetime import datetime
 
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.db_replica import publish_replica
+
 # Add project root to path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(current_dir))
@@ -19,12 +25,7 @@ except ImportError as e:
     sys.exit(1)
 
 def build_snapshots(db_path, start_season=None, end_season=None, force=False, model_version="baseline_v1"):
-    conn = duckdb.connect(db_path)
-    
-    # Enable performance pragmas
-    conn.execute("SET memory_limit = '8GB';")
-    conn.execute("SET threads = 8;")
-    conn.execute("SET temp_directory = './duckdb_temp/';")
+    conn = get_db_connection(db_path)
 
     # Check existing
     if not force:
@@ -312,6 +313,7 @@ def build_snapshots(db_path, start_season=None, end_season=None, force=False, mo
     
     print(f"Written {len(df_mu)} rows to fact_model_mu")
     print(f"Written {len(df_probs)} rows to fact_probabilities")
+    publish_replica(conn, db_path, tables=("fact_probabilities",))
     
     conn.close()
 
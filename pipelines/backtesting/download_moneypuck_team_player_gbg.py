@@ -1,139 +1,58 @@
+"""
+MoneyPuck Downloader
+--------------------
+Syncs the player lookup and the per-team game-by-game CSVs into
+data/raw/moneypuck. Files are fetched concurrently over one pooled session;
+data/raw/moneypuck/download_manifest.json keeps size, ETag and Last-Modified per
+file so a nightly sync only sends conditional requests for unchanged files, and
+an interrupted run resumes where it stopped.
+
+Usage:
+    python pipelines/backtesting/download_moneypuck_team_player_gbg.py --end-season 2025
+    python pipelines/backtesting/download_moneypuck_team_player_gbg.py --start-season 2024 --workers 16 --force
+"""
+
 import os
 import sys
-import time
 import argparse
-import requests
-from pathlib import Path
 import logging
+from pathlib import Path
+
+# Ensure project root is in path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+src_dir = os.path.join(project_root, "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from nhl_bets.scrapers.moneypuck_downloader import LOOKUP_URL, MoneyPuckDownloader
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Constants
-BASE_URL = "https://moneypuck.com/playerData"
-SEASON_SUMMARY_BASE = f"{BASE_URL}/seasonSummary"
-LOOKUP_URL = f"{BASE_URL}/playerBios/allPlayersLookup.csv"
-
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-}
-
-def download_file(url, target_path, force=False):
-    """
-    Download a file from a URL to target_path. 
-    If not force, it compares Content-Length if available to skip.
-    """
-    target_file = Path(target_path)
-    target_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    try:
-        # 1. Use HEAD request to check size/existence
-        head = requests.head(url, headers=HEADERS, timeout=10)
-        if head.status_code == 403:
-            logger.warning(f"Upstream returned 403; downloader skipped; ingestion may proceed using existing local data. URL: {url}")
-            return "skipped"
-            
-        if head.status_code != 200:
-            # Try GET if HEAD is not supported properly
-            resp = requests.get(url, headers=HEADERS, stream=True, timeout=10)
-            if resp.status_code == 403:
-                logger.warning(f"Upstream returned 403; downloader skipped; ingestion may proceed using existing local data. URL: {url}")
-                return "skipped"
-            if resp.status_code != 200:
-                logger.error(f"File not found on server ({resp.status_code}): {url}")
-                return "failed"
-        else:
-            remote_size = int(head.headers.get('Content-Length', 0))
-            if not force and target_file.exists() and target_file.stat().st_size == remote_size:
-                return "skipped"
-            resp = requests.get(url, headers=HEADERS, stream=True, timeout=30)
-
-        # 2. Download and save
-        with open(target_file, 'wb') as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        return "downloaded"
-    except Exception as e:
-        logger.error(f"Failed to download {url}: {e}")
-        return "failed"
-
 def main():
-    parser = argparse.ArgumentParser(description="Download MoneyPuck NHL Season Summary data.")
+    parser = argparse.ArgumentParser(description="Download MoneyPuck NHL game-by-game data.")
     parser.add_argument("--start-season", type=int, default=2018)
     parser.add_argument("--end-season", type=int, default=2025)
     parser.add_argument("--season-type", type=str, default="regular")
-    parser.add_argument("--force", action="store_true")
-    
-    script_dir = Path(__file__).parent
-    project_root = script_dir.parent.parent
-    data_root = project_root / "data" / "raw" / "moneypuck"
-    
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent downloads")
+    parser.add_argument("--force", action="store_true", help="Re-download every file")
     args = parser.parse_args()
-    
-    logger.info(f"Starting optimized download to {data_root}")
-    
-    # 1. Download Lookup
-    status = download_file(LOOKUP_URL, data_root / "allPlayersLookup.csv", force=args.force)
-    logger.info(f"Lookup file: {status}")
-    
-    # 2. Download Season Summaries (Faster than game-by-game for live bridge)
-    # Note: ingest_moneypuck_to_duckdb.py currently expects individual game files.
-    # However, the user asked for a "downloader". 
-    # If I use season summaries, I need to update the ingestor too.
-    # Let's stick to individual games if that's what the ingestor wants, 
-    # OR provide both and update the ingestor.
-    
-    # For now, let's keep the game-by-game logic but make it more robust.
-    # MoneyPuck's directory listing can be finicky.
-    
-    GAME_BY_GAME_BASE = f"{BASE_URL}/teamPlayerGameByGame"
-    
-    import re
-    def get_csv_links(index_url):
-        try:
-            response = requests.get(index_url, headers=HEADERS, timeout=30)
-            if response.status_code == 403:
-                logger.warning(f"Upstream returned 403; downloader skipped; ingestion may proceed using existing local data. URL: {index_url}")
-                return []
-            response.raise_for_status()
-            links = re.findall(r'href=["\\]?([^"\">]+\.csv)["\\]?', response.text)
-            return list(set(links))
-        except Exception as e:
-            logger.error(f"Error fetching index {index_url}: {e}")
-            return []
 
-    groups = ["skaters", "goalies"]
-    seasons = range(args.start_season, args.end_season + 1)
-    
-    overall_failed = False
-    for season in seasons:
-        for group in groups:
-            rel_path = f"teamPlayerGameByGame/{season}/{args.season_type}/{group}"
-            target_dir = data_root / rel_path
-            index_url = f"{GAME_BY_GAME_BASE}/{season}/{args.season_type}/{group}/"
-            
-            logger.info(f"Syncing {season} {group}...")
-            csv_files = get_csv_links(index_url)
-            
-            if not csv_files:
-                continue
-                
-            stats = {"downloaded": 0, "skipped": 0, "failed": 0}
-            for csv_file in csv_files:
-                res = download_file(f"{index_url}{csv_file}", target_dir / csv_file, force=args.force)
-                stats[res] += 1
-            
-            if stats['failed'] > 0:
-                overall_failed = True
-            
-            if stats['downloaded'] > 0:
-                logger.info(f"  Result: {stats['downloaded']} new, {stats['skipped']} skipped.")
-            else:
-                logger.info(f"  Result: Up to date.")
-    
-    if overall_failed and args.force:
+    data_root = Path(project_root) / "data" / "raw" / "moneypuck"
+    logger.info(f"Syncing MoneyPuck data to {data_root}")
+    downloader = MoneyPuckDownloader(str(data_root), workers=args.workers)
+
+    # 1. Directory listings for every season/group, then one job per file (lookup included)
+    jobs = [(LOOKUP_URL, "allPlayersLookup.csv")]
+    jobs += downloader.game_by_game_jobs(range(args.start_season, args.end_season + 1), args.season_type)
+    logger.info(f"{len(jobs)} files listed.")
+
+    # 2. Sync
+    stats = downloader.sync(jobs, force=args.force)
+    logger.info(f"Result: {stats['downloaded']} downloaded, {stats['skipped']} unchanged/skipped, {stats['failed']} failed.")
+
+    if stats["failed"] > 0 and args.force:
         logger.error("Fresh download was requested (--force) but some files failed to download.")
         sys.exit(1)
 
@@ -1,10 +1,16 @@
-import duckdb
 import pandas as pd
 import numpy as np
 import os
 import argparse
 from datetime import datetime
 from sklearn.metrics import brier_score_loss, log_loss, roc_auc_score
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
 
 def calculate_ece(y_true, y_prob, n_bins=10):
     """
@@ -84,7 +90,7 @@ def evaluate_accuracy(db_path, output_md, output_csv, output_bins_csv):
         print(f"Error: Database not found at {db_path}")
         return
 
-    con = duckdb.connect(db_path)
+    con = get_replica_connection(db_path)
     
     print("Joining predictions with realized outcomes and team stats...")
     
@@ -137,7 +143,7 @@ def evaluate_accuracy(db_path, output_md, output_csv, output_bins_csv):
     max_date = df['game_date'].max()
     
     # Get seasons
-    con = duckdb.connect(db_path)
+    con = get_replica_connection(db_path)
     seasons = con.execute("SELECT DISTINCT season FROM fact_skater_game_all").df()['season'].unique()
     seasons.sort()
     con.close()
@@ -1,4 +1,3 @@
-import duckdb
 import pandas as pd
 import numpy as np
 import os
@@ -9,6 +8,12 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import log_loss
 from scipy.special import logit, expit
 
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+
 def calculate_ece(y_true, y_prob, n_bins=10):
     if len(y_true) == 0:
         return 0.0
@@ -23,7 +28,7 @@ def calculate_ece(y_true, y_prob, n_bins=10):
     return ece
 
 def fit_calibrators(db_path, output_dir):
-    con = duckdb.connect(db_path)
+    con = get_db_connection(db_path, read_only=True)
     
     query = """
     SELECT
@@ -1,4 +1,3 @@
-import duckdb
 import pandas as pd
 import numpy as np
 import argparse
@@ -7,6 +6,13 @@ import joblib
 from sklearn.isotonic import IsotonicRegression
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import log_loss
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 MODELS_DIR = 'data/models/calibrators'
@@ -18,7 +24,7 @@ def main():
     parser.add_argument('--version', type=str, default='v1')
     args = parser.parse_args()
     
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH)
     
     # Create dim_calibrators if not exists
     con.execute("""
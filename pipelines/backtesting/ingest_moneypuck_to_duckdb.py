@@ -1,8 +1,19 @@
-import duckdb
 import argparse
+import json
 import logging
 from pathlib import Path
 import sys
+import os
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.moneypuck_ingest import (
+    INGEST_MANIFEST_TABLE, STAGING_ROOT, ingest_group, list_group_files, refresh_dim_games, refresh_skater_game_all,
+    table_exists,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -23,8 +34,7 @@ def setup_db(con, force=False):
         con.execute("DROP TABLE IF EXISTS fact_skater_game_all")
         con.execute("DROP TABLE IF EXISTS fact_goalie_game_situation")
         con.execute("DROP TABLE IF EXISTS dim_games")
-    
-    pass
+        con.execute(f"DROP TABLE IF EXISTS {INGEST_MANIFEST_TABLE}")
 
 def ingest_players(con, data_root):
     """
@@ -63,196 +73,114 @@ def ingest_players(con, data_root):
     else:
         logger.info("dim_players table already exists. Skipping.")
 
-def ingest_skaters(con, data_root, start_season, end_season, season_type):
+def ingest_skaters(con, data_root, start_season, end_season, season_type, incremental=False,
+                   staging_root=STAGING_ROOT):
     """
-    Ingests skater game-by-game data.
+    Ingests skater game-by-game data via the typed Parquet staging. With incremental,
+    only new or changed files are loaded and fact_skater_game_all / dim_games are
+    refreshed for their games.
+    Returns (touched game_ids or None after a full build, earliest changed game_date).
     """
     logger.info("Ingesting skater data...")
-    
-    sit_table_exists = con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'fact_skater_game_situation'").fetchone()[0] > 0
-    
-    if sit_table_exists:
-        logger.info("fact_skater_game_situation already exists. Skipping raw ingest (use --force to rebuild).")
+
+    if table_exists(con, "fact_skater_game_situation") and not incremental:
+        logger.info("fact_skater_game_situation already exists. Skipping raw ingest (use --incremental or --force).")
     else:
-        files = []
-        for season in range(start_season, end_season + 1):
-            season_path = Path(data_root) / str(season) / season_type / "skaters"
-            if season_path.exists():
-                season_files = list(season_path.glob("*.csv"))
-                files.extend([str(f).replace('\\', '/') for f in season_files])
-            else:
-                logger.warning(f"Season path not found: {season_path}")
-        
+        files = list_group_files(data_root, start_season, end_season, season_type, "skaters")
         if not files:
             logger.warning("No skater files found.")
-            return
-
+            return [], None
         logger.info(f"Found {len(files)} skater files.")
-        
-        logger.info("Creating fact_skater_game_situation...")
-        con.execute(f"""
-        CREATE TABLE fact_skater_game_situation AS
-        SELECT
-            playerId as player_id,
-            gameId as game_id,
-            strptime(CAST(gameDate AS VARCHAR), '%Y%m%d') as game_date,
-            CAST(gameId / 1000000 AS INTEGER) as season,
-            playerTeam as team,
-            opposingTeam as opp_team,
-            home_or_away,
-            position,
-            situation,
-            icetime as toi_seconds,
-            I_F_goals as goals,
-            I_F_primaryAssists as primary_assists,
-            I_F_secondaryAssists as secondary_assists,
-            I_F_points as points,
-            I_F_shotsOnGoal as sog,
-            shotsBlockedByPlayer as blocks,
-            I_F_shotAttempts as shot_attempts,
-            I_F_hits as hits,
-            I_F_takeaways as takeaways,
-            I_F_giveaways as giveaways,
-            I_F_dZoneGiveaways as d_zone_giveaways,
-            I_F_xGoals as x_goals,
-            OnIce_F_xGoals as on_ice_xgoals,
-            OnIce_F_goals as on_ice_goals
-        FROM read_csv_auto({files}, union_by_name=True, filename=True)
-        """
-        )
-        logger.info("Created fact_skater_game_situation.")
 
-    all_table_exists = con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'fact_skater_game_all'").fetchone()[0] > 0
-    
-    if all_table_exists:
+        created = not table_exists(con, "fact_skater_game_situation")
+        result = ingest_group(con, data_root, "skaters", files, incremental and not created, staging_root)
+        logger.info(f"fact_skater_game_situation: {result['files']} files, {result['rows']} rows, "
+                    f"{len(result['game_ids'])} games.")
+        if not created:
+            refresh_skater_game_all(con, result["game_ids"])
+            return result["game_ids"], result["changed_from"]
+
+    if table_exists(con, "fact_skater_game_all"):
         logger.info("fact_skater_game_all already exists. Skipping.")
     else:
         logger.info("Creating fact_skater_game_all...")
-        
-        con.execute("""
-        CREATE TABLE fact_skater_game_all AS
-        WITH all_situations AS (
-            SELECT * FROM fact_skater_game_situation WHERE situation = 'all'
-        ),
-        pp_toi AS (
-            SELECT player_id, game_id, toi_seconds as pp_toi_seconds 
-            FROM fact_skater_game_situation 
-            WHERE situation = '5on4'
-        ),
-        ev_toi AS (
-            SELECT player_id, game_id, toi_seconds as ev_toi_seconds 
-            FROM fact_skater_game_situation 
-            WHERE situation = '5on5'
-        )
-        SELECT
-            a.player_id,
-            a.game_id,
-            a.game_date,
-            a.season,
-            a.team,
-            a.opp_team,
-            a.home_or_away,
-            a.position,
-            a.goals,
-            COALESCE(a.primary_assists + a.secondary_assists, a.points - a.goals) as assists,
-            a.points,
-            a.sog,
-            a.blocks,
-            a.toi_seconds,
-            a.toi_seconds / 60.0 as toi_minutes,
-            COALESCE(p.pp_toi_seconds, 0) as pp_toi_seconds,
-            COALESCE(e.ev_toi_seconds, 0) as ev_toi_seconds,
-            a.x_goals,
-            a.shot_attempts,
-            a.hits
-        FROM all_situations a
-        LEFT JOIN pp_toi p ON a.player_id = p.player_id AND a.game_id = p.game_id
-        LEFT JOIN ev_toi e ON a.player_id = e.player_id AND a.game_id = e.game_id
-        """
-        )
+        refresh_skater_game_all(con)
         logger.info("Created fact_skater_game_all.")
+    return None, None
 
-def ingest_goalies(con, data_root, start_season, end_season, season_type):
+def ingest_goalies(con, data_root, start_season, end_season, season_type, incremental=False,
+                   staging_root=STAGING_ROOT):
     """
-    Ingests goalie game-by-game data.
+    Ingests goalie game-by-game data via the typed Parquet staging (only new or
+    changed files with incremental). Returns the earliest changed game_date of an
+    incremental load.
     """
     logger.info("Ingesting goalie data...")
-    
-    table_exists = con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'fact_goalie_game_situation'").fetchone()[0] > 0
-    
-    if table_exists:
+
+    if table_exists(con, "fact_goalie_game_situation") and not incremental:
         logger.info("fact_goalie_game_situation already exists. Skipping.")
-        return
+        return None
 
-    files = []
-    for season in range(start_season, end_season + 1):
-        season_path = Path(data_root) / str(season) / season_type / "goalies"
-        if season_path.exists():
-            season_files = list(season_path.glob("*.csv"))
-            files.extend([str(f).replace('\\', '/') for f in season_files])
-    
+    files = list_group_files(data_root, start_season, end_season, season_type, "goalies")
     if not files:
         logger.warning("No goalie files found.")
-        return
-
+        return None
     logger.info(f"Found {len(files)} goalie files.")
-    
-    con.execute(f"""
-    CREATE TABLE fact_goalie_game_situation AS
-    SELECT
-        playerId as player_id,
-        gameId as game_id,
-        strptime(CAST(gameDate AS VARCHAR), '%Y%m%d') as game_date,
-        CAST(gameId / 1000000 AS INTEGER) as season,
-        playerTeam as team,
-        opposingTeam as opp_team,
-        home_or_away,
-        situation,
-        icetime as toi_seconds,
-        ongoal as shots_against,
-        goals as goals_against,
-        xGoals as x_goals_against
-    FROM read_csv_auto({files}, union_by_name=True, filename=True)
-    """
-    )
-    logger.info("Created fact_goalie_game_situation.")
 
-def derive_games(con):
+    incremental = incremental and table_exists(con, "fact_goalie_game_situation")
+    result = ingest_group(con, data_root, "goalies", files, incremental, staging_root)
+    logger.info(f"fact_goalie_game_situation: {result['files']} files, {result['rows']} rows, "
+                f"{len(result['game_ids'])} games.")
+    return result["changed_from"] if incremental else None
+
+def derive_games(con, game_ids=None):
     """
-    Derives dim_games from fact tables.
+    Derives dim_games from fact tables (only game_ids, if given and dim_games exists).
     """
     logger.info("Deriving dim_games...")
-    
-    table_exists = con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'dim_games'").fetchone()[0] > 0
-    
-    if table_exists:
+
+    if game_ids is not None and table_exists(con, "dim_games"):
+        refresh_dim_games(con, game_ids)
+        logger.info(f"Refreshed dim_games for {len(game_ids)} games.")
+        return
+
+    if table_exists(con, "dim_games"):
         logger.info("dim_games already exists. Skipping.")
         return
 
-    con.execute("""
-    CREATE TABLE dim_games AS
-    SELECT
-        game_id,
-        MIN(game_date) as game_date,
-        MIN(season) as season,
-        MIN(CASE WHEN home_or_away = 'HOME' THEN team ELSE opp_team END) as home_team,
-        MIN(CASE WHEN home_or_away = 'AWAY' THEN team ELSE opp_team END) as away_team
-    FROM fact_skater_game_situation
-    WHERE situation = 'all'
-    GROUP BY game_id
-    """
-    )
-    
+    refresh_dim_games(con)
     logger.info("Created dim_games.")
 
+def record_changed_from(path, changed_from):
+    """
+    Merges the earliest changed game_date into the pending file the feature steps
+    read as --since (the production runner removes it once they have all run).
+    """
+    if changed_from is None:
+        return
+    since = changed_from.date().isoformat()
+    if os.path.exists(path):
+        with open(path) as f:
+            since = min(since, json.load(f)["since"])
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"since": since}, f)
+    logger.info(f"Features need recomputing from {since} (recorded in {path}).")
+
 def main():
     parser = argparse.ArgumentParser(description="Ingest MoneyPuck data into DuckDB.")
     parser.add_argument("--start-season", type=int, default=2018)
     parser.add_argument("--end-season", type=int, default=2025)
     parser.add_argument("--season-type", type=str, default="regular")
     parser.add_argument("--data-root", type=str, default=r"data\raw\moneypuck\teamPlayerGameByGame")
+    parser.add_argument("--staging-root", type=str, default=STAGING_ROOT,
+                        help="Typed Parquet copies of the CSVs (per file and per season)")
     parser.add_argument("--duckdb-path", type=str, default=r"data\db\nhl_backtest.duckdb")
     parser.add_argument("--force", action="store_true", help="Drop existing tables and rebuild")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Read only new or changed CSVs (per moneypuck_ingest_manifest) into existing tables")
+    parser.add_argument("--changed-since-file", type=str,
+                        help="Record the earliest game_date whose rows changed here, for the feature steps' --since")
     
     args = parser.parse_args()
     
@@ -260,14 +188,21 @@ def main():
     
     Path(args.duckdb_path).parent.mkdir(parents=True, exist_ok=True)
     
-    con = duckdb.connect(args.duckdb_path)
+    con = get_db_connection(args.duckdb_path)
     
     try:
         setup_db(con, args.force)
         ingest_players(con, args.data_root)
-        ingest_skaters(con, args.data_root, args.start_season, args.end_season, args.season_type)
-        ingest_goalies(con, args.data_root, args.start_season, args.end_season, args.season_type)
-        derive_games(con)
+        game_ids, skaters_changed_from = ingest_skaters(con, args.data_root, args.start_season, args.end_season,
+                                                        args.season_type, incremental=args.incremental,
+                                                        staging_root=args.staging_root)
+        goalies_changed_from = ingest_goalies(con, args.data_root, args.start_season, args.end_season,
+                                              args.season_type, incremental=args.incremental,
+                                              staging_root=args.staging_root)
+        derive_games(con, game_ids)
+        if args.changed_since_file:
+            changed = [d for d in (skaters_changed_from, goalies_changed_from) if d is not None]
+            record_changed_from(args.changed_since_file, min(changed) if changed else None)
         
         logger.info("Ingestion complete.")
         
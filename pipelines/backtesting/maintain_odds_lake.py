@@ -0,0 +1,57 @@
+"""
+Odds Lake Maintenance
+---------------------
+Compacts closed-day partitions of the Parquet odds lake into one file each and
+prunes (or archives) partitions older than a cutoff date.
+
+Usage:
+    python pipelines/backtesting/maintain_odds_lake.py --compact
+    python pipelines/backtesting/maintain_odds_lake.py --prune-before 2025-07-01 --archive-dir data/odds_archive
+"""
+
+import argparse
+import os
+import sys
+import logging
+
+import duckdb
+
+# Ensure project root is in path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+src_dir = os.path.join(project_root, "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from nhl_bets.common.odds_lake import ODDS_LAKE_ROOT, compact_partitions, list_partitions, prune_partitions
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("maintain_odds_lake")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact / prune the Parquet odds lake")
+    parser.add_argument("--root", default=ODDS_LAKE_ROOT, help="Odds lake root directory")
+    parser.add_argument("--vendor", help="Restrict to one source_vendor")
+    parser.add_argument("--compact", action="store_true", help="Merge each closed-day partition into one file")
+    parser.add_argument("--compact-before", help="Only compact partitions before this date (default: today)")
+    parser.add_argument("--prune-before", help="Remove partitions with capture_date before this date (YYYY-MM-DD)")
+    parser.add_argument("--archive-dir", help="Move pruned partitions here instead of deleting them")
+    args = parser.parse_args()
+
+    if args.compact:
+        # In-memory connection: compaction only reads and writes Parquet files
+        con = duckdb.connect()
+        try:
+            n = compact_partitions(con, args.root, before_date=args.compact_before, source_vendor=args.vendor)
+            logger.info(f"Compacted {n} partitions.")
+        finally:
+            con.close()
+
+    if args.prune_before:
+        prune_partitions(args.root, args.prune_before, source_vendor=args.vendor, archive_root=args.archive_dir)
+
+    partitions = list_partitions(args.root, args.vendor)
+    n_files = sum(len(p["files"]) for p in partitions)
+    logger.info(f"Odds lake: {len(partitions)} partitions, {n_files} files under {args.root}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Publish DuckDB Read Replica
+---------------------------
+Copies the reader tables of the primary database into a new replica and swaps
+the CURRENT pointer (see nhl_bets.common.db_replica). The production pipeline
+runs it once after its MoneyPuck ingest and feature steps; run it by hand after
+a standalone backfill. --odds-only copies just the odds tables and carries the
+rest over from the previous replica.
+
+Usage:
+    python pipelines/backtesting/publish_db_replica.py
+    python pipelines/backtesting/publish_db_replica.py --odds-only
+"""
+
+import argparse
+import os
+import sys
+import logging
+
+# Ensure project root is in path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+src_dir = os.path.join(project_root, "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.db_replica import ODDS_REPLICA_TABLES, publish_replica
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("publish_db_replica")
+
+DB_PATH = 'data/db/nhl_backtest.duckdb'
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish a read replica of the DuckDB database")
+    parser.add_argument("--duckdb-path", default=DB_PATH)
+    parser.add_argument("--odds-only", action="store_true", help="Copy only the odds tables")
+    args = parser.parse_args()
+
+    con = get_db_connection(args.duckdb_path)
+    try:
+        publish_replica(con, args.duckdb_path, tables=ODDS_REPLICA_TABLES if args.odds_only else None)
+    finally:
+        con.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Raw Odds Replay
+---------------
+Rebuilds fact_prop_odds from the stored raw payloads (outputs/odds/raw): after a
+parser fix, a schema change or a lost DB. Payloads are parsed in a process pool
+with the vendor parsers and bulk-loaded idempotently; raw_odds_payloads is updated.
+By default only payloads missing from raw_odds_payloads are replayed; --all
+re-parses everything (rows already in the lake are skipped by row_key, so this
+only adds rows). After a parser fix use --replace: every selected payload is
+replayed and, once it has parsed, the rows it loaded before are deleted from the
+lake and the latest/consensus tables just before the new rows are loaded.
+
+Usage:
+    python pipelines/backtesting/replay_raw_odds.py
+    python pipelines/backtesting/replay_raw_odds.py --all --vendor UNABATED --start-date 2025-10-01 --workers 8
+    python pipelines/backtesting/replay_raw_odds.py --replace --vendor PLAYNOW --start-date 2025-10-01
+"""
+
+import argparse
+import os
+import sys
+import logging
+from datetime import date
+
+# Ensure project root is in path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+src_dir = os.path.join(project_root, "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from nhl_bets.common.db_init import get_db_connection, initialize_phase11_tables
+from nhl_bets.common.db_replica import ODDS_REPLICA_TABLES, publish_replica
+from nhl_bets.common.odds_lake import ODDS_LAKE_ROOT, compact_partitions
+from nhl_bets.common.storage import STORAGE_ROOT
+from nhl_bets.scrapers.odds_replay import list_stored_payloads, replay_payloads
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("replay_raw_odds")
+
+DB_PATH = 'data/db/nhl_backtest.duckdb'
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored raw odds payloads into fact_prop_odds")
+    parser.add_argument("--storage-root", default=STORAGE_ROOT, help="Raw payload store")
+    parser.add_argument("--vendor", action="append", help="Restrict to a vendor (repeatable)")
+    parser.add_argument("--start-date", type=date.fromisoformat, help="First capture date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="Last capture date (YYYY-MM-DD)")
+    parser.add_argument("--all", action="store_true", help="Also re-parse payloads already in raw_odds_payloads")
+    parser.add_argument("--replace", action="store_true",
+                        help="Re-parse all selected payloads, replacing the rows they loaded before (implies --all)")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Payloads per worker batch")
+    args = parser.parse_args()
+
+    con = get_db_connection(DB_PATH)
+    initialize_phase11_tables(con)
+    try:
+        # 1. Stored payloads, one per content hash
+        payloads = list_stored_payloads(args.storage_root, args.vendor, args.start_date, args.end_date, con=con)
+        if not args.all and not args.replace:
+            payloads = [p for p in payloads if not p["registered"]]
+        logger.info(f"{'Replacing' if args.replace else 'Replaying'} {len(payloads)} payloads from {args.storage_root}...")
+
+        # 2. Parse in parallel, load as batches complete
+        summary = replay_payloads(con, payloads, workers=args.workers, chunk_size=args.chunk_size,
+                                  replace=args.replace)
+        logger.info(f"Replay summary: {summary}")
+
+        # 3. Merge the per-batch files of closed days, then publish readers' snapshot
+        n = compact_partitions(con, ODDS_LAKE_ROOT)
+        logger.info(f"Compacted {n} odds lake partitions.")
+        publish_replica(con, DB_PATH, tables=ODDS_REPLICA_TABLES)
+    finally:
+        con.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,20 @@
-import duckdb
 import pandas as pd
 import argparse
 import os
 from datetime import datetime
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.db_replica import publish_replica
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 
 def run_backtest(start_date, end_date, min_ev, stake, prob_source, skip_months, output_table=None):
-    con = duckdb.connect(DB_PATH)
-
-    # Optimization
-    con.execute("SET memory_limit = '8GB'")
-    con.execute("SET threads = 8")
-    con.execute("SET temp_directory = './duckdb_temp/'")
+    con = get_db_connection(DB_PATH)
     
     table_suffix = "calibrated" if prob_source == "calibrated" else "baseline"
     
@@ -249,6 +251,7 @@ def run_backtest(start_date, end_date, min_ev, stake, prob_source, skip_months,
     
     con.execute(f"INSERT INTO {table_name} {query}")
     print("Backtest simulation complete.")
+    publish_replica(con, DB_PATH, tables=(table_name,))
     
     # Export Report
     df_res = con.execute(f"SELECT * FROM {table_name} ORDER BY game_date, ev DESC").df()
@@ -0,0 +1,78 @@
+"""
+Odds Polling Daemon
+-------------------
+Long-running odds capture. Each vendor is polled on an adaptive schedule keyed to
+the next puck drop among its quoted events: hourly far out, every 10 minutes in
+the last three hours, every 1-2 minutes in the last hour, with a final capture
+just before puck drop. Errors back off exponentially and 403/429 back off harder.
+Lag/throughput metrics are written to --metrics-path after every cycle, and a read
+replica is published at most every --replica-minutes. The database is opened for
+each capture cycle and closed after it, so the production pipeline can write
+between cycles (see OPERATIONS.md, "DuckDB Lock").
+
+Usage:
+    python pipelines/backtesting/run_odds_daemon.py --delta
+    python pipelines/backtesting/run_odds_daemon.py --hours 12 --requests-per-minute 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+# Ensure project root is in path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+src_dir = os.path.join(project_root, "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from nhl_bets.common.db_init import get_db_connection, initialize_phase11_tables
+from nhl_bets.common.db_replica import ODDS_REPLICA_TABLES, publish_replica
+from nhl_bets.common.storage import RawPayloadWriter
+from nhl_bets.scrapers.odds_scheduler import REQUESTS_PER_MINUTE, OddsPollingDaemon
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("run_odds_daemon")
+
+DB_PATH = 'data/db/nhl_backtest.duckdb'
+METRICS_PATH = 'outputs/odds/daemon_metrics.json'
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive odds polling daemon")
+    parser.add_argument("--delta", action="store_true", help="Store price changes + keyframes instead of full snapshots")
+    parser.add_argument("--requests-per-minute", type=float, default=REQUESTS_PER_MINUTE, help="HTTP request budget")
+    parser.add_argument("--hours", type=float, help="Stop after this many hours (default: run until interrupted)")
+    parser.add_argument("--metrics-path", default=METRICS_PATH, help="Where to write lag/throughput metrics (JSON)")
+    parser.add_argument("--replica-minutes", type=float, default=15, help="Minimum minutes between replica publishes")
+    args = parser.parse_args()
+
+    con = get_db_connection(DB_PATH)
+    try:
+        initialize_phase11_tables(con)
+    finally:
+        con.close()
+    last_publish = [datetime.min.replace(tzinfo=timezone.utc)]
+
+    def publish_if_due(con, summary):
+        # Runs on the daemon's DB thread, on the cycle's connection
+        now = datetime.now(timezone.utc)
+        inserted = any(result["status"] == "inserted" for result in summary.values())
+        if inserted and now - last_publish[0] >= timedelta(minutes=args.replica_minutes):
+            publish_replica(con, DB_PATH, tables=ODDS_REPLICA_TABLES)
+            last_publish[0] = now
+
+    until = datetime.now(timezone.utc) + timedelta(hours=args.hours) if args.hours else None
+    try:
+        with RawPayloadWriter() as writer:
+            daemon = OddsPollingDaemon(partial(get_db_connection, DB_PATH), writer,
+                                       requests_per_minute=args.requests_per_minute, delta=args.delta,
+                                       metrics_path=args.metrics_path, after_cycle=publish_if_due)
+            asyncio.run(daemon.run(until=until))
+    except KeyboardInterrupt:
+        logger.info("Stopping odds daemon.")
+
+if __name__ == "__main__":
+    main()
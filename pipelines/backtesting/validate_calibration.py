@@ -1,12 +1,18 @@
-import duckdb
 import pandas as pd
 import numpy as np
 import sys
+import os
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 
 def main():
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH, read_only=True)
     
     print("Validating fact_probabilities_calibrated...")
     
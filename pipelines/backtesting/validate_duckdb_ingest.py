@@ -1,8 +1,14 @@
-import duckdb
 import pandas as pd
 from pathlib import Path
 import logging
 import sys
+import os
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
 
 # Configure logging
 logging.basicConfig(
@@ -20,7 +26,7 @@ def validate_db():
         logger.error(f"Database not found at {DB_PATH}")
         return
 
-    con = duckdb.connect(DB_PATH)
+    con = get_db_connection(DB_PATH, read_only=True)
     Path(REPORT_DIR).mkdir(parents=True, exist_ok=True)
     
     try:
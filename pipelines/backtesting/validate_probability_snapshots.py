@@ -1,11 +1,16 @@
-import duckdb
 import pandas as pd
 import argparse
 import sys
 import os
 
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_init import get_db_connection
+
 def validate_snapshots(db_path):
-    conn = duckdb.connect(db_path)
+    conn = get_db_connection(db_path, read_only=True)
     
     print("Validating probability snapshots...")
     
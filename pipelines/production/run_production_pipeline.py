@@ -1,3 +1,4 @@
+import json
 import os
 import subprocess
 import sys
@@ -53,14 +54,27 @@ def main():
         downloader = os.path.join(backtest_pipeline_dir, "download_moneypuck_team_player_gbg.py")
         run_step("Download MoneyPuck", [sys.executable, downloader, "--end-season", "2025"], env)
         
-        # B. Ingest to DuckDB
+        # B. Ingest to DuckDB (new/changed CSVs only); corrected games are recorded for the feature steps
         ingestor = os.path.join(backtest_pipeline_dir, "ingest_moneypuck_to_duckdb.py")
-        run_step("Ingest DuckDB", [sys.executable, ingestor, "--end-season", "2025"], env)
+        changed_since_file = os.path.join("data", "db", "moneypuck_changed_since.json")
+        run_step("Ingest DuckDB", [sys.executable, ingestor, "--end-season", "2025", "--incremental",
+                                   "--changed-since-file", changed_since_file], env)
         
-        # C. Rebuild Features
+        # C. Update Features (games added since the last build, and from the earliest corrected game)
+        feature_args = ["--incremental"]
+        if os.path.exists(changed_since_file):
+            with open(changed_since_file) as f:
+                feature_args += ["--since", json.load(f)["since"]]
         for feature_script in ["build_player_features.py", "build_team_defense_features.py", "build_goalie_features.py"]:
             script_path = os.path.join(backtest_pipeline_dir, feature_script)
-            run_step(f"Rebuild {feature_script}", [sys.executable, script_path, "--force"], env)
+            run_step(f"Update {feature_script}", [sys.executable, script_path] + feature_args, env)
+        # Kept until every feature step succeeded, so a failed run recomputes the corrections next time
+        if os.path.exists(changed_since_file):
+            os.remove(changed_since_file)
+        
+        # Publish the read replica once, after every write above
+        publisher = os.path.join(backtest_pipeline_dir, "publish_db_replica.py")
+        run_step("Publish Replica", [sys.executable, publisher], env)
             
         # D. Produce Base Projections File
         producer = os.path.join(proj_dir, "produce_live_base_projections.py")
@@ -0,0 +1,196 @@
+"""
+Batch EV Runner
+---------------
+Replays many saved props slates against one set of projection inputs in a
+single process start. Base/probability indexes are built once and shared with
+a pool of workers; each slate is evaluated with the same logic as runner.py.
+
+Outputs:
+    <out-dir>/date=YYYY-MM-DD/ev_bets.csv   (one partition per slate date)
+    <out-dir>/summary.csv                   (combined per-date summary)
+
+Usage:
+    python src/nhl_bets/analysis/batch_runner.py \
+        --base outputs/projections/BaseSingleGameProjections.csv \
+        --probs outputs/projections/SingleGamePropProbabilities.csv \
+        --props-glob "data/raw/props_archive/*.csv" \
+        --start-date 2025-10-01 --end-date 2025-10-31 \
+        --out-dir outputs/ev_analysis/batch
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from nhl_bets.analysis.file_io import read_csv
+from nhl_bets.analysis.export import bets_to_frame
+from nhl_bets.analysis.runner import build_indexes, evaluate_slate
+
+DATE_IN_NAME = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})")
+UNKNOWN_DATE = "unknown"
+
+# Set once per worker process by _init_worker
+_WORKER_INDEXES = None
+
+def slate_date_from_path(path):
+    """Returns the YYYY-MM-DD date embedded in a props file name, if any."""
+    match = DATE_IN_NAME.search(os.path.basename(path))
+    if not match:
+        return None
+    return "-".join(match.groups())
+
+def discover_slates(props_glob, start_date=None, end_date=None):
+    """
+    Lists props files matching the glob, restricted to [start_date, end_date]
+    when the date can be read from the file name.
+    """
+    files = sorted(glob.glob(props_glob, recursive=True))
+    selected = []
+    for path in files:
+        slate_date = slate_date_from_path(path)
+        if slate_date:
+            if start_date and slate_date < start_date:
+                continue
+            if end_date and slate_date > end_date:
+                continue
+        selected.append(path)
+    return selected
+
+def evaluate_slate_file(path, indexes):
+    """Evaluates one props file and returns the flattened bets DataFrame."""
+    df_props = read_csv(path)
+    bets = evaluate_slate(df_props, indexes, verbose=False)
+    df = bets_to_frame(bets)
+    if df.empty:
+        return df
+
+    # Slates without Game_Date fall back to the date in the file name
+    df['Date'] = df['Date'].fillna(slate_date_from_path(path) or UNKNOWN_DATE)
+    df['Slate_File'] = path
+    return df
+
+def _init_worker(indexes):
+    global _WORKER_INDEXES
+    _WORKER_INDEXES = indexes
+
+def _evaluate_in_worker(path):
+    return evaluate_slate_file(path, _WORKER_INDEXES)
+
+def summarize(df_all):
+    """Per-date summary across every evaluated slate."""
+    supported = df_all[df_all['Supported'] == True]
+    positive = supported[supported['EV'] > 0]
+
+    summary = pd.DataFrame({
+        'Slates': df_all.groupby('Date')['Slate_File'].nunique(),
+        'Total_Rows': df_all.groupby('Date').size(),
+        'Supported': supported.groupby('Date').size(),
+        'Positive_EV': positive.groupby('Date').size(),
+        'Mean_EV_Positive': positive.groupby('Date')['EV'].mean(),
+        'Max_EV': supported.groupby('Date')['EV'].max()
+    })
+    count_cols = ['Slates', 'Total_Rows', 'Supported', 'Positive_EV']
+    summary[count_cols] = summary[count_cols].fillna(0).astype(int)
+    return summary.reset_index().rename(columns={'index': 'Date'})
+
+def write_partitions(df_all, out_dir, start_date=None, end_date=None):
+    """Writes one ev_bets.csv per slate date under out_dir/date=YYYY-MM-DD/."""
+    written = []
+    for date_str, df_date in df_all.groupby('Date'):
+        if date_str != UNKNOWN_DATE:
+            if start_date and date_str < start_date:
+                continue
+            if end_date and date_str > end_date:
+                continue
+        part_dir = os.path.join(out_dir, f"date={date_str}")
+        os.makedirs(part_dir, exist_ok=True)
+        part_path = os.path.join(part_dir, "ev_bets.csv")
+        df_date.sort_values('EV', ascending=False).to_csv(part_path, index=False)
+        written.append(part_path)
+    return written
+
+def run_batch(props_files, indexes, out_dir, workers=None, start_date=None, end_date=None):
+    """
+    Evaluates every slate (in a process pool when workers > 1), writes the date
+    partitions and the combined summary. Returns the summary DataFrame.
+    """
+    frames = []
+    failed = []
+
+    if workers == 1 or len(props_files) <= 1:
+        for path in props_files:
+            try:
+                frames.append(evaluate_slate_file(path, indexes))
+            except Exception as e:
+                print(f"WARNING: Slate {path} failed: {e}")
+                failed.append(path)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(indexes,)) as pool:
+            futures = {pool.submit(_evaluate_in_worker, path): path for path in props_files}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    frames.append(future.result())
+                except Exception as e:
+                    print(f"WARNING: Slate {path} failed: {e}")
+                    failed.append(path)
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        print("No bets produced by any slate.")
+        return pd.DataFrame()
+
+    df_all = pd.concat(frames, ignore_index=True)
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = write_partitions(df_all, out_dir, start_date, end_date)
+
+    summary = summarize(df_all)
+    if start_date:
+        summary = summary[(summary['Date'] == UNKNOWN_DATE) | (summary['Date'] >= start_date)]
+    if end_date:
+        summary = summary[(summary['Date'] == UNKNOWN_DATE) | (summary['Date'] <= end_date)]
+    summary.to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+
+    print(f"Processed {len(props_files) - len(failed)}/{len(props_files)} slates into {len(written)} date partitions.")
+    if failed:
+        print(f"Failed slates: {failed}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="NHL EV Batch Runner (multi-slate replay)")
+    parser.add_argument("--base", required=True, help="Path to BaseSingleGameProjections.csv")
+    parser.add_argument("--probs", required=False, help="Path to SingleGamePropProbabilities.csv (may span many dates)")
+    parser.add_argument("--props-glob", required=True, help="Glob of saved props CSVs (e.g. 'data/raw/props_archive/*.csv')")
+    parser.add_argument("--start-date", help="First slate date to include (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Last slate date to include (YYYY-MM-DD)")
+    parser.add_argument("--out-dir", default=os.path.join("outputs", "ev_analysis", "batch"), help="Output directory for date partitions")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+
+    args = parser.parse_args()
+
+    props_files = discover_slates(args.props_glob, args.start_date, args.end_date)
+    if not props_files:
+        print(f"No props files matched {args.props_glob}")
+        return
+    print(f"Found {len(props_files)} props slates.")
+
+    indexes = build_indexes(args.base, args.probs)
+    summary = run_batch(props_files, indexes, args.out_dir, args.workers, args.start_date, args.end_date)
+
+    if not summary.empty:
+        print("\n--- BATCH SUMMARY ---")
+        print(summary.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,24 @@ def remove_vig(p1, p2):
         return 0, 0
     return p1 / total, p2 / total
 
+def consensus_no_vig(pairs):
+    """
+    Multi-book generalization of remove_vig.
+    pairs: iterable of (p_over_raw, p_under_raw) implied probabilities, one per book.
+    Each book is de-vigged on its own, then the fair probabilities are averaged.
+    Returns (p_over_fair, p_under_fair), or (None, None) if no book quotes both sides.
+    """
+    fair_overs = []
+    for p_over, p_under in pairs:
+        if p_over is None or p_under is None:
+            continue
+        p_over_fair, _ = remove_vig(p_over, p_under)
+        fair_overs.append(p_over_fair)
+    if not fair_overs:
+        return None, None
+    p_over_fair = sum(fair_overs) / len(fair_overs)
+    return p_over_fair, 1 - p_over_fair
+
 def calculate_ev(prob_win, decimal_odds):
     """
     Calculates Expected Value.
@@ -1,10 +1,9 @@
 import pandas as pd
 
-def export_to_excel(bets, output_path):
+def bets_to_frame(bets):
     """
-    Exports bets to Excel with multiple tabs.
+    Flattens a list of Bet objects into the detailed audit DataFrame layout.
     """
-    # Convert list of Bet objects to DataFrame
     data = []
     for b in bets:
         row = {
@@ -29,7 +28,14 @@ def export_to_excel(bets, output_path):
         }
         data.append(row)
         
-    df = pd.DataFrame(data)
+    return pd.DataFrame(data)
+
+def export_to_excel(bets, output_path):
+    """
+    Exports bets to Excel with multiple tabs.
+    """
+    # Convert list of Bet objects to DataFrame
+    df = bets_to_frame(bets)
     
     # Filter for Ranked Bets
     df_ranked = df[
@@ -5,6 +5,8 @@ import logging
 import pandas as pd
 from datetime import datetime, timedelta
 
+from nhl_bets.common.odds_lake import sql_literal
+
 logger = logging.getLogger(__name__)
 
 TEAM_MAP = {
@@ -112,84 +114,209 @@ def fuzzy_match_player(name, candidates, threshold=0.90):
 
     return None, best_score
 
-def update_player_mappings(con: duckdb.DuckDBPyConnection):
+def _pair_key_sql(team_a: str, team_b: str) -> str:
+    """Canonical unordered team pair ('BOS|TOR' for either home/away order)."""
+    return f"LEAST({team_a}, {team_b}) || '|' || GREATEST({team_a}, {team_b})"
+
+# Keys that did not map on an earlier run, per mapper (alias o = fact_prop_odds)
+PENDING_EVENTS_SQL = """NOT EXISTS (
+    SELECT 1 FROM dim_events_mapping em
+    WHERE em.source_vendor = o.source_vendor AND em.vendor_event_id = o.event_id_vendor
+)"""
+PENDING_PLAYERS_SQL = """NOT EXISTS (
+    SELECT 1 FROM dim_players_mapping m
+    WHERE m.source_vendor = o.source_vendor
+      AND (m.vendor_player_id = o.player_id_vendor OR m.vendor_player_name = o.player_name_raw)
+)"""
+
+def _stage_new_odds(con: duckdb.DuckDBPyConnection, mapping_name: str, pending_sql: str, full_refresh: bool = False):
+    """
+    Stages the distinct vendor/event/player/team combinations to map into temp table
+    stg_mapping_odds, along with the canonical dim_games keys (stg_game_keys):
+    - odds from payloads ingested after the mapping's watermark;
+    - once dim_games has games newer than at the last run, odds still unmapped
+      (pending_sql) captured from the day before the previous latest game on, since
+      odds are captured before a game reaches dim_games.
+    Returns (payload watermark, latest game date) to save, or None if there is
+    nothing to stage. full_refresh restages all of fact_prop_odds.
     """
-    Attempts to map raw player names from fact_prop_odds to canonical player_ids.
+    register_sql_helpers(con)
+    watermark, games_through = con.execute(
+        "SELECT max(ingested_at_utc), max(games_through) FROM mapping_watermarks WHERE mapping_name = ?", [mapping_name]
+    ).fetchone()
+    latest_game = con.execute("SELECT CAST(max(game_date) AS DATE) FROM dim_games").fetchone()[0]
+    if full_refresh:
+        watermark = None
+
+    # 1. Payloads since the watermark and the capture dates (lake partitions) they cover
+    new_payloads = "SELECT payload_hash FROM raw_odds_payloads"
+    params = []
+    if watermark is not None:
+        new_payloads += " WHERE ingested_at_utc > ?"
+        params.append(watermark)
+    new_max, min_ts, max_ts = con.execute(
+        f"SELECT max(ingested_at_utc), min(capture_ts_utc), max(capture_ts_utc) FROM raw_odds_payloads "
+        f"WHERE payload_hash IN ({new_payloads})", params
+    ).fetchone()
+
+    # 2. Unmapped keys that games added since the last run may now match
+    retry = (not full_refresh and watermark is not None and latest_game is not None
+             and (games_through is None or latest_game > games_through))
+    if new_max is None and not retry:
+        return None
+
+    sources = []
+    if full_refresh:
+        sources.append("SELECT * FROM fact_prop_odds o")
+    else:
+        if new_max is not None:
+            # Literal bounds so the lake prunes to the matching capture_date partitions
+            sources.append(f"""SELECT * FROM fact_prop_odds o
+            WHERE capture_date BETWEEN {sql_literal(min_ts.date())} AND {sql_literal(max_ts.date())}
+              AND raw_payload_hash IN ({new_payloads})""")
+        if retry:
+            since = f"capture_date >= {sql_literal(games_through - timedelta(days=1))} AND " if games_through else ""
+            sources.append(f"SELECT * FROM fact_prop_odds o WHERE {since}{pending_sql}")
+
+    # 3. One row per distinct combination, with team abbreviations and the pair key
+    combinations = " UNION ".join(
+        f"SELECT DISTINCT source_vendor, event_id_vendor, player_id_vendor, player_name_raw, home_team, away_team, "
+        f"capture_date FROM ({source})" for source in sources
+    )
+    con.execute(f"""
+    CREATE OR REPLACE TEMP TABLE stg_mapping_odds AS
+    SELECT
+        *,
+        LOWER(player_name_raw) AS name_key,
+        {_pair_key_sql('home_abbr', 'away_abbr')} AS pair_key
+    FROM (
+        SELECT *, nhl_team_abbr(home_team) AS home_abbr, nhl_team_abbr(away_team) AS away_abbr
+        FROM ({combinations})
+    )
+    """, params if new_max is not None and not full_refresh else [])
+
+    # 4. dim_games keyed the same way
+    con.execute(f"""
+    CREATE OR REPLACE TEMP TABLE stg_game_keys AS
+    SELECT game_id, CAST(game_date AS DATE) AS game_date, home_team, away_team,
+           {_pair_key_sql('home_team', 'away_team')} AS pair_key
+    FROM dim_games
+    """)
+    return new_max or watermark, latest_game
+
+def _candidate_games_sql(columns: str) -> str:
+    """
+    Equi-joins staged rows to games on (pair_key, game_date), trying the capture
+    date and one day either side. Exposes `day_gap` for picking the closest game.
+    """
+    return f"""
+    SELECT s.*, g.game_id, g.home_team AS game_home, g.away_team AS game_away,
+           ABS(g.game_date - s.capture_date) AS day_gap
+    FROM (
+        SELECT {columns}, capture_date, pair_key,
+               UNNEST([capture_date - 1, capture_date, capture_date + 1]) AS game_date
+        FROM stg_mapping_odds
+        WHERE pair_key IS NOT NULL
+    ) s
+    JOIN stg_game_keys g ON s.pair_key = g.pair_key AND s.game_date = g.game_date
+    """
+
+def _save_watermark(con: duckdb.DuckDBPyConnection, mapping_name: str, watermark):
+    """watermark is the (payload watermark, latest game date) pair from _stage_new_odds."""
+    con.execute("INSERT OR REPLACE INTO mapping_watermarks (mapping_name, ingested_at_utc, games_through) VALUES (?, ?, ?)",
+                [mapping_name, *watermark])
+
+def _vendor_counts(con: duckdb.DuckDBPyConnection, key_sql: str, mapped_sql: str) -> dict:
+    rows = con.execute(f"""
+    SELECT source_vendor,
+           count(DISTINCT {key_sql}) FILTER (WHERE {mapped_sql}) AS mapped,
+           count(DISTINCT {key_sql}) FILTER (WHERE NOT ({mapped_sql})) AS unmapped
+    FROM stg_mapping_odds s
+    WHERE {key_sql} IS NOT NULL
+    GROUP BY source_vendor
+    ORDER BY source_vendor
+    """).fetchall()
+    return {vendor: {"mapped": mapped, "unmapped": unmapped} for vendor, mapped, unmapped in rows}
+
+def update_player_mappings(con: duckdb.DuckDBPyConnection, full_refresh: bool = False) -> dict:
+    """
+    Maps raw player names/IDs from payloads ingested since the last run, plus players
+    that did not map before and may now (see _stage_new_odds), to canonical player_ids
+    (team + date window through dim_games). Returns {vendor: {"mapped", "unmapped"}}
+    over the players staged.
     """
     logger.info("Updating player mappings...")
     
-    con.register("team_name_map", pd.DataFrame(list(TEAM_NAME_TO_ABBR.items()), columns=['name', 'abbr']))
+    new_watermark = _stage_new_odds(con, "players", PENDING_PLAYERS_SQL, full_refresh)
+    if new_watermark is None:
+        logger.info("No new payloads or games since the last player mapping run.")
+        return {}
+    
+    con.execute("""
+    CREATE OR REPLACE TEMP TABLE stg_player_keys AS
+    SELECT player_id, LOWER(player_name) AS name_key, team FROM dim_players
+    """)
+    candidates = f"""
+    SELECT c.source_vendor, c.player_id_vendor, c.player_name_raw, c.day_gap, p.player_id
+    FROM (
+        SELECT *, UNNEST([game_home, game_away]) AS team
+        FROM ({_candidate_games_sql("source_vendor, player_id_vendor, player_name_raw, name_key")})
+    ) c
+    JOIN stg_player_keys p ON c.name_key = p.name_key AND c.team = p.team
+    """
 
     # 1. Vendor ID match when available, using team + date window to disambiguate.
-    con.execute("""
-    WITH raw_team_abbr AS (
-        SELECT
-            raw.*,
-            COALESCE(h.abbr, raw.home_team) AS home_abbr,
-            COALESCE(a.abbr, raw.away_team) AS away_abbr
-        FROM fact_prop_odds raw
-        LEFT JOIN team_name_map h ON TRIM(raw.home_team) = h.name
-        LEFT JOIN team_name_map a ON TRIM(raw.away_team) = a.name
-    )
+    con.execute(f"""
     INSERT INTO dim_players_mapping (vendor_player_id, vendor_player_name, source_vendor, canonical_player_id)
-    SELECT DISTINCT raw.player_id_vendor, raw.player_name_raw, raw.source_vendor, p.player_id
-    FROM raw_team_abbr raw
-    JOIN dim_games g ON 
-        (TRIM(raw.home_abbr) = g.home_team AND TRIM(raw.away_abbr) = g.away_team) OR
-        (TRIM(raw.home_abbr) = g.away_team AND TRIM(raw.away_abbr) = g.home_team)
-    JOIN dim_players p ON 
-        LOWER(raw.player_name_raw) = LOWER(p.player_name) AND
-        p.team IN (g.home_team, g.away_team)
-    LEFT JOIN dim_players_mapping m ON 
-        raw.player_id_vendor = m.vendor_player_id AND 
-        raw.source_vendor = m.source_vendor
+    SELECT raw.player_id_vendor, raw.player_name_raw, raw.source_vendor, raw.player_id
+    FROM ({candidates}) raw
+    LEFT JOIN dim_players_mapping m_id ON 
+        raw.player_id_vendor = m_id.vendor_player_id AND 
+        raw.source_vendor = m_id.source_vendor
+    LEFT JOIN dim_players_mapping m_name ON 
+        raw.player_name_raw = m_name.vendor_player_name AND 
+        raw.source_vendor = m_name.source_vendor
     WHERE raw.player_id_vendor IS NOT NULL
-      AND raw.home_abbr IS NOT NULL AND raw.away_abbr IS NOT NULL
-      AND ABS(DATEDIFF('day', CAST(raw.capture_ts_utc AS DATE), CAST(g.game_date AS DATE))) <= 1
-      AND m.vendor_player_id IS NULL
+      AND m_id.vendor_player_id IS NULL
+      AND m_name.vendor_player_name IS NULL
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY raw.source_vendor, raw.player_id_vendor ORDER BY raw.day_gap, raw.player_id) = 1
     """)
 
     # 2. Exact name match fallback with team + date window.
-    con.execute("""
-    WITH raw_team_abbr AS (
-        SELECT
-            raw.*,
-            COALESCE(h.abbr, raw.home_team) AS home_abbr,
-            COALESCE(a.abbr, raw.away_team) AS away_abbr
-        FROM fact_prop_odds raw
-        LEFT JOIN team_name_map h ON TRIM(raw.home_team) = h.name
-        LEFT JOIN team_name_map a ON TRIM(raw.away_team) = a.name
-    )
+    con.execute(f"""
     INSERT INTO dim_players_mapping (vendor_player_name, source_vendor, canonical_player_id)
-    SELECT DISTINCT raw.player_name_raw, raw.source_vendor, p.player_id
-    FROM raw_team_abbr raw
-    JOIN dim_games g ON 
-        (TRIM(raw.home_abbr) = g.home_team AND TRIM(raw.away_abbr) = g.away_team) OR
-        (TRIM(raw.home_abbr) = g.away_team AND TRIM(raw.away_abbr) = g.home_team)
-    JOIN dim_players p ON 
-        LOWER(raw.player_name_raw) = LOWER(p.player_name) AND
-        p.team IN (g.home_team, g.away_team)
+    SELECT raw.player_name_raw, raw.source_vendor, raw.player_id
+    FROM ({candidates}) raw
     LEFT JOIN dim_players_mapping m ON 
         raw.player_name_raw = m.vendor_player_name AND 
         raw.source_vendor = m.source_vendor
-    WHERE raw.home_abbr IS NOT NULL AND raw.away_abbr IS NOT NULL
-      AND ABS(DATEDIFF('day', CAST(raw.capture_ts_utc AS DATE), CAST(g.game_date AS DATE))) <= 1
-      AND m.vendor_player_name IS NULL
+    WHERE m.vendor_player_name IS NULL
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY raw.source_vendor, raw.player_name_raw ORDER BY raw.day_gap, raw.player_id) = 1
     """)
     
-    # 2. Add vendor_player_id if available
+    # 3. Add vendor_player_id if available
     con.execute("""
     UPDATE dim_players_mapping m
     SET vendor_player_id = raw.player_id_vendor
-    FROM fact_prop_odds raw
+    FROM (
+        SELECT DISTINCT source_vendor, player_name_raw, player_id_vendor
+        FROM stg_mapping_odds
+        WHERE player_id_vendor IS NOT NULL
+    ) raw
     WHERE m.vendor_player_name = raw.player_name_raw
       AND m.source_vendor = raw.source_vendor
       AND m.vendor_player_id IS NULL
-      AND raw.player_id_vendor IS NOT NULL
     """)
     
-    res = con.execute("SELECT count(*) FROM dim_players_mapping").fetchone()
-    logger.info(f"Mapped {res[0]} unique player-vendor pairs.")
+    counts = _vendor_counts(con, "COALESCE(s.player_id_vendor, s.player_name_raw)", """EXISTS (
+        SELECT 1 FROM dim_players_mapping m
+        WHERE m.source_vendor = s.source_vendor
+          AND (m.vendor_player_id = s.player_id_vendor OR m.vendor_player_name = s.player_name_raw)
+    )""")
+    _save_watermark(con, "players", new_watermark)
+    for vendor, c in counts.items():
+        logger.info(f"{vendor}: {c['mapped']} players mapped, {c['unmapped']} unmapped.")
+    return counts
 
 # Mapping full team names to abbreviations
 TEAM_NAME_TO_ABBR = {
@@ -228,61 +355,62 @@ TEAM_NAME_TO_ABBR = {
     'Washington Capitals': 'WSH'
 }
 
-def update_event_mappings(con: duckdb.DuckDBPyConnection):
+def register_sql_helpers(con: duckdb.DuckDBPyConnection):
     """
-    Attempts to map vendor event IDs to canonical game_ids.
-    Strategy: Link vendor event to dim_games if teams and date match.
+    Registers SQL equivalents of the Python normalizers on a connection:
+    - team_name_map (name -> abbr) relation
+    - nhl_normalize_name(name) macro (mirrors normalize_name)
+    - nhl_team_abbr(team) macro (mirrors runner_duckdb.normalize_team)
     """
-    logger.info("Updating event mappings...")
-    
-    # 1. Map based on abbreviations (Unabated, OddsShark)
+    con.register("team_name_map", pd.DataFrame(list(TEAM_NAME_TO_ABBR.items()), columns=['name', 'abbr']))
+    con.execute(r"""
+    CREATE OR REPLACE TEMP MACRO nhl_normalize_name(name) AS
+        LOWER(TRIM(
+            regexp_replace(
+                regexp_replace(
+                    regexp_replace(COALESCE(name, ''), '\s*\(.*?\)', '', 'g'),
+                    '[^\p{L}\p{N}_\s\p{Z}]', '', 'g'
+                ),
+                '[\s\p{Z}]+', ' ', 'g'
+            )
+        ))
+    """)
     con.execute("""
-    INSERT INTO dim_events_mapping (vendor_event_id, source_vendor, canonical_game_id)
-    SELECT DISTINCT raw.event_id_vendor, raw.source_vendor, g.game_id
-    FROM fact_prop_odds raw
-    JOIN dim_games g ON 
-        (TRIM(raw.home_team) = g.home_team AND TRIM(raw.away_team) = g.away_team) OR
-        (TRIM(raw.home_team) = g.away_team AND TRIM(raw.away_team) = g.home_team)
-    LEFT JOIN dim_events_mapping em ON raw.event_id_vendor = em.vendor_event_id AND raw.source_vendor = em.source_vendor
-    WHERE em.vendor_event_id IS NULL
-      AND ABS(DATEDIFF('day', CAST(raw.capture_ts_utc AS DATE), CAST(g.game_date AS DATE))) <= 1
-      AND raw.home_team IS NOT NULL AND raw.away_team IS NOT NULL
+    CREATE OR REPLACE TEMP MACRO nhl_team_abbr(team) AS
+        CASE WHEN team IS NULL THEN NULL
+             ELSE COALESCE((SELECT abbr FROM team_name_map WHERE name = TRIM(team)), UPPER(TRIM(team)))
+        END
     """)
+
+def update_event_mappings(con: duckdb.DuckDBPyConnection, full_refresh: bool = False) -> dict:
+    """
+    Maps vendor event IDs from payloads ingested since the last run, plus events that
+    did not map before and may now (see _stage_new_odds), to canonical game_ids.
+    Strategy: Link vendor event to dim_games if teams (either order) and date (+/- 1 day) match.
+    Returns {vendor: {"mapped", "unmapped"}} over the events staged.
+    """
+    logger.info("Updating event mappings...")
     
-    # 2. Map based on full names (PlayNow)
-    con.register("team_name_map", pd.DataFrame(list(TEAM_NAME_TO_ABBR.items()), columns=['name', 'abbr']))
-    con.execute("""
+    new_watermark = _stage_new_odds(con, "events", PENDING_EVENTS_SQL, full_refresh)
+    if new_watermark is None:
+        logger.info("No new payloads or games since the last event mapping run.")
+        return {}
+    
+    # Abbreviations (Unabated, OddsShark) and full names (PlayNow) share one pair key
+    con.execute(f"""
     INSERT INTO dim_events_mapping (vendor_event_id, source_vendor, canonical_game_id)
-    SELECT DISTINCT raw.event_id_vendor, raw.source_vendor, g.game_id
-    FROM fact_prop_odds raw
-    JOIN team_name_map h ON TRIM(raw.home_team) = h.name
-    JOIN team_name_map a ON TRIM(raw.away_team) = a.name
-    JOIN dim_games g ON 
-        (h.abbr = g.home_team AND a.abbr = g.away_team) OR
-        (h.abbr = g.away_team AND a.abbr = g.home_team)
+    SELECT raw.event_id_vendor, raw.source_vendor, raw.game_id
+    FROM ({_candidate_games_sql("source_vendor, event_id_vendor")}) raw
     LEFT JOIN dim_events_mapping em ON raw.event_id_vendor = em.vendor_event_id AND raw.source_vendor = em.source_vendor
     WHERE em.vendor_event_id IS NULL
-      AND ABS(DATEDIFF('day', CAST(raw.capture_ts_utc AS DATE), CAST(g.game_date AS DATE))) <= 1
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY raw.source_vendor, raw.event_id_vendor ORDER BY raw.day_gap, raw.game_id) = 1
     """)
     
-    res = con.execute("SELECT count(*) FROM dim_events_mapping").fetchone()
-    logger.info(f"Mapped {res[0]} unique event-vendor pairs.")
-
-def get_mapped_odds(con: duckdb.DuckDBPyConnection):
-    """
-    Returns a view of fact_prop_odds joined with canonical keys.
-    """
-    return con.execute("""
-    SELECT 
-        o.*,
-        COALESCE(pm_id.canonical_player_id, pm_name.canonical_player_id) AS canonical_player_id,
-        em.canonical_game_id
-    FROM fact_prop_odds o
-    LEFT JOIN dim_players_mapping pm_id ON 
-        o.player_id_vendor = pm_id.vendor_player_id AND 
-        o.source_vendor = pm_id.source_vendor
-    LEFT JOIN dim_players_mapping pm_name ON 
-        o.player_name_raw = pm_name.vendor_player_name AND 
-        o.source_vendor = pm_name.source_vendor
-    LEFT JOIN dim_events_mapping em ON o.event_id_vendor = em.vendor_event_id AND o.source_vendor = em.source_vendor
-    """).df()
+    counts = _vendor_counts(con, "s.event_id_vendor", """EXISTS (
+        SELECT 1 FROM dim_events_mapping em
+        WHERE em.source_vendor = s.source_vendor AND em.vendor_event_id = s.event_id_vendor
+    )""")
+    _save_watermark(con, "events", new_watermark)
+    for vendor, c in counts.items():
+        logger.info(f"{vendor}: {c['mapped']} events mapped, {c['unmapped']} unmapped.")
+    return counts
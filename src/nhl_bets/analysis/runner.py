@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+from datetime import datetime
 
 # Ensure project root is in path for nhl_bets import
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -25,49 +26,11 @@ from nhl_bets.analysis.ev import decimal_to_implied, remove_vig, calculate_ev
 from nhl_bets.analysis.export import export_to_excel, export_to_csv
 from nhl_bets.analysis.audit import generate_audit_reports, run_quick_checks
 
-def main():
-    parser = argparse.ArgumentParser(description="NHL EV Betting Pipeline")
-    parser.add_argument("--base", required=True, help="Path to BaseSingleGameProjections.csv")
-    parser.add_argument("--props", required=True, help="Path to nhl_player_props_all.csv")
-    parser.add_argument("--probs", required=False, help="Path to SingleGamePropProbabilities.csv (Phase 8 Model Output)")
-    parser.add_argument("--out_xlsx", required=True, help="Output Excel path")
-    parser.add_argument("--out_csv", required=True, help="Output CSV path")
-    
-    args = parser.parse_args()
-    
-    print(f"Reading base projections: {args.base}")
-    df_base = read_csv(args.base)
-    validate_base_columns(df_base)
-    
-    # Load Probs if available
-    df_probs = None
-    probs_lookup = {}
-    probs_lookup_name_only = {}
-    
-    if args.probs and os.path.exists(args.probs):
-        print(f"Reading calculated probabilities: {args.probs}")
-        df_probs = read_csv(args.probs)
-        has_date = 'Date' in df_probs.columns
-        
-        for idx, row in df_probs.iterrows():
-            norm_name = normalize_name(row['Player'])
-            if has_date:
-                key = (norm_name, str(row['Date']))
-                probs_lookup[key] = row.to_dict()
-            
-            # Name only lookup for fallbacks (if unique)
-            if norm_name not in probs_lookup_name_only:
-                probs_lookup_name_only[norm_name] = []
-            probs_lookup_name_only[norm_name].append(row.to_dict())
-    
-    print(f"Reading props: {args.props}")
-    df_props = read_csv(args.props)
-    
-    # 1. Pre-process Base Projections
-    # Create lookup dict: (NormalizedName, Team) -> Row
-    # Also (NormalizedName) -> List of Rows (for disambiguation)
-    
-    base_lookup = {}
+def build_base_index(df_base):
+    """
+    Builds the base projection lookups used for fallback matching.
+    Returns {'name_only': NormalizedName -> [records], 'names': [NormalizedName]}.
+    """
     base_lookup_name_only = {}
     
     for idx, row in df_base.iterrows():
@@ -84,32 +47,64 @@ def main():
         
         record = {'team': team, 'stats': stats, 'original_name': row['Player']}
         
-        base_lookup[(norm_name, team)] = record
-        
         if norm_name not in base_lookup_name_only:
             base_lookup_name_only[norm_name] = []
         base_lookup_name_only[norm_name].append(record)
         
-    all_base_names = list(base_lookup_name_only.keys())
-    
-    # 2. Parse Bets
-    print("Parsing bets...")
-    bets = parse_bets(df_props)
-    print(f"Parsed {len(bets)} potential bets.")
-    
-    # 3. Match Players and Get Means
-    print("Matching players...")
-    all_probs_names = []
+    return {
+        'name_only': base_lookup_name_only,
+        'names': list(base_lookup_name_only.keys())
+    }
+
+def build_probs_index(df_probs, probs_path=None):
+    """
+    Builds the model probability lookups (Phase 8 output).
+    Returns None when no probabilities file was supplied.
+    """
+    if df_probs is None:
+        return None
+        
     probs_lookup_norm = {}
-    if df_probs is not None:
-        # Build normalized lookup for Probs
-        for idx, row in df_probs.iterrows():
-            p_name = row['Player']
-            norm_p = normalize_name(p_name)
-            if norm_p not in probs_lookup_norm:
-                probs_lookup_norm[norm_p] = []
-            probs_lookup_norm[norm_p].append(row.to_dict())
-        all_probs_names = list(set(df_probs['Player'].tolist()))
+    for row in df_probs.to_dict('records'):
+        norm_p = normalize_name(row['Player'])
+        if norm_p not in probs_lookup_norm:
+            probs_lookup_norm[norm_p] = []
+        probs_lookup_norm[norm_p].append(row)
+        
+    return {
+        'by_name': probs_lookup_norm,
+        'names': list(set(df_probs['Player'].tolist())),
+        'has_date': 'Date' in df_probs.columns,
+        'path': probs_path
+    }
+
+def build_indexes(base_path, probs_path=None):
+    """
+    Reads the projection inputs once and builds every lookup needed to
+    evaluate a props slate. The result can be shared across many slates.
+    """
+    print(f"Reading base projections: {base_path}")
+    df_base = read_csv(base_path)
+    validate_base_columns(df_base)
+    
+    df_probs = None
+    if probs_path and os.path.exists(probs_path):
+        print(f"Reading calculated probabilities: {probs_path}")
+        df_probs = read_csv(probs_path)
+        
+    return {
+        'base': build_base_index(df_base),
+        'probs': build_probs_index(df_probs, probs_path)
+    }
+
+def match_bets(bets, indexes):
+    """
+    Matches each supported bet to a model projection (Probs first, Base fallback)
+    and fills in model_mean / model_prob and the audit trail.
+    """
+    base_lookup_name_only = indexes['base']['name_only']
+    all_base_names = indexes['base']['names']
+    probs_index = indexes['probs']
 
     for bet in bets:
         if not bet.supported:
@@ -119,15 +114,21 @@ def main():
         mu_found = False
         probs_row = None
         
-        if df_probs is not None:
+        if probs_index is not None:
             # 1. Exact Normalized Match in Probs
-            candidates = probs_lookup_norm.get(norm_player, [])
+            candidates = probs_index['by_name'].get(norm_player, [])
             
             # 2. Fuzzy Match in Probs (if no exact)
             if not candidates:
-                matched_name, score = fuzzy_match_player(norm_player, all_probs_names, threshold=0.85)
+                matched_name, score = fuzzy_match_player(norm_player, probs_index['names'], threshold=0.85)
                 if matched_name:
-                    candidates = probs_lookup_norm.get(normalize_name(matched_name), [])
+                    candidates = probs_index['by_name'].get(normalize_name(matched_name), [])
+            
+            # Multi-date probability files: prefer the slate's own date
+            if candidates and probs_index['has_date'] and bet.game_date:
+                same_date = [c for c in candidates if str(c.get('Date')) == bet.game_date]
+                if same_date:
+                    candidates = same_date
             
             if candidates:
                 # Disambiguate by team if possible
@@ -177,16 +178,12 @@ def main():
                         'b2b': probs_row.get('mult_b2b', 1.0)
                     }
                     bet.audit['source_columns'] = [col, prob_col] if prob_col else [col]
-                    bet.audit['input_file'] = args.probs
+                    bet.audit['input_file'] = probs_index['path']
                     
                     missing = []
                     if pd.isna(probs_row.get('OppTeam')): missing.append('OppTeam')
                     bet.audit['missing_fields'] = missing
         
-        if not mu_found:
-            # Fallback to base mean (no multipliers)
-            candidates = base_lookup_name_only.get(norm_player)
-        
         if mu_found:
             continue
 
@@ -219,12 +216,7 @@ def main():
         else:
             # Fuzzy Match
             # Only fuzzy match against players ON the teams in the game to reduce false positives
-            # Get all base names for the teams in this game
             if valid_teams:
-                # Optimized: Filter names first? No, iterate all names is safer but slower.
-                # Only iterate names that belong to relevant teams
-                # Build subset of names
-                
                 # For speed, we just fuzzy match against ALL names, then filter result.
                 matched_name, score = fuzzy_match_player(norm_player, all_base_names)
                 
@@ -259,10 +251,11 @@ def main():
             if bet.model_mean is None or pd.isna(bet.model_mean):
                 bet.supported = False
                 bet.reason = f"No projection for stat {bet.stat_type}"
-    
-    # 4. Infer Sides and Calculate Probabilities
-    print("Calculating probabilities...")
-    
+
+def price_bets(bets):
+    """
+    Infers sides for paired markets and computes model/implied probabilities, EV and edge.
+    """
     for bet in bets:
         if not bet.supported:
             continue
@@ -333,12 +326,45 @@ def main():
             bet.ev = calculate_ev(bet.model_prob, bet.odds_decimal)
             bet.edge = bet.model_prob - p_raw
 
-    # 5. Export
+def evaluate_slate(df_props, indexes, verbose=True):
+    """
+    Runs one props slate through parsing, matching and pricing.
+    Returns the list of Bet objects.
+    """
+    if verbose: print("Parsing bets...")
+    bets = parse_bets(df_props)
+    if verbose: print(f"Parsed {len(bets)} potential bets.")
+    
+    if verbose: print("Matching players...")
+    match_bets(bets, indexes)
+    
+    if verbose: print("Calculating probabilities...")
+    price_bets(bets)
+    
+    return bets
+
+def main():
+    parser = argparse.ArgumentParser(description="NHL EV Betting Pipeline")
+    parser.add_argument("--base", required=True, help="Path to BaseSingleGameProjections.csv")
+    parser.add_argument("--props", required=True, help="Path to nhl_player_props_all.csv")
+    parser.add_argument("--probs", required=False, help="Path to SingleGamePropProbabilities.csv (Phase 8 Model Output)")
+    parser.add_argument("--out_xlsx", required=True, help="Output Excel path")
+    parser.add_argument("--out_csv", required=True, help="Output CSV path")
+    
+    args = parser.parse_args()
+    
+    indexes = build_indexes(args.base, args.probs)
+    
+    print(f"Reading props: {args.props}")
+    df_props = read_csv(args.props)
+    
+    bets = evaluate_slate(df_props, indexes)
+
     print("Exporting results...")
     export_to_excel(bets, args.out_xlsx)
     export_to_csv(bets, args.out_csv)
     
-    # 6. Summary
+    # Summary
     supported_count = len([b for b in bets if b.supported])
     ev_bets = [b for b in bets if b.supported and b.ev > 0]
     print(f"Supported bets: {supported_count}")
@@ -1,10 +1,9 @@
 import pandas as pd
-import numpy as np
-import duckdb
+import argparse
 import os
+import re
 import sys
 import logging
-from datetime import datetime
 
 # Ensure project root is in path
 project_root = os.getcwd()
@@ -12,8 +11,10 @@ src_dir = os.path.join(project_root, "src")
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
-from nhl_bets.analysis.normalize import normalize_name, get_mapped_odds, TEAM_NAME_TO_ABBR
+from nhl_bets.analysis.normalize import register_sql_helpers, TEAM_NAME_TO_ABBR
 from nhl_bets.projections.config import get_production_prob_column
+from nhl_bets.common.db_init import EXCLUDED_BOOK_KEYWORDS
+from nhl_bets.common.db_replica import get_replica_connection
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,176 +33,229 @@ def normalize_team(value):
         return TEAM_NAME_TO_ABBR[trimmed]
     return trimmed.upper()
 
-def main():
-    logger.info("Starting Multi-Book EV Analysis...")
-    
-    # 1. Load Mapped Odds from DuckDB
-    con = duckdb.connect(DB_PATH)
-    try:
-        df_odds = get_mapped_odds(con)
-        df_players = con.execute("""
-            SELECT
-                player_id,
-                player_name AS canonical_player_name,
-                team AS canonical_team
-            FROM dim_players
-        """).df()
-        logger.info(f"Loaded {len(df_odds)} mapped odds records.")
-    finally:
-        con.close()
-        
-    if df_odds.empty:
-        logger.warning("No mapped odds found. Run ingestion and mapping first.")
-        return
+PROB_COLUMN_PATTERN = re.compile(r"^p_([A-Z]+)_(\d+)plus(?:_calibrated)?$")
+PROB_STAT_TO_MARKET = {
+    'G': 'GOALS',
+    'A': 'ASSISTS',
+    'PTS': 'POINTS',
+    'SOG': 'SOG',
+    'BLK': 'BLOCKS'
+}
 
-    # 2. Load Model Probabilities
-    if not os.path.exists(PROBS_PATH):
-        logger.error(f"Probs file not found: {PROBS_PATH}")
-        return
-        
-    df_probs = pd.read_csv(PROBS_PATH)
-    logger.info(f"Loaded {len(df_probs)} model probabilities.")
-    
-    # 3. Join Odds with Probs
-    # Note: Use canonical_player_id if available, otherwise fallback to normalized name + team
-    # Current Probs CSV doesn't have player_id, so we'll use Normalized Name + Team.
+# Standard books only (exclude Pick'em/DFS with non-standard pricing)
+EXCLUDED_KEYWORDS = EXCLUDED_BOOK_KEYWORDS
+BLACKLISTED_MARKETS = ['GOALS']
+MIN_EV = 0.02
+
+# Odds captured more than this many days before the window are never considered,
+# which lets DuckDB prune old row groups instead of scanning the whole history.
+CAPTURE_LOOKBACK_DAYS = 3
+
+LATEST_ODDS_TABLE = 'fact_prop_odds_latest'
+HISTORY_ODDS_TABLE = 'fact_prop_odds'
+
+# The history view is partitioned by capture_date; filtering on it reads only the window's files.
+HISTORY_PARTITION_FILTER = """AND o.capture_date BETWEEN CAST(CAST($target_date AS DATE) - to_days(CAST($window_days + $lookback_days AS INTEGER)) AS DATE)
+                            AND CAST($target_date AS DATE) + CAST($window_days AS INTEGER)"""
+
+def build_prob_policy(prob_columns):
+    """
+    Resolves the production probability column for every (market, line) bucket
+    present in the probabilities artifact, using get_production_prob_column.
+    Returns a DataFrame of (market_type, line_floor, prob_col).
+    """
+    ks_by_market = {}
+    for col in prob_columns:
+        match = PROB_COLUMN_PATTERN.match(col)
+        if not match:
+            continue
+        market = PROB_STAT_TO_MARKET.get(match.group(1))
+        if market:
+            ks_by_market.setdefault(market, set()).add(int(match.group(2)))
     
-    df_odds = df_odds.merge(
-        df_players,
-        left_on='canonical_player_id',
-        right_on='player_id',
-        how='left'
-    )
-    df_odds['join_name'] = df_odds['canonical_player_name'].fillna(df_odds['player_name_raw'])
-    df_odds['join_team'] = df_odds['canonical_team']
-    df_odds.loc[df_odds['join_team'].isna(), 'join_team'] = None
-    df_odds['join_team'] = df_odds['join_team'].astype(str).str.upper()
-    df_odds.loc[df_odds['join_team'] == 'NONE', 'join_team'] = None
-    df_odds['home_abbr'] = df_odds['home_team'].apply(normalize_team)
-    df_odds['away_abbr'] = df_odds['away_team'].apply(normalize_team)
-    df_odds['join_date'] = pd.to_datetime(df_odds['event_start_ts_utc'], errors='coerce')
-    df_odds['join_date'] = df_odds['join_date'].fillna(
-        pd.to_datetime(df_odds['capture_ts_utc'], errors='coerce')
-    )
-    df_odds['join_date'] = df_odds['join_date'].dt.normalize()
-    player_key = df_odds['canonical_player_id'].astype(object).where(
-        df_odds['canonical_player_id'].notna(),
-        df_odds['join_name']
-    )
-    df_odds['player_key'] = player_key.astype(str)
-    df_odds = df_odds.sort_values('capture_ts_utc').drop_duplicates(
-        subset=[
-            'source_vendor',
-            'book_id_vendor',
-            'market_type',
-            'line',
-            'side',
-            'player_key',
-            'home_abbr',
-            'away_abbr'
-        ],
-        keep='last'
+    rows = []
+    for market, ks in ks_by_market.items():
+        for k in sorted(ks):
+            # Line k-0.5 (and any line in [k-1, k)) maps to the "k plus" column
+            prob_col = get_production_prob_column(market.lower(), k - 0.5, prob_columns)
+            if prob_col:
+                rows.append({'market_type': market, 'line_floor': k - 1, 'prob_col': prob_col})
+    return pd.DataFrame(rows, columns=['market_type', 'line_floor', 'prob_col'])
+
+RANKED_BETS_SQL = """
+WITH odds_window AS (
+    SELECT
+        o.*,
+        COALESCE(pm_id.canonical_player_id, pm_name.canonical_player_id) AS canonical_player_id
+    FROM {odds_table} o
+    LEFT JOIN dim_players_mapping pm_id ON 
+        o.player_id_vendor = pm_id.vendor_player_id AND 
+        o.source_vendor = pm_id.source_vendor
+    LEFT JOIN dim_players_mapping pm_name ON 
+        o.player_name_raw = pm_name.vendor_player_name AND 
+        o.source_vendor = pm_name.source_vendor
+    WHERE o.capture_ts_utc >= CAST($target_date AS DATE) - to_days(CAST($window_days + $lookback_days AS INTEGER))
+      AND o.capture_ts_utc < CAST($target_date AS DATE) + to_days(CAST($window_days + 1 AS INTEGER))
+      {partition_filter}
+      AND o.market_type NOT IN (SELECT UNNEST($blacklisted_markets))
+      AND o.odds_decimal > 1.0
+      AND NOT regexp_matches(LOWER(COALESCE(o.book_name_raw, '')), $excluded_books_pattern)
+),
+odds_keyed AS (
+    SELECT
+        w.*,
+        COALESCE(p.player_name, w.player_name_raw) AS join_name,
+        UPPER(p.team) AS join_team,
+        nhl_team_abbr(w.home_team) AS home_abbr,
+        nhl_team_abbr(w.away_team) AS away_abbr,
+        CAST(COALESCE(w.event_start_ts_utc, w.capture_ts_utc) AS DATE) AS join_date,
+        COALESCE(CAST(w.canonical_player_id AS VARCHAR), p.player_name, w.player_name_raw) AS join_player_key
+    FROM odds_window w
+    LEFT JOIN dim_players p ON w.canonical_player_id = p.player_id
+),
+latest_odds AS (
+    SELECT *, nhl_normalize_name(join_name) AS norm_name
+    FROM odds_keyed
+    WHERE ABS(date_diff('day', join_date, CAST($target_date AS DATE))) <= $window_days
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY source_vendor, book_id_vendor, market_type, line, side, join_player_key, home_abbr, away_abbr
+        ORDER BY capture_ts_utc DESC
+    ) = 1
+),
+model_probs AS (
+    SELECT
+        Player,
+        Team,
+        nhl_normalize_name(Player) AS norm_name,
+        UPPER(CAST(Team AS VARCHAR)) AS team_abbr,
+        CAST(Date AS DATE) AS prob_date,
+        prob_col,
+        TRY_CAST(p_over_model AS DOUBLE) AS p_over_model
+    FROM (
+        UNPIVOT probs_raw
+        ON COLUMNS('^p_[A-Z]+_[0-9]+plus')
+        INTO NAME prob_col VALUE p_over_model
     )
+    WHERE ABS(date_diff('day', CAST(Date AS DATE), CAST($target_date AS DATE))) <= $window_days
+),
+joined AS (
+    SELECT
+        mp.Player,
+        mp.Team,
+        o.market_type,
+        o.line,
+        o.side,
+        o.book_name_raw,
+        o.odds_american,
+        o.odds_decimal,
+        pol.prob_col,
+        CASE WHEN UPPER(o.side) = 'OVER' THEN mp.p_over_model ELSE 1.0 - mp.p_over_model END AS p_model
+    FROM latest_odds o
+    JOIN prob_policy pol ON
+        o.market_type = pol.market_type AND
+        CAST(FLOOR(o.line) AS INTEGER) = pol.line_floor
+    JOIN model_probs mp ON
+        mp.norm_name = o.norm_name AND
+        mp.prob_col = pol.prob_col
+    -- Team-aware join guard: prefer canonical team when available, else fallback to event teams.
+    WHERE (mp.team_abbr = o.join_team OR (o.join_team IS NULL AND mp.team_abbr IN (o.home_abbr, o.away_abbr)))
+      -- Capture window filter to prevent stale odds joining fresh projections.
+      AND ABS(date_diff('day', o.join_date, mp.prob_date)) <= $window_days
+      AND mp.p_over_model IS NOT NULL
+)
+SELECT *, (p_model * odds_decimal) - 1 AS ev
+FROM joined
+WHERE (p_model * odds_decimal) - 1 >= $min_ev
+ORDER BY ev DESC
+"""
 
-    df_probs['norm_name'] = df_probs['Player'].apply(normalize_name)
-    df_probs['team_abbr'] = df_probs['Team'].astype(str).str.upper()
-    df_probs['prob_date'] = pd.to_datetime(df_probs['Date'], errors='coerce').dt.normalize()
-    df_odds['norm_name'] = df_odds['join_name'].apply(normalize_name)
+def get_ranked_bets(con, df_probs, target_date, window_days=CAPTURE_WINDOW_DAYS, min_ev=MIN_EV, odds_table=LATEST_ODDS_TABLE):
+    """
+    Runs the multi-book EV join inside DuckDB for one target date and returns
+    only the ranked (EV >= min_ev) rows.
+    odds_table is fact_prop_odds_latest for live runs; pass fact_prop_odds to
+    replay a past date against the full capture history.
+    """
+    register_sql_helpers(con)
+    con.register("probs_raw", df_probs)
+    con.register("prob_policy", build_prob_policy(list(df_probs.columns)))
     
-    # Merge
-    merged = pd.merge(
-        df_odds, 
-        df_probs, 
-        left_on=['norm_name'], 
-        right_on=['norm_name'],
-        how='inner',
-        suffixes=('_raw', '_model')
-    )
+    params = {
+        'target_date': str(target_date),
+        'window_days': window_days,
+        'lookback_days': CAPTURE_LOOKBACK_DAYS,
+        'blacklisted_markets': BLACKLISTED_MARKETS,
+        'excluded_books_pattern': "|".join(re.escape(kw) for kw in EXCLUDED_KEYWORDS),
+        'min_ev': min_ev
+    }
+    try:
+        partition_filter = HISTORY_PARTITION_FILTER if odds_table == HISTORY_ODDS_TABLE else ""
+        sql = RANKED_BETS_SQL.format(odds_table=odds_table, partition_filter=partition_filter)
+        return con.execute(sql, params).df()
+    finally:
+        con.unregister("probs_raw")
+        con.unregister("prob_policy")
 
-    # Team-aware join guard: prefer canonical team when available, else fallback to event teams.
-    team_match = merged['team_abbr'] == merged['join_team']
-    fallback_match = merged['join_team'].isna() & (
-        (merged['team_abbr'] == merged['home_abbr']) | (merged['team_abbr'] == merged['away_abbr'])
-    )
-    merged = merged[team_match | fallback_match]
+def format_results(df_ranked):
+    """Shapes ranked rows into the MultiBookBestBets report layout."""
+    return pd.DataFrame({
+        'Player': df_ranked['Player'],
+        'Team': df_ranked['Team'],
+        'Market': df_ranked['market_type'],
+        'Line': df_ranked['line'],
+        'Side': df_ranked['side'],
+        'Book': df_ranked['book_name_raw'],
+        'Odds': df_ranked['odds_american'],
+        'Model_Prob': df_ranked['p_model'].map(lambda p: f"{p:.1%}"),
+        'Implied_Prob': (1 / df_ranked['odds_decimal']).map(lambda p: f"{p:.1%}"),
+        'EV%': df_ranked['ev'].map(lambda ev: f"{ev:+.1%}"),
+        'ev_sort': df_ranked['ev'],
+        'Prob_Source': df_ranked['prob_col'].map(lambda c: 'Calibrated' if 'calibrated' in c else 'Raw'),
+        'Source_Col': df_ranked['prob_col']
+    })
 
-    # Capture window filter to prevent stale odds joining fresh projections.
-    merged = merged[merged['join_date'].notna() & merged['prob_date'].notna()]
-    merged = merged[(merged['join_date'] - merged['prob_date']).abs().dt.days <= CAPTURE_WINDOW_DAYS]
+def main():
+    parser = argparse.ArgumentParser(description="Multi-Book EV Analysis (DuckDB)")
+    parser.add_argument("--date", help="Target slate date (YYYY-MM-DD). Defaults to the latest date in the probabilities file.")
+    parser.add_argument("--history", action="store_true", help="Use full capture history (fact_prop_odds) instead of current prices, e.g. for past dates.")
+    args = parser.parse_args()
     
-    logger.info(f"Joined {len(merged)} records.")
+    logger.info("Starting Multi-Book EV Analysis...")
     
-    if merged.empty:
-        logger.warning("Join resulted in 0 records. Check player name normalization.")
+    # 1. Load Model Probabilities
+    if not os.path.exists(PROBS_PATH):
+        logger.error(f"Probs file not found: {PROBS_PATH}")
         return
-
-    # 4. Calculate EV for each record
-    results = []
+        
+    df_probs = pd.read_csv(PROBS_PATH)
+    logger.info(f"Loaded {len(df_probs)} model probabilities.")
     
-    # Standard books only (exclude Pick'em/DFS with non-standard pricing)
-    EXCLUDED_KEYWORDS = ['underdog', 'prizepicks', 'parlayplay', 'sleeper', 'chalkboard', 'boom']
+    target_date = args.date
+    if not target_date:
+        prob_dates = pd.to_datetime(df_probs['Date'], errors='coerce').dropna()
+        if prob_dates.empty:
+            logger.error("Probs file has no usable Date column; pass --date.")
+            return
+        target_date = prob_dates.max().strftime("%Y-%m-%d")
+    logger.info(f"Target date: {target_date}")
     
-    for idx, row in merged.iterrows():
-        book_name_lower = row['book_name_raw'].lower()
-        if any(kw in book_name_lower for kw in EXCLUDED_KEYWORDS):
-            continue
-            
-        if row['market_type'] == 'GOALS':
-            continue # Blacklisted
-            
-        stat_type = row['market_type'].lower()
-        line = row['line']
-        
-        # Select correct model probability column based on policy
-        prob_col = get_production_prob_column(stat_type, line, row.keys())
-        
-        if not prob_col or prob_col not in row:
-            continue
-            
-        p_over_model = float(row[prob_col])
-        
-        # Adjust for side
-        if row['side'].upper() == 'OVER':
-            p_model = p_over_model
-        else:
-            p_model = 1.0 - p_over_model
-            
-        odds_decimal = row['odds_decimal']
-        if not odds_decimal or odds_decimal <= 1.0:
-            continue
-            
-        ev = (p_model * odds_decimal) - 1
-        
-        # Format results
-        results.append({
-            'Player': row['Player'],
-            'Team': row['Team'],
-            'Market': row['market_type'],
-            'Line': row['line'],
-            'Side': row['side'],
-            'Book': row['book_name_raw'],
-            'Odds': row['odds_american'],
-            'Model_Prob': f"{p_model:.1%}",
-            'Implied_Prob': f"{1/odds_decimal:.1%}",
-            'EV%': f"{ev:+.1%}",
-            'ev_sort': ev,
-            'Prob_Source': 'Calibrated' if 'calibrated' in prob_col else 'Raw',
-            'Source_Col': prob_col
-        })
-        
-    df_results = pd.DataFrame(results)
+    # 2. Join odds with probs and rank inside DuckDB
+    con = get_replica_connection(DB_PATH)
+    try:
+        odds_table = HISTORY_ODDS_TABLE if args.history else LATEST_ODDS_TABLE
+        df_ranked = get_ranked_bets(con, df_probs, target_date, odds_table=odds_table)
+    finally:
+        con.close()
     
-    if df_results.empty:
-        logger.warning("No bets found after filtering.")
+    if df_ranked.empty:
+        logger.warning("No bets found after filtering. Run ingestion and mapping first, or check player name normalization.")
         return
 
-    # 5. Filter and Sort
-    # EV >= 2%
-    df_ev = df_results[df_results['ev_sort'] >= 0.02].sort_values('ev_sort', ascending=False)
+    df_ev = format_results(df_ranked)
     
-    logger.info(f"Found {len(df_ev)} bets with EV% >= 2.0%")
+    logger.info(f"Found {len(df_ev)} bets with EV% >= {MIN_EV:.1%}")
     
-    # 6. Export
+    # 3. Export
     os.makedirs(os.path.dirname(OUTPUT_XLSX), exist_ok=True)
     df_ev.to_excel(OUTPUT_XLSX, index=False)
     logger.info(f"Exported best bets to {OUTPUT_XLSX}")
@@ -1,91 +1,307 @@
+import glob
+import math
+import os
+import shutil
 import duckdb
 import logging
+import pyarrow as pa
+from datetime import timedelta
+
+from nhl_bets.common.odds_lake import (
+    HIVE_TYPES, ODDS_LAKE_ROOT, SCHEMA_DATE, SCHEMA_VENDOR, lake_scan_sql, partition_dir, partition_files,
+    sql_literal, write_parquet_file
+)
 
 logger = logging.getLogger(__name__)
 
-def initialize_phase11_tables(con: duckdb.DuckDBPyConnection):
+DEFAULT_DB_PATH = os.path.join("data", "db", "nhl_backtest.duckdb")
+DUCKDB_TEMP_DIR = "./duckdb_temp/"
+# Share of the memory ceiling handed to DuckDB; the rest stays with pandas/sklearn.
+DUCKDB_MEMORY_FRACTION = 0.75
+
+# fact_prop_odds_latest key: one row per (vendor, book, event, player, market, line, side).
+# PlayNow/OddsShark have no vendor player id, so the raw name stands in for it.
+LATEST_PLAYER_KEY = "COALESCE(player_id_vendor, player_name_raw)"
+LATEST_KEY_COLUMNS = f"source_vendor, book_id_vendor, event_id_vendor, {LATEST_PLAYER_KEY}, market_type, line, side"
+LATEST_SELECT_COLUMNS = f"""
+    source_vendor, book_id_vendor, event_id_vendor, {LATEST_PLAYER_KEY} AS player_key,
+    market_type, line, side, capture_ts_utc, event_name_raw, event_start_ts_utc,
+    home_team, away_team, player_id_vendor, player_name_raw, book_name_raw,
+    odds_american, odds_decimal, is_live, raw_payload_hash
+"""
+
+# fact_prop_consensus key: one row per (vendor, event, player, market, line) across books.
+CONSENSUS_KEY_COLUMNS = "source_vendor, event_id_vendor, player_key, market_type, line"
+
+FACT_PROP_ODDS_COLUMNS = """
+    source_vendor TEXT NOT NULL,
+    capture_ts_utc TIMESTAMP NOT NULL,
+    event_id_vendor TEXT NOT NULL,
+    event_name_raw TEXT,
+    event_start_ts_utc TIMESTAMP,
+    home_team TEXT,
+    away_team TEXT,
+    player_id_vendor TEXT,
+    player_name_raw TEXT,
+    market_type TEXT NOT NULL,
+    line DOUBLE NOT NULL,
+    side TEXT NOT NULL,
+    book_id_vendor TEXT NOT NULL,
+    book_name_raw TEXT,
+    odds_american INTEGER,
+    odds_decimal DOUBLE,
+    is_live BOOLEAN DEFAULT FALSE,
+    raw_payload_path TEXT,
+    raw_payload_hash TEXT NOT NULL,
+    row_key UBIGINT NOT NULL
+"""
+FACT_PROP_ODDS_COLUMN_NAMES = [line.split()[0] for line in FACT_PROP_ODDS_COLUMNS.strip().splitlines()]
+# Columns stored in the lake files (source_vendor via the partition path). row_key is not
+# stored: a random 64-bit value does not compress and was nearly all of each file, while
+# the string columns are dictionary-encoded by Parquet. It is derived with ODDS_ROW_KEY_SQL.
+ODDS_LAKE_COLUMN_NAMES = [c for c in FACT_PROP_ODDS_COLUMN_NAMES if c != "row_key"]
+
+# SQL twin of storage.odds_row_key: low 64 bits of md5 over the dedup fields joined by 0x1F,
+# capture time as epoch microseconds (UTC) and line in thousandths.
+ODDS_ROW_KEY_SQL = """
+    CAST(md5_number(concat_ws(chr(31),
+        COALESCE(source_vendor, ''),
+        COALESCE(CAST(epoch_us(capture_ts_utc) AS TEXT), ''),
+        COALESCE(CAST(event_id_vendor AS TEXT), ''),
+        COALESCE(CAST(player_id_vendor AS TEXT), ''),
+        COALESCE(player_name_raw, ''),
+        COALESCE(market_type, ''),
+        COALESCE(CAST(CAST(ROUND(line * 1000) AS BIGINT) AS TEXT), ''),
+        COALESCE(side, ''),
+        COALESCE(book_id_vendor, ''),
+        COALESCE(raw_payload_hash, '')
+    )) & 18446744073709551615 AS UBIGINT)
+"""
+
+# Delta capture (insert_odds_deltas): each vendor writes a full keyframe at most this often
+ODDS_KEYFRAME_INTERVAL = timedelta(hours=1)
+
+# Pick'em/DFS books with non-standard pricing never count toward best line or consensus.
+EXCLUDED_BOOK_KEYWORDS = ['underdog', 'prizepicks', 'parlayplay', 'sleeper', 'chalkboard', 'boom']
+
+def _relation_type(con: duckdb.DuckDBPyConnection, name: str):
+    """Returns 'BASE TABLE', 'VIEW' or None."""
+    row = con.execute("SELECT table_type FROM information_schema.tables WHERE table_name = ?", [name]).fetchone()
+    return row[0] if row else None
+
+def _migrate_fact_prop_odds_to_lake(con: duckdb.DuckDBPyConnection, lake_root: str):
+    """
+    One-off export of a table-backed fact_prop_odds into the Parquet lake. Leftovers
+    of an interrupted export are removed first, so a rerun never duplicates rows.
+    """
+    logger.info(f"Migrating fact_prop_odds table to the odds lake at {lake_root}...")
+    for path in glob.glob(os.path.join(lake_root, "*", "*", "migrated-*.parquet")):
+        os.remove(path)
+    
+    columns = ", ".join(ODDS_LAKE_COLUMN_NAMES)
+    os.makedirs(lake_root, exist_ok=True)
+    con.execute(f"""
+    COPY (
+        SELECT {columns}, CAST(capture_ts_utc AS DATE) AS capture_date
+        FROM fact_prop_odds
+        ORDER BY capture_ts_utc
+    ) TO {sql_literal(lake_root)} (
+        FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (source_vendor, capture_date),
+        FILENAME_PATTERN 'migrated-{{uuid}}', OVERWRITE_OR_IGNORE
+    )
+    """)
+    con.execute("DROP INDEX IF EXISTS idx_fact_prop_odds_dedup")
+    con.execute("DROP TABLE fact_prop_odds")
+
+def _lake_stores_row_key(con: duckdb.DuckDBPyConnection, lake_root: str) -> bool:
+    seed = partition_files(lake_root, SCHEMA_VENDOR, SCHEMA_DATE)
+    if not seed:
+        return False
+    columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM read_parquet({sql_literal(seed[0])})").fetchall()]
+    return "row_key" in columns
+
+def _drop_stored_row_keys(con: duckdb.DuckDBPyConnection, lake_root: str):
+    """
+    Rewrites a lake whose files still carry row_key next to it, then swaps the
+    directories. An interrupted swap is completed by the next call.
+    """
+    root = os.path.normpath(lake_root)
+    staging, backup = root + ".rewrite", root + ".old"
+    if not os.path.exists(root) and os.path.exists(backup):
+        os.replace(backup, root)
+    if not _lake_stores_row_key(con, root):
+        return
+    
+    logger.info(f"Rewriting odds lake at {root} without stored row keys...")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    con.execute(f"""
+    COPY (
+        SELECT {", ".join(ODDS_LAKE_COLUMN_NAMES)}, capture_date
+        FROM {lake_scan_sql(root)}
+        WHERE source_vendor <> {sql_literal(SCHEMA_VENDOR)}
+        ORDER BY capture_ts_utc
+    ) TO {sql_literal(staging)} (
+        FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (source_vendor, capture_date),
+        FILENAME_PATTERN 'rewritten-{{uuid}}', OVERWRITE_OR_IGNORE
+    )
+    """)
+    os.replace(root, backup)
+    os.replace(staging, root)
+    shutil.rmtree(backup)
+
+def _create_fact_prop_odds_view(con: duckdb.DuckDBPyConnection, lake_root: str):
+    """(Re)creates the fact_prop_odds view over the lake, seeding the schema file if needed."""
+    if not partition_files(lake_root, SCHEMA_VENDOR, SCHEMA_DATE):
+        con.execute(f"CREATE OR REPLACE TEMP TABLE fact_prop_odds_schema ({FACT_PROP_ODDS_COLUMNS})")
+        write_parquet_file(con, "SELECT * EXCLUDE (source_vendor, row_key) FROM fact_prop_odds_schema",
+                           partition_dir(lake_root, SCHEMA_VENDOR, SCHEMA_DATE), prefix="schema")
+        con.execute("DROP TABLE fact_prop_odds_schema")
+    
+    # row_key is only computed for queries that select it
+    con.execute(f"""
+    CREATE OR REPLACE VIEW fact_prop_odds AS
+    SELECT {", ".join(ODDS_LAKE_COLUMN_NAMES)}, {ODDS_ROW_KEY_SQL} AS row_key, capture_date
+    FROM {lake_scan_sql(lake_root)}
+    """)
+
+def _create_prop_odds_asof_macro(con: duckdb.DuckDBPyConnection):
+    """
+    prop_odds_asof(ts): the quoted price of every prop at ts, one row per latest key.
+    Per vendor, only captures since its last keyframe at or before ts are read (full
+    state there, changes after it); a removal between a price and ts hides the prop.
+    """
+    con.execute(f"""
+    CREATE OR REPLACE MACRO prop_odds_asof(as_of_ts) AS TABLE
+    WITH keyframe AS (
+        SELECT source_vendor, MAX(capture_ts_utc) AS keyframe_ts
+        FROM odds_keyframes
+        WHERE capture_ts_utc <= as_of_ts
+        GROUP BY source_vendor
+    ),
+    quoted AS (
+        SELECT o.* EXCLUDE (row_key, capture_date), {LATEST_PLAYER_KEY} AS player_key
+        FROM fact_prop_odds o
+        LEFT JOIN keyframe k USING (source_vendor)
+        WHERE o.capture_ts_utc <= as_of_ts
+          AND o.capture_date <= CAST(as_of_ts AS DATE)
+          AND o.capture_ts_utc >= COALESCE(k.keyframe_ts, TIMESTAMP '-infinity')
+          AND {LATEST_PLAYER_KEY} IS NOT NULL
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY {LATEST_KEY_COLUMNS} ORDER BY o.capture_ts_utc DESC) = 1
+    )
+    SELECT q.*
+    FROM quoted q
+    ASOF LEFT JOIN fact_prop_odds_removals r
+      ON r.source_vendor = q.source_vendor AND r.book_id_vendor = q.book_id_vendor
+     AND r.event_id_vendor = q.event_id_vendor AND r.player_key = q.player_key
+     AND r.market_type = q.market_type AND r.line = q.line AND r.side = q.side
+     AND q.capture_ts_utc < r.removed_ts_utc
+    WHERE r.removed_ts_utc IS NULL OR r.removed_ts_utc > as_of_ts
+    """)
+
+def initialize_phase11_tables(con: duckdb.DuckDBPyConnection, lake_root: str = None):
     """
     Initializes the schema for Phase 11 Historical Odds Ingestion.
+    fact_prop_odds is a view over the Parquet odds lake at lake_root (default ODDS_LAKE_ROOT).
     """
     logger.info("Initializing Phase 11 tables...")
     
-    # 1. fact_prop_odds (Main unified odds table)
+    lake_root = lake_root or ODDS_LAKE_ROOT
+    
+    # 1. fact_prop_odds (Main unified odds history: Parquet lake partitioned by vendor/capture date,
+    #    deduplicated on row_key by insert_odds_records)
+    if _relation_type(con, "fact_prop_odds") == "BASE TABLE":
+        _migrate_fact_prop_odds_to_lake(con, lake_root)
+    else:
+        _drop_stored_row_keys(con, lake_root)
+    _create_fact_prop_odds_view(con, lake_root)
+    
+    # 2. raw_odds_payloads (Ingestion registry)
     con.execute("""
-    CREATE TABLE IF NOT EXISTS fact_prop_odds (
+    CREATE TABLE IF NOT EXISTS raw_odds_payloads (
+        payload_hash TEXT PRIMARY KEY,
         source_vendor TEXT NOT NULL,
         capture_ts_utc TIMESTAMP NOT NULL,
+        file_path TEXT NOT NULL,
+        ingested_at_utc TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Enforce constraints for existing tables (when IF NOT EXISTS skips DDL).
+    con.execute("ALTER TABLE raw_odds_payloads ALTER COLUMN source_vendor SET NOT NULL")
+    con.execute("ALTER TABLE raw_odds_payloads ALTER COLUMN capture_ts_utc SET NOT NULL")
+    con.execute("ALTER TABLE raw_odds_payloads ALTER COLUMN file_path SET NOT NULL")
+    
+    # 3. fact_prop_odds_latest (Current price per prop, maintained by insert_odds_records)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS fact_prop_odds_latest (
+        source_vendor TEXT NOT NULL,
+        book_id_vendor TEXT NOT NULL,
         event_id_vendor TEXT NOT NULL,
+        player_key TEXT NOT NULL,
+        market_type TEXT NOT NULL,
+        line DOUBLE NOT NULL,
+        side TEXT NOT NULL,
+        capture_ts_utc TIMESTAMP NOT NULL,
         event_name_raw TEXT,
         event_start_ts_utc TIMESTAMP,
         home_team TEXT,
         away_team TEXT,
         player_id_vendor TEXT,
         player_name_raw TEXT,
-        market_type TEXT NOT NULL,
-        line DOUBLE NOT NULL,
-        side TEXT NOT NULL,
-        book_id_vendor TEXT NOT NULL,
         book_name_raw TEXT,
         odds_american INTEGER,
         odds_decimal DOUBLE,
         is_live BOOLEAN DEFAULT FALSE,
-        raw_payload_path TEXT,
         raw_payload_hash TEXT NOT NULL,
-        CONSTRAINT fact_prop_odds_unique UNIQUE (
-            source_vendor,
-            capture_ts_utc,
-            event_id_vendor,
-            player_id_vendor,
-            player_name_raw,
-            market_type,
-            line,
-            side,
-            book_id_vendor,
-            raw_payload_hash
-        )
+        PRIMARY KEY (source_vendor, book_id_vendor, event_id_vendor, player_key, market_type, line, side)
     )
     """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_fact_prop_odds_latest_event ON fact_prop_odds_latest (event_id_vendor)")
     
-    # 2. raw_odds_payloads (Ingestion registry)
-    con.execute("""
-    CREATE TABLE IF NOT EXISTS raw_odds_payloads (
-        payload_hash TEXT PRIMARY KEY,
-        source_vendor TEXT NOT NULL,
-        capture_ts_utc TIMESTAMP NOT NULL,
-        file_path TEXT NOT NULL,
-        ingested_at_utc TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+    # Backfill once from history when the table is new on an existing database.
+    latest_empty = con.execute("SELECT count(*) FROM fact_prop_odds_latest").fetchone()[0] == 0
+    if latest_empty:
+        con.execute(f"""
+        INSERT INTO fact_prop_odds_latest
+        SELECT {LATEST_SELECT_COLUMNS}
+        FROM fact_prop_odds
+        WHERE {LATEST_PLAYER_KEY} IS NOT NULL
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY {LATEST_KEY_COLUMNS} ORDER BY capture_ts_utc DESC) = 1
+        """)
 
-    # Enforce constraints for existing tables (when IF NOT EXISTS skips DDL).
-    con.execute("DROP INDEX IF EXISTS idx_fact_prop_odds_dedup")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN source_vendor SET NOT NULL")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN capture_ts_utc SET NOT NULL")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN event_id_vendor SET NOT NULL")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN market_type SET NOT NULL")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN line SET NOT NULL")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN side SET NOT NULL")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN book_id_vendor SET NOT NULL")
-    con.execute("ALTER TABLE fact_prop_odds ALTER COLUMN raw_payload_hash SET NOT NULL")
-    con.execute("ALTER TABLE raw_odds_payloads ALTER COLUMN source_vendor SET NOT NULL")
-    con.execute("ALTER TABLE raw_odds_payloads ALTER COLUMN capture_ts_utc SET NOT NULL")
-    con.execute("ALTER TABLE raw_odds_payloads ALTER COLUMN file_path SET NOT NULL")
+    # 4. fact_prop_consensus (Best line + multi-book no-vig consensus, maintained from fact_prop_odds_latest)
     con.execute("""
-    CREATE UNIQUE INDEX IF NOT EXISTS idx_fact_prop_odds_dedup ON fact_prop_odds (
-        source_vendor,
-        capture_ts_utc,
-        event_id_vendor,
-        player_id_vendor,
-        player_name_raw,
-        market_type,
-        line,
-        side,
-        book_id_vendor,
-        raw_payload_hash
+    CREATE TABLE IF NOT EXISTS fact_prop_consensus (
+        source_vendor TEXT NOT NULL,
+        event_id_vendor TEXT NOT NULL,
+        player_key TEXT NOT NULL,
+        market_type TEXT NOT NULL,
+        line DOUBLE NOT NULL,
+        event_name_raw TEXT,
+        player_name_raw TEXT,
+        best_over_decimal DOUBLE,
+        best_over_american INTEGER,
+        best_over_book TEXT,
+        best_under_decimal DOUBLE,
+        best_under_american INTEGER,
+        best_under_book TEXT,
+        consensus_p_over DOUBLE,
+        consensus_p_under DOUBLE,
+        book_count INTEGER NOT NULL,
+        paired_book_count INTEGER NOT NULL,
+        last_capture_ts_utc TIMESTAMP NOT NULL,
+        PRIMARY KEY (source_vendor, event_id_vendor, player_key, market_type, line)
     )
     """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_fact_prop_consensus_event ON fact_prop_consensus (event_id_vendor)")
     
-    # 3. dim_books (Sportsbook mapping)
+    # Backfill once from the latest table (no-op on a fresh database).
+    consensus_empty = con.execute("SELECT count(*) FROM fact_prop_consensus").fetchone()[0] == 0
+    if consensus_empty:
+        refresh_consensus(con, "fact_prop_odds_latest")
+
+    # 5. dim_books (Sportsbook mapping)
     con.execute("""
     CREATE TABLE IF NOT EXISTS dim_books (
         book_key TEXT,
@@ -95,7 +311,7 @@ def initialize_phase11_tables(con: duckdb.DuckDBPyConnection):
     )
     """)
     
-    # 4. dim_markets (Market type mapping)
+    # 6. dim_markets (Market type mapping)
     con.execute("""
     CREATE TABLE IF NOT EXISTS dim_markets (
         vendor_market_label TEXT,
@@ -104,7 +320,7 @@ def initialize_phase11_tables(con: duckdb.DuckDBPyConnection):
     )
     """)
     
-    # 5. Mapping tables for players and events (Simplified for now)
+    # 7. Mapping tables for players and events (Simplified for now)
     con.execute("""
     CREATE TABLE IF NOT EXISTS dim_players_mapping (
         vendor_player_id TEXT,
@@ -147,46 +363,454 @@ def initialize_phase11_tables(con: duckdb.DuckDBPyConnection):
     )
     """)
     
+    # 8. mapping_watermarks (Last raw_odds_payloads.ingested_at_utc and dim_games date seen by each incremental mapper)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS mapping_watermarks (
+        mapping_name TEXT PRIMARY KEY,
+        ingested_at_utc TIMESTAMP NOT NULL,
+        games_through DATE
+    )
+    """)
+    con.execute("ALTER TABLE mapping_watermarks ADD COLUMN IF NOT EXISTS games_through DATE")
+    
+    # 9. Delta capture: keyframe log and removed props (see insert_odds_deltas)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS odds_keyframes (
+        source_vendor TEXT NOT NULL,
+        capture_ts_utc TIMESTAMP NOT NULL,
+        PRIMARY KEY (source_vendor, capture_ts_utc)
+    )
+    """)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS fact_prop_odds_removals (
+        source_vendor TEXT NOT NULL,
+        book_id_vendor TEXT NOT NULL,
+        event_id_vendor TEXT NOT NULL,
+        player_key TEXT NOT NULL,
+        market_type TEXT NOT NULL,
+        line DOUBLE NOT NULL,
+        side TEXT NOT NULL,
+        removed_ts_utc TIMESTAMP NOT NULL,
+        PRIMARY KEY (source_vendor, book_id_vendor, event_id_vendor, player_key, market_type, line, side, removed_ts_utc)
+    )
+    """)
+    _create_prop_odds_asof_macro(con)
+    
     logger.info("Phase 11 tables initialized.")
 
-def insert_odds_records(con: duckdb.DuckDBPyConnection, df):
+def _stage_odds_input(con: duckdb.DuckDBPyConnection, df):
+    """Registers df (DataFrame or pyarrow.Table) as the temp view stg_new_odds, with row_key attached."""
+    # Parsers attach row_key at parse time; derive it in SQL for callers that did not
+    con.register("stg_odds_input", df)
+    columns = df.column_names if isinstance(df, pa.Table) else df.columns
+    if "row_key" in columns:
+        staged = "SELECT * REPLACE (CAST(row_key AS UBIGINT) AS row_key) FROM stg_odds_input"
+    else:
+        staged = f"SELECT *, {ODDS_ROW_KEY_SQL} AS row_key FROM stg_odds_input"
+    con.execute(f"CREATE OR REPLACE TEMP VIEW stg_new_odds AS {staged}")
+
+def _drop_staged_odds(con: duckdb.DuckDBPyConnection):
+    con.execute("DROP TABLE IF EXISTS stg_fresh_odds")
+    con.execute("DROP VIEW IF EXISTS stg_new_odds")
+    con.unregister("stg_odds_input")
+
+def _append_to_lake(con: duckdb.DuckDBPyConnection, relation: str, lake_root: str):
+    """
+    Appends the rows of relation that are not yet in the lake. Dedup compares row_key
+    only against the batch's own (vendor, capture_date) partitions.
+    """
+    # 1. Typed staging of rows not yet in the lake (NOT NULL constraints enforced here)
+    con.execute(f"CREATE OR REPLACE TEMP TABLE stg_fresh_odds ({FACT_PROP_ODDS_COLUMNS})")
+    batch = con.execute(f"""
+    SELECT DISTINCT source_vendor, CAST(CAST(capture_ts_utc AS TIMESTAMP) AS DATE)
+    FROM {relation}
+    """).fetchall()
+    existing_files = [f for vendor, capture_date in batch for f in partition_files(lake_root, vendor, capture_date)]
+    existing_keys = "SELECT CAST(NULL AS UBIGINT) AS row_key WHERE false"
+    if existing_files:
+        file_list = "[" + ", ".join(sql_literal(f) for f in existing_files) + "]"
+        # Constant bounds let DuckDB skip row groups outside the capture window (Parquet stats)
+        min_ts, max_ts = con.execute(f"""
+        SELECT CAST(MIN(capture_ts_utc) AS TIMESTAMP), CAST(MAX(capture_ts_utc) AS TIMESTAMP)
+        FROM {relation}
+        """).fetchone()
+        # row_key is derived from the stored columns, for the capture window only
+        existing_keys = f"""
+        SELECT {ODDS_ROW_KEY_SQL} FROM read_parquet({file_list}, hive_partitioning = true, hive_types = {HIVE_TYPES})
+        WHERE capture_ts_utc BETWEEN {sql_literal(min_ts)} AND {sql_literal(max_ts)}
+        """
+    con.execute(f"""
+    INSERT INTO stg_fresh_odds BY NAME
+    SELECT n.* FROM {relation} n
+    WHERE n.row_key NOT IN ({existing_keys})
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY n.row_key) = 1
+    """)
+    
+    # 2. One new file per (vendor, capture_date) partition, renamed into place when complete
+    for vendor, capture_date in con.execute("""
+    SELECT DISTINCT source_vendor, CAST(capture_ts_utc AS DATE) FROM stg_fresh_odds
+    """).fetchall():
+        write_parquet_file(con, f"""
+            SELECT * EXCLUDE (source_vendor, row_key) FROM stg_fresh_odds
+            WHERE source_vendor = {sql_literal(vendor)} AND CAST(capture_ts_utc AS DATE) = DATE {sql_literal(capture_date)}
+            ORDER BY capture_ts_utc
+        """, partition_dir(lake_root, vendor, capture_date))
+
+def insert_odds_records(con: duckdb.DuckDBPyConnection, df, lake_root: str = None):
     """
-    Inserts odds records from a DataFrame into fact_prop_odds with idempotency.
-    Uses a temporary staging table to perform an anti-join.
+    Appends new odds records to the Parquet odds lake with idempotency, then
+    maintains fact_prop_odds_latest / fact_prop_consensus in one transaction.
+    Dedup compares row_key only against the batch's own (vendor, capture_date)
+    partitions, so the cost tracks the batch size rather than the whole history.
     """
     if df is None or len(df) == 0:
         return
+    lake_root = lake_root or ODDS_LAKE_ROOT
     
-    # Register DataFrame as a virtual table
-    con.register("stg_new_odds", df)
+    _stage_odds_input(con, df)
+    try:
+        _append_to_lake(con, "stg_new_odds", lake_root)
+        
+        # Current-price and consensus tables. A failure here leaves the lake ahead of
+        # them; re-inserting the same batch is a no-op for the lake and repairs both.
+        con.begin()
+        try:
+            upsert_latest_odds(con, "stg_new_odds")
+            refresh_consensus(con, "stg_new_odds")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+    finally:
+        _drop_staged_odds(con)
+
+def insert_odds_deltas(con: duckdb.DuckDBPyConnection, df, lake_root: str = None,
+                       keyframe_interval: timedelta = ODDS_KEYFRAME_INTERVAL) -> dict:
+    """
+    Delta-mode counterpart of insert_odds_records for a parsed snapshot. The snapshot
+    is compared with fact_prop_odds_latest and only new props (I) and price changes (U)
+    go to the lake; props that vanished from an event present in the snapshot are
+    recorded as removals (D) in fact_prop_odds_removals. A vendor's first snapshot
+    after keyframe_interval is a keyframe: every row is written and it is logged in
+    odds_keyframes, which bounds how far back prop_odds_asof() has to scan.
+    fact_prop_odds_latest still sees every row, so its capture times stay current.
+    Returns counts {"inserted", "updated", "removed", "unchanged", "keyframes"}.
+    """
+    counts = {"inserted": 0, "updated": 0, "removed": 0, "unchanged": 0, "keyframes": 0}
+    if df is None or len(df) == 0:
+        return counts
+    lake_root = lake_root or ODDS_LAKE_ROOT
     
-    # perform anti-join to only insert rows that don't already exist
-    # Note: we use COALESCE for nullable fields in the join to ensure correct comparison
-    con.execute("""
-    INSERT INTO fact_prop_odds
-    SELECT n.* FROM stg_new_odds n
-    LEFT JOIN fact_prop_odds e ON 
-        n.source_vendor = e.source_vendor AND
-        n.capture_ts_utc = e.capture_ts_utc AND
-        n.event_id_vendor = e.event_id_vendor AND
-        COALESCE(n.player_id_vendor, 'NULL') = COALESCE(e.player_id_vendor, 'NULL') AND
-        n.player_name_raw = e.player_name_raw AND
-        n.market_type = e.market_type AND
-        n.line = e.line AND
-        n.side = e.side AND
-        n.book_id_vendor = e.book_id_vendor AND
-        n.raw_payload_hash = e.raw_payload_hash
-    WHERE e.source_vendor IS NULL
-    """)
-    
-    con.unregister("stg_new_odds")
-
-def get_db_connection(db_path: str) -> duckdb.DuckDBPyConnection:
-    """
-    Returns a DuckDB connection with standard pragmas.
-    """
-    con = duckdb.connect(db_path)
-    con.execute("SET memory_limit = '8GB';")
-    con.execute("SET threads = 8;")
-    con.execute("SET temp_directory = './duckdb_temp/';")
+    _stage_odds_input(con, df)
+    try:
+        # 1. Vendors due a keyframe
+        keyframes = []
+        for vendor, capture_ts in con.execute("""
+        SELECT source_vendor, CAST(MAX(capture_ts_utc) AS TIMESTAMP) FROM stg_new_odds GROUP BY 1
+        """).fetchall():
+            last = con.execute("SELECT MAX(capture_ts_utc) FROM odds_keyframes WHERE source_vendor = ?", [vendor]).fetchone()[0]
+            if last is None or capture_ts - last >= keyframe_interval:
+                keyframes.append((vendor, capture_ts))
+        keyframe_vendors = "[" + ", ".join(sql_literal(v) for v, _ in keyframes) + "]::TEXT[]"
+        
+        # 2. Classify rows against the latest-price state
+        con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE stg_odds_changes AS
+        SELECT n.*,
+            CASE
+                WHEN l.source_vendor IS NULL THEN 'I'
+                WHEN (n.odds_decimal, n.odds_american, n.is_live) IS DISTINCT FROM (l.odds_decimal, l.odds_american, l.is_live) THEN 'U'
+            END AS change_type
+        FROM stg_new_odds n
+        LEFT JOIN fact_prop_odds_latest l
+          ON l.source_vendor = n.source_vendor AND l.book_id_vendor = n.book_id_vendor
+         AND l.event_id_vendor = CAST(n.event_id_vendor AS TEXT) AND l.player_key = COALESCE(n.player_id_vendor, n.player_name_raw)
+         AND l.market_type = n.market_type AND l.line = n.line AND l.side = n.side
+        """)
+        
+        # 3. Props quoted before in a snapshot event but absent from this snapshot
+        con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE stg_odds_removed AS
+        SELECT l.*, b.capture_ts_utc AS removed_ts_utc
+        FROM fact_prop_odds_latest l
+        JOIN (SELECT source_vendor, MAX(capture_ts_utc) AS capture_ts_utc FROM stg_new_odds GROUP BY 1) b
+          ON b.source_vendor = l.source_vendor AND l.capture_ts_utc < b.capture_ts_utc
+        WHERE (l.source_vendor, l.event_id_vendor) IN (SELECT DISTINCT source_vendor, CAST(event_id_vendor AS TEXT) FROM stg_new_odds)
+          AND NOT EXISTS (
+            SELECT 1 FROM stg_new_odds n
+            WHERE n.source_vendor = l.source_vendor AND n.book_id_vendor = l.book_id_vendor
+              AND CAST(n.event_id_vendor AS TEXT) = l.event_id_vendor AND COALESCE(n.player_id_vendor, n.player_name_raw) = l.player_key
+              AND n.market_type = l.market_type AND n.line = l.line AND n.side = l.side
+          )
+        """)
+        
+        for change_type, n in con.execute("SELECT change_type, count(*) FROM stg_odds_changes GROUP BY 1").fetchall():
+            counts[{"I": "inserted", "U": "updated"}.get(change_type, "unchanged")] = n
+        counts["removed"] = con.execute("SELECT count(*) FROM stg_odds_removed").fetchone()[0]
+        counts["keyframes"] = len(keyframes)
+        
+        # 4. Lake: changes only, full rows for keyframe vendors
+        _append_to_lake(con, f"""(
+            SELECT * EXCLUDE (change_type) FROM stg_odds_changes
+            WHERE change_type IS NOT NULL OR list_contains({keyframe_vendors}, source_vendor)
+        )""", lake_root)
+        
+        # 5. Removals, keyframes, current-price and consensus tables in one transaction
+        con.begin()
+        try:
+            con.execute("""
+            INSERT INTO fact_prop_odds_removals
+            SELECT source_vendor, book_id_vendor, event_id_vendor, player_key, market_type, line, side, removed_ts_utc
+            FROM stg_odds_removed
+            ON CONFLICT DO NOTHING
+            """)
+            con.execute("""
+            DELETE FROM fact_prop_odds_latest l USING stg_odds_removed r
+            WHERE l.source_vendor = r.source_vendor AND l.book_id_vendor = r.book_id_vendor
+              AND l.event_id_vendor = r.event_id_vendor AND l.player_key = r.player_key
+              AND l.market_type = r.market_type AND l.line = r.line AND l.side = r.side
+            """)
+            if keyframes:
+                con.executemany("INSERT INTO odds_keyframes VALUES (?, ?) ON CONFLICT DO NOTHING", keyframes)
+            upsert_latest_odds(con, "stg_new_odds")
+            refresh_consensus(con, "stg_new_odds")
+            refresh_consensus(con, "stg_odds_removed")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+    finally:
+        con.execute("DROP TABLE IF EXISTS stg_odds_changes")
+        con.execute("DROP TABLE IF EXISTS stg_odds_removed")
+        _drop_staged_odds(con)
+    return counts
+
+def upsert_latest_odds(con: duckdb.DuckDBPyConnection, source_relation: str):
+    """
+    Upserts the newest price per key from source_relation into fact_prop_odds_latest.
+    Older captures never overwrite newer ones, so replays and backfills are safe.
+    """
+    con.execute(f"""
+    INSERT INTO fact_prop_odds_latest
+    SELECT {LATEST_SELECT_COLUMNS}
+    FROM {source_relation}
+    WHERE {LATEST_PLAYER_KEY} IS NOT NULL
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY {LATEST_KEY_COLUMNS} ORDER BY capture_ts_utc DESC) = 1
+    ON CONFLICT (source_vendor, book_id_vendor, event_id_vendor, player_key, market_type, line, side) DO UPDATE SET
+        capture_ts_utc = EXCLUDED.capture_ts_utc,
+        event_name_raw = EXCLUDED.event_name_raw,
+        event_start_ts_utc = EXCLUDED.event_start_ts_utc,
+        home_team = EXCLUDED.home_team,
+        away_team = EXCLUDED.away_team,
+        player_id_vendor = EXCLUDED.player_id_vendor,
+        player_name_raw = EXCLUDED.player_name_raw,
+        book_name_raw = EXCLUDED.book_name_raw,
+        odds_american = EXCLUDED.odds_american,
+        odds_decimal = EXCLUDED.odds_decimal,
+        is_live = EXCLUDED.is_live,
+        raw_payload_hash = EXCLUDED.raw_payload_hash
+    WHERE EXCLUDED.capture_ts_utc >= fact_prop_odds_latest.capture_ts_utc
+    """)
+
+def refresh_consensus(con: duckdb.DuckDBPyConnection, source_relation: str):
+    """
+    Recomputes fact_prop_consensus for the (vendor, event, player, market, line)
+    keys present in source_relation, reading only their rows in fact_prop_odds_latest.
+    Per book, Over/Under implied probabilities are de-vigged (analysis.ev.remove_vig);
+    the consensus is the mean fair Over probability across books quoting both sides.
+    """
+    excluded_pattern = "|".join(EXCLUDED_BOOK_KEYWORDS)
+    touched = f"""
+        SELECT DISTINCT source_vendor, event_id_vendor, {LATEST_PLAYER_KEY} AS player_key, market_type, line
+        FROM {source_relation}
+        WHERE {LATEST_PLAYER_KEY} IS NOT NULL
+    """
+    con.execute(f"""
+    DELETE FROM fact_prop_consensus c
+    USING ({touched}) t
+    WHERE c.source_vendor = t.source_vendor
+      AND c.event_id_vendor = t.event_id_vendor
+      AND c.player_key = t.player_key
+      AND c.market_type = t.market_type
+      AND c.line = t.line
+    """)
+    con.execute(f"""
+    INSERT INTO fact_prop_consensus
+    WITH quotes AS (
+        SELECT l.*
+        FROM fact_prop_odds_latest l
+        JOIN ({touched}) t USING ({CONSENSUS_KEY_COLUMNS})
+        WHERE l.odds_decimal > 1.0
+          AND NOT regexp_matches(LOWER(COALESCE(l.book_name_raw, '')), '{excluded_pattern}')
+    ),
+    best AS (
+        SELECT
+            {CONSENSUS_KEY_COLUMNS},
+            ANY_VALUE(event_name_raw) AS event_name_raw,
+            ANY_VALUE(player_name_raw) AS player_name_raw,
+            MAX(odds_decimal) FILTER (WHERE side = 'OVER') AS best_over_decimal,
+            ARG_MAX(odds_american, odds_decimal) FILTER (WHERE side = 'OVER') AS best_over_american,
+            ARG_MAX(book_name_raw, odds_decimal) FILTER (WHERE side = 'OVER') AS best_over_book,
+            MAX(odds_decimal) FILTER (WHERE side = 'UNDER') AS best_under_decimal,
+            ARG_MAX(odds_american, odds_decimal) FILTER (WHERE side = 'UNDER') AS best_under_american,
+            ARG_MAX(book_name_raw, odds_decimal) FILTER (WHERE side = 'UNDER') AS best_under_book,
+            COUNT(DISTINCT book_id_vendor) AS book_count,
+            MAX(capture_ts_utc) AS last_capture_ts_utc
+        FROM quotes
+        GROUP BY {CONSENSUS_KEY_COLUMNS}
+    ),
+    per_book AS (
+        SELECT
+            {CONSENSUS_KEY_COLUMNS},
+            book_id_vendor,
+            MAX(1.0 / odds_decimal) FILTER (WHERE side = 'OVER') AS p_over_raw,
+            MAX(1.0 / odds_decimal) FILTER (WHERE side = 'UNDER') AS p_under_raw
+        FROM quotes
+        GROUP BY {CONSENSUS_KEY_COLUMNS}, book_id_vendor
+    ),
+    fair AS (
+        SELECT
+            {CONSENSUS_KEY_COLUMNS},
+            AVG(p_over_raw / (p_over_raw + p_under_raw)) AS consensus_p_over,
+            COUNT(*) AS paired_book_count
+        FROM per_book
+        WHERE p_over_raw IS NOT NULL AND p_under_raw IS NOT NULL
+        GROUP BY {CONSENSUS_KEY_COLUMNS}
+    )
+    SELECT
+        b.source_vendor,
+        b.event_id_vendor,
+        b.player_key,
+        b.market_type,
+        b.line,
+        b.event_name_raw,
+        b.player_name_raw,
+        b.best_over_decimal,
+        b.best_over_american,
+        b.best_over_book,
+        b.best_under_decimal,
+        b.best_under_american,
+        b.best_under_book,
+        f.consensus_p_over,
+        1.0 - f.consensus_p_over AS consensus_p_under,
+        b.book_count,
+        COALESCE(f.paired_book_count, 0) AS paired_book_count,
+        b.last_capture_ts_utc
+    FROM best b
+    LEFT JOIN fair f USING ({CONSENSUS_KEY_COLUMNS})
+    """)
+
+def _select_filtered(con: duckdb.DuckDBPyConnection, table: str, **filters):
+    clauses = []
+    params = []
+    for column, value in filters.items():
+        if value is None:
+            continue
+        clauses.append(f"{column} = ?")
+        params.append(str(value) if column == "event_id_vendor" else value)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return con.execute(f"SELECT * FROM {table} {where}", params).df()
+
+def get_latest_odds(con: duckdb.DuckDBPyConnection, event_id_vendor=None, source_vendor=None, market_type=None):
+    """
+    Returns current prices from fact_prop_odds_latest (one row per prop/book/side).
+    Cost depends on the number of live props, not on how many snapshots were captured.
+    """
+    return _select_filtered(con, "fact_prop_odds_latest", event_id_vendor=event_id_vendor,
+                            source_vendor=source_vendor, market_type=market_type)
+
+def get_consensus(con: duckdb.DuckDBPyConnection, event_id_vendor=None, source_vendor=None, market_type=None):
+    """
+    Returns best Over/Under price + book and the no-vig consensus per
+    (vendor, event, player, market, line) from fact_prop_consensus.
+    """
+    return _select_filtered(con, "fact_prop_consensus", event_id_vendor=event_id_vendor,
+                            source_vendor=source_vendor, market_type=market_type)
+
+def _read_first_line(path: str):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def _cgroup_memory_bytes():
+    """Container memory limit (cgroup v2, then v1), or None when unlimited/unknown."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read_first_line(path)
+        if value and value.isdigit():
+            return int(value)
+    return None
+
+def _host_memory_bytes():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def _available_cpus() -> int:
+    """CPUs this process may use: affinity mask, capped by a cgroup CPU quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = None
+    cpu_max = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if cpu_max and not cpu_max.startswith("max"):
+        q, period = cpu_max.split()[:2]
+        quota = int(q) / int(period)
+    else:
+        q = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if q and period and q.lstrip("-").isdigit() and int(q) > 0:
+            quota = int(q) / int(period)
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+def resolve_duckdb_settings() -> dict:
+    """
+    DuckDB resource settings for this host. memory_limit is DUCKDB_MEMORY_FRACTION of the
+    smaller of host RAM and the cgroup limit; threads is the usable CPU count.
+    NHL_DUCKDB_MEMORY_LIMIT (e.g. '12GB'), NHL_DUCKDB_THREADS and NHL_DUCKDB_TEMP_DIR override.
+    """
+    memory_limit = os.environ.get("NHL_DUCKDB_MEMORY_LIMIT")
+    if not memory_limit:
+        limits = [b for b in (_host_memory_bytes(), _cgroup_memory_bytes()) if b]
+        if limits:
+            memory_limit = f"{int(min(limits) * DUCKDB_MEMORY_FRACTION / 2**20)}MB"
+    threads = os.environ.get("NHL_DUCKDB_THREADS")
+    return {
+        "memory_limit": memory_limit,
+        "threads": int(threads) if threads else _available_cpus(),
+        "temp_directory": os.environ.get("NHL_DUCKDB_TEMP_DIR", DUCKDB_TEMP_DIR)
+    }
+
+def get_db_connection(db_path: str = DEFAULT_DB_PATH, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+    """
+    Opens a DuckDB connection to db_path, sized by resolve_duckdb_settings(). Every call
+    returns a new connection that the caller owns and closes; connections to one file in
+    a process share DuckDB's database instance. Pure readers pass read_only=True so they
+    can run alongside each other; if this process already has the file open read-write
+    (DuckDB refuses mixed configurations), the reader gets a read-write connection instead.
+    """
+    if read_only:
+        try:
+            con = duckdb.connect(db_path, read_only=True)
+        except duckdb.ConnectionException:
+            logger.info(f"{db_path} is open read-write in this process; sharing it for a read-only caller.")
+            con = duckdb.connect(db_path)
+            read_only = False
+    else:
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        con = duckdb.connect(db_path)
+    
+    settings = resolve_duckdb_settings()
+    if settings["memory_limit"]:
+        con.execute(f"SET memory_limit = '{settings['memory_limit']}'")
+    con.execute(f"SET threads = {int(settings['threads'])}")
+    con.execute(f"SET temp_directory = '{settings['temp_directory']}'")
+    logger.info(
+        f"DuckDB {db_path} ({'read-only' if read_only else 'read-write'}): "
+        f"memory_limit={settings['memory_limit'] or 'duckdb default'}, threads={settings['threads']}, "
+        f"temp_directory={settings['temp_directory']}"
+    )
     return con
@@ -0,0 +1,136 @@
+import glob
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import duckdb
+
+from nhl_bets.common.db_init import DEFAULT_DB_PATH, _create_prop_odds_asof_macro, get_db_connection
+from nhl_bets.common.odds_lake import sql_literal
+
+logger = logging.getLogger(__name__)
+
+# DuckDB allows a single writer per database file. Writers publish a consistent
+# copy after each successful stage; readers open the copy named by the pointer:
+#   <db dir>/replicas/<db stem>/replica-<utc ts>-<id>.duckdb
+#   <db dir>/replicas/<db stem>/CURRENT   (file name of the latest replica)
+REPLICA_POINTER = "CURRENT"
+REPLICA_KEEP = 3
+
+# Tables readers open through get_replica_connection. Raw payload, manifest and
+# watermark tables stay in the primary only.
+ODDS_REPLICA_TABLES = (
+    "fact_prop_odds_latest", "fact_prop_consensus", "dim_players_mapping", "dim_events_mapping",
+    "odds_keyframes", "fact_prop_odds_removals",
+)
+REPLICA_TABLES = ODDS_REPLICA_TABLES + (
+    # MoneyPuck facts and features (projections, evaluators, experiments)
+    "dim_players", "dim_games", "fact_skater_game_situation", "fact_goalie_game_situation", "fact_skater_game_all",
+    "fact_player_game_features", "fact_team_defense_features", "fact_goalie_features",
+    # Model outputs and backtests, each also published by the stage that writes it
+    "fact_probabilities", "fact_probabilities_calibrated", "fact_calibration_dataset", "fact_backtest_bets",
+    "fact_backtest_bets_baseline", "fact_backtest_bets_calibrated",
+)
+
+def replica_dir_for(db_path: str) -> str:
+    db_dir, db_file = os.path.split(os.path.abspath(db_path))
+    return os.path.join(db_dir, "replicas", os.path.splitext(db_file)[0])
+
+def latest_replica_path(db_path: str = DEFAULT_DB_PATH, replica_dir: Optional[str] = None) -> Optional[str]:
+    """Path of the latest published replica, or None if nothing has been published."""
+    replica_dir = replica_dir or replica_dir_for(db_path)
+    try:
+        with open(os.path.join(replica_dir, REPLICA_POINTER), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(replica_dir, name)
+    return path if name and os.path.exists(path) else None
+
+def publish_replica(con: duckdb.DuckDBPyConnection, db_path: str = DEFAULT_DB_PATH,
+                    replica_dir: Optional[str] = None, keep: int = REPLICA_KEEP,
+                    tables: Optional[tuple] = None) -> str:
+    """
+    Copies the reader tables (REPLICA_TABLES) of the database behind the writer
+    connection con into a new replica file, then swaps the pointer to it. With
+    tables, only those are copied from con and the rest is carried over from the
+    previous replica (the odds stages pass ODDS_REPLICA_TABLES). The copy runs in one
+    transaction, so it never contains a half-finished stage; readers see either the
+    old or the new replica. Older replicas beyond keep are removed. Returns the new
+    replica path.
+
+    The replica's fact_prop_odds view reads the live odds lake, so odds history is
+    not pinned to the publish: it can include captures newer than the replica's
+    latest/consensus tables. Lake files are only ever renamed into place, so a
+    reader never sees a partial file.
+    """
+    replica_dir = replica_dir or replica_dir_for(db_path)
+    os.makedirs(replica_dir, exist_ok=True)
+    previous = latest_replica_path(db_path, replica_dir)
+    if tables is None or previous is None:
+        tables = REPLICA_TABLES
+
+    # 1. Copy the reader tables into a fresh file (or a copy of the previous replica)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = os.path.join(replica_dir, f"replica-{stamp}-{uuid.uuid4().hex[:8]}.duckdb")
+    if tables is not REPLICA_TABLES:
+        shutil.copyfile(previous, path)
+    source = con.execute("SELECT current_database()").fetchone()[0]
+    existing = {name for (name,) in con.execute(
+        "SELECT table_name FROM duckdb_tables() WHERE database_name = ? AND schema_name = 'main'", [source]
+    ).fetchall()}
+    views = con.execute(
+        "SELECT sql FROM duckdb_views() WHERE database_name = ? AND schema_name = 'main' AND NOT internal "
+        "AND view_name = 'fact_prop_odds'", [source]
+    ).fetchall()
+    con.execute(f"ATTACH {sql_literal(path)} AS replica_publish")
+    try:
+        con.begin()
+        for table in tables:
+            if table in existing:
+                con.execute(f'CREATE OR REPLACE TABLE replica_publish.main."{table}" AS SELECT * FROM "{source}".main."{table}"')
+        con.commit()
+    except Exception:
+        con.rollback()
+        con.execute("DETACH replica_publish")
+        os.remove(path)
+        raise
+    con.execute("DETACH replica_publish")
+
+    # Odds history view and the as-of macro, recreated in the replica's own catalog
+    if views:
+        replica = duckdb.connect(path)
+        try:
+            replica.execute(views[0][0].replace("CREATE VIEW", "CREATE OR REPLACE VIEW", 1))
+            _create_prop_odds_asof_macro(replica)
+        finally:
+            replica.close()
+
+    # 2. Atomic pointer swap
+    pointer = os.path.join(replica_dir, REPLICA_POINTER)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(path))
+    os.replace(pointer + ".tmp", pointer)
+    logger.info(f"Published replica {path}")
+
+    # 3. Retire old replicas (readers that still have one open keep their handle on POSIX)
+    for old in sorted(glob.glob(os.path.join(replica_dir, "replica-*.duckdb")))[:-keep]:
+        try:
+            os.remove(old)
+        except OSError as e:
+            logger.warning(f"Could not remove old replica {old}: {e}")
+    return path
+
+def get_replica_connection(db_path: str = DEFAULT_DB_PATH, replica_dir: Optional[str] = None) -> duckdb.DuckDBPyConnection:
+    """
+    Read-only connection to the latest published replica of db_path, so analytics never
+    contend with a running ingest. Falls back to the primary file if none is published.
+    """
+    path = latest_replica_path(db_path, replica_dir)
+    if path is None:
+        logger.warning(f"No published replica for {db_path}; reading the primary database")
+        path = db_path
+    return get_db_connection(path, read_only=True)
@@ -0,0 +1,142 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+import duckdb
+
+# Feature tables are window queries over a per-game source table, described by a spec dict:
+#   table       feature table name
+#   source      source table the query reads ({source} in select_sql and rows_sql)
+#   select_sql  SELECT producing every feature row (no season filter)
+#   rows_sql    one row per feature row: keys, game_date, season and the window partition columns
+#   keys        columns identifying a feature row
+#   order       window ORDER BY (must be total, so results do not depend on row placement)
+#   windows     [(partition column, rows preceding)] for the bounded frames
+#   season_to_date  True if some frame runs from the start of the season
+
+def _season_filter(start_season: Optional[int], end_season: Optional[int]) -> str:
+    season_filter = ""
+    if start_season:
+        season_filter += f" AND season >= {start_season}"
+    if end_season:
+        season_filter += f" AND season <= {end_season}"
+    return season_filter
+
+def _select(spec: dict, source: str, start_season: Optional[int], end_season: Optional[int]) -> str:
+    return f"SELECT * FROM ({spec['select_sql'].format(source=source)}) WHERE 1=1 {_season_filter(start_season, end_season)}"
+
+def rebuild_features(con: duckdb.DuckDBPyConnection, spec: dict, start_season: Optional[int] = None,
+                     end_season: Optional[int] = None) -> int:
+    """Full build over the whole source history. Returns the row count."""
+    con.execute(f"CREATE OR REPLACE TABLE {spec['table']} AS {_select(spec, spec['source'], start_season, end_season)}")
+    return con.execute(f"SELECT count(*) FROM {spec['table']}").fetchone()[0]
+
+def _context_start(con: duckdb.DuckDBPyConnection, spec: dict, new_from: datetime) -> datetime:
+    """
+    Earliest game_date any recomputed row (game_date >= new_from) can see through
+    its windows: for each partition, the row `preceding` rows before its first
+    recomputed row; with season_to_date, the first game of that season.
+    """
+    starts = [new_from]
+    if spec.get("season_to_date"):
+        starts.append(con.execute("""
+        SELECT min(game_date) FROM feat_rows WHERE season = (SELECT min(season) FROM feat_rows WHERE game_date >= ?)
+        """, [new_from]).fetchone()[0])
+    for column, preceding in spec["windows"]:
+        starts.append(con.execute(f"""
+        WITH ranked AS (
+            SELECT {column}, game_date, row_number() OVER (PARTITION BY {column} ORDER BY {spec['order']}) as rn
+            FROM feat_rows
+            WHERE {column} IN (SELECT {column} FROM feat_rows WHERE game_date >= $1)
+        ),
+        first_new AS (
+            SELECT {column}, min(rn) as rn FROM ranked WHERE game_date >= $1 GROUP BY {column}
+        )
+        SELECT min(r.game_date) FROM ranked r JOIN first_new f USING ({column}) WHERE r.rn >= f.rn - {preceding}
+        """, [new_from]).fetchone()[0])
+    return min(s for s in starts if s is not None)
+
+def update_features(con: duckdb.DuckDBPyConnection, spec: dict, start_season: Optional[int] = None,
+                    end_season: Optional[int] = None, since: Optional[datetime] = None) -> Dict[str, object]:
+    """
+    Incremental maintenance: finds source rows with no feature row yet, recomputes
+    every feature row dated on or after the earliest of them (or since, the earliest
+    game_date whose source rows were corrected in place) from only the source rows
+    their windows reach, and replaces those rows. Builds the table if missing.
+    Returns {"new_from", "context_from", "context_rows", "rows"}.
+    """
+    table, keys = spec["table"], spec["keys"]
+    if con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]).fetchone()[0] == 0:
+        rows = rebuild_features(con, spec, start_season, end_season)
+        return {"new_from": None, "context_from": None, "context_rows": None, "rows": rows}
+
+    # 1. Earliest game without features, or with corrected source rows
+    con.execute(f"CREATE OR REPLACE TEMP TABLE feat_rows AS {spec['rows_sql'].format(source=spec['source'])}")
+    match = " AND ".join(f"f.{k} = r.{k}" for k in keys)
+    new_from = con.execute(f"""
+    SELECT min(game_date) FROM feat_rows r
+    WHERE (NOT EXISTS (SELECT 1 FROM {table} f WHERE {match}) OR game_date >= ?) {_season_filter(start_season, end_season)}
+    """, [since]).fetchone()[0]
+    if new_from is None:
+        con.execute("DROP TABLE feat_rows")
+        return {"new_from": None, "context_from": None, "context_rows": 0, "rows": 0}
+
+    # 2. Source rows the recomputed windows need, and nothing earlier
+    context_from = _context_start(con, spec, new_from)
+    con.execute("DROP TABLE feat_rows")
+    con.execute(f"CREATE OR REPLACE TEMP TABLE feat_context AS SELECT * FROM {spec['source']} WHERE game_date >= ?",
+                [context_from])
+    context_rows = con.execute("SELECT count(*) FROM feat_context").fetchone()[0]
+    con.execute(f"""
+    CREATE OR REPLACE TEMP TABLE feat_new AS
+    SELECT * FROM ({_select(spec, 'feat_context', start_season, end_season)}) WHERE game_date >= ?
+    """, [new_from])
+
+    # 3. Replace everything from new_from on
+    con.begin()
+    try:
+        con.execute(f"DELETE FROM {table} WHERE game_date >= ?", [new_from])
+        con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM feat_new")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    rows = con.execute("SELECT count(*) FROM feat_new").fetchone()[0]
+    con.execute("DROP TABLE feat_context")
+    con.execute("DROP TABLE feat_new")
+    return {"new_from": new_from, "context_from": context_from, "context_rows": context_rows, "rows": rows}
+
+def diff_features(con: duckdb.DuckDBPyConnection, spec: dict, start_season: Optional[int] = None,
+                  end_season: Optional[int] = None, tolerance: float = 1e-9) -> Dict[str, object]:
+    """
+    Compares the stored feature table with a full rebuild (not persisted). Floating
+    columns match within a relative tolerance, since window sums over a shorter
+    context can differ in the last bits. Returns {"rows", "missing", "extra",
+    "mismatched": {column: rows}}.
+    """
+    table, keys = spec["table"], spec["keys"]
+    con.execute(f"CREATE OR REPLACE TEMP TABLE feat_expected AS {_select(spec, spec['source'], start_season, end_season)}")
+    columns = con.execute("SELECT column_name, data_type FROM information_schema.columns "
+                          "WHERE table_name = 'feat_expected' ORDER BY ordinal_position").fetchall()
+    on = " AND ".join(f"e.{k} = a.{k}" for k in keys)
+
+    checks = []
+    for name, data_type in columns:
+        if name in keys:
+            continue
+        e, a = f'e."{name}"', f'a."{name}"'
+        if data_type in ("DOUBLE", "FLOAT", "REAL") or data_type.startswith("DECIMAL"):
+            same = f"({e} IS NOT DISTINCT FROM {a} OR abs({e} - {a}) <= {tolerance} * greatest(1, abs({e})))"
+        else:
+            same = f"{e} IS NOT DISTINCT FROM {a}"
+        checks.append((name, f"count(*) FILTER (WHERE NOT {same})"))
+
+    rows, missing, extra = con.execute(f"""
+    SELECT
+        (SELECT count(*) FROM feat_expected),
+        (SELECT count(*) FROM feat_expected e WHERE NOT EXISTS (SELECT 1 FROM {table} a WHERE {on})),
+        (SELECT count(*) FROM {table} a WHERE NOT EXISTS (SELECT 1 FROM feat_expected e WHERE {on}))
+    """).fetchone()
+    counts = con.execute(f"SELECT {', '.join(check for _, check in checks)} FROM feat_expected e JOIN {table} a ON {on}").fetchone()
+    con.execute("DROP TABLE feat_expected")
+    mismatched = {name: n for (name, _), n in zip(checks, counts) if n}
+    return {"rows": rows, "missing": missing, "extra": extra, "mismatched": mismatched}
@@ -0,0 +1,403 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+INGEST_MANIFEST_TABLE = "moneypuck_ingest_manifest"
+# Typed Parquet copies of the CSVs: files/<season>/<type>/<group>/<team>.parquet, compacted to seasons/<group>/.
+# Each staged file has a <file>.json sidecar: the CSV hash/stat it was staged from, or the season file's sources.
+STAGING_ROOT = os.path.join("data", "staging", "moneypuck")
+
+# The MoneyPuck CSV columns we keep, with their types; every other column is skipped unparsed
+SKATER_CSV_TYPES = {
+    "playerId": "BIGINT", "gameId": "BIGINT", "gameDate": "VARCHAR", "playerTeam": "VARCHAR",
+    "opposingTeam": "VARCHAR", "home_or_away": "VARCHAR", "position": "VARCHAR", "situation": "VARCHAR",
+    "icetime": "DOUBLE", "I_F_goals": "DOUBLE", "I_F_primaryAssists": "DOUBLE", "I_F_secondaryAssists": "DOUBLE",
+    "I_F_points": "DOUBLE", "I_F_shotsOnGoal": "DOUBLE", "shotsBlockedByPlayer": "DOUBLE",
+    "I_F_shotAttempts": "DOUBLE", "I_F_hits": "DOUBLE", "I_F_takeaways": "DOUBLE", "I_F_giveaways": "DOUBLE",
+    "I_F_dZoneGiveaways": "DOUBLE", "I_F_xGoals": "DOUBLE", "OnIce_F_xGoals": "DOUBLE", "OnIce_F_goals": "DOUBLE"
+}
+GOALIE_CSV_TYPES = {
+    "playerId": "BIGINT", "gameId": "BIGINT", "gameDate": "VARCHAR", "playerTeam": "VARCHAR",
+    "opposingTeam": "VARCHAR", "home_or_away": "VARCHAR", "situation": "VARCHAR", "icetime": "DOUBLE",
+    "ongoal": "DOUBLE", "goals": "DOUBLE", "xGoals": "DOUBLE"
+}
+
+SKATER_COLUMNS = """
+    playerId as player_id,
+    gameId as game_id,
+    strptime(CAST(gameDate AS VARCHAR), '%Y%m%d') as game_date,
+    CAST(gameId / 1000000 AS INTEGER) as season,
+    playerTeam as team,
+    opposingTeam as opp_team,
+    home_or_away,
+    position,
+    situation,
+    icetime as toi_seconds,
+    I_F_goals as goals,
+    I_F_primaryAssists as primary_assists,
+    I_F_secondaryAssists as secondary_assists,
+    I_F_points as points,
+    I_F_shotsOnGoal as sog,
+    shotsBlockedByPlayer as blocks,
+    I_F_shotAttempts as shot_attempts,
+    I_F_hits as hits,
+    I_F_takeaways as takeaways,
+    I_F_giveaways as giveaways,
+    I_F_dZoneGiveaways as d_zone_giveaways,
+    I_F_xGoals as x_goals,
+    OnIce_F_xGoals as on_ice_xgoals,
+    OnIce_F_goals as on_ice_goals
+"""
+
+GOALIE_COLUMNS = """
+    playerId as player_id,
+    gameId as game_id,
+    strptime(CAST(gameDate AS VARCHAR), '%Y%m%d') as game_date,
+    CAST(gameId / 1000000 AS INTEGER) as season,
+    playerTeam as team,
+    opposingTeam as opp_team,
+    home_or_away,
+    situation,
+    icetime as toi_seconds,
+    ongoal as shots_against,
+    goals as goals_against,
+    xGoals as x_goals_against
+"""
+
+# group -> (situation fact table, projection of the MoneyPuck CSV columns, CSV column types)
+GROUP_TABLES = {
+    "skaters": ("fact_skater_game_situation", SKATER_COLUMNS, SKATER_CSV_TYPES),
+    "goalies": ("fact_goalie_game_situation", GOALIE_COLUMNS, GOALIE_CSV_TYPES)
+}
+
+def table_exists(con: duckdb.DuckDBPyConnection, table: str) -> bool:
+    return con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]).fetchone()[0] > 0
+
+def init_ingest_manifest(con: duckdb.DuckDBPyConnection):
+    """One row per ingested CSV: path relative to the data root, size, mtime, content hash, rows read."""
+    con.execute(f"""
+    CREATE TABLE IF NOT EXISTS {INGEST_MANIFEST_TABLE} (
+        file_path VARCHAR PRIMARY KEY,
+        player_group VARCHAR,
+        size_bytes BIGINT,
+        mtime TIMESTAMP,
+        sha256 VARCHAR,
+        row_count BIGINT,
+        ingested_at TIMESTAMP
+    )
+    """)
+
+def list_group_files(data_root: str, start_season: int, end_season: int, season_type: str, group: str) -> List[str]:
+    files = []
+    for season in range(start_season, end_season + 1):
+        season_path = Path(data_root) / str(season) / season_type / group
+        if season_path.exists():
+            files.extend(str(f).replace('\\', '/') for f in sorted(season_path.glob("*.csv")))
+        else:
+            logger.warning(f"Season path not found: {season_path}")
+    return files
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _sql_path(path: str) -> str:
+    return path.replace('\\', '/')
+
+def _csv_source(path: str, csv_types: Dict[str, str]) -> str:
+    """
+    read_csv over one CSV with every column declared from its header (no type
+    sniffing). Kept columns get their types, the rest stay VARCHAR and are never
+    converted; kept columns missing from the file read as NULL.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    kept = ", ".join(f'"{c}"' if c in header else f'CAST(NULL AS {t}) AS "{c}"' for c, t in csv_types.items())
+    if not header:
+        return f"(SELECT {kept} WHERE false)"
+    columns = {name: csv_types.get(name, "VARCHAR") for name in header}
+    return f"(SELECT {kept} FROM read_csv('{_sql_path(path)}', header=true, auto_detect=false, delim=',', columns={columns!r}))"
+
+def staged_file_path(staging_root: str, rel_path: str) -> str:
+    return os.path.join(staging_root, "files", os.path.splitext(rel_path)[0] + ".parquet")
+
+def staged_season_path(staging_root: str, group: str, season: str, season_type: str) -> str:
+    return os.path.join(staging_root, "seasons", group, f"{season}_{season_type}.parquet")
+
+def _read_sidecar(target: str) -> Optional[dict]:
+    try:
+        with open(f"{target}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_sidecar(target: str, data: dict):
+    tmp_path = f"{target}.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, f"{target}.json")
+
+def _copy_to_parquet(con: duckdb.DuckDBPyConnection, query: str, target: str):
+    """COPY to a temp file, then rename into place."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.tmp"
+    con.execute(f"COPY ({query}) TO '{_sql_path(tmp_path)}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    os.replace(tmp_path, target)
+
+def stage_group_files(con: duckdb.DuckDBPyConnection, data_root: str, staging_root: str, group: str,
+                      files: List[str]) -> Dict[str, str]:
+    """
+    Converts each CSV into a typed Parquet file in the fact-table shape unless its
+    staged copy was made from the same content: the sidecar's size/mtime are checked
+    first and only CSVs that differ there are hashed, so a re-downloaded file with the
+    same bytes is not parsed again. Then rewrites the per-season compacted file of
+    every season whose CSV set or content changed, from exactly the given files (a
+    deleted CSV's leftover Parquet is not included). Returns {csv path: staged path}.
+    """
+    _, columns, csv_types = GROUP_TABLES[group]
+    staged, season_sources, restaged = {}, {}, 0
+    for path in files:
+        rel_path = os.path.relpath(path, data_root).replace('\\', '/')
+        season, season_type = rel_path.split("/")[:2]
+        target = staged_file_path(staging_root, rel_path)
+        stat = os.stat(path)
+        source = {"size_bytes": stat.st_size, "mtime": stat.st_mtime}
+        previous = _read_sidecar(target) if os.path.exists(target) else None
+        if previous and (previous["size_bytes"], previous["mtime"]) == (source["size_bytes"], source["mtime"]):
+            source["sha256"] = previous["sha256"]
+        else:
+            source["sha256"] = _file_sha256(path)
+            if not previous or previous["sha256"] != source["sha256"]:
+                _copy_to_parquet(con, f"SELECT {columns} FROM {_csv_source(path, csv_types)}", target)
+                restaged += 1
+            _write_sidecar(target, source)
+        staged[path] = target
+        season_sources.setdefault((season, season_type), []).append([rel_path, source["sha256"]])
+    if restaged:
+        logger.info(f"Staged {group}: {restaged} CSVs parsed.")
+
+    # Season files are rebuilt from the per-file Parquet, never from the CSVs
+    for (season, season_type), sources in sorted(season_sources.items()):
+        target = staged_season_path(staging_root, group, season, season_type)
+        sources = sorted(sources)
+        if not os.path.exists(target) or (_read_sidecar(target) or {}).get("sources") != sources:
+            parts = [_sql_path(staged_file_path(staging_root, rel_path)) for rel_path, _ in sources]
+            _copy_to_parquet(con, f"SELECT * FROM read_parquet({parts}) ORDER BY game_id, player_id", target)
+            _write_sidecar(target, {"sources": sources})
+    return staged
+
+def changed_files(con: duckdb.DuckDBPyConnection, data_root: str, files: List[str]) -> List[dict]:
+    """
+    Files that are new or whose content changed since they were ingested. Size and
+    mtime are checked first; only files that differ there are hashed, and a file
+    whose hash is unchanged (re-downloaded, same bytes) only has its manifest row
+    refreshed.
+    """
+    init_ingest_manifest(con)
+    known = {row[0]: row[1:] for row in con.execute(
+        f"SELECT file_path, size_bytes, mtime, sha256 FROM {INGEST_MANIFEST_TABLE}").fetchall()}
+    changed, touched = [], []
+    for path in files:
+        stat = os.stat(path)
+        info = {
+            "path": path,
+            "rel_path": os.path.relpath(path, data_root).replace('\\', '/'),
+            "size_bytes": stat.st_size,
+            "mtime": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).replace(tzinfo=None)
+        }
+        previous = known.get(info["rel_path"])
+        if previous and previous[:2] == (info["size_bytes"], info["mtime"]):
+            continue
+        info["sha256"] = _file_sha256(path)
+        (touched if previous and previous[2] == info["sha256"] else changed).append(info)
+
+    if touched:
+        con.executemany(f"UPDATE {INGEST_MANIFEST_TABLE} SET size_bytes = ?, mtime = ? WHERE file_path = ?",
+                        [[f["size_bytes"], f["mtime"], f["rel_path"]] for f in touched])
+    return changed
+
+def _changed_from(con: duckdb.DuckDBPyConnection, table: str) -> Optional[datetime]:
+    """
+    Earliest game_date whose rows differ between stg_moneypuck and the table rows
+    for the same (player_id, game_id) keys: new, corrected or dropped rows. A
+    re-downloaded season file reloads every game in it, mostly unchanged.
+    """
+    if not table_exists(con, table):
+        return con.execute("SELECT min(game_date) FROM stg_moneypuck").fetchone()[0]
+    columns = ", ".join(f'"{c[0]}"' for c in con.execute("DESCRIBE stg_moneypuck").fetchall())
+    return con.execute(f"""
+    WITH current_rows AS (
+        SELECT {columns} FROM {table} t
+        WHERE EXISTS (SELECT 1 FROM stg_moneypuck k WHERE t.player_id = k.player_id AND t.game_id = k.game_id)
+    ),
+    changed AS (
+        (SELECT {columns} FROM stg_moneypuck EXCEPT SELECT * FROM current_rows)
+        UNION ALL
+        (SELECT * FROM current_rows EXCEPT SELECT {columns} FROM stg_moneypuck)
+    )
+    SELECT min(game_date) FROM changed
+    """).fetchone()[0]
+
+def load_group_files(con: duckdb.DuckDBPyConnection, group: str, files: List[dict],
+                     sources: List[str]) -> Tuple[int, List[int], Optional[datetime]]:
+    """
+    Loads staged Parquet (sources) for the given CSVs of one group (skaters/goalies)
+    into its situation table: created from them if missing, otherwise the
+    (player_id, game_id) keys they contain are replaced. Records the files, with
+    their staged row counts, in the manifest. Returns (rows read, game_ids touched,
+    earliest game_date whose rows changed).
+    """
+    table = GROUP_TABLES[group][0]
+    init_ingest_manifest(con)
+
+    # 1. Stage
+    con.execute(f"CREATE OR REPLACE TEMP TABLE stg_moneypuck AS SELECT * FROM read_parquet({[_sql_path(p) for p in sources]})")
+    rows = con.execute("SELECT count(*) FROM stg_moneypuck").fetchone()[0]
+    game_ids = [r[0] for r in con.execute("SELECT DISTINCT game_id FROM stg_moneypuck ORDER BY game_id").fetchall()]
+    per_file = dict(con.execute(f"""
+    SELECT file_name, sum(row_group_num_rows) FROM parquet_metadata({[_sql_path(f["staged_path"]) for f in files]})
+    WHERE column_id = 0 GROUP BY file_name
+    """).fetchall())
+    changed_from = _changed_from(con, table)
+
+    # 2. Replace the affected (player, game) rows and record the files, atomically
+    con.begin()
+    try:
+        if not table_exists(con, table):
+            con.execute(f"CREATE TABLE {table} AS SELECT * FROM stg_moneypuck")
+        else:
+            con.execute(f"""
+            DELETE FROM {table} t USING (SELECT DISTINCT player_id, game_id FROM stg_moneypuck) k
+            WHERE t.player_id = k.player_id AND t.game_id = k.game_id
+            """)
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM stg_moneypuck")
+        ingested_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        con.executemany(f"""
+        INSERT OR REPLACE INTO {INGEST_MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [[f["rel_path"], group, f["size_bytes"], f["mtime"], f["sha256"],
+               per_file.get(_sql_path(f["staged_path"]), 0), ingested_at] for f in files])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.execute("DROP TABLE IF EXISTS stg_moneypuck")
+    return rows, game_ids, changed_from
+
+def _refresh_by_game(con: duckdb.DuckDBPyConnection, table: str, select_sql: str, game_ids: Optional[List[int]]):
+    """Creates table from select_sql, or replaces just the rows of game_ids (select_sql filters on touched_games)."""
+    if game_ids is not None and not game_ids and table_exists(con, table):
+        return
+    if not table_exists(con, table) or game_ids is None:
+        con.execute("CREATE OR REPLACE TEMP TABLE touched_games AS SELECT DISTINCT game_id FROM fact_skater_game_situation")
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS {select_sql}")
+    else:
+        con.execute("CREATE OR REPLACE TEMP TABLE touched_games (game_id BIGINT)")
+        con.executemany("INSERT INTO touched_games VALUES (?)", [[g] for g in game_ids])
+        con.begin()
+        try:
+            con.execute(f"DELETE FROM {table} WHERE game_id IN (SELECT game_id FROM touched_games)")
+            con.execute(f"INSERT INTO {table} BY NAME {select_sql}")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+    con.execute("DROP TABLE touched_games")
+
+def refresh_skater_game_all(con: duckdb.DuckDBPyConnection, game_ids: Optional[List[int]] = None):
+    """fact_skater_game_all (one 'all' row per player-game with PP/EV TOI); game_ids=None rebuilds it."""
+    _refresh_by_game(con, "fact_skater_game_all", """
+    WITH situations AS (
+        SELECT * FROM fact_skater_game_situation WHERE game_id IN (SELECT game_id FROM touched_games)
+    ),
+    all_situations AS (
+        SELECT * FROM situations WHERE situation = 'all'
+    ),
+    pp_toi AS (
+        SELECT player_id, game_id, toi_seconds as pp_toi_seconds
+        FROM situations
+        WHERE situation = '5on4'
+    ),
+    ev_toi AS (
+        SELECT player_id, game_id, toi_seconds as ev_toi_seconds
+        FROM situations
+        WHERE situation = '5on5'
+    )
+    SELECT
+        a.player_id,
+        a.game_id,
+        a.game_date,
+        a.season,
+        a.team,
+        a.opp_team,
+        a.home_or_away,
+        a.position,
+        a.goals,
+        COALESCE(a.primary_assists + a.secondary_assists, a.points - a.goals) as assists,
+        a.points,
+        a.sog,
+        a.blocks,
+        a.toi_seconds,
+        a.toi_seconds / 60.0 as toi_minutes,
+        COALESCE(p.pp_toi_seconds, 0) as pp_toi_seconds,
+        COALESCE(e.ev_toi_seconds, 0) as ev_toi_seconds,
+        a.x_goals,
+        a.shot_attempts,
+        a.hits
+    FROM all_situations a
+    LEFT JOIN pp_toi p ON a.player_id = p.player_id AND a.game_id = p.game_id
+    LEFT JOIN ev_toi e ON a.player_id = e.player_id AND a.game_id = e.game_id
+    """, game_ids)
+
+def refresh_dim_games(con: duckdb.DuckDBPyConnection, game_ids: Optional[List[int]] = None):
+    """dim_games derived from the skater 'all' rows; game_ids=None rebuilds it."""
+    _refresh_by_game(con, "dim_games", """
+    SELECT
+        game_id,
+        MIN(game_date) as game_date,
+        MIN(season) as season,
+        MIN(CASE WHEN home_or_away = 'HOME' THEN team ELSE opp_team END) as home_team,
+        MIN(CASE WHEN home_or_away = 'AWAY' THEN team ELSE opp_team END) as away_team
+    FROM fact_skater_game_situation
+    WHERE situation = 'all' AND game_id IN (SELECT game_id FROM touched_games)
+    GROUP BY game_id
+    """, game_ids)
+
+def ingest_group(con: duckdb.DuckDBPyConnection, data_root: str, group: str, files: List[str],
+                 incremental: bool, staging_root: str = STAGING_ROOT) -> Dict[str, object]:
+    """
+    Stages the group's CSVs as typed Parquet, then loads either everything (from
+    the per-season compacted files) or, with incremental, only the files that are
+    new or changed per the manifest. Returns {"files", "rows", "game_ids",
+    "changed_from"}: changed_from is the earliest game_date whose rows differ from
+    what was loaded before, so features can be recomputed from there.
+    """
+    staged = stage_group_files(con, data_root, staging_root, group, files)
+    if incremental:
+        selected = changed_files(con, data_root, files)
+        sources = [staged[f["path"]] for f in selected]
+    else:
+        selected = [{"path": path, "rel_path": os.path.relpath(path, data_root).replace('\\', '/'),
+                     "size_bytes": os.path.getsize(path), "sha256": _file_sha256(path),
+                     "mtime": datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).replace(tzinfo=None)}
+                    for path in files]
+        season_dirs = sorted({tuple(f["rel_path"].split("/")[:2]) for f in selected})
+        sources = [staged_season_path(staging_root, group, season, season_type) for season, season_type in season_dirs]
+    if not selected:
+        return {"files": 0, "rows": 0, "game_ids": [], "changed_from": None}
+    for f in selected:
+        f["staged_path"] = staged[f["path"]]
+    rows, game_ids, changed_from = load_group_files(con, group, selected, sources)
+    return {"files": len(selected), "rows": rows, "game_ids": game_ids, "changed_from": changed_from}
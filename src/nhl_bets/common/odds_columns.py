@@ -0,0 +1,121 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import pyarrow as pa
+
+from nhl_bets.common.storage import _ROW_KEY_SEP, _row_key_part
+
+# Arrow twin of db_init.FACT_PROP_ODDS_COLUMNS (same names, order and types)
+FACT_PROP_ODDS_SCHEMA = pa.schema([
+    ("source_vendor", pa.string()),
+    ("capture_ts_utc", pa.timestamp("us")),
+    ("event_id_vendor", pa.string()),
+    ("event_name_raw", pa.string()),
+    ("event_start_ts_utc", pa.timestamp("us")),
+    ("home_team", pa.string()),
+    ("away_team", pa.string()),
+    ("player_id_vendor", pa.string()),
+    ("player_name_raw", pa.string()),
+    ("market_type", pa.string()),
+    ("line", pa.float64()),
+    ("side", pa.string()),
+    ("book_id_vendor", pa.string()),
+    ("book_name_raw", pa.string()),
+    ("odds_american", pa.int32()),
+    ("odds_decimal", pa.float64()),
+    ("is_live", pa.bool_()),
+    ("raw_payload_path", pa.string()),
+    ("raw_payload_hash", pa.string()),
+    ("row_key", pa.uint64())
+])
+# Same for every row of one payload; stored once and broadcast by to_table()
+PAYLOAD_COLUMNS = ("source_vendor", "capture_ts_utc", "raw_payload_path", "raw_payload_hash")
+ROW_COLUMNS = tuple(name for name in FACT_PROP_ODDS_SCHEMA.names if name not in PAYLOAD_COLUMNS + ("row_key",))
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class OddsColumnBuilder:
+    """
+    Collects the normalized odds rows of one raw payload column by column and emits
+    a pyarrow.Table with the fact_prop_odds schema, ready for insert_odds_records.
+    Payload-level values are kept once; row_key is computed as rows are appended
+    (same value as storage.odds_row_key).
+    """
+
+    def __init__(self, vendor: str, capture_ts: datetime, raw_path: str, raw_hash: str):
+        self.vendor = vendor
+        self.capture_ts = _utc_naive(capture_ts)
+        self.raw_path = raw_path
+        self.raw_hash = raw_hash
+        self.columns: Dict[str, list] = {name: [] for name in ROW_COLUMNS}
+        self.row_keys = []
+        # Constant parts of the row-key string, and parsed event starts by raw value
+        self._key_prefix = _ROW_KEY_SEP.join((vendor, _row_key_part("capture_ts_utc", self.capture_ts))) + _ROW_KEY_SEP
+        self._key_suffix = _ROW_KEY_SEP + raw_hash
+        self._event_starts: Dict[Any, Optional[datetime]] = {}
+
+    def __len__(self) -> int:
+        return len(self.row_keys)
+
+    def _event_start(self, value: Any) -> Optional[datetime]:
+        """ISO-8601 string (vendor format) or datetime -> naive UTC."""
+        if value not in self._event_starts:
+            parsed = datetime.fromisoformat(value) if isinstance(value, str) else value
+            self._event_starts[value] = _utc_naive(parsed)
+        return self._event_starts[value]
+
+    def append(self, event_id_vendor: str, event_name_raw: Optional[str], event_start_ts_utc: Any,
+               home_team: Optional[str], away_team: Optional[str], player_id_vendor: Optional[str],
+               player_name_raw: Optional[str], market_type: str, line: float, side: str,
+               book_id_vendor: str, book_name_raw: Optional[str], odds_american: Optional[int],
+               odds_decimal: Optional[float], is_live: bool = False):
+        columns = self.columns
+        columns["event_id_vendor"].append(event_id_vendor)
+        columns["event_name_raw"].append(event_name_raw)
+        columns["event_start_ts_utc"].append(self._event_start(event_start_ts_utc))
+        columns["home_team"].append(home_team)
+        columns["away_team"].append(away_team)
+        columns["player_id_vendor"].append(player_id_vendor)
+        columns["player_name_raw"].append(player_name_raw)
+        columns["market_type"].append(market_type)
+        columns["line"].append(line)
+        columns["side"].append(side)
+        columns["book_id_vendor"].append(book_id_vendor)
+        columns["book_name_raw"].append(book_name_raw)
+        columns["odds_american"].append(odds_american)
+        columns["odds_decimal"].append(odds_decimal)
+        columns["is_live"].append(is_live)
+
+        # Row key over ROW_KEY_FIELDS, with the payload-level parts precomputed
+        raw = self._key_prefix + _ROW_KEY_SEP.join((
+            _row_key_part("event_id_vendor", event_id_vendor),
+            _row_key_part("player_id_vendor", player_id_vendor),
+            _row_key_part("player_name_raw", player_name_raw),
+            _row_key_part("market_type", market_type),
+            _row_key_part("line", line),
+            _row_key_part("side", side),
+            _row_key_part("book_id_vendor", book_id_vendor)
+        )) + self._key_suffix
+        self.row_keys.append(int.from_bytes(hashlib.md5(raw.encode("utf-8")).digest()[:8], "little"))
+
+    def to_table(self) -> pa.Table:
+        n = len(self.row_keys)
+        constants = {
+            "source_vendor": self.vendor,
+            "capture_ts_utc": self.capture_ts,
+            "raw_payload_path": self.raw_path,
+            "raw_payload_hash": self.raw_hash
+        }
+        arrays = []
+        for field in FACT_PROP_ODDS_SCHEMA:
+            if field.name in constants:
+                arrays.append(pa.repeat(pa.scalar(constants[field.name], type=field.type), n))
+            elif field.name == "row_key":
+                arrays.append(pa.array(self.row_keys, type=field.type))
+            else:
+                arrays.append(pa.array(self.columns[field.name], type=field.type))
+        return pa.Table.from_arrays(arrays, schema=FACT_PROP_ODDS_SCHEMA)
@@ -0,0 +1,228 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# Historical odds live outside the DuckDB file as Hive-partitioned Parquet:
+#   <root>/source_vendor=<VENDOR>/capture_date=<YYYY-MM-DD>/<prefix>-<uuid>.parquet
+# Partition columns are encoded in the path only, never inside the files.
+ODDS_LAKE_ROOT = os.path.join("data", "odds_lake")
+PARTITION_COLUMNS = ("source_vendor", "capture_date")
+HIVE_TYPES = "{'source_vendor': VARCHAR, 'capture_date': DATE}"
+
+# Empty, schema-only file so the fact_prop_odds view can bind before the first capture.
+SCHEMA_VENDOR = "_schema"
+SCHEMA_DATE = "1970-01-01"
+
+# Partition rewrites (compaction, row deletes) replace a partition's files with one
+# new file. They hold REWRITE_LOCK (in the root) against each other, and swap files
+# through a journal in the partition directory, so a crash mid-swap is rolled
+# forward by the next rewrite instead of leaving duplicated or missing rows. Readers
+# scanning the live lake at the instant of a swap can miss that partition's rows or
+# fail on a vanished file (retry the query); they never see rows twice.
+REWRITE_LOCK = ".rewrite.lock"
+REWRITE_JOURNAL = ".rewrite.json"
+RETIRED_SUFFIX = ".retired"
+REWRITE_PREFIXES = ("compacted", "rewritten")
+
+def sql_literal(value) -> str:
+    """Quotes a value as a SQL string literal (for COPY, which takes no parameters)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+def partition_dir(root: str, source_vendor: str, capture_date) -> str:
+    return os.path.join(root, f"source_vendor={source_vendor}", f"capture_date={capture_date}")
+
+def partition_files(root: str, source_vendor: str, capture_date) -> List[str]:
+    return sorted(glob.glob(os.path.join(partition_dir(root, source_vendor, capture_date), "*.parquet")))
+
+def lake_scan_sql(root: str) -> str:
+    """
+    read_parquet() expression over the whole lake with Hive partition columns.
+    Files share one column layout; union_by_name is deliberately off because it
+    opens every file at bind time and would defeat partition pruning.
+    """
+    pattern = os.path.join(root, "*", "*", "*.parquet")
+    return f"read_parquet({sql_literal(pattern)}, hive_partitioning = true, hive_types = {HIVE_TYPES})"
+
+def _write_tmp_file(con: duckdb.DuckDBPyConnection, select_sql: str, part_dir: str, prefix: str) -> str:
+    """Writes select_sql to <part_dir>/<prefix>-<uuid>.parquet.tmp; returns the final (unrenamed) path."""
+    os.makedirs(part_dir, exist_ok=True)
+    final_path = os.path.join(part_dir, f"{prefix}-{uuid.uuid4().hex}.parquet")
+    con.execute(f"COPY ({select_sql}) TO {sql_literal(final_path + '.tmp')} (FORMAT PARQUET, COMPRESSION ZSTD)")
+    return final_path
+
+def write_parquet_file(con: duckdb.DuckDBPyConnection, select_sql: str, part_dir: str, prefix: str = "part") -> str:
+    """
+    Writes the result of select_sql to a new file in part_dir. The file is written
+    under a temporary name and renamed, so readers never see a partial file.
+    """
+    final_path = _write_tmp_file(con, select_sql, part_dir, prefix)
+    os.replace(final_path + ".tmp", final_path)
+    return final_path
+
+@contextmanager
+def rewrite_lock(root: str):
+    """Exclusive, cross-process lock for partition rewrites under root (blocks until free)."""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, REWRITE_LOCK), "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _finish_swap(part_dir: str):
+    """Rolls a journaled swap forward: old files retired, new file published, journal removed."""
+    journal = os.path.join(part_dir, REWRITE_JOURNAL)
+    with open(journal, encoding="utf-8") as f:
+        swap = json.load(f)
+    for name in swap["old"]:
+        path = os.path.join(part_dir, name)
+        if os.path.exists(path):
+            os.replace(path, path + RETIRED_SUFFIX)
+    if swap["new"] and os.path.exists(os.path.join(part_dir, swap["new"] + ".tmp")):
+        os.replace(os.path.join(part_dir, swap["new"] + ".tmp"), os.path.join(part_dir, swap["new"]))
+    for name in swap["old"]:
+        if os.path.exists(os.path.join(part_dir, name + RETIRED_SUFFIX)):
+            os.remove(os.path.join(part_dir, name + RETIRED_SUFFIX))
+    os.remove(journal)
+
+def _swap_files(part_dir: str, old_files: List[str], new_path: Optional[str]):
+    """
+    Replaces old_files with new_path (written as new_path + '.tmp'; None to just drop
+    them). The journal is written once the new file is complete, then the swap runs.
+    """
+    journal = os.path.join(part_dir, REWRITE_JOURNAL)
+    with open(journal + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"old": [os.path.basename(p) for p in old_files],
+                   "new": os.path.basename(new_path) if new_path else None}, f)
+    os.replace(journal + ".tmp", journal)
+    _finish_swap(part_dir)
+
+def recover_partition(part_dir: str):
+    """
+    Completes a swap a crashed rewrite left behind and removes the temporary files
+    of rewrites that crashed before their journal (appends' files are left alone).
+    Call under rewrite_lock.
+    """
+    if os.path.exists(os.path.join(part_dir, REWRITE_JOURNAL)):
+        logger.warning(f"Completing an interrupted rewrite in {part_dir}")
+        _finish_swap(part_dir)
+    for prefix in REWRITE_PREFIXES:
+        for path in glob.glob(os.path.join(part_dir, f"{prefix}-*.parquet.tmp")):
+            os.remove(path)
+
+def list_partitions(root: str, source_vendor: Optional[str] = None) -> List[dict]:
+    """Lists data partitions (schema seed excluded) with their files, oldest first."""
+    partitions = []
+    for vendor_dir in sorted(glob.glob(os.path.join(root, "source_vendor=*"))):
+        vendor = os.path.basename(vendor_dir).split("=", 1)[1]
+        if vendor == SCHEMA_VENDOR or (source_vendor and vendor != source_vendor):
+            continue
+        for date_dir in sorted(glob.glob(os.path.join(vendor_dir, "capture_date=*"))):
+            partitions.append({
+                "source_vendor": vendor,
+                "capture_date": os.path.basename(date_dir).split("=", 1)[1],
+                "path": date_dir,
+                "files": sorted(glob.glob(os.path.join(date_dir, "*.parquet")))
+            })
+    return sorted(partitions, key=lambda p: (p["capture_date"], p["source_vendor"]))
+
+def compact_partitions(con: duckdb.DuckDBPyConnection, root: str, before_date: Optional[str] = None,
+                       min_files: int = 2, source_vendor: Optional[str] = None) -> int:
+    """
+    Rewrites every partition older than before_date (default: today, i.e. closed
+    UTC days only) that has at least min_files files into a single file sorted by
+    capture time. Returns the number of partitions compacted.
+    """
+    before_date = before_date or datetime.now(timezone.utc).date().isoformat()
+    compacted = 0
+    with rewrite_lock(root):
+        for part in list_partitions(root, source_vendor):
+            if part["capture_date"] >= before_date:
+                continue
+            recover_partition(part["path"])
+            files = sorted(glob.glob(os.path.join(part["path"], "*.parquet")))
+            if len(files) < min_files:
+                continue
+            # Files hold no partition columns; hive_partitioning off keeps them out of the rewrite
+            file_list = "[" + ", ".join(sql_literal(f) for f in files) + "]"
+            new_path = _write_tmp_file(con, f"""
+                SELECT * FROM read_parquet({file_list}, union_by_name = true, hive_partitioning = false)
+                ORDER BY capture_ts_utc
+            """, part["path"], prefix="compacted")
+            _swap_files(part["path"], files, new_path)
+            compacted += 1
+            logger.info(f"Compacted {len(files)} files in {part['path']}")
+    return compacted
+
+def delete_partition_rows(con: duckdb.DuckDBPyConnection, root: str, source_vendor: str, capture_date,
+                          where_sql: str) -> int:
+    """
+    Rewrites one partition without the rows matching where_sql (over the stored
+    columns): the kept rows are written to a single new file that is swapped in for
+    the old ones, and a partition left empty is removed. Returns the rows deleted.
+    """
+    part_dir = partition_dir(root, source_vendor, capture_date)
+    if not os.path.isdir(part_dir):
+        return 0
+    with rewrite_lock(root):
+        recover_partition(part_dir)
+        files = partition_files(root, source_vendor, capture_date)
+        if not files:
+            return 0
+        scan = ("read_parquet([" + ", ".join(sql_literal(f) for f in files) + "], union_by_name = true, "
+                "hive_partitioning = false)")
+        deleted, kept = con.execute(
+            f"SELECT count(*) FILTER (WHERE {where_sql}), count(*) FILTER (WHERE NOT ({where_sql})) FROM {scan}"
+        ).fetchone()
+        if not deleted:
+            return 0
+        new_path = None
+        if kept:
+            new_path = _write_tmp_file(con, f"SELECT * FROM {scan} WHERE NOT ({where_sql}) ORDER BY capture_ts_utc",
+                                       part_dir, prefix="rewritten")
+        _swap_files(part_dir, files, new_path)
+        if not kept and not os.listdir(part_dir):
+            os.rmdir(part_dir)
+    logger.info(f"Deleted {deleted} rows from {part_dir}")
+    return deleted
+
+def prune_partitions(root: str, before_date: str, source_vendor: Optional[str] = None,
+                     archive_root: Optional[str] = None) -> List[str]:
+    """
+    Removes partitions older than before_date. With archive_root they are moved
+    there (same layout) instead of deleted. Returns the affected partition paths.
+    """
+    pruned = []
+    for part in list_partitions(root, source_vendor):
+        if part["capture_date"] >= before_date:
+            continue
+        if archive_root:
+            target = partition_dir(archive_root, part["source_vendor"], part["capture_date"])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(part["path"], target)
+        else:
+            shutil.rmtree(part["path"])
+        pruned.append(part["path"])
+    logger.info(f"{'Archived' if archive_root else 'Pruned'} {len(pruned)} odds partitions before {before_date}")
+    return pruned
@@ -1,50 +1,214 @@
+import gzip
 import hashlib
 import json
 import os
 import logging
-from datetime import datetime, timezone
-from typing import Tuple, Any, Optional
+import queue
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Tuple, Any, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
 STORAGE_ROOT = "outputs/odds/raw"
 
-def save_raw_payload(vendor: str, payload: Any, extension: str = "json", suffix: Optional[str] = None) -> Tuple[str, str, datetime]:
+# Payload objects are zstd-compressed when the zstandard package is installed, gzip otherwise
+if zstandard is not None:
+    COMPRESSION_SUFFIX = ".zst"
+    _compressed_writer = lambda raw: zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+else:
+    COMPRESSION_SUFFIX = ".gz"
+    _compressed_writer = lambda raw: gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+
+_JSON_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+_CHUNK_BYTES = 1 << 20
+_INDEX_LOCK = threading.Lock()
+
+# fact_prop_odds dedup key. Mirrored in SQL by db_init.ODDS_ROW_KEY_SQL; keep both in sync.
+ROW_KEY_FIELDS = (
+    "source_vendor", "capture_ts_utc", "event_id_vendor", "player_id_vendor", "player_name_raw",
+    "market_type", "line", "side", "book_id_vendor", "raw_payload_hash"
+)
+_ROW_KEY_SEP = "\x1f"
+_EPOCH = datetime(1970, 1, 1)
+
+def _payload_chunks(payload: Any, extension: str) -> Iterator[bytes]:
+    """Serializes a payload incrementally (sorted JSON keys, so equal payloads hash equally)."""
+    if extension == "json":
+        for piece in _JSON_ENCODER.iterencode(payload):
+            yield piece.encode("utf-8")
+    else:
+        content = str(payload).encode("utf-8")
+        for start in range(0, len(content), _CHUNK_BYTES):
+            yield content[start:start + _CHUNK_BYTES]
+
+def _object_path(sha_hash: str, extension: str) -> str:
+    return os.path.join(STORAGE_ROOT, "objects", sha_hash[:2], f"{sha_hash}.{extension}{COMPRESSION_SUFFIX}")
+
+def _append_index(vendor: str, entry: dict):
+    index_dir = os.path.join(STORAGE_ROOT, "index", vendor.upper())
+    os.makedirs(index_dir, exist_ok=True)
+    index_path = os.path.join(index_dir, f"{entry['capture_ts_utc'][:10]}.jsonl")
+    with _INDEX_LOCK, open(index_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+def _prepare_payload(vendor: str, payload: Any, extension: str, suffix: Optional[str],
+                     capture_ts: Optional[datetime] = None) -> dict:
+    """Serializes and hashes a payload in memory; nothing touches the disk yet."""
+    hasher = hashlib.sha256()
+    chunks = []
+    for chunk in _payload_chunks(payload, extension):
+        hasher.update(chunk)
+        chunks.append(chunk)
+    sha_hash = hasher.hexdigest()
+    full_path = _object_path(sha_hash, extension)
+    return {
+        "vendor": vendor,
+        "suffix": suffix,
+        "sha256": sha_hash,
+        "full_path": full_path,
+        "rel_path": os.path.relpath(full_path, start=os.getcwd()),
+        "capture_ts": capture_ts or datetime.now(timezone.utc),
+        "chunks": chunks
+    }
+
+def _store_payload(prepared: dict) -> bool:
     """
-    Saves a raw payload to the local filesystem in a date-partitioned structure.
-    Returns (relative_path, sha256_hash, capture_ts).
+    Writes a prepared payload's object if its content is new (fsync'd temp file + rename),
+    then records the capture in the index. Returns True if the object was written.
     """
-    now = datetime.now(timezone.utc)
-    date_path = now.strftime("%Y/%m/%d")
-    time_prefix = now.strftime("%H%M%S")
-    
-    # Create filename
-    filename = f"{time_prefix}_{vendor.lower()}"
-    if suffix:
-        filename += f"_{suffix}"
-    filename += f".{extension}"
-    
-    dir_path = os.path.join(STORAGE_ROOT, vendor.upper(), date_path)
-    os.makedirs(dir_path, exist_ok=True)
-    
-    full_path = os.path.join(dir_path, filename)
-    rel_path = os.path.relpath(full_path, start=os.getcwd())
-    
-    # Convert payload to string for hashing/saving
-    if extension == "json":
-        content = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    # 1. Object (skipped for content already stored)
+    full_path = prepared["full_path"]
+    is_new = not os.path.exists(full_path)
+    if is_new:
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f"{full_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as raw:
+                with _compressed_writer(raw) as f:
+                    for chunk in prepared["chunks"]:
+                        f.write(chunk)
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
     else:
-        content = str(payload)
-        
-    # Calculate SHA256
-    sha_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        logger.debug(f"{prepared['vendor']}: payload {prepared['sha256']} already stored")
     
-    # Save file
-    with open(full_path, "w", encoding="utf-8") as f:
-        f.write(content)
-        
-    # Save hash file for integrity verification
-    with open(f"{full_path}.sha256", "w") as f:
-        f.write(sha_hash)
-        
-    return rel_path, sha_hash, now
+    # 2. Capture time -> hash
+    _append_index(prepared["vendor"], {
+        "capture_ts_utc": prepared["capture_ts"].isoformat(),
+        "source_vendor": prepared["vendor"].upper(),
+        "suffix": prepared["suffix"],
+        "sha256": prepared["sha256"],
+        "path": prepared["rel_path"],
+        "bytes": sum(len(c) for c in prepared["chunks"]),
+        "new": is_new
+    })
+    return is_new
+
+def save_raw_payload(vendor: str, payload: Any, extension: str = "json", suffix: Optional[str] = None,
+                     capture_ts: Optional[datetime] = None) -> Tuple[str, str, datetime]:
+    """
+    Saves a raw payload to the content-addressed store (objects/<hh>/<sha256>.<ext>.zst|.gz),
+    hashing it while it is serialized. Content that is already stored is not written
+    again; every capture is still recorded in the vendor's daily index. capture_ts
+    (UTC, default now) lets backfills index a payload at its original capture time.
+    Returns (relative_path, sha256_hash, capture_ts).
+    """
+    prepared = _prepare_payload(vendor, payload, extension, suffix, capture_ts)
+    _store_payload(prepared)
+    return prepared["rel_path"], prepared["sha256"], prepared["capture_ts"]
+
+class RawPayloadWriter:
+    """
+    Persists raw payloads on a background thread so disk writes stay off the
+    fetch -> parse -> insert path. submit() hashes in the caller's thread and returns
+    at once; the returned Future resolves once the object is durable on disk.
+    At most max_pending payloads wait in memory; submit() blocks beyond that.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_pending: int = 8):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="raw-payload-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, vendor: str, payload: Any, extension: str = "json",
+               suffix: Optional[str] = None) -> Tuple[str, str, datetime, Future]:
+        """Returns (relative_path, sha256_hash, capture_ts, written) without waiting for the disk."""
+        if self._closed:
+            raise RuntimeError("RawPayloadWriter is closed")
+        prepared = _prepare_payload(vendor, payload, extension, suffix)
+        written = Future()
+        self._queue.put((prepared, written))
+        return prepared["rel_path"], prepared["sha256"], prepared["capture_ts"], written
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            prepared, written = item
+            try:
+                written.set_result(_store_payload(prepared))
+            except Exception as e:
+                logger.error(f"{prepared['vendor']}: failed to store payload {prepared['sha256']}: {e}")
+                written.set_exception(e)
+
+    def close(self):
+        """Flushes every queued payload, then stops the thread."""
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load_raw_payload(path: str, extension: str = "json") -> Any:
+    """Reads a stored payload back (compressed objects and legacy uncompressed files)."""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstandard is required to read .zst payloads")
+        opener = lambda p: zstandard.open(p, "rt", encoding="utf-8")
+    elif path.endswith(".gz"):
+        opener = lambda p: gzip.open(p, "rt", encoding="utf-8")
+    else:
+        opener = lambda p: open(p, encoding="utf-8")
+    with opener(path) as f:
+        return json.load(f) if extension == "json" else f.read()
+
+def _row_key_part(field: str, value: Any) -> str:
+    if value is None or value != value:  # None / NaN
+        return ""
+    if field == "capture_ts_utc":
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return str((value - _EPOCH) // timedelta(microseconds=1))
+    if field == "line":
+        return str(int(round(float(value) * 1000)))
+    return str(value)
+
+def odds_row_key(record: dict) -> int:
+    """
+    Returns the 64-bit row key of a normalized odds record: the low 8 bytes of the
+    MD5 of its dedup fields. Parsers attach it at parse time so inserts can dedup
+    on one integer instead of ten columns.
+    """
+    raw = _ROW_KEY_SEP.join(_row_key_part(f, record.get(f)) for f in ROW_KEY_FIELDS)
+    return int.from_bytes(hashlib.md5(raw.encode("utf-8")).digest()[:8], "little")
@@ -1,5 +1,4 @@
 import pandas as pd
-import duckdb
 import os
 import sys
 import argparse
@@ -10,6 +9,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 src_dir = os.path.dirname(os.path.dirname(current_dir))
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
 
 try:
     from nhl_bets.analysis.normalize import TEAM_MAP, get_teams_from_slug
@@ -25,7 +25,7 @@ BASE_PROJ_PATH = os.path.join(project_root, 'outputs', 'projections', 'BaseSingl
 OUTPUT_PATH = os.path.join(project_root, 'outputs', 'projections', 'GameContext.csv')
 
 def get_db_connection():
-    return duckdb.connect(DB_PATH)
+    return get_replica_connection(DB_PATH)
 
 def load_schedule_from_props():
     if not os.path.exists(PROPS_PATH):
@@ -1,8 +1,14 @@
-import duckdb
 import pandas as pd
 import os
 import logging
 from datetime import datetime
+import sys
+
+# Ensure src is in path for nhl_bets import
+src_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+from nhl_bets.common.db_replica import get_replica_connection
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,7 +26,7 @@ def produce_live_projections():
         logger.error(f"DuckDB not found at {DB_PATH}. Cannot produce live projections.")
         return False
 
-    con = duckdb.connect(DB_PATH)
+    con = get_replica_connection(DB_PATH)
     
     logger.info("Computing Live Projections from Raw Game Logs (Zero Lag)...")
     
@@ -0,0 +1,76 @@
+import hashlib
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+class ConditionalFetcher:
+    """
+    Remembers, per request, the last stored response's ETag / Last-Modified and a
+    digest of its raw bytes. Repeat requests send If-None-Match / If-Modified-Since;
+    a 304, or a 200 whose body hashes the same as last time, is reported as unchanged
+    before anything is decoded or parsed.
+
+    A changed response's validators stay pending until commit(), which the caller
+    runs once the snapshot is stored. If parsing or the insert fails (or the result
+    is dropped), the next request is judged against the last stored snapshot, so the
+    same content is fetched and ingested again instead of reading as unchanged.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session or requests.Session()
+        self._state: Dict[str, dict] = {}
+        self._pending: Dict[str, dict] = {}
+
+    @staticmethod
+    def _key(url: str, params: Optional[dict]) -> str:
+        return f"{url}?{urlencode(sorted((params or {}).items()))}" if params else url
+
+    def get(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+            **kwargs) -> Optional[requests.Response]:
+        """Returns the response, or None if the resource is unchanged since the last commit."""
+        key = self._key(url, params)
+        state = self._state.get(key)
+        headers = dict(headers or {})
+        if state:
+            if state.get("etag"):
+                headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                headers["If-Modified-Since"] = state["last_modified"]
+
+        response = self.session.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304:
+            logger.info(f"Not modified (304): {url}")
+            return None
+        response.raise_for_status()
+
+        # Servers without validators: compare the raw bytes before any decoding
+        digest = hashlib.sha256(response.content).hexdigest()
+        unchanged = state is not None and state["digest"] == digest
+        if unchanged:
+            logger.info(f"Unchanged body: {url}")
+            return None
+        self._pending[key] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "digest": digest
+        }
+        return response
+
+    def forget(self, url: str, params: Optional[dict] = None):
+        """Drops the validators of one request, so the next get() fetches its body unconditionally."""
+        key = self._key(url, params)
+        self._state.pop(key, None)
+        self._pending.pop(key, None)
+
+    def commit(self):
+        """Makes the validators of every response since the last commit/rollback current."""
+        self._state.update(self._pending)
+        self._pending = {}
+
+    def rollback(self):
+        """Forgets uncommitted validators (start of a new capture)."""
+        self._pending = {}
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://moneypuck.com/playerData"
+LOOKUP_URL = f"{BASE_URL}/playerBios/allPlayersLookup.csv"
+GAME_BY_GAME_BASE = f"{BASE_URL}/teamPlayerGameByGame"
+MANIFEST_NAME = "download_manifest.json"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+BLOCKED_MESSAGE = "Upstream returned 403; downloader skipped; ingestion may proceed using existing local data. URL: {url}"
+CSV_LINK = re.compile(r'href=["\\]?([^"\">]+\.csv)["\\]?')
+CHUNK_SIZE = 64 * 1024
+# Manifest is rewritten every N completed files, so an interrupted run keeps its progress
+SAVE_EVERY = 50
+
+
+class MoneyPuckDownloader:
+    """
+    Syncs MoneyPuck CSVs into data_root over one pooled session with bounded
+    concurrency. A manifest (data_root/download_manifest.json) records size, ETag,
+    Last-Modified and sha256 per file: a repeat sync sends one conditional GET per
+    file and an unchanged file costs a 304 (or a matching 200 header) and no body.
+    Bodies stream to <file>.part and are moved into place atomically; a .part left
+    by an interrupted run is resumed with a Range request when the server still
+    serves the same version (If-Range).
+    """
+
+    def __init__(self, data_root: str, workers: int = 8, manifest_path: Optional[str] = None,
+                 session: Optional[requests.Session] = None, timeout: int = 30):
+        self.data_root = str(data_root)
+        self.workers = workers
+        self.timeout = timeout
+        self.manifest_path = manifest_path or os.path.join(self.data_root, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+        self._lock = threading.Lock()
+        self._completed = 0
+
+        self.session = session or requests.Session()
+        self.session.headers.update(HEADERS)
+        retries = Retry(total=3, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # --- manifest ---
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable download manifest {self.manifest_path} ({e}); starting a new one.")
+            return {}
+
+    def save_manifest(self):
+        """Atomic rewrite (temp file + os.replace)."""
+        with self._lock:
+            snapshot = json.dumps(self.manifest, indent=1, sort_keys=True)
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _record(self, rel_path: str, entry: dict):
+        with self._lock:
+            self.manifest[rel_path] = entry
+            self._completed += 1
+            due = self._completed % SAVE_EVERY == 0
+        if due:
+            self.save_manifest()
+
+    # --- listing ---
+
+    def list_csv_links(self, index_url: str) -> List[str]:
+        """CSV file names linked from a directory index page ([] if blocked or unavailable)."""
+        try:
+            response = self.session.get(index_url, timeout=self.timeout)
+            if response.status_code == 403:
+                logger.warning(BLOCKED_MESSAGE.format(url=index_url))
+                return []
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Error fetching index {index_url}: {e}")
+            return []
+        return sorted(set(CSV_LINK.findall(response.text)))
+
+    def game_by_game_jobs(self, seasons: Iterable[int], season_type: str,
+                          groups: Iterable[str] = ("skaters", "goalies"),
+                          base_url: str = GAME_BY_GAME_BASE) -> List[Tuple[str, str]]:
+        """(url, path relative to data_root) for every listed per-team CSV; index pages are fetched concurrently."""
+        dirs = [f"{season}/{season_type}/{group}" for season in seasons for group in groups]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="moneypuck-index") as pool:
+            listings = pool.map(lambda d: self.list_csv_links(f"{base_url}/{d}/"), dirs)
+            return [(f"{base_url}/{d}/{name}", f"teamPlayerGameByGame/{d}/{name}")
+                    for d, names in zip(dirs, listings) for name in names]
+
+    # --- files ---
+
+    def _validators(self, rel_path: str, target: str, force: bool) -> dict:
+        """Conditional headers for a file already on disk; none when forced or unknown."""
+        if force or not os.path.exists(target):
+            return {}
+        entry = self.manifest.get(rel_path)
+        if entry and not entry.get("partial"):
+            if entry.get("size") != os.path.getsize(target):
+                return {}
+            headers = {}
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers
+        # Downloaded before the manifest existed: the local copy is newer than any unchanged remote
+        mtime = datetime.fromtimestamp(os.path.getmtime(target), tz=timezone.utc)
+        return {"If-Modified-Since": format_datetime(mtime, usegmt=True)}
+
+    @staticmethod
+    def _entry(url: str, response: requests.Response, size: int, sha256: Optional[str]) -> dict:
+        return {
+            "url": url,
+            "size": size,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": sha256,
+            "fetched_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    @staticmethod
+    def _file_sha256(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _matches_local(entry: dict, response: requests.Response, target: str) -> bool:
+        """A 200 for a file we already hold: same identity size and, if known, same validators."""
+        size = response.headers.get("Content-Length")
+        if size is None or response.headers.get("Content-Encoding") or not os.path.exists(target):
+            return False
+        if int(size) != os.path.getsize(target):
+            return False
+        if not entry or entry.get("partial"):
+            return True
+        return (entry.get("etag"), entry.get("last_modified")) == \
+            (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+    def sync_file(self, url: str, rel_path: str, force: bool = False) -> str:
+        """Brings one file up to date. Returns "downloaded", "skipped" (unchanged or blocked) or "failed"."""
+        target = os.path.join(self.data_root, rel_path)
+        part = f"{target}.part"
+        entry = self.manifest.get(rel_path) or {}
+        known = bool(entry) and not entry.get("partial")
+        headers = self._validators(rel_path, target, force)
+
+        # 1. Resume a partial body only if the server can prove it is the same version
+        offset = 0
+        if not force and os.path.exists(part) and entry.get("partial") and (entry.get("etag") or entry.get("last_modified")):
+            offset = os.path.getsize(part)
+            headers = {"Range": f"bytes={offset}-", "If-Range": entry.get("etag") or entry["last_modified"],
+                       "Accept-Encoding": "identity"}
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 403:
+                    logger.warning(BLOCKED_MESSAGE.format(url=url))
+                    return "skipped"
+                # 2. Unchanged: a 304, or a full 200 that matches the local copy (body left unread)
+                if response.status_code == 304 or (response.status_code == 200 and not force
+                                                    and self._matches_local(entry, response, target)):
+                    if not known:
+                        self._record(rel_path, self._entry(url, response, os.path.getsize(target),
+                                                           self._file_sha256(target)))
+                    return "skipped"
+                if response.status_code not in (200, 206):
+                    logger.error(f"File not found on server ({response.status_code}): {url}")
+                    return "failed"
+
+                # 3. Stream to the .part file (appending after a 206), then move into place
+                resumed = response.status_code == 206
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with self._lock:
+                    self.manifest[rel_path] = dict(self._entry(url, response, 0, None), partial=True)
+                with open(part, "ab" if resumed else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                expected = response.headers.get("Content-Length")
+                if response.headers.get("Content-Encoding"):
+                    expected = None
+            size = os.path.getsize(part)
+            if expected is not None and size - (offset if resumed else 0) != int(expected):
+                raise IOError(f"short body ({size} bytes, expected {expected} from byte {offset if resumed else 0})")
+            sha256 = self._file_sha256(part)
+            os.replace(part, target)
+        except (requests.RequestException, OSError) as e:
+            logger.error(f"Failed to download {url}: {e}")
+            return "failed"
+
+        if resumed:
+            logger.info(f"Resumed {rel_path} from byte {offset}")
+        self._record(rel_path, self._entry(url, response, size, sha256))
+        return "downloaded"
+
+    def sync(self, jobs: List[Tuple[str, str]], force: bool = False) -> Dict[str, int]:
+        """Syncs (url, rel_path) jobs on the worker pool; the manifest is saved periodically and on exit."""
+        stats = {"downloaded": 0, "skipped": 0, "failed": 0}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="moneypuck") as pool:
+                for status in pool.map(lambda job: self.sync_file(job[0], job[1], force=force), jobs):
+                    stats[status] += 1
+        finally:
+            self.save_manifest()
+        return stats
@@ -0,0 +1,263 @@
+import logging
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+import duckdb
+from tenacity import RetryError
+
+from nhl_bets.common.db_init import insert_odds_deltas, insert_odds_records
+from nhl_bets.common.storage import RawPayloadWriter
+from nhl_bets.scrapers.oddsshark_client import OddsSharkClient
+from nhl_bets.scrapers.playnow_adapter import PlayNowAdapter
+from nhl_bets.scrapers.playnow_api_client import FAILED_EVENTS_KEY, PlayNowAPIClient
+from nhl_bets.scrapers.unabated_client import UnabatedClient
+
+logger = logging.getLogger(__name__)
+
+# Wall-clock budget per vendor for one capture cycle (fetch + retries + parse).
+# A vendor that overruns is reported as timed out; the others are unaffected.
+VENDOR_TIMEOUTS = {
+    "UNABATED": 60.0,
+    "PLAYNOW": 90.0,
+    "ODDSSHARK": 60.0
+}
+DEFAULT_VENDOR_TIMEOUT = 60.0
+
+# Workers still running past their timeout, by capture callable. A vendor is not
+# captured again until its previous worker is done, so a bound client (conditional
+# validators, pending PlayNow chunks) is never used by two threads at once.
+_RUNNING: Dict[Callable, Future] = {}
+
+def is_payload_ingested(con: duckdb.DuckDBPyConnection, payload_hash: str) -> bool:
+    res = con.execute("SELECT count(*) FROM raw_odds_payloads WHERE payload_hash = ?", [payload_hash]).fetchone()
+    return res[0] > 0
+
+def register_payload(con: duckdb.DuckDBPyConnection, vendor: str, capture_ts: datetime, rel_path: str, payload_hash: str,
+                     written: Future):
+    # Only register payloads whose raw object is durable; a failed write raises here
+    written.result()
+    con.execute("INSERT INTO raw_odds_payloads (payload_hash, source_vendor, capture_ts_utc, file_path) VALUES (?, ?, ?, ?)",
+                [payload_hash, vendor, capture_ts, rel_path])
+
+def _unchanged(vendor: str, commit: Optional[Callable] = None) -> dict:
+    logger.info(f"{vendor}: Snapshot unchanged since the last stored one.")
+    return {"vendor": vendor, "unchanged": True, "commit": commit}
+
+def _capture(vendor: str, cursor: duckdb.DuckDBPyConnection, writer: RawPayloadWriter, payload: Any,
+             extension: str, parse: Callable, suffix: Optional[str] = None,
+             commit: Optional[Callable] = None, partial: bool = False) -> dict:
+    """
+    Persists a fetched payload and parses it unless its hash was already ingested.
+    commit (the client's) runs once the writer has stored the capture. A partial
+    payload (some events failed to fetch) is always parsed and never registered,
+    so its hash cannot stand in for the complete snapshot.
+    """
+    rel_path, sha_hash, capture_ts, written = writer.submit(vendor, payload, extension, suffix=suffix)
+    capture = {
+        "vendor": vendor,
+        "unchanged": False,
+        "commit": commit,
+        "partial": partial,
+        "rel_path": rel_path,
+        "sha256": sha_hash,
+        "capture_ts": capture_ts,
+        "written": written,
+        "records": None
+    }
+    if partial or not is_payload_ingested(cursor, sha_hash):
+        capture["records"] = parse(payload, rel_path, sha_hash, capture_ts)
+    return capture
+
+def capture_unabated(cursor: duckdb.DuckDBPyConnection, writer: RawPayloadWriter,
+                     client: Optional[UnabatedClient] = None) -> dict:
+    client = client or UnabatedClient()
+    snapshot = client.fetch_snapshot()
+    if snapshot is None:
+        return _unchanged("UNABATED", client.commit)
+    return _capture("UNABATED", cursor, writer, snapshot, "json", client.parse_snapshot, commit=client.commit)
+
+def capture_oddsshark(cursor: duckdb.DuckDBPyConnection, writer: RawPayloadWriter,
+                      client: Optional[OddsSharkClient] = None) -> dict:
+    client = client or OddsSharkClient()
+    html = client.fetch_snapshot()
+    if html is None:
+        return _unchanged("ODDSSHARK", client.commit)
+    return _capture("ODDSSHARK", cursor, writer, html, "html", client.parse_snapshot, commit=client.commit)
+
+def capture_playnow(cursor: duckdb.DuckDBPyConnection, writer: RawPayloadWriter,
+                    client: Optional[PlayNowAPIClient] = None) -> Optional[dict]:
+    client = client or PlayNowAPIClient()
+    adapter = PlayNowAdapter()
+
+    # 1. Event list (kept for reference; dedup is on the detailed props payload)
+    url_list, data_list = client.fetch_event_list(event_sorts="MTCH,TNMT")
+    if data_list is None:
+        data_list = client.last_event_list
+    else:
+        writer.submit("PLAYNOW", data_list, "json", suffix="event_list")
+
+    events = data_list.get('data', {}).get('events', [])
+    event_ids = [e['id'] for e in events if e.get('marketCount', 0) > 5]
+    if not event_ids:
+        logger.warning("PLAYNOW: No events with props found.")
+        return None
+
+    # 2. Detailed props
+    logger.info(f"Fetching PlayNow details for {len(event_ids)} events...")
+    url_det, data_det = client.fetch_event_details(event_ids)
+    if data_det is None:
+        return _unchanged("PLAYNOW", client.commit)
+    failed = data_det.get(FAILED_EVENTS_KEY)
+    if failed:
+        logger.warning(f"PLAYNOW: Partial snapshot, details missing for events {failed}.")
+    return _capture("PLAYNOW", cursor, writer, data_det, "json", adapter.parse_event_details,
+                    suffix="details_partial" if failed else "details", commit=client.commit, partial=bool(failed))
+
+def build_capture_vendors(conditional: bool = True) -> Dict[str, Callable]:
+    """
+    Vendor capture callables bound to their clients. Reuse the result across cycles:
+    conditional clients remember validators/digests and skip unchanged snapshots.
+    """
+    return {
+        "UNABATED": partial(capture_unabated, client=UnabatedClient(conditional=conditional)),
+        "PLAYNOW": partial(capture_playnow, client=PlayNowAPIClient(conditional=conditional)),
+        "ODDSSHARK": partial(capture_oddsshark, client=OddsSharkClient(conditional=conditional))
+    }
+
+def is_noop_cycle(summary: Dict[str, dict]) -> bool:
+    """True if no vendor produced new data (every snapshot unchanged or already ingested)."""
+    return all(result["status"] in ("unchanged", "skipped") for result in summary.values())
+
+def _http_status(error: Exception) -> Optional[int]:
+    """HTTP status behind a capture error (through tenacity's RetryError), if any."""
+    if isinstance(error, RetryError):
+        error = error.last_attempt.exception()
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+def _run_vendor(vendor: str, capture_fn: Callable, cursor: duckdb.DuckDBPyConnection,
+                writer: RawPayloadWriter, results: queue.Queue):
+    try:
+        results.put((vendor, capture_fn(cursor, writer), None))
+    except Exception as e:
+        results.put((vendor, None, e))
+    finally:
+        cursor.close()
+
+def _store_capture(con: duckdb.DuckDBPyConnection, capture: Optional[dict], lake_root: Optional[str],
+                   delta: bool = False) -> dict:
+    """
+    Single-writer step: insert a vendor's parsed records and register its payload, then
+    commit the client's conditional-GET state. A capture that fails here (or arrives after
+    its deadline) never commits, so the next cycle fetches and ingests it again.
+    """
+    result = _store_records(con, capture, lake_root, delta)
+    if capture is not None and capture.get("commit") is not None:
+        capture["commit"]()
+    return result
+
+def _store_records(con: duckdb.DuckDBPyConnection, capture: Optional[dict], lake_root: Optional[str],
+                   delta: bool) -> dict:
+    if capture is None:
+        return {"status": "empty", "records": 0}
+    vendor = capture["vendor"]
+    if capture["unchanged"]:
+        return {"status": "unchanged", "records": 0}
+    if capture["records"] is None:
+        logger.info(f"{vendor}: Snapshot with hash {capture['sha256']} already ingested. Skipping.")
+        return {"status": "skipped", "records": 0}
+    # Parsers return pyarrow Tables in the fact_prop_odds schema; they go to DuckDB as-is
+    table = capture["records"]
+    if table.num_rows == 0:
+        return {"status": "empty", "records": 0}
+
+    if delta:
+        changes = insert_odds_deltas(con, table, lake_root=lake_root)
+        logger.info(f"{vendor}: {table.num_rows} records -> {changes}")
+    else:
+        insert_odds_records(con, table, lake_root=lake_root)
+        logger.info(f"{vendor}: Inserted {table.num_rows} records.")
+    if capture["partial"]:
+        return {"status": "inserted", "records": table.num_rows, "partial": True}
+    register_payload(con, vendor, capture["capture_ts"], capture["rel_path"], capture["sha256"], capture["written"])
+    return {"status": "inserted", "records": table.num_rows}
+
+def run_capture_cycle(con: duckdb.DuckDBPyConnection, writer: RawPayloadWriter,
+                      vendors: Optional[Dict[str, Callable]] = None,
+                      timeouts: Optional[Dict[str, float]] = None,
+                      lake_root: Optional[str] = None, delta: bool = False) -> Dict[str, dict]:
+    """
+    Captures every vendor concurrently (one thread each: fetch, hash, dedup check, parse)
+    while the calling thread is the only one writing to DuckDB, storing each vendor's
+    records as soon as they arrive. A vendor that fails or exceeds its timeout is
+    reported and skipped without affecting the others. With delta=True snapshots are
+    stored as price changes + periodic keyframes (db_init.insert_odds_deltas).
+    Returns {vendor: {"status", "records", "seconds"}}; status is one of
+    inserted, unchanged (not modified since the last fetch), skipped (payload already
+    ingested), empty, failed, timeout, busy (its timed-out worker from an earlier cycle
+    is still running, so it is not captured again yet). Failed vendors also carry "http_status";
+    partial snapshots (inserted, not registered) carry "partial": True.
+    """
+    vendors = vendors or build_capture_vendors()
+    timeouts = {**VENDOR_TIMEOUTS, **(timeouts or {})}
+    results = queue.Queue()
+    summary = {}
+
+    # 1. Fan out fetches; each worker reads through its own cursor
+    start = time.monotonic()
+    deadlines = {v: start + timeouts.get(v, DEFAULT_VENDOR_TIMEOUT) for v in vendors}
+    for fn in [fn for fn, future in _RUNNING.items() if future.done()]:
+        del _RUNNING[fn]
+    cursors, futures = {}, {}
+    executor = ThreadPoolExecutor(max_workers=len(vendors), thread_name_prefix="odds-capture")
+    for vendor, capture_fn in vendors.items():
+        if capture_fn in _RUNNING:
+            logger.error(f"{vendor}: previous capture is still running; skipped this cycle")
+            summary[vendor] = {"status": "busy", "records": 0, "seconds": 0.0}
+            continue
+        cursors[vendor] = con.cursor()
+        futures[vendor] = executor.submit(_run_vendor, vendor, capture_fn, cursors[vendor], writer, results)
+    received = set()
+
+    # 2. Single writer: store captures in completion order until all are done or timed out
+    try:
+        while len(summary) < len(vendors):
+            pending = [v for v in vendors if v not in summary]
+            wait = max(0.0, min(deadlines[v] for v in pending) - time.monotonic())
+            try:
+                vendor, capture, error = results.get(timeout=wait)
+                received.add(vendor)
+            except queue.Empty:
+                for v in pending:
+                    if time.monotonic() >= deadlines[v]:
+                        logger.error(f"{v}: capture timed out after {timeouts.get(v, DEFAULT_VENDOR_TIMEOUT):.0f}s")
+                        summary[v] = {"status": "timeout", "records": 0, "seconds": round(time.monotonic() - start, 2)}
+                continue
+            if vendor in summary:
+                continue  # Finished after its deadline; results are discarded
+
+            if error is None:
+                try:
+                    summary[vendor] = _store_capture(con, capture, lake_root, delta)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                logger.error(f"{vendor} ingestion failed: {error}", exc_info=error)
+                summary[vendor] = {"status": "failed", "records": 0, "http_status": _http_status(error)}
+            summary[vendor]["seconds"] = round(time.monotonic() - start, 2)
+    finally:
+        # Timed-out workers finish (or fail) in the background; nothing waits on them.
+        # Their cursors are closed here so they do not keep the database (and its file
+        # lock) open once the caller closes con; the late worker then fails harmlessly.
+        executor.shutdown(wait=False, cancel_futures=True)
+        for vendor, future in futures.items():
+            if vendor not in received and not future.done():
+                _RUNNING[vendors[vendor]] = future
+                cursors[vendor].close()
+    if is_noop_cycle(summary):
+        logger.info("No-op cycle: no vendor snapshot changed.")
+    return summary
@@ -0,0 +1,291 @@
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import duckdb
+import pyarrow as pa
+
+from nhl_bets.common import storage
+from nhl_bets.common.db_init import insert_odds_records, refresh_consensus, upsert_latest_odds
+from nhl_bets.common.odds_columns import FACT_PROP_ODDS_SCHEMA
+from nhl_bets.common.odds_lake import ODDS_LAKE_ROOT, delete_partition_rows, sql_literal
+from nhl_bets.scrapers.oddsshark_client import OddsSharkClient
+from nhl_bets.scrapers.playnow_adapter import PlayNowAdapter
+from nhl_bets.scrapers.playnow_api_client import FAILED_EVENTS_KEY
+from nhl_bets.scrapers.unabated_client import UnabatedClient
+
+logger = logging.getLogger(__name__)
+
+# Replayable payloads: (vendor, suffix) -> extension. PlayNow event lists carry no prices.
+REPLAY_KINDS = {
+    ("UNABATED", None): "json",
+    ("ODDSSHARK", None): "html",
+    ("PLAYNOW", "details"): "json",
+    ("PLAYNOW", "details_partial"): "json"
+}
+# Legacy layout (before content addressing): <VENDOR>/YYYY/MM/DD/HHMMSS_<vendor>[_<suffix>].<ext>
+_LEGACY_NAME = re.compile(r"^(\d{6})_([a-z]+)(?:_(\w+))?\.(json|html)$")
+
+def _parser(vendor: str):
+    if vendor == "UNABATED":
+        return UnabatedClient().parse_snapshot
+    if vendor == "ODDSSHARK":
+        return OddsSharkClient().parse_snapshot
+    return PlayNowAdapter().parse_event_details
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+def _object_file(storage_root: str, sha_hash: str, extension: str) -> Optional[str]:
+    """Stored object for a hash, whichever compression it was written with."""
+    matches = [p for p in glob.glob(os.path.join(storage_root, "objects", sha_hash[:2], f"{sha_hash}.{extension}*"))
+               if not p.endswith(".tmp")]
+    return matches[0] if matches else None
+
+def _indexed_payloads(storage_root: str) -> Iterable[dict]:
+    """Captures recorded in the daily per-vendor index (content-addressed layout)."""
+    for index_path in sorted(glob.glob(os.path.join(storage_root, "index", "*", "*.jsonl"))):
+        with open(index_path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                vendor = entry["source_vendor"]
+                extension = REPLAY_KINDS.get((vendor, entry.get("suffix")))
+                if extension is None:
+                    continue
+                path = _object_file(storage_root, entry["sha256"], extension)
+                if path is None:
+                    logger.warning(f"{vendor}: object for {entry['sha256']} is missing; skipping.")
+                    continue
+                yield {
+                    "vendor": vendor,
+                    "sha256": entry["sha256"],
+                    "path": path,
+                    "raw_path": entry["path"],
+                    "extension": extension,
+                    "capture_ts": _utc(datetime.fromisoformat(entry["capture_ts_utc"]))
+                }
+
+def _legacy_payloads(storage_root: str) -> Iterable[dict]:
+    """Uncompressed files from the date-partitioned layout, timed by their path."""
+    for path in sorted(glob.glob(os.path.join(storage_root, "*", "[0-9][0-9][0-9][0-9]", "*", "*", "*"))):
+        match = _LEGACY_NAME.match(os.path.basename(path))
+        if not match:
+            continue
+        time_part, vendor, suffix, extension = match.groups()
+        vendor = vendor.upper()
+        if REPLAY_KINDS.get((vendor, suffix)) != extension:
+            continue
+        year, month, day = os.path.normpath(path).split(os.sep)[-4:-1]
+        capture_ts = datetime.strptime(f"{year}{month}{day}{time_part}", "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+        if os.path.exists(f"{path}.sha256"):
+            with open(f"{path}.sha256", encoding="utf-8") as f:
+                sha_hash = f.read().strip()
+        else:
+            with open(path, "rb") as f:
+                sha_hash = hashlib.sha256(f.read()).hexdigest()
+        yield {
+            "vendor": vendor,
+            "sha256": sha_hash,
+            "path": path,
+            "raw_path": os.path.relpath(path, start=os.getcwd()),
+            "extension": extension,
+            "capture_ts": capture_ts
+        }
+
+def list_stored_payloads(storage_root: Optional[str] = None, vendors: Optional[List[str]] = None,
+                         start_date: Optional[date] = None, end_date: Optional[date] = None,
+                         con: Optional[duckdb.DuckDBPyConnection] = None) -> List[dict]:
+    """
+    Replayable raw payloads, one per content hash, oldest first. A hash seen several
+    times is replayed at its first capture, as live ingestion did. With con, hashes
+    already in raw_odds_payloads keep their registered capture time and path, so
+    replayed rows get the same row_key as the originals.
+    """
+    storage_root = storage_root or storage.STORAGE_ROOT
+    vendors = {v.upper() for v in vendors} if vendors else None
+
+    # 1. Earliest capture per hash across both layouts
+    payloads: Dict[str, dict] = {}
+    for payload in list(_indexed_payloads(storage_root)) + list(_legacy_payloads(storage_root)):
+        seen = payloads.get(payload["sha256"])
+        if seen is None or payload["capture_ts"] < seen["capture_ts"]:
+            payloads[payload["sha256"]] = payload
+
+    # 2. Registered capture times win
+    if con is not None:
+        for sha_hash, capture_ts, file_path in con.execute(
+            "SELECT payload_hash, capture_ts_utc, file_path FROM raw_odds_payloads"
+        ).fetchall():
+            if sha_hash in payloads:
+                payloads[sha_hash].update(capture_ts=_utc(capture_ts), raw_path=file_path, registered=True)
+
+    selected = []
+    for payload in payloads.values():
+        capture_date = payload["capture_ts"].date()
+        if vendors and payload["vendor"] not in vendors:
+            continue
+        if (start_date and capture_date < start_date) or (end_date and capture_date > end_date):
+            continue
+        payload.setdefault("registered", False)
+        selected.append(payload)
+    return sorted(selected, key=lambda p: p["capture_ts"])
+
+def parse_payload_batch(payloads: List[dict], batch_dir: str) -> dict:
+    """
+    Worker: loads and parses payloads with the vendor parsers and writes their rows
+    to one Arrow IPC file in batch_dir. Returns the file path plus per-payload row
+    counts and errors; a payload that fails is reported and left out. Partial
+    PlayNow snapshots are flagged so they are loaded but not registered.
+    """
+    parsers, tables, parsed, errors = {}, [], [], []
+    for payload in payloads:
+        try:
+            if payload["vendor"] not in parsers:
+                parsers[payload["vendor"]] = _parser(payload["vendor"])
+            data = storage.load_raw_payload(payload["path"], payload["extension"])
+            table = parsers[payload["vendor"]](data, payload["raw_path"], payload["sha256"], payload["capture_ts"])
+        except Exception as e:
+            errors.append((payload["sha256"], f"{type(e).__name__}: {e}"))
+            continue
+        tables.append(table)
+        payload = {**payload, "partial": isinstance(data, dict) and bool(data.get(FAILED_EVENTS_KEY))}
+        parsed.append((payload, table.num_rows))
+
+    batch_path = os.path.join(batch_dir, f"batch-{os.getpid()}-{uuid.uuid4().hex}.arrow")
+    table = pa.concat_tables(tables) if tables else FACT_PROP_ODDS_SCHEMA.empty_table()
+    with pa.OSFile(batch_path, "wb") as sink, pa.ipc.new_file(sink, FACT_PROP_ODDS_SCHEMA) as writer:
+        writer.write_table(table)
+    return {"path": batch_path, "parsed": parsed, "errors": errors}
+
+def _load_batch(con: duckdb.DuckDBPyConnection, result: dict, lake_root: Optional[str]) -> int:
+    """Single writer: bulk-loads one worker batch, then registers its payloads."""
+    with pa.memory_map(result["path"]) as source:
+        table = pa.ipc.open_file(source).read_all()
+    insert_odds_records(con, table, lake_root=lake_root)
+    for payload, _ in result["parsed"]:
+        if payload["partial"]:
+            continue
+        con.execute("""
+        INSERT INTO raw_odds_payloads (payload_hash, source_vendor, capture_ts_utc, file_path) VALUES (?, ?, ?, ?)
+        ON CONFLICT (payload_hash) DO NOTHING
+        """, [payload["sha256"], payload["vendor"], payload["capture_ts"].replace(tzinfo=None), payload["raw_path"]])
+    return table.num_rows
+
+def _clear_payload_rows(con: duckdb.DuckDBPyConnection, payloads: List[dict], lake_root: str) -> int:
+    """
+    Replace mode, before loading a parsed batch: removes its payloads' rows from their
+    (vendor, capture_date) lake partitions and their prices from fact_prop_odds_latest.
+    The removed latest rows are added to stg_replaced_latest for _restore_latest_odds.
+    Returns the number of lake rows deleted.
+    """
+    if not payloads:
+        return 0
+    con.execute("CREATE OR REPLACE TEMP TABLE stg_replace_hashes (payload_hash TEXT)")
+    con.executemany("INSERT INTO stg_replace_hashes VALUES (?)", [[p["sha256"]] for p in payloads])
+    replaced = "raw_payload_hash IN (SELECT payload_hash FROM stg_replace_hashes)"
+
+    # 1. Latest prices the payloads set (their consensus is refreshed after the reload)
+    con.begin()
+    try:
+        con.execute(f"INSERT INTO stg_replaced_latest SELECT * FROM fact_prop_odds_latest WHERE {replaced}")
+        con.execute(f"DELETE FROM fact_prop_odds_latest WHERE {replaced}")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    # 2. Lake rows: parsers stamp every row with the payload's capture time
+    deleted = 0
+    for vendor, capture_date in sorted({(p["vendor"], p["capture_ts"].date()) for p in payloads}):
+        deleted += delete_partition_rows(con, lake_root, vendor, capture_date, replaced)
+    return deleted
+
+def _restore_latest_odds(con: duckdb.DuckDBPyConnection):
+    """
+    Replace mode, after reloading: keys whose latest price came from a replaced
+    payload get the newest remaining lake price (unless a later removal hides it),
+    and their consensus is recomputed.
+    """
+    vendors = [v for (v,) in con.execute("SELECT DISTINCT source_vendor FROM stg_replaced_latest").fetchall()]
+    if vendors:
+        con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE stg_restored_odds AS
+        SELECT o.*
+        FROM fact_prop_odds o
+        JOIN stg_replaced_latest k
+          ON o.source_vendor = k.source_vendor AND o.book_id_vendor = k.book_id_vendor
+         AND o.event_id_vendor = k.event_id_vendor AND COALESCE(o.player_id_vendor, o.player_name_raw) = k.player_key
+         AND o.market_type = k.market_type AND o.line = k.line AND o.side = k.side
+        WHERE o.source_vendor IN ({", ".join(sql_literal(v) for v in vendors)})
+          AND NOT EXISTS (
+            SELECT 1 FROM fact_prop_odds_removals r
+            WHERE r.source_vendor = k.source_vendor AND r.book_id_vendor = k.book_id_vendor
+              AND r.event_id_vendor = k.event_id_vendor AND r.player_key = k.player_key
+              AND r.market_type = k.market_type AND r.line = k.line AND r.side = k.side
+              AND r.removed_ts_utc > o.capture_ts_utc
+          )
+        """)
+        con.begin()
+        try:
+            upsert_latest_odds(con, "stg_restored_odds")
+            refresh_consensus(con, "stg_replaced_latest")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+    for table in ("stg_restored_odds", "stg_replaced_latest", "stg_replace_hashes"):
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+
+def replay_payloads(con: duckdb.DuckDBPyConnection, payloads: List[dict], lake_root: Optional[str] = None,
+                    workers: Optional[int] = None, chunk_size: int = 50, replace: bool = False) -> dict:
+    """
+    Re-parses stored payloads in a process pool (chunk_size payloads per task) and
+    bulk-loads each worker batch through insert_odds_records as it completes. Loading
+    is idempotent: rows already in the lake are skipped by row_key and registered
+    payloads are left as they are. Since row_key has no price fields, that cannot
+    correct rows a parser got wrong; with replace=True each batch's parsed payloads
+    have their rows deleted from the lake and fact_prop_odds_latest just before the
+    batch is loaded (a payload that fails to parse keeps its rows), and at the end,
+    even if the run fails, the latest and consensus state of the keys they priced is
+    rebuilt from the lake. Delta removals
+    are kept: a replayed price at a removal's capture time supersedes it. Workers are
+    spawned, not forked, so they never inherit the DuckDB connection's threads.
+    Returns counts {"payloads", "parsed", "failed", "rows", "deleted"}.
+    """
+    summary = {"payloads": len(payloads), "parsed": 0, "failed": 0, "rows": 0, "deleted": 0}
+    if not payloads:
+        return summary
+    if replace:
+        con.execute("CREATE OR REPLACE TEMP TABLE stg_replaced_latest AS SELECT * FROM fact_prop_odds_latest WHERE false")
+    chunks = [payloads[i:i + chunk_size] for i in range(0, len(payloads), chunk_size)]
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="odds-replay-") as batch_dir, \
+                ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                    mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(parse_payload_batch, chunk, batch_dir) for chunk in chunks]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                for sha_hash, error in result["errors"]:
+                    logger.error(f"Replay of payload {sha_hash} failed: {error}")
+                if replace:
+                    summary["deleted"] += _clear_payload_rows(con, [p for p, _ in result["parsed"]],
+                                                              lake_root or ODDS_LAKE_ROOT)
+                summary["rows"] += _load_batch(con, result, lake_root)
+                summary["parsed"] += len(result["parsed"])
+                summary["failed"] += len(result["errors"])
+                os.remove(result["path"])
+                logger.info(f"Replay: batch {done}/{len(chunks)} loaded ({summary['parsed']} payloads, {summary['rows']} rows)")
+    finally:
+        if replace:
+            _restore_latest_odds(con)
+    return summary
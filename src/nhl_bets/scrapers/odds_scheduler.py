@@ -0,0 +1,269 @@
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+import duckdb
+
+from nhl_bets.common.storage import RawPayloadWriter
+from nhl_bets.scrapers.odds_capture import build_capture_vendors, is_noop_cycle, run_capture_cycle
+
+logger = logging.getLogger(__name__)
+
+# Poll interval by time left until a vendor's next puck drop: (more than, poll every)
+POLL_SCHEDULE = [
+    (timedelta(hours=6), timedelta(minutes=60)),
+    (timedelta(hours=3), timedelta(minutes=30)),
+    (timedelta(hours=1), timedelta(minutes=10)),
+    (timedelta(minutes=15), timedelta(minutes=2)),
+    (timedelta(0), timedelta(minutes=1))
+]
+# No upcoming event known (or all have started): look for new ones this often
+IDLE_INTERVAL = timedelta(minutes=60)
+# Last capture of an event this long before its puck drop; it is not polled after that
+FINAL_POLL_LEAD = timedelta(seconds=30)
+
+# Error back-off doubles from the base up to the cap; 403/429 start from the slower base
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_BLOCKED = timedelta(minutes=10)
+BACKOFF_MAX = timedelta(hours=1)
+BLOCKED_STATUSES = (403, 429)
+# Retry delay when another process holds the DuckDB write lock at cycle start
+DB_BUSY_RETRY = timedelta(minutes=1)
+
+# HTTP requests one poll of each vendor costs against the per-minute budget
+# (PlayNow: event list + detail chunks on a typical slate)
+VENDOR_REQUEST_COST = {"UNABATED": 1, "ODDSSHARK": 1, "PLAYNOW": 4}
+REQUESTS_PER_MINUTE = 20
+
+class SystemClock:
+    """Wall clock; tests substitute a fake with the same two methods."""
+
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+class RequestBudget:
+    """Token bucket allowing per_minute requests per minute, refilled continuously."""
+
+    def __init__(self, per_minute: float, clock):
+        self.per_minute = per_minute
+        self.clock = clock
+        self.tokens = float(per_minute)
+        self.updated = clock.now()
+
+    def _refill(self):
+        now = self.clock.now()
+        self.tokens = min(self.per_minute, self.tokens + (now - self.updated).total_seconds() * self.per_minute / 60)
+        self.updated = now
+
+    def try_take(self, cost: float) -> bool:
+        self._refill()
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+    def wait_seconds(self, cost: float) -> float:
+        self._refill()
+        return max(0.0, (cost - self.tokens) * 60 / self.per_minute)
+
+def poll_interval(time_to_puck_drop: Optional[timedelta]) -> timedelta:
+    """Sparse far from puck drop, dense in the last hour; IDLE_INTERVAL with no upcoming event."""
+    if time_to_puck_drop is None or time_to_puck_drop <= timedelta(0):
+        return IDLE_INTERVAL
+    for horizon, interval in POLL_SCHEDULE:
+        if time_to_puck_drop > horizon:
+            return interval
+    return POLL_SCHEDULE[-1][1]
+
+def upcoming_puck_drops(con: duckdb.DuckDBPyConnection, now: datetime) -> Dict[str, datetime]:
+    """
+    Next puck drop per vendor among the events currently quoted (PlayNow startTime,
+    Unabated eventStart), skipping events whose final capture is already done.
+    "*" holds the earliest across vendors, for vendors without start times (OddsShark).
+    """
+    cutoff = (now + FINAL_POLL_LEAD).astimezone(timezone.utc).replace(tzinfo=None)
+    rows = con.execute("""
+    SELECT source_vendor, MIN(event_start_ts_utc)
+    FROM fact_prop_odds_latest
+    WHERE event_start_ts_utc > ?
+    GROUP BY source_vendor
+    """, [cutoff]).fetchall()
+    drops = {vendor: start.replace(tzinfo=timezone.utc) for vendor, start in rows}
+    if drops:
+        drops["*"] = min(drops.values())
+    return drops
+
+class OddsPollingDaemon:
+    """
+    Polls each vendor on its own adaptive schedule (see poll_interval), keyed to the
+    next puck drop among that vendor's quoted events. Vendors due together are captured
+    in one run_capture_cycle on a dedicated thread, so DuckDB keeps a single writer.
+    connect() opens the database for each cycle and the connection is closed after it
+    (and after_cycle(con, summary)), so the file lock is only held while capturing and
+    other writers such as the production pipeline can run between cycles; if the lock
+    is taken when a cycle starts, the due vendors are retried after DB_BUSY_RETRY.
+    Failures back off exponentially (403/429 from a slower base); polls that would
+    exceed the requests-per-minute budget are deferred. metrics() reports lag and
+    throughput.
+    """
+
+    def __init__(self, connect: Callable[[], duckdb.DuckDBPyConnection], writer: RawPayloadWriter,
+                 vendors: Optional[Dict[str, Callable]] = None, clock=None,
+                 requests_per_minute: float = REQUESTS_PER_MINUTE, lake_root: Optional[str] = None,
+                 delta: bool = False, metrics_path: Optional[str] = None,
+                 after_cycle: Optional[Callable[[duckdb.DuckDBPyConnection, dict], None]] = None):
+        self.connect = connect
+        self.writer = writer
+        self.vendors = vendors or build_capture_vendors()
+        self.clock = clock or SystemClock()
+        self.budget = RequestBudget(requests_per_minute, self.clock)
+        self.lake_root = lake_root
+        self.delta = delta
+        self.metrics_path = metrics_path
+        self.after_cycle = after_cycle
+
+        start = self.clock.now()
+        self.next_poll = {vendor: start for vendor in self.vendors}
+        # Schedule before any budget deferral; lag is measured from here
+        self._scheduled = dict(self.next_poll)
+        self.failures = {vendor: 0 for vendor in self.vendors}
+        self.puck_drops: Dict[str, datetime] = {}
+        self._started = start
+        self._stopped = False
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="odds-db")
+        self._counters = {
+            "cycles": 0,
+            "noop_cycles": 0,
+            "polls": {vendor: 0 for vendor in self.vendors},
+            "errors": {vendor: 0 for vendor in self.vendors},
+            "deferred": 0,
+            "db_busy": 0,
+            "requests": 0,
+            "records": 0,
+            "last_lag_s": 0.0,
+            "max_lag_s": 0.0,
+            "last_cycle_s": 0.0
+        }
+
+    def stop(self):
+        self._stopped = True
+
+    def metrics(self) -> dict:
+        """Counters plus throughput per minute of uptime and the next scheduled polls."""
+        uptime_min = max((self.clock.now() - self._started).total_seconds() / 60, 1 / 60)
+        polls = sum(self._counters["polls"].values())
+        return {
+            **self._counters,
+            "uptime_min": round(uptime_min, 2),
+            "polls_per_min": round(polls / uptime_min, 3),
+            "requests_per_min": round(self._counters["requests"] / uptime_min, 3),
+            "records_per_min": round(self._counters["records"] / uptime_min, 3),
+            "next_poll": {vendor: ts.isoformat() for vendor, ts in self.next_poll.items()},
+            "puck_drops": {vendor: ts.isoformat() for vendor, ts in self.puck_drops.items()}
+        }
+
+    def _write_metrics(self):
+        if not self.metrics_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.metrics_path)), exist_ok=True)
+        with open(self.metrics_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.metrics(), f, indent=2)
+        os.replace(self.metrics_path + ".tmp", self.metrics_path)
+
+    def _schedule(self, vendor: str, result: dict, now: datetime):
+        # 1. Errors: exponential back-off, slower when the vendor is blocking us
+        if result["status"] in ("failed", "timeout", "busy"):
+            self.failures[vendor] += 1
+            self._counters["errors"][vendor] += 1
+            base = BACKOFF_BLOCKED if result.get("http_status") in BLOCKED_STATUSES else BACKOFF_BASE
+            delay = min(base * 2 ** (self.failures[vendor] - 1), BACKOFF_MAX)
+            self.next_poll[vendor] = self._scheduled[vendor] = now + delay
+            logger.warning(f"{vendor}: {result['status']} ({result.get('http_status')}); backing off {delay}")
+            return
+        self.failures[vendor] = 0
+
+        # 2. Adaptive interval; the last poll lands just before puck drop
+        drop = self.puck_drops.get(vendor) or self.puck_drops.get("*")
+        next_poll = now + poll_interval(drop - now if drop else None)
+        if drop is not None and next_poll > drop - FINAL_POLL_LEAD > now:
+            next_poll = drop - FINAL_POLL_LEAD
+        self.next_poll[vendor] = self._scheduled[vendor] = next_poll
+
+    def _capture(self, vendors: Dict[str, Callable], now: datetime):
+        """
+        DB thread: one capture cycle on a fresh connection, then refresh the puck-drop
+        schedule. Returns (None, current puck drops) if the database is locked.
+        """
+        try:
+            con = self.connect()
+        except duckdb.IOException as e:
+            logger.warning(f"Database busy, retrying in {DB_BUSY_RETRY}: {e}")
+            return None, self.puck_drops
+        try:
+            summary = run_capture_cycle(con, self.writer, vendors, lake_root=self.lake_root, delta=self.delta)
+            if self.after_cycle is not None:
+                self.after_cycle(con, summary)
+            return summary, upcoming_puck_drops(con, now)
+        finally:
+            con.close()
+
+    async def run_once(self) -> Optional[dict]:
+        """Captures every vendor that is due and within budget; returns the cycle summary."""
+        now = self.clock.now()
+        batch = []
+        for vendor in sorted(v for v, ts in self.next_poll.items() if ts <= now):
+            cost = VENDOR_REQUEST_COST.get(vendor, 1)
+            if self.budget.try_take(cost):
+                batch.append(vendor)
+                self._counters["requests"] += cost
+            else:
+                self.next_poll[vendor] = now + timedelta(seconds=self.budget.wait_seconds(cost))
+                self._counters["deferred"] += 1
+        if not batch:
+            return None
+
+        # Lag: how late the most overdue poll in this batch starts
+        lag = max((now - self._scheduled[vendor]).total_seconds() for vendor in batch)
+        self._counters["last_lag_s"] = lag
+        self._counters["max_lag_s"] = max(self._counters["max_lag_s"], lag)
+
+        loop = asyncio.get_running_loop()
+        summary, self.puck_drops = await loop.run_in_executor(
+            self._db, self._capture, {vendor: self.vendors[vendor] for vendor in batch}, now
+        )
+        if summary is None:
+            self._counters["db_busy"] += 1
+            for vendor in batch:
+                self.next_poll[vendor] = now + DB_BUSY_RETRY
+            self._write_metrics()
+            return None
+
+        done = self.clock.now()
+        self._counters["cycles"] += 1
+        self._counters["noop_cycles"] += int(is_noop_cycle(summary))
+        self._counters["last_cycle_s"] = max((r.get("seconds", 0.0) for r in summary.values()), default=0.0)
+        for vendor, result in summary.items():
+            self._counters["polls"][vendor] += 1
+            self._counters["records"] += result["records"]
+            self._schedule(vendor, result, done)
+        self._write_metrics()
+        return summary
+
+    async def run(self, until: Optional[datetime] = None):
+        """Polls until stop() is called or the clock reaches until."""
+        try:
+            while not self._stopped and (until is None or self.clock.now() < until):
+                await self.run_once()
+                wake = min(self.next_poll.values())
+                if until is not None:
+                    wake = min(wake, until)
+                await self.clock.sleep(max(0.0, (wake - self.clock.now()).total_seconds()))
+        finally:
+            self._db.shutdown(wait=True)
@@ -1,117 +1,159 @@
+import re
 import requests
 import logging
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from typing import Optional
+import pyarrow as pa
 from tenacity import retry, stop_after_attempt, wait_exponential
+from nhl_bets.common.odds_columns import OddsColumnBuilder
 from nhl_bets.common.storage import save_raw_payload
+from nhl_bets.scrapers.conditional_http import ConditionalFetcher
 
 logger = logging.getLogger(__name__)
 
+# lxml builds the tree faster than the pure-Python html.parser; records are the same with either
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Only the tab strip, market containers and game headers are built into the tree.
+# A regex, since the strainer may see the whole class attribute ("player-props--container tab").
+PROPS_STRAINER = SoupStrainer(class_=re.compile(r"(^|\s)(tab-group|player-props--container|props-game-info)(\s|$)"))
+
+def _props_elements(tag: Tag):
+    """Tab strips, game headers, market containers and prop rows under tag, in document order."""
+    for child in tag.children:
+        if not isinstance(child, Tag):
+            continue
+        classes = child.get("class") or ()
+        if "props-game-info" in classes or "player-props--row" in classes or "tab-group" in classes:
+            yield child
+            continue
+        if "player-props--container" in classes and "tab" in classes:
+            yield child
+        yield from _props_elements(child)
+
 class OddsSharkClient:
     URL = "https://www.oddsshark.com/nhl/odds/player-props"
     
-    def __init__(self, timeout: int = 30):
+    def __init__(self, timeout: int = 30, url: Optional[str] = None, conditional: bool = False):
         self.timeout = timeout
+        self.url = url or self.URL
+        # Polling clients skip unchanged pages (ETag/Last-Modified, else raw-bytes hash)
+        self.fetcher = ConditionalFetcher() if conditional else None
+
+    def commit(self):
+        """Marks the last fetched snapshot as stored (conditional clients compare against it)."""
+        if self.fetcher is not None:
+            self.fetcher.commit()
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def fetch_snapshot(self) -> str:
-        """Fetches the latest prop odds HTML from OddsShark."""
-        logger.info(f"Fetching OddsShark HTML from {self.URL}...")
+    def fetch_snapshot(self) -> Optional[str]:
+        """
+        Fetches the latest prop odds HTML from OddsShark. Conditional clients
+        return None when the page is unchanged since the previous fetch.
+        """
+        logger.info(f"Fetching OddsShark HTML from {self.url}...")
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
-        response = requests.get(self.URL, headers=headers, timeout=(10, self.timeout))
+        if self.fetcher is not None:
+            self.fetcher.rollback()
+            response = self.fetcher.get(self.url, headers=headers, timeout=(10, self.timeout))
+            return None if response is None else response.text
+        response = requests.get(self.url, headers=headers, timeout=(10, self.timeout))
         response.raise_for_status()
         return response.text
 
-    def parse_snapshot(self, html: str, raw_path: str, raw_hash: str, capture_ts: datetime) -> List[Dict[str, Any]]:
-        """Parses the OddsShark HTML into normalized records."""
-        records = []
-        soup = BeautifulSoup(html, 'html.parser')
+    @staticmethod
+    def _tab_market_type(text: str) -> Optional[str]:
+        """Canonical market for an upper-cased tab label (None: unsupported)."""
+        if "POWER PLAY" in text: return None # Skip PPP for now
+        elif "GOALS" == text: return "GOALS" # Exact match or careful contains
+        elif "ASSISTS" == text: return "ASSISTS"
+        elif "POINTS" == text: return "POINTS"
+        elif "SHOTS ON GOAL" in text: return "SOG"
+        elif "BLOCKS" in text or "BLOCKED SHOTS" in text: return "BLOCKS"
+        elif "GOALS" in text: return "GOALS"
+        elif "ASSISTS" in text: return "ASSISTS"
+        elif "POINTS" in text: return "POINTS"
+        return None
+
+    def parse_snapshot(self, html: str, raw_path: str, raw_hash: str, capture_ts: datetime) -> pa.Table:
+        """
+        Parses the OddsShark HTML into normalized records (fact_prop_odds columns).
+        One forward pass in document order: game headers set the current game,
+        containers switch the market, and only rows of supported markets are parsed.
+        """
+        records = OddsColumnBuilder("ODDSSHARK", capture_ts, raw_path, raw_hash)
+        soup = BeautifulSoup(html, HTML_PARSER, parse_only=PROPS_STRAINER)
+        
+        elements = list(_props_elements(soup))
         
         # 1. Identify markets from tabs
         # The tab buttons usually define what the containers below them are.
-        tab_buttons = soup.select(".tab-group.foil .button--tab-primary")
-        market_types = []
-        for btn in tab_buttons:
-            text = btn.get_text(strip=True).upper()
-            if "POWER PLAY" in text: market_types.append(None) # Skip PPP for now
-            elif "GOALS" == text: market_types.append("GOALS") # Exact match or careful contains
-            elif "ASSISTS" == text: market_types.append("ASSISTS")
-            elif "POINTS" == text: market_types.append("POINTS")
-            elif "SHOTS ON GOAL" in text: market_types.append("SOG")
-            elif "BLOCKS" in text or "BLOCKED SHOTS" in text: market_types.append("BLOCKS")
-            elif "GOALS" in text: market_types.append("GOALS")
-            elif "ASSISTS" in text: market_types.append("ASSISTS")
-            elif "POINTS" in text: market_types.append("POINTS")
-            else: market_types.append(None)
-            
-        # 2. Iterate over containers (each container corresponds to a tab)
-        containers = soup.select(".player-props--container.tab")
-        
-        # Sportsbooks are in the header of each container
-        # Note: They might be different per container but usually the same.
+        market_types = [self._tab_market_type(btn.get_text(strip=True).upper())
+                        for el in elements if "tab-group" in el["class"] and "foil" in el["class"]
+                        for btn in el.select(".button--tab-primary")]
         
-        for idx, container in enumerate(containers):
-            if idx >= len(market_types) or market_types[idx] is None:
-                continue # Skip unsupported markets
-                
-            market_type = market_types[idx]
+        # 2. Walk game headers, containers (one per tab) and rows in document order
+        event_name, home_team, away_team = "unknown", None, None
+        container, container_idx, market_type, book_names = None, -1, None, []
+        for el in elements:
+            classes = el["class"]
+            if "tab-group" in classes:
+                continue
             
-            # Find book names in header
-            header_items = container.select(".player-props--header .player-props--item img")
-            book_names = [img.get('alt', '').strip() for img in header_items]
-            # Some headers might not have images or be different. 
-            # Looking at the sample, books start from the 3rd column (index 2).
-            # Index 0: Player, Index 1: Best Odds, Index 2+: Specific Books
+            if "props-game-info" in classes:
+                # Game info looks like: <div class="props-game-info"> <span class="props-teams">ANA @ WSH -</span> ...
+                # Rows belong to the nearest game header before them
+                event_name, home_team, away_team = "unknown", None, None
+                teams_el = el.select_one(".props-teams")
+                if teams_el:
+                    event_name = teams_el.get_text(strip=True).replace(" -", "")
+                    if " @ " in event_name:
+                        away_team, home_team = event_name.split(" @ ")
+                continue
             
-            rows = container.select(".player-props--row")
+            if "player-props--container" in classes and "tab" in classes:
+                container, container_idx = el, container_idx + 1
+                market_type = market_types[container_idx] if container_idx < len(market_types) else None
+                if market_type is not None:
+                    # Sportsbooks are in the header of each container
+                    # Index 0: Player, Index 1: Best Odds, Index 2+: Specific Books
+                    header = el.find(class_="player-props--header")
+                    header_items = header.select(".player-props--item img") if header else []
+                    book_names = [img.get('alt', '').strip() for img in header_items]
+                continue
             
-            # Find game info preceding the rows
-            # Game info looks like: <div class="props-game-info"> <span class="props-teams">ANA @ WSH -</span> ...
+            if market_type is None or not any(parent is container for parent in el.parents):
+                continue # Unsupported market, or a row outside any market container
             
-            for row in rows:
-                event_id = row.get('data-event', 'unknown')
-                
-                # Find the game info by looking at the previous sibling that is not a row
-                game_info = row.find_previous(class_="props-game-info")
-                event_name = "unknown"
-                home_team = None
-                away_team = None
-                if game_info:
-                    teams_el = game_info.select_one(".props-teams")
-                    if teams_el:
-                        event_name = teams_el.get_text(strip=True).replace(" -", "")
-                        if " @ " in event_name:
-                            away_team, home_team = event_name.split(" @ ")
-                
-                player_name_el = row.select_one(".player-name")
-                if not player_name_el:
-                    continue
-                player_name = player_name_el.get_text(strip=True)
+            event_id = el.get('data-event', 'unknown')
+            player_name_el = el.find(class_="player-name")
+            if not player_name_el:
+                continue
+            player_name = player_name_el.get_text(strip=True)
+            
+            # Each book-row corresponds to a column in the header
+            for cell_idx, cell in enumerate(el.find_all(class_="book-row")):
+                if cell_idx == 0: continue # Skip Best Odds column
                 
-                # Each book-row corresponds to a column in the header
-                book_cells = row.select(".book-row")
-                # Skip the "Best Odds" cell (usually the first book-row)
+                # book_cells[0] is Best Odds, book_cells[1] is the first book in the header
+                header_idx = cell_idx - 1
+                if header_idx >= len(book_names):
+                    book_name = f"Unknown Book {header_idx}"
+                else:
+                    book_name = book_names[header_idx]
                 
-                for cell_idx, cell in enumerate(book_cells):
-                    if cell_idx == 0: continue # Skip Best Odds column
-                    
-                    # Header index for book name would be cell_idx - 1 if we skip Player/Best Odds
-                    # Wait, book_cells[0] is Best Odds. book_cells[1] is the first book.
-                    # header_items[0] is usually the first book.
-                    header_idx = cell_idx - 1
-                    if header_idx >= len(book_names):
-                        book_name = f"Unknown Book {header_idx}"
-                    else:
-                        book_name = book_names[header_idx]
-                    
-                    # Each cell might have Over and Under
-                    odds_divs = cell.select(".player-props-odds > div")
-                    for div in odds_divs:
-                        info_el = div.select_one(".odds-info")
-                        detail_el = div.select_one(".odds-detail")
+                # Each cell might have Over and Under
+                for odds_el in cell.find_all(class_="player-props-odds"):
+                    for div in odds_el.find_all("div", recursive=False):
+                        info_el = div.find(class_="odds-info")
+                        detail_el = div.find(class_="odds-detail")
                         
                         if not info_el or not detail_el:
                             continue
@@ -131,41 +173,37 @@ class OddsSharkClient:
                         try:
                             line = float(line_raw)
                             price_american = int(detail_text.replace("+", ""))
-                            
-                            # Calculate decimal odds
-                            odds_decimal = None
-                            if price_american > 0:
-                                odds_decimal = (price_american / 100) + 1
-                            elif price_american < 0:
-                                odds_decimal = (100 / abs(price_american)) + 1
-                                
-                            records.append({
-                                "source_vendor": "ODDSSHARK",
-                                "capture_ts_utc": capture_ts,
-                                "event_id_vendor": event_id,
-                                "event_name_raw": event_name,
-                                "event_start_ts_utc": None, # HTML doesn't easily give UTC timestamp per row
-                                "home_team": home_team,
-                                "away_team": away_team,
-                                "player_id_vendor": None,
-                                "player_name_raw": player_name,
-                                "market_type": market_type,
-                                "line": line,
-                                "side": side,
-                                "book_id_vendor": book_name.lower().replace(" ", "_"),
-                                "book_name_raw": book_name,
-                                "odds_american": price_american,
-                                "odds_decimal": odds_decimal,
-                                "is_live": False,
-                                "raw_payload_path": raw_path,
-                                "raw_payload_hash": raw_hash
-                            })
                         except (ValueError, TypeError):
                             continue
+                        
+                        # Calculate decimal odds
+                        odds_decimal = None
+                        if price_american > 0:
+                            odds_decimal = (price_american / 100) + 1
+                        elif price_american < 0:
+                            odds_decimal = (100 / abs(price_american)) + 1
+                        
+                        records.append(
+                            event_id_vendor=event_id,
+                            event_name_raw=event_name,
+                            event_start_ts_utc=None, # HTML doesn't easily give UTC timestamp per row
+                            home_team=home_team,
+                            away_team=away_team,
+                            player_id_vendor=None,
+                            player_name_raw=player_name,
+                            market_type=market_type,
+                            line=line,
+                            side=side,
+                            book_id_vendor=book_name.lower().replace(" ", "_"),
+                            book_name_raw=book_name,
+                            odds_american=price_american,
+                            odds_decimal=odds_decimal,
+                            is_live=False
+                        )
                             
-        return records
+        return records.to_table()
 
-    def run_ingestion(self) -> List[Dict[str, Any]]:
+    def run_ingestion(self) -> pa.Table:
         """Fetch, save, and parse OddsShark odds."""
         html = self.fetch_snapshot()
         rel_path, sha_hash, capture_ts = save_raw_payload("ODDSSHARK", html, "html")
@@ -173,6 +211,6 @@ class OddsSharkClient:
         logger.info(f"Saved OddsShark snapshot to {rel_path} (hash: {sha_hash})")
         
         normalized_records = self.parse_snapshot(html, rel_path, sha_hash, capture_ts)
-        logger.info(f"Parsed {len(normalized_records)} records from OddsShark snapshot.")
+        logger.info(f"Parsed {normalized_records.num_rows} records from OddsShark snapshot.")
         
         return normalized_records
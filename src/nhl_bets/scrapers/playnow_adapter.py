@@ -1,7 +1,9 @@
 import re
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional
+import pyarrow as pa
+from nhl_bets.common.odds_columns import OddsColumnBuilder
 from nhl_bets.common.storage import save_raw_payload
 
 logger = logging.getLogger(__name__)
@@ -30,11 +32,11 @@ class PlayNowAdapter:
             return 'GOALS'
         return None
 
-    def parse_event_details(self, data: Dict[str, Any], raw_path: str, raw_hash: str, capture_ts: datetime) -> List[Dict[str, Any]]:
+    def parse_event_details(self, data: Dict[str, Any], raw_path: str, raw_hash: str, capture_ts: datetime) -> pa.Table:
         """
-        Parses the detailed 'events-by-ids' response.
+        Parses the detailed 'events-by-ids' response into fact_prop_odds columns.
         """
-        records = []
+        records = OddsColumnBuilder("PLAYNOW", capture_ts, raw_path, raw_hash)
         events = data.get('data', {}).get('events', [])
         
         for event in events:
@@ -113,26 +115,22 @@ class PlayNowAdapter:
                             elif price_decimal > 1.0:
                                 price_american = -100 / (price_decimal - 1)
                     
-                    records.append({
-                        "source_vendor": "PLAYNOW",
-                        "capture_ts_utc": capture_ts,
-                        "event_id_vendor": event_id,
-                        "event_name_raw": event_name,
-                        "event_start_ts_utc": start_time,
-                        "home_team": home_team,
-                        "away_team": away_team,
-                        "player_id_vendor": None, # PlayNow doesn't give a stable player ID in this payload
-                        "player_name_raw": current_player,
-                        "market_type": market_type,
-                        "line": float(line),
-                        "side": side,
-                        "book_id_vendor": "PLAYNOW",
-                        "book_name_raw": "PlayNow",
-                        "odds_american": int(round(price_american)) if price_american is not None else None,
-                        "odds_decimal": float(price_decimal) if price_decimal is not None else None,
-                        "is_live": False, # Assume pre-game unless otherwise indicated
-                        "raw_payload_path": raw_path,
-                        "raw_payload_hash": raw_hash
-                    })
+                    records.append(
+                        event_id_vendor=event_id,
+                        event_name_raw=event_name,
+                        event_start_ts_utc=start_time,
+                        home_team=home_team,
+                        away_team=away_team,
+                        player_id_vendor=None, # PlayNow doesn't give a stable player ID in this payload
+                        player_name_raw=current_player,
+                        market_type=market_type,
+                        line=float(line),
+                        side=side,
+                        book_id_vendor="PLAYNOW",
+                        book_name_raw="PlayNow",
+                        odds_american=int(round(price_american)) if price_american is not None else None,
+                        odds_decimal=float(price_decimal) if price_decimal is not None else None,
+                        is_live=False # Assume pre-game unless otherwise indicated
+                    )
                     
-        return records
+        return records.to_table()
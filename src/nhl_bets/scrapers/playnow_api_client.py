@@ -1,15 +1,36 @@
 import requests
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from tenacity import retry, stop_after_attempt, wait_exponential
+from nhl_bets.scrapers.conditional_http import ConditionalFetcher
 
 logger = logging.getLogger(__name__)
 
+# events-by-ids requests: event ids per request, and requests in flight
+DETAIL_CHUNK_SIZE = 4
+DETAIL_WORKERS = 4
+# Set on a merged events-by-ids response when some chunks failed: the ids left out
+FAILED_EVENTS_KEY = "failed_event_ids"
+
 class PlayNowAPIClient:
     BASE_URL = "https://content.sb.playnow.com/content-service/api/v1/q"
     
-    def __init__(self, cookie=None):
+    def __init__(self, cookie=None, base_url=None, conditional=False, detail_chunk_size=DETAIL_CHUNK_SIZE,
+                 detail_workers=DETAIL_WORKERS):
+        self.base_url = base_url or self.BASE_URL
         self.session = requests.Session()
+        # Polling clients skip unchanged responses (ETag/Last-Modified, else raw-bytes hash)
+        self.fetcher = ConditionalFetcher(self.session) if conditional else None
+        self.last_event_list = None
+        self._last_chunks = {}
+        self._pending_chunks = None
+        self.detail_chunk_size = detail_chunk_size
+        self.detail_workers = detail_workers
+        # Connection pool sized for parallel detail chunks
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=detail_workers))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=detail_workers))
         self.cookie = cookie or os.environ.get("PLAYNOW_COOKIE")
         
         self.headers = {
@@ -24,11 +45,34 @@ class PlayNowAPIClient:
         else:
             logger.info("No PlayNow cookie provided; proceeding without it.")
 
+    def _get_json(self, url, params):
+        if self.fetcher is not None:
+            response = self.fetcher.get(url, params=params, headers=self.headers, timeout=15)
+            if response is None:
+                return url, None
+        else:
+            response = self.session.get(url, headers=self.headers, params=params, timeout=15)
+            response.raise_for_status()
+        return response.url, response.json()
+
+    def commit(self):
+        """
+        Marks the last fetched event list and details as stored: conditional clients
+        compare later responses (and reuse unchanged chunks) against them.
+        """
+        if self.fetcher is not None:
+            self.fetcher.commit()
+            if self._pending_chunks is not None:
+                self._last_chunks = self._pending_chunks
+                self._pending_chunks = None
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
     def fetch_event_list(self, drilldown_tag_ids="220", include_child_markets=True, event_sorts="MTCH,TNMT"):
         """
         Fetches the list of events for a given competition (NHL is 220).
-        Returns (request_url, response_json).
+        Returns (request_url, response_json); response_json is None for a
+        conditional client when the list is unchanged since the last commit().
+        This starts a capture: validators not committed since are dropped.
         """
         params = {
             "eventSortsIncluded": event_sorts,
@@ -37,29 +81,97 @@ class PlayNowAPIClient:
             "lang": "en-US",
             "channel": "I"
         }
-        url = f"{self.BASE_URL}/event-list"
+        url = f"{self.base_url}/event-list"
         logger.info(f"Fetching event list from {url} with params {params}")
-        response = self.session.get(url, headers=self.headers, params=params, timeout=15)
-        response.raise_for_status()
-        return response.url, response.json()
+        if self.fetcher is not None:
+            self.fetcher.rollback()
+            self._pending_chunks = None
+        request_url, data = self._get_json(url, params)
+        if data is not None:
+            self.last_event_list = data
+        return request_url, data
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def fetch_event_details(self, event_ids, include_child_markets=True):
-        """
-        Fetches detailed info for specific event IDs.
-        Returns (request_url, response_json).
-        """
-        if isinstance(event_ids, list):
-            event_ids = ",".join(map(str, event_ids))
-            
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), reraise=True)
+    def _fetch_event_chunk(self, event_ids, include_child_markets, refetch=False):
         params = {
-            "eventIds": event_ids,
+            "eventIds": ",".join(map(str, event_ids)),
             "includeChildMarkets": str(include_child_markets).lower(),
             "lang": "en-US",
             "channel": "I"
         }
-        url = f"{self.BASE_URL}/events-by-ids"
-        logger.info(f"Fetching event details from {url} (eventIds: {event_ids})")
-        response = self.session.get(url, headers=self.headers, params=params, timeout=15)
-        response.raise_for_status()
-        return response.url, response.json()
+        url = f"{self.base_url}/events-by-ids"
+        if refetch and self.fetcher is not None:
+            self.fetcher.forget(url, params)
+        return self._get_json(url, params)
+
+    def fetch_event_details(self, event_ids, include_child_markets=True, chunk_size=None, max_workers=None):
+        """
+        Fetches detailed info for specific event IDs, chunk_size ids per request with
+        up to max_workers requests in flight on the shared session. Each chunk is
+        retried on its own; a chunk that still fails is logged and left out, so one
+        bad event cannot sink the slate. Chunk responses are merged into the shape of
+        a single events-by-ids response; if chunks were left out, their event ids are
+        listed under FAILED_EVENTS_KEY and the response is a partial snapshot.
+        Returns (request_url, response_json); response_json is None for a
+        conditional client when no chunk changed since the last commit().
+        """
+        if isinstance(event_ids, str):
+            event_ids = event_ids.split(",")
+        event_ids = list(event_ids)
+        chunk_size = chunk_size or self.detail_chunk_size
+        chunks = [tuple(event_ids[i:i + chunk_size]) for i in range(0, len(event_ids), chunk_size)]
+        url = requests.Request("GET", f"{self.base_url}/events-by-ids", params={
+            "eventIds": ",".join(map(str, event_ids)),
+            "includeChildMarkets": str(include_child_markets).lower(),
+            "lang": "en-US",
+            "channel": "I"
+        }).prepare().url
+        logger.info(f"Fetching event details for {len(event_ids)} events in {len(chunks)} chunks")
+
+        # 1. Fetch chunks concurrently
+        results, errors = {}, []
+        with ThreadPoolExecutor(max_workers=min(max_workers or self.detail_workers, len(chunks)) or 1) as pool:
+            futures = {pool.submit(self._fetch_event_chunk, chunk, include_child_markets): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results[chunk] = future.result()[1]
+                except Exception as e:
+                    logger.error(f"PlayNow event details failed for events {','.join(map(str, chunk))}: {e}")
+                    errors.append(e)
+
+        # 2. Conditional clients: a chunk reported unchanged that the last stored snapshot
+        # does not hold (its boundaries moved back to an earlier split) is fetched again in full
+        if self.fetcher is not None:
+            for chunk in [c for c, data in results.items() if data is None and c not in self._last_chunks]:
+                try:
+                    results[chunk] = self._fetch_event_chunk(chunk, include_child_markets, refetch=True)[1]
+                except Exception as e:
+                    logger.error(f"PlayNow event details failed for events {','.join(map(str, chunk))}: {e}")
+                    del results[chunk]
+                    errors.append(e)
+        if errors and len(errors) == len(chunks):
+            raise errors[0]
+
+        # 3. Conditional clients: reuse the last stored events of unchanged chunks; unchanged
+        # only if the chunks are also the ones last stored
+        if self.fetcher is not None:
+            if set(chunks) == set(self._last_chunks) and all(results.get(chunk) is None for chunk in chunks):
+                return url, None
+            for chunk, data in results.items():
+                if data is None:
+                    results[chunk] = self._last_chunks[chunk]
+            self._pending_chunks = {chunk: results[chunk] for chunk in chunks if chunk in results}
+
+        # 4. Merge in request order into one events-by-ids shaped response
+        merged = None
+        for chunk in chunks:
+            data = results.get(chunk)
+            if data is None:
+                continue
+            if merged is None:
+                merged = {**data, "data": {**data.get("data", {}), "events": []}}
+            merged["data"]["events"].extend(data.get("data", {}).get("events", []))
+        if errors:
+            merged[FAILED_EVENTS_KEY] = [event_id for chunk in chunks if chunk not in results for event_id in chunk]
+        return url, merged
@@ -11,26 +11,34 @@ Chrome DevTools Capture:
 4. Right-click the request -> Copy -> Copy as cURL to see full headers/cookies.
 5. If cookies are required, set the PLAYNOW_COOKIE environment variable.
 
+Raw responses are stored once per content hash (content-addressed payload +
+a reference row in raw_playnow_responses); market rows are appended only when an
+outcome's price or details change. --compact migrates/collapses older tables.
+
 Usage:
     python src/nhl_bets/scrapers/scrape_playnow_api.py
+    python src/nhl_bets/scrapers/scrape_playnow_api.py --compact
 """
 
+import argparse
 import os
 import sys
 import json
 import logging
 import datetime
-import pandas as pd
 import duckdb
+import pandas as pd
 import re
 
 # Ensure project root is in path for nhl_bets import
-project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 src_dir = os.path.join(project_root, "src")
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
 from nhl_bets.scrapers.playnow_api_client import PlayNowAPIClient
+from nhl_bets.common.db_init import get_db_connection
+from nhl_bets.common.storage import save_raw_payload
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -38,12 +46,28 @@ logger = logging.getLogger(__name__)
 
 DB_PATH = 'data/db/nhl_backtest.duckdb'
 RAW_RESPONSES_TABLE = 'raw_playnow_responses'
+# The pre-dedup raw table while it is being migrated (see _migrate_legacy_raw_responses)
+LEGACY_RAW_RESPONSES_TABLE = f'{RAW_RESPONSES_TABLE}_legacy'
 FACT_MARKETS_TABLE = 'fact_playnow_markets'
 
+# Endpoint -> save_raw_payload suffix (same names as the odds capture pipeline)
+ENDPOINT_SUFFIXES = {'event-list': 'event_list', 'events-by-ids': 'details'}
+
+# fact_playnow_markets: one outcome is (event_id, market_id, outcome_id); a new row is
+# appended only when one of the value columns differs from the outcome's latest row
+MARKET_KEY_COLUMNS = ['event_id', 'market_id', 'outcome_id']
+MARKET_VALUE_COLUMNS = ['event_name', 'start_time', 'market_name', 'outcome_name',
+                        'price_decimal', 'price_numerator', 'price_denominator', 'channel']
+FACT_MARKETS_COLUMNS = """
+    event_id VARCHAR, event_name VARCHAR, start_time TIMESTAMP, market_id VARCHAR, market_name VARCHAR,
+    outcome_id VARCHAR, outcome_name VARCHAR, price_decimal DOUBLE, price_numerator INTEGER,
+    price_denominator INTEGER, channel VARCHAR, captured_at TIMESTAMP
+"""
+
 def slugify(text):
     return text.lower().replace(' at ', '-at-').replace(' ', '-').replace("'", "").replace(".", "")
 
-def extract_market_rows(event):
+def extract_market_rows(event, captured_at=None):
     normalized_rows = []
     legacy_rows = []
     
@@ -97,7 +121,7 @@ def extract_market_rows(event):
                 'price_numerator': outcome['prices'][0].get('numerator') if outcome.get('prices') else None,
                 'price_denominator': outcome['prices'][0].get('denominator') if outcome.get('prices') else None,
                 'channel': 'I',
-                'captured_at': datetime.datetime.now()
+                'captured_at': captured_at
             })
             
             # Legacy CSV Rows
@@ -156,21 +180,228 @@ def extract_market_rows(event):
 
     return normalized_rows, legacy_rows
 
+def _utc_naive(ts):
+    return ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+def _table_exists(con: duckdb.DuckDBPyConnection, table: str) -> bool:
+    return con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]).fetchone()[0] > 0
+
+def init_playnow_tables(con: duckdb.DuckDBPyConnection) -> bool:
+    """
+    Creates the PlayNow tables. Returns True if raw_playnow_responses still has the
+    legacy layout (one JSON body per run), or an interrupted migration left the
+    legacy table behind; _migrate_legacy_raw_responses (re)runs the migration.
+    """
+    con.execute(f"""
+    CREATE TABLE IF NOT EXISTS {RAW_RESPONSES_TABLE} (
+        payload_hash VARCHAR PRIMARY KEY,
+        endpoint VARCHAR NOT NULL,
+        request_url VARCHAR,
+        file_path VARCHAR NOT NULL,
+        first_captured_at TIMESTAMP NOT NULL,
+        last_captured_at TIMESTAMP NOT NULL,
+        capture_count INTEGER NOT NULL DEFAULT 1
+    )
+    """)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {FACT_MARKETS_TABLE} ({FACT_MARKETS_COLUMNS})")
+    columns = con.execute("SELECT column_name FROM information_schema.columns WHERE table_name = ?",
+                          [RAW_RESPONSES_TABLE]).fetchall()
+    return ("payload_json",) in columns or _table_exists(con, LEGACY_RAW_RESPONSES_TABLE)
+
+def register_raw_response(con: duckdb.DuckDBPyConnection, endpoint: str, request_url: str, payload,
+                          capture_ts=None):
+    """
+    Saves a response to the content-addressed payload store and references it by hash
+    in raw_playnow_responses; a repeat of known content only moves last_captured_at and
+    bumps capture_count. Returns (file_path, payload_hash, capture_ts).
+    """
+    rel_path, sha_hash, capture_ts = save_raw_payload("PLAYNOW", payload, "json", suffix=ENDPOINT_SUFFIXES[endpoint],
+                                                      capture_ts=capture_ts)
+    ts = _utc_naive(capture_ts)
+    con.execute(f"""
+    INSERT INTO {RAW_RESPONSES_TABLE} VALUES (?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT (payload_hash) DO UPDATE SET
+        first_captured_at = least(first_captured_at, excluded.first_captured_at),
+        last_captured_at = greatest(last_captured_at, excluded.last_captured_at),
+        capture_count = capture_count + 1
+    """, [sha_hash, endpoint, request_url, rel_path, ts, ts])
+    return rel_path, sha_hash, capture_ts
+
+def append_market_changes(con: duckdb.DuckDBPyConnection, rows) -> int:
+    """
+    Appends market rows whose outcome is new or whose values differ from the outcome's
+    latest stored row (see MARKET_VALUE_COLUMNS). Returns the number of rows appended.
+    """
+    if not rows:
+        return 0
+    keys = ", ".join(MARKET_KEY_COLUMNS)
+    join_keys = " AND ".join(f"l.{c} = n.{c}" for c in MARKET_KEY_COLUMNS)
+    new_values = ", ".join(f"n.{c}" for c in MARKET_VALUE_COLUMNS)
+    old_values = ", ".join(f"l.{c}" for c in MARKET_VALUE_COLUMNS)
+    
+    # 1. Typed staging, one row per outcome
+    con.register("stg_playnow_input", pd.DataFrame(rows))
+    try:
+        con.execute(f"CREATE OR REPLACE TEMP TABLE stg_playnow_markets ({FACT_MARKETS_COLUMNS})")
+        con.execute(f"""
+        INSERT INTO stg_playnow_markets BY NAME
+        SELECT * FROM stg_playnow_input
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY {keys}) = 1
+        """)
+        
+        # 2. Compare with each outcome's latest row (only events in this batch are scanned)
+        appended = con.execute(f"""
+        INSERT INTO {FACT_MARKETS_TABLE} BY NAME
+        SELECT n.* FROM stg_playnow_markets n
+        LEFT JOIN (
+            SELECT * FROM {FACT_MARKETS_TABLE}
+            WHERE event_id IN (SELECT DISTINCT event_id FROM stg_playnow_markets)
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY captured_at DESC) = 1
+        ) l ON {join_keys}
+        WHERE l.event_id IS NULL OR ({new_values}) IS DISTINCT FROM ({old_values})
+        """).fetchone()[0]
+    finally:
+        con.execute("DROP TABLE IF EXISTS stg_playnow_markets")
+        con.unregister("stg_playnow_input")
+    return appended
+
+def _migrate_legacy_raw_responses(con: duckdb.DuckDBPyConnection, legacy_timezone: str = None):
+    """
+    Replaces the legacy JSON-body raw table by reference rows: each distinct payload
+    is written once to the payload store, indexed at its first capture. The legacy
+    table is set aside as raw_playnow_responses_legacy and dropped in the transaction
+    that inserts the reference rows, so an interrupted migration resumes from it.
+    The legacy scraper stamped captured_at in local time (legacy_timezone, default
+    the session TimeZone); raw and market rows are converted to naive UTC like new
+    captures.
+    """
+    legacy = LEGACY_RAW_RESPONSES_TABLE
+    legacy_timezone = legacy_timezone or con.execute("SELECT current_setting('TimeZone')").fetchone()[0]
+    
+    # 1. Set the legacy table aside (already done if a previous run was interrupted)
+    if not _table_exists(con, legacy):
+        con.begin()
+        try:
+            con.execute(f"ALTER TABLE {RAW_RESPONSES_TABLE} RENAME TO {legacy}")
+            init_playnow_tables(con)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+    else:
+        logger.info(f"Resuming the migration from {legacy}")
+        init_playnow_tables(con)
+    
+    # 2. One group per distinct body; bodies that differ only in key order share a hash
+    refs = {}
+    cursor = con.cursor()
+    cursor.execute(f"""
+    SELECT endpoint, body, arg_min(request_url, captured_utc), MIN(captured_utc), MAX(captured_utc), count(*)
+    FROM (
+        SELECT *, CAST(payload_json AS VARCHAR) AS body, timezone('UTC', timezone(?, captured_at)) AS captured_utc
+        FROM {legacy}
+    )
+    GROUP BY endpoint, body
+    ORDER BY MIN(captured_utc)
+    """, [legacy_timezone])
+    while batch := cursor.fetchmany(100):
+        for endpoint, body, request_url, first, last, n in batch:
+            first = first.replace(tzinfo=datetime.timezone.utc)
+            rel_path, sha_hash, _ = save_raw_payload("PLAYNOW", json.loads(body), "json",
+                                                     suffix=ENDPOINT_SUFFIXES.get(endpoint), capture_ts=first)
+            ref = refs.setdefault(sha_hash, [sha_hash, endpoint, request_url, rel_path, first.replace(tzinfo=None), last, 0])
+            ref[5] = max(ref[5], last)
+            ref[6] += n
+    cursor.close()
+    
+    # 3. Swap in the reference rows and move the legacy market rows to UTC
+    con.begin()
+    try:
+        if refs:
+            con.executemany(f"""
+            INSERT INTO {RAW_RESPONSES_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (payload_hash) DO UPDATE SET
+                first_captured_at = least(first_captured_at, excluded.first_captured_at),
+                last_captured_at = greatest(last_captured_at, excluded.last_captured_at),
+                capture_count = capture_count + excluded.capture_count
+            """, list(refs.values()))
+        con.execute(f"UPDATE {FACT_MARKETS_TABLE} SET captured_at = timezone('UTC', timezone(?, captured_at))",
+                    [legacy_timezone])
+        con.execute(f"DROP TABLE {legacy}")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+def compact_playnow_tables(con: duckdb.DuckDBPyConnection, legacy_timezone: str = None) -> dict:
+    """
+    Collapses existing duplicates: migrates a legacy raw_playnow_responses to one
+    reference row per distinct payload (see _migrate_legacy_raw_responses), and drops
+    market rows that repeat their outcome's previous values. Returns row counts
+    before/after for both tables.
+    """
+    legacy = init_playnow_tables(con)
+    raw_table = LEGACY_RAW_RESPONSES_TABLE if _table_exists(con, LEGACY_RAW_RESPONSES_TABLE) else RAW_RESPONSES_TABLE
+    counts = {"raw_before": con.execute(f"SELECT count(*) FROM {raw_table}").fetchone()[0]}
+    if legacy:
+        _migrate_legacy_raw_responses(con, legacy_timezone)
+    counts["raw_after"] = con.execute(f"SELECT count(*) FROM {RAW_RESPONSES_TABLE}").fetchone()[0]
+    
+    keys = ", ".join(MARKET_KEY_COLUMNS)
+    values = ", ".join(MARKET_VALUE_COLUMNS)
+    previous = ", ".join(f"LAG({c}) OVER w" for c in MARKET_VALUE_COLUMNS)
+    counts["markets_before"] = con.execute(f"SELECT count(*) FROM {FACT_MARKETS_TABLE}").fetchone()[0]
+    con.begin()
+    try:
+        con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE stg_playnow_compacted AS
+        SELECT * FROM {FACT_MARKETS_TABLE}
+        WINDOW w AS (PARTITION BY {keys} ORDER BY captured_at)
+        QUALIFY ROW_NUMBER() OVER w = 1 OR ({values}) IS DISTINCT FROM ({previous})
+        """)
+        con.execute(f"DELETE FROM {FACT_MARKETS_TABLE}")
+        con.execute(f"INSERT INTO {FACT_MARKETS_TABLE} SELECT * FROM stg_playnow_compacted ORDER BY captured_at")
+        con.execute("DROP TABLE stg_playnow_compacted")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    counts["markets_after"] = con.execute(f"SELECT count(*) FROM {FACT_MARKETS_TABLE}").fetchone()[0]
+    return counts
+
 def main():
+    parser = argparse.ArgumentParser(description="Scrape NHL player props from the PlayNow API")
+    parser.add_argument("--compact", action="store_true",
+                        help="Collapse duplicate raw responses and unchanged market rows, then exit")
+    args = parser.parse_args()
+    
+    if args.compact:
+        con = get_db_connection(DB_PATH)
+        try:
+            logger.info(f"Compaction: {compact_playnow_tables(con)}")
+        finally:
+            con.close()
+        return
+    
     client = PlayNowAPIClient()
     con = None
     try:
-        con = duckdb.connect(DB_PATH)
-        con.execute(f"CREATE TABLE IF NOT EXISTS {RAW_RESPONSES_TABLE} (captured_at TIMESTAMP, endpoint VARCHAR, request_url VARCHAR, payload_json JSON)")
-        con.execute(f"CREATE TABLE IF NOT EXISTS {FACT_MARKETS_TABLE} (event_id VARCHAR, event_name VARCHAR, start_time TIMESTAMP, market_id VARCHAR, market_name VARCHAR, outcome_id VARCHAR, outcome_name VARCHAR, price_decimal DOUBLE, price_numerator INTEGER, price_denominator INTEGER, channel VARCHAR, captured_at TIMESTAMP)")
+        con = get_db_connection(DB_PATH)
+        if init_playnow_tables(con):
+            logger.info(f"{RAW_RESPONSES_TABLE} has the legacy layout; migrating...")
+            _migrate_legacy_raw_responses(con)
     except Exception as e:
         logger.error(f"Failed to connect to DuckDB: {e}")
+        # Nothing is written while a migration is pending: its UTC conversion covers every market row
+        if con:
+            con.close()
+            con = None
     
     try:
         # Fetch event list with multiple sorts to be thorough
         url, data = client.fetch_event_list(event_sorts="MTCH,TNMT")
         if con:
-            con.execute(f"INSERT INTO {RAW_RESPONSES_TABLE} VALUES (current_timestamp, 'event-list', ?, ?)", [url, json.dumps(data)])
+            register_raw_response(con, 'event-list', url, data)
         
         events = data.get('data', {}).get('events', [])
         # Include events that have markets (marketCount > 0)
@@ -186,21 +417,24 @@ def main():
             return
 
         url_det, data_det = client.fetch_event_details(event_ids)
+        # One capture time (UTC) for every market row of this run
+        captured_at = datetime.datetime.now(datetime.timezone.utc)
         if con:
-            con.execute(f"INSERT INTO {RAW_RESPONSES_TABLE} VALUES (current_timestamp, 'events-by-ids', ?, ?)", [url_det, json.dumps(data_det)])
+            _, _, captured_at = register_raw_response(con, 'events-by-ids', url_det, data_det)
+        captured_at = _utc_naive(captured_at)
         
         all_normalized_rows = []
         all_legacy_rows = []
         
         detailed_events = data_det.get('data', {}).get('events', [])
         for event in detailed_events:
-            norm_rows, leg_rows = extract_market_rows(event)
+            norm_rows, leg_rows = extract_market_rows(event, captured_at)
             all_normalized_rows.extend(norm_rows)
             all_legacy_rows.extend(leg_rows)
                 
         if con and all_normalized_rows:
-            df_norm = pd.DataFrame(all_normalized_rows)
-            con.append(FACT_MARKETS_TABLE, df_norm)
+            appended = append_market_changes(con, all_normalized_rows)
+            logger.info(f"{appended} of {len(all_normalized_rows)} market rows changed since the last run.")
             
         csv_path = "nhl_player_props.csv"
         df_legacy = pd.DataFrame(all_legacy_rows) if all_legacy_rows else pd.DataFrame(columns=['Game','Market','Sub_Header','Player','Odds_1','Odds_2','Raw_Line','Game_Date'])
@@ -1,9 +1,12 @@
 import requests
 import logging
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional
+import pyarrow as pa
 from tenacity import retry, stop_after_attempt, wait_exponential
+from nhl_bets.common.odds_columns import OddsColumnBuilder
 from nhl_bets.common.storage import save_raw_payload
+from nhl_bets.scrapers.conditional_http import ConditionalFetcher
 
 logger = logging.getLogger(__name__)
 
@@ -20,20 +23,35 @@ class UnabatedClient:
         129: "GOALS"
     }
     
-    def __init__(self, timeout: int = 30):
+    def __init__(self, timeout: int = 30, url: Optional[str] = None, conditional: bool = False):
         self.timeout = timeout
+        self.url = url or self.URL
+        # Polling clients skip unchanged snapshots (ETag/Last-Modified, else raw-bytes hash)
+        self.fetcher = ConditionalFetcher() if conditional else None
+
+    def commit(self):
+        """Marks the last fetched snapshot as stored (conditional clients compare against it)."""
+        if self.fetcher is not None:
+            self.fetcher.commit()
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def fetch_snapshot(self) -> Dict[str, Any]:
-        """Fetches the latest prop odds snapshot from Unabated."""
-        logger.info(f"Fetching Unabated snapshot from {self.URL}...")
-        response = requests.get(self.URL, timeout=(10, self.timeout))
+    def fetch_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        Fetches the latest prop odds snapshot from Unabated. Conditional clients
+        return None when it is unchanged since the previous fetch.
+        """
+        logger.info(f"Fetching Unabated snapshot from {self.url}...")
+        if self.fetcher is not None:
+            self.fetcher.rollback()
+            response = self.fetcher.get(self.url, timeout=(10, self.timeout))
+            return None if response is None else response.json()
+        response = requests.get(self.url, timeout=(10, self.timeout))
         response.raise_for_status()
         return response.json()
 
-    def parse_snapshot(self, data: Dict[str, Any], raw_path: str, raw_hash: str, capture_ts: datetime) -> List[Dict[str, Any]]:
-        """Parses the Unabated JSON into normalized records."""
-        records = []
+    def parse_snapshot(self, data: Dict[str, Any], raw_path: str, raw_hash: str, capture_ts: datetime) -> pa.Table:
+        """Parses the Unabated JSON into normalized records (fact_prop_odds columns)."""
+        records = OddsColumnBuilder("UNABATED", capture_ts, raw_path, raw_hash)
         
         people = data.get("people", {})
         market_sources = {str(ms["id"]): ms["name"] for ms in data.get("marketSources", [])}
@@ -98,31 +116,27 @@ class UnabatedClient:
                     elif price_american < 0:
                         odds_decimal = (100 / abs(price_american)) + 1
                     
-                    records.append({
-                        "source_vendor": "UNABATED",
-                        "capture_ts_utc": capture_ts,
-                        "event_id_vendor": event_id,
-                        "event_name_raw": event_name,
-                        "event_start_ts_utc": event_start,
-                        "home_team": home_team,
-                        "away_team": away_team,
-                        "player_id_vendor": person_id,
-                        "player_name_raw": player_name,
-                        "market_type": market_type,
-                        "line": float(line),
-                        "side": side,
-                        "book_id_vendor": book_id,
-                        "book_name_raw": book_name,
-                        "odds_american": int(price_american),
-                        "odds_decimal": odds_decimal,
-                        "is_live": prop.get("live", False),
-                        "raw_payload_path": raw_path,
-                        "raw_payload_hash": raw_hash
-                    })
+                    records.append(
+                        event_id_vendor=event_id,
+                        event_name_raw=event_name,
+                        event_start_ts_utc=event_start,
+                        home_team=home_team,
+                        away_team=away_team,
+                        player_id_vendor=person_id,
+                        player_name_raw=player_name,
+                        market_type=market_type,
+                        line=float(line),
+                        side=side,
+                        book_id_vendor=book_id,
+                        book_name_raw=book_name,
+                        odds_american=int(price_american),
+                        odds_decimal=odds_decimal,
+                        is_live=prop.get("live", False)
+                    )
                     
-        return records
+        return records.to_table()
 
-    def run_ingestion(self) -> List[Dict[str, Any]]:
+    def run_ingestion(self) -> pa.Table:
         """Fetch, save, and parse Unabated odds."""
         snapshot = self.fetch_snapshot()
         rel_path, sha_hash, capture_ts = save_raw_payload("UNABATED", snapshot, "json")
@@ -130,6 +144,6 @@ class UnabatedClient:
         logger.info(f"Saved Unabated snapshot to {rel_path} (hash: {sha_hash})")
         
         normalized_records = self.parse_snapshot(snapshot, rel_path, sha_hash, capture_ts)
-        logger.info(f"Parsed {len(normalized_records)} records from Unabated snapshot.")
+        logger.info(f"Parsed {normalized_records.num_rows} records from Unabated snapshot.")
         
         return normalized_records
@@ -0,0 +1,60 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pandas as pd
+
+from nhl_bets.analysis.batch_runner import discover_slates, run_batch, slate_date_from_path
+from nhl_bets.analysis.runner import build_indexes
+
+GAME = "montreal-canadiens-at-toronto-maple-leafs"
+
+
+def test_slate_date_from_path():
+    assert slate_date_from_path("props_2025-10-01.csv") == "2025-10-01"
+    assert slate_date_from_path("archive/20251102_props.csv") == "2025-11-02"
+    assert slate_date_from_path("nhl_player_props_all.csv") is None
+
+
+def test_discover_slates_date_range(tmp_path):
+    for name in ["props_2025-10-01.csv", "props_2025-10-15.csv", "props_2025-11-01.csv", "props_latest.csv"]:
+        (tmp_path / name).write_text("Game,Market\n")
+
+    files = discover_slates(str(tmp_path / "*.csv"), start_date="2025-10-02", end_date="2025-10-31")
+    names = [os.path.basename(f) for f in files]
+
+    # Undated files are kept; their rows are filtered by Game_Date after evaluation.
+    assert names == ["props_2025-10-15.csv", "props_latest.csv"]
+
+
+def _write_slate(path, rows):
+    pd.DataFrame(rows, columns=["Game", "Market", "Player", "Odds_1", "Raw_Line", "Game_Date"]).to_csv(path, index=False)
+
+
+def test_run_batch_partitions_and_summary(tmp_path):
+    base = tmp_path / "base.csv"
+    pd.DataFrame([{"Player": "Auston Matthews", "Team": "TOR", "mu_base_goals": 0.6, "Assists Per Game": 0.5,
+                   "Points Per Game": 1.1, "SOG Per Game": 4.0}]).to_csv(base, index=False)
+    goals = ["Player 1+ Goals", "Auston Matthews"]
+    # Dated by file name only; an undated file whose rows span an in-range and an out-of-range day
+    _write_slate(tmp_path / "props_2025-10-01.csv", [[GAME, *goals, 3.0, "", None], [GAME, *goals, 1.2, "", None]])
+    _write_slate(tmp_path / "props_latest.csv", [[GAME, *goals, 3.0, "", "2025-10-15"],
+                                                 [GAME, "Anytime Goal Scorer", "Auston Matthews", 2.5, "", "2025-10-15"],
+                                                 [GAME, *goals, 3.0, "", "2025-11-01"]])
+
+    out_dir = tmp_path / "batch"
+    files = discover_slates(str(tmp_path / "props_*.csv"), "2025-10-01", "2025-10-31")
+    summary = run_batch(files, build_indexes(str(base)), str(out_dir), workers=1,
+                        start_date="2025-10-01", end_date="2025-10-31")
+
+    assert sorted(os.listdir(out_dir)) == ["date=2025-10-01", "date=2025-10-15", "summary.csv"]
+    first = pd.read_csv(out_dir / "date=2025-10-01" / "ev_bets.csv")
+    assert list(first["Odds"]) == [3.0, 1.2]  # sorted by EV
+    assert set(first["Slate_File"]) == {str(tmp_path / "props_2025-10-01.csv")}
+
+    summary = summary.set_index("Date")
+    assert list(summary.index) == ["2025-10-01", "2025-10-15"]
+    assert summary.loc["2025-10-01", ["Slates", "Total_Rows", "Supported", "Positive_EV"]].tolist() == [1, 2, 2, 1]
+    assert summary.loc["2025-10-15", ["Total_Rows", "Supported", "Positive_EV"]].tolist() == [2, 1, 1]
+    assert pd.read_csv(out_dir / "summary.csv")["Date"].tolist() == ["2025-10-01", "2025-10-15"]
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import duckdb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.db_init import get_db_connection, resolve_duckdb_settings
+
+
+def test_env_overrides_and_connection_ownership(tmp_path, monkeypatch):
+    monkeypatch.setenv("NHL_DUCKDB_MEMORY_LIMIT", "512MB")
+    monkeypatch.setenv("NHL_DUCKDB_THREADS", "2")
+    monkeypatch.setenv("NHL_DUCKDB_TEMP_DIR", str(tmp_path / "spill"))
+    assert resolve_duckdb_settings() == {
+        "memory_limit": "512MB", "threads": 2, "temp_directory": str(tmp_path / "spill")
+    }
+
+    db_path = str(tmp_path / "db" / "test.duckdb")
+    con = get_db_connection(db_path)
+    assert con.execute("SELECT current_setting('threads')").fetchone()[0] == 2
+    assert con.execute("SELECT current_setting('memory_limit')").fetchone()[0] in ("488.2 MiB", "512.0 MB")
+    con.execute("CREATE TABLE t AS SELECT 1 AS a")
+
+    # Each caller owns its connection: one holder closing does not break another
+    other = get_db_connection(db_path)
+    assert other is not con
+    other.close()
+    assert con.execute("SELECT a FROM t").fetchone()[0] == 1
+
+    # A read-only caller shares the process's read-write instance and can close freely
+    reader = get_db_connection(db_path, read_only=True)
+    assert reader.execute("SELECT a FROM t").fetchone()[0] == 1
+    reader.close()
+    con.execute("INSERT INTO t VALUES (2)")
+    con.close()
+
+    # Read-only holders are not closed by a later read-write request; DuckDB refuses it instead
+    reader = get_db_connection(db_path, read_only=True)
+    with pytest.raises(duckdb.ConnectionException):
+        get_db_connection(db_path)
+    assert reader.execute("SELECT count(*) FROM t").fetchone()[0] == 2
+    reader.close()
+    writer = get_db_connection(db_path)
+    assert writer.execute("SELECT count(*) FROM t").fetchone()[0] == 2
+    writer.close()
+
+def test_auto_sizing_without_overrides(monkeypatch):
+    for var in ("NHL_DUCKDB_MEMORY_LIMIT", "NHL_DUCKDB_THREADS", "NHL_DUCKDB_TEMP_DIR"):
+        monkeypatch.delenv(var, raising=False)
+    settings = resolve_duckdb_settings()
+    assert settings["threads"] >= 1
+    assert settings["memory_limit"] is None or settings["memory_limit"].endswith("MB")
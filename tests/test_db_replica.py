@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.db_init import get_db_connection, initialize_phase11_tables, insert_odds_records
+from nhl_bets.common.db_replica import (
+    ODDS_REPLICA_TABLES, get_replica_connection, latest_replica_path, publish_replica,
+)
+
+
+def _odds(capture_ts, odds_decimal):
+    return pd.DataFrame([{
+        "source_vendor": "UNABATED", "capture_ts_utc": capture_ts, "event_id_vendor": "E1",
+        "event_name_raw": "EDM @ TOR", "event_start_ts_utc": None, "home_team": "TOR", "away_team": "EDM",
+        "player_id_vendor": "P1", "player_name_raw": "Connor McDavid", "market_type": "POINTS", "line": 1.5,
+        "side": "OVER", "book_id_vendor": "1", "book_name_raw": "DraftKings", "odds_american": 100,
+        "odds_decimal": odds_decimal, "is_live": False, "raw_payload_path": "x.json",
+        "raw_payload_hash": f"h{capture_ts:%H}",
+    }])
+
+
+def _tables(con):
+    return {name for (name,) in con.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+
+
+def test_readers_use_latest_replica_while_writer_holds_primary(tmp_path):
+    db_path = str(tmp_path / "primary.duckdb")
+    lake = str(tmp_path / "lake")
+    writer = get_db_connection(db_path)
+    initialize_phase11_tables(writer, lake_root=lake)
+    writer.execute("CREATE TABLE dim_games AS SELECT 1 AS game_id")
+    insert_odds_records(writer, _odds(datetime(2026, 1, 5, 12), 1.9), lake_root=lake)
+    assert latest_replica_path(db_path) is None
+
+    first = publish_replica(writer, db_path)
+    assert latest_replica_path(db_path) == first
+
+    # Only reader tables are copied; the odds view and as-of macro work in the replica
+    reader = get_replica_connection(db_path)
+    assert {"dim_games", "fact_prop_odds_latest", "dim_players_mapping"} <= _tables(reader)
+    assert "raw_odds_payloads" not in _tables(reader)
+    assert reader.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 1
+    assert reader.execute("SELECT odds_decimal FROM prop_odds_asof(TIMESTAMP '2026-01-05 13:00')").fetchone()[0] == 1.9
+
+    # Writes after a publish stay invisible to readers until the next publish
+    writer.execute("INSERT INTO dim_games VALUES (2)")
+    insert_odds_records(writer, _odds(datetime(2026, 1, 5, 14), 2.1), lake_root=lake)
+    assert reader.execute("SELECT count(*) FROM dim_games").fetchone()[0] == 1
+    assert reader.execute("SELECT odds_decimal FROM fact_prop_odds_latest").fetchone()[0] == 1.9
+
+    # Another process can read the replica while this one holds the primary's write lock
+    script = (
+        "import duckdb, sys; "
+        "print(duckdb.connect(sys.argv[1], read_only=True).execute('SELECT count(*) FROM dim_games').fetchone()[0])"
+    )
+    out = subprocess.run([sys.executable, "-c", script, first], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "1"
+
+    # An odds-only publish refreshes the odds tables and carries the rest over
+    second = publish_replica(writer, db_path, tables=ODDS_REPLICA_TABLES)
+    odds_reader = get_replica_connection(db_path)
+    assert odds_reader.execute("SELECT odds_decimal FROM fact_prop_odds_latest").fetchone()[0] == 2.1
+    assert odds_reader.execute("SELECT count(*) FROM dim_games").fetchone()[0] == 1
+    assert odds_reader.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 2
+    odds_reader.close()
+
+    # A model stage publishes just its table; the odds tables published before are carried over
+    writer.execute("CREATE TABLE fact_probabilities AS SELECT 0.42::DOUBLE AS p_over")
+    publish_replica(writer, db_path, tables=("fact_probabilities",))
+    model_reader = get_replica_connection(db_path)
+    assert model_reader.execute("SELECT p_over FROM fact_probabilities").fetchone()[0] == 0.42
+    assert model_reader.execute("SELECT odds_decimal FROM fact_prop_odds_latest").fetchone()[0] == 2.1
+    model_reader.close()
+
+    # Pointer swaps to the new copy; old copies beyond keep are retired
+    third = publish_replica(writer, db_path, keep=1)
+    assert latest_replica_path(db_path) == third
+    assert not os.path.exists(first) and not os.path.exists(second)
+    assert len(os.listdir(os.path.dirname(third))) == 2  # third and CURRENT
+    full_reader = get_replica_connection(db_path)
+    assert full_reader.execute("SELECT count(*) FROM dim_games").fetchone()[0] == 2
+    full_reader.close()
+    reader.close()
+    writer.close()
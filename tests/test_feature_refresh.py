@@ -0,0 +1,128 @@
+import importlib.util
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import duckdb
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.feature_refresh import diff_features, rebuild_features, update_features
+
+PIPELINES = os.path.join(os.path.dirname(__file__), "..", "pipelines", "backtesting")
+TEAMS = ["TOR", "MTL", "EDM", "CGY"]
+
+
+def _spec(script):
+    module_spec = importlib.util.spec_from_file_location(script, os.path.join(PIPELINES, f"{script}.py"))
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return module.SPEC
+
+
+def _games(seasons=(2023, 2024), per_season=50):
+    """Round-robin schedule: (season, game_id, date, home, away), two games a night."""
+    games = []
+    for season in seasons:
+        start = datetime(season, 10, 10)
+        for n in range(per_season):
+            a, b, c, d = TEAMS[n % 4:] + TEAMS[:n % 4]
+            for i, (home, away) in enumerate(((a, b), (c, d))):
+                games.append((season, season * 1000000 + 20000 + 2 * n + i, start + timedelta(days=n), home, away))
+    return games
+
+
+def _source_rows(games):
+    rng = random.Random(11)
+    skaters, goalies = [], []
+    for season, game_id, date, home, away in games:
+        for team, opp, side in ((home, away, "HOME"), (away, home, "AWAY")):
+            t = TEAMS.index(team)
+            for p in range(5):
+                for situation, toi in (("all", 1100), ("5on5", 850), ("5on4", 150)):
+                    goals = rng.randint(0, 1)
+                    skaters.append({
+                        "player_id": 8470000 + t * 10 + p, "game_id": game_id, "game_date": date, "season": season,
+                        "team": team, "opp_team": opp, "home_or_away": side, "position": "C", "situation": situation,
+                        "toi_seconds": float(toi + rng.randint(-60, 60)), "goals": float(goals),
+                        "primary_assists": float(rng.randint(0, 1)), "secondary_assists": float(rng.randint(0, 1)),
+                        "points": float(goals + rng.randint(0, 2)), "sog": float(rng.randint(0, 5)),
+                        "blocks": float(rng.randint(0, 2)), "shot_attempts": float(rng.randint(0, 8)),
+                        "hits": 1.0, "takeaways": 0.0, "giveaways": 0.0, "d_zone_giveaways": 0.0,
+                        "x_goals": rng.random(), "on_ice_xgoals": rng.random() * 2, "on_ice_goals": float(rng.randint(0, 2)),
+                    })
+            goalies.append({
+                "player_id": 8480000 + t * 10 + (game_id % 3 == 0), "game_id": game_id, "game_date": date,
+                "season": season, "team": team, "opp_team": opp, "home_or_away": side, "situation": "all",
+                "toi_seconds": 3600.0, "shots_against": float(rng.randint(20, 40)),
+                "goals_against": float(rng.randint(0, 5)), "x_goals_against": rng.random() * 4,
+            })
+    return pd.DataFrame(skaters), pd.DataFrame(goalies)
+
+
+def _append(con, games):
+    skaters, goalies = _source_rows(games)
+    for table, df in (("fact_skater_game_situation", skaters), ("fact_goalie_game_situation", goalies)):
+        con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM df WHERE false")
+        con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM df")
+
+
+@pytest.mark.parametrize("script", ["build_player_features", "build_team_defense_features", "build_goalie_features"])
+def test_incremental_features_match_full_rebuild(script):
+    spec = _spec(script)
+    games = _games()
+    last_night = max(g[2] for g in games)
+    con = duckdb.connect()
+
+    _append(con, [g for g in games if g[2] < last_night - timedelta(days=5)])
+    rebuild_features(con, spec)
+    assert update_features(con, spec)["rows"] == 0
+
+    # Nightly: five new nights, read from a trailing window only
+    _append(con, [g for g in games if last_night - timedelta(days=5) <= g[2] < last_night])
+    result = update_features(con, spec)
+    assert result["new_from"] == last_night - timedelta(days=5)
+    assert result["rows"] == {"build_player_features": 100, "build_team_defense_features": 20,
+                              "build_goalie_features": 20}[script]
+    # At most back to this season's opener (season-to-date frames), never last season
+    assert datetime(2024, 10, 10) <= result["context_from"] < result["new_from"]
+    assert result["context_rows"] < con.execute(f"SELECT count(*) FROM {spec['source']}").fetchone()[0] / 2
+    assert diff_features(con, spec) == {"rows": con.execute(f"SELECT count(*) FROM {spec['table']}").fetchone()[0],
+                                        "missing": 0, "extra": 0, "mismatched": {}}
+
+    # Late-arriving game from last season plus the final night: later rows are recomputed too
+    backfill = (2023, 2023029999, datetime(2023, 11, 1), "TOR", "EDM")
+    _append(con, [backfill] + [g for g in games if g[2] == last_night])
+    update_features(con, spec)
+    assert diff_features(con, spec, start_season=2023)["mismatched"] == {}
+    assert diff_features(con, spec)["missing"] == diff_features(con, spec)["extra"] == 0
+
+    # A corrected stat on an old game (replaced in place by the MoneyPuck ingest) is recomputed from since
+    corrected = games[10]
+    for table, column in (("fact_skater_game_situation", "goals"), ("fact_goalie_game_situation", "goals_against")):
+        con.execute(f"UPDATE {table} SET {column} = {column} + 3 WHERE game_id = {corrected[1]}")
+    assert diff_features(con, spec)["mismatched"] != {}
+    assert update_features(con, spec)["rows"] == 0
+    result = update_features(con, spec, since=corrected[2])
+    assert result["new_from"] == corrected[2]
+    assert diff_features(con, spec)["mismatched"] == {}
+
+    # The verification mode notices drift
+    con.execute(f"DELETE FROM {spec['table']} WHERE game_id = {games[-1][1]}")
+    assert diff_features(con, spec)["missing"] > 0
+
+
+def test_season_filter_applies_to_incremental_rows():
+    spec = _spec("build_goalie_features")
+    games = _games()
+    con = duckdb.connect()
+    _append(con, [g for g in games if g[0] == 2023])
+    rebuild_features(con, spec, start_season=2024)
+    assert con.execute(f"SELECT count(*) FROM {spec['table']}").fetchone()[0] == 0
+
+    _append(con, [g for g in games if g[0] == 2024])
+    assert update_features(con, spec, start_season=2024)["rows"] == 200
+    assert diff_features(con, spec, start_season=2024)["mismatched"] == {}
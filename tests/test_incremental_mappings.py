@@ -0,0 +1,114 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.analysis.normalize import update_event_mappings, update_player_mappings
+from nhl_bets.common.db_init import initialize_phase11_tables, insert_odds_records
+
+
+def _odds(vendor, payload_hash, event_id, home, away, player_id, player_name, capture_ts):
+    return {
+        "source_vendor": vendor, "capture_ts_utc": capture_ts, "event_id_vendor": event_id,
+        "event_name_raw": f"{away} @ {home}", "event_start_ts_utc": None,
+        "home_team": home, "away_team": away, "player_id_vendor": player_id,
+        "player_name_raw": player_name, "market_type": "SOG", "line": 2.5, "side": "OVER",
+        "book_id_vendor": vendor, "book_name_raw": vendor, "odds_american": -110,
+        "odds_decimal": 1.91, "is_live": False, "raw_payload_path": "x.json",
+        "raw_payload_hash": payload_hash,
+    }
+
+
+def _ingest(con, lake_root, payload_hash, vendor, rows, ingested_at):
+    insert_odds_records(con, pd.DataFrame(rows), lake_root=lake_root)
+    con.execute(
+        "INSERT INTO raw_odds_payloads VALUES (?, ?, ?, 'x.json', ?)",
+        [payload_hash, vendor, rows[0]["capture_ts_utc"], ingested_at],
+    )
+
+
+def test_mappings_only_process_new_payloads(tmp_path):
+    lake_root = str(tmp_path)
+    con = duckdb.connect()
+    initialize_phase11_tables(con, lake_root=lake_root)
+    con.execute("""
+    CREATE TABLE dim_games AS SELECT * FROM (VALUES
+        ('G1', DATE '2026-01-05', 'TOR', 'EDM'),
+        ('G2', DATE '2026-01-07', 'BOS', 'MTL')
+    ) t(game_id, game_date, home_team, away_team)
+    """)
+    con.execute("""
+    CREATE TABLE dim_players AS SELECT * FROM (VALUES
+        (8478402, 'Connor McDavid', 'EDM'),
+        (8479318, 'Auston Matthews', 'TOR'),
+        (8477956, 'David Pastrnak', 'BOS')
+    ) t(player_id, player_name, team)
+    """)
+
+    # Full team names, home/away swapped relative to dim_games, captured the day before
+    capture = datetime(2026, 1, 4, 18, 0)
+    _ingest(con, lake_root, "h1", "PLAYNOW", [
+        _odds("PLAYNOW", "h1", "E1", "Edmonton Oilers", "Toronto Maple Leafs", "P1", "Connor McDavid", capture),
+        _odds("PLAYNOW", "h1", "E1", "Edmonton Oilers", "Toronto Maple Leafs", None, "auston matthews", capture),
+        _odds("PLAYNOW", "h1", "E1", "Edmonton Oilers", "Toronto Maple Leafs", "P9", "Nobody Known", capture),
+        _odds("PLAYNOW", "h1", "E9", "Edmonton Oilers", "Boston Bruins", "P1", "Connor McDavid", capture),
+    ], datetime(2026, 1, 4, 18, 1))
+
+    assert update_event_mappings(con) == {"PLAYNOW": {"mapped": 1, "unmapped": 1}}
+    assert update_player_mappings(con) == {"PLAYNOW": {"mapped": 2, "unmapped": 1}}
+    assert con.execute("SELECT canonical_game_id FROM dim_events_mapping WHERE vendor_event_id = 'E1'").fetchone()[0] == "G1"
+    assert sorted(con.execute("SELECT canonical_player_id FROM dim_players_mapping").fetchall()) == [(8478402,), (8479318,)]
+
+    # Nothing new: no work, no report
+    assert update_event_mappings(con) == {}
+    assert update_player_mappings(con) == {}
+
+    # A new payload from another vendor is the only thing staged
+    capture = datetime(2026, 1, 7, 12, 0)
+    _ingest(con, lake_root, "h2", "UNABATED", [
+        _odds("UNABATED", "h2", "U1", "BOS", "MTL", "77", "David Pastrnak", capture),
+    ], datetime(2026, 1, 7, 12, 1))
+    assert update_event_mappings(con) == {"UNABATED": {"mapped": 1, "unmapped": 0}}
+    assert update_player_mappings(con) == {"UNABATED": {"mapped": 1, "unmapped": 0}}
+
+    # A full refresh rescans history and reports every vendor
+    assert set(update_event_mappings(con, full_refresh=True)) == {"PLAYNOW", "UNABATED"}
+    assert con.execute("SELECT count(*) FROM dim_events_mapping").fetchone()[0] == 2
+
+
+def test_odds_captured_before_the_game_is_loaded_map_later(tmp_path):
+    lake_root = str(tmp_path)
+    con = duckdb.connect()
+    initialize_phase11_tables(con, lake_root=lake_root)
+    con.execute("""
+    CREATE TABLE dim_games AS SELECT * FROM (VALUES ('G0', DATE '2026-01-04', 'BOS', 'MTL'))
+    t(game_id, game_date, home_team, away_team)
+    """)
+    con.execute("CREATE TABLE dim_players AS SELECT * FROM (VALUES (8478402, 'Connor McDavid', 'EDM')) t(player_id, player_name, team)")
+
+    # Pre-game capture: tonight's game is not in dim_games yet
+    capture = datetime(2026, 1, 5, 17, 0)
+    _ingest(con, lake_root, "h1", "UNABATED", [
+        _odds("UNABATED", "h1", "U1", "TOR", "EDM", "97", "Connor McDavid", capture),
+    ], datetime(2026, 1, 5, 17, 1))
+    assert update_event_mappings(con) == {"UNABATED": {"mapped": 0, "unmapped": 1}}
+    assert update_player_mappings(con) == {"UNABATED": {"mapped": 0, "unmapped": 1}}
+
+    # No new payloads and no new games: nothing to retry
+    assert update_event_mappings(con) == {}
+    assert update_player_mappings(con) == {}
+
+    # Next day the MoneyPuck ingest adds the game; no new odds payloads arrived
+    con.execute("INSERT INTO dim_games VALUES ('G1', DATE '2026-01-05', 'TOR', 'EDM')")
+    assert update_event_mappings(con) == {"UNABATED": {"mapped": 1, "unmapped": 0}}
+    assert update_player_mappings(con) == {"UNABATED": {"mapped": 1, "unmapped": 0}}
+    assert con.execute("SELECT canonical_game_id FROM dim_events_mapping").fetchall() == [("G1",)]
+    assert con.execute("SELECT canonical_player_id FROM dim_players_mapping").fetchall() == [(8478402,)]
+
+    # Mapped keys are not restaged when later games arrive
+    con.execute("INSERT INTO dim_games VALUES ('G2', DATE '2026-01-06', 'BOS', 'MTL')")
+    assert update_event_mappings(con) == {}
@@ -0,0 +1,88 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.db_init import initialize_phase11_tables, insert_odds_records, get_latest_odds
+
+
+def _snapshot(capture_ts, odds_decimal, payload_hash):
+    return pd.DataFrame([{
+        "source_vendor": "UNABATED",
+        "capture_ts_utc": capture_ts,
+        "event_id_vendor": "E1",
+        "event_name_raw": "EDM @ TOR",
+        "event_start_ts_utc": None,
+        "home_team": "TOR",
+        "away_team": "EDM",
+        "player_id_vendor": "P1",
+        "player_name_raw": "Connor McDavid",
+        "market_type": "POINTS",
+        "line": 1.5,
+        "side": side,
+        "book_id_vendor": "1",
+        "book_name_raw": "DraftKings",
+        "odds_american": 100,
+        "odds_decimal": odds_decimal,
+        "is_live": False,
+        "raw_payload_path": "x.json",
+        "raw_payload_hash": payload_hash,
+    } for side in ("OVER", "UNDER")])
+
+
+def test_latest_odds_keeps_newest_capture(tmp_path):
+    con = duckdb.connect()
+    initialize_phase11_tables(con, lake_root=str(tmp_path))
+
+    insert_odds_records(con, _snapshot(datetime(2026, 1, 5, 12), 1.9, "h2"), lake_root=str(tmp_path))
+    # An older capture (e.g. a replay) must not overwrite the newer price.
+    insert_odds_records(con, _snapshot(datetime(2026, 1, 5, 10), 2.5, "h1"), lake_root=str(tmp_path))
+
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 4
+    latest = get_latest_odds(con, event_id_vendor="E1")
+    assert len(latest) == 2
+    assert set(latest["odds_decimal"]) == {1.9}
+
+    insert_odds_records(con, _snapshot(datetime(2026, 1, 5, 14), 2.1, "h3"), lake_root=str(tmp_path))
+    latest = get_latest_odds(con, event_id_vendor="E1")
+    assert set(latest["odds_decimal"]) == {2.1}
+
+
+def test_consensus_tracks_best_line_and_no_vig(tmp_path):
+    from nhl_bets.analysis.ev import consensus_no_vig, decimal_to_implied
+    from nhl_bets.common.db_init import get_consensus
+
+    con = duckdb.connect()
+    initialize_phase11_tables(con, lake_root=str(tmp_path))
+
+    books = {"DraftKings": (1.80, 2.05), "FanDuel": (1.95, 1.87), "Underdog": (3.00, 3.00)}
+    frames = []
+    for book, (over, under) in books.items():
+        df = _snapshot(datetime(2026, 1, 5, 12), over, "h1")
+        df["book_id_vendor"] = book.lower()
+        df["book_name_raw"] = book
+        df.loc[df["side"] == "UNDER", "odds_decimal"] = under
+        frames.append(df)
+    insert_odds_records(con, pd.concat(frames, ignore_index=True), lake_root=str(tmp_path))
+
+    row = get_consensus(con, event_id_vendor="E1").iloc[0]
+    assert row["book_count"] == 2  # pick'em book excluded
+    assert row["best_over_book"] == "FanDuel" and row["best_over_decimal"] == 1.95
+    assert row["best_under_book"] == "DraftKings" and row["best_under_decimal"] == 2.05
+
+    expected_over, _ = consensus_no_vig([
+        (decimal_to_implied(o), decimal_to_implied(u)) for b, (o, u) in books.items() if b != "Underdog"
+    ])
+    assert abs(row["consensus_p_over"] - expected_over) < 1e-12
+
+    # A new snapshot moves the best Over to DraftKings.
+    df = _snapshot(datetime(2026, 1, 5, 13), 2.10, "h2")
+    df["book_id_vendor"] = "draftkings"
+    df["book_name_raw"] = "DraftKings"
+    insert_odds_records(con, df, lake_root=str(tmp_path))
+    row = get_consensus(con, event_id_vendor="E1").iloc[0]
+    assert row["best_over_book"] == "DraftKings" and row["best_over_decimal"] == 2.10
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.scrapers.moneypuck_downloader import MANIFEST_NAME, MoneyPuckDownloader
+
+LAST_MODIFIED = "Mon, 05 Jan 2026 10:00:00 GMT"
+
+
+class FakeMoneyPuck(BaseHTTPRequestHandler):
+    """Static files with strong ETags, conditional GETs and If-Range byte ranges; logs every response."""
+    files = {}
+    log = []
+
+    def do_GET(self):
+        if self.path.endswith("/"):
+            names = sorted(p.rsplit("/", 1)[1] for p in self.files if p.startswith(self.path))
+            return self._send(200, "".join(f'<a href="{n}">{n}</a>' for n in names).encode(), {})
+        body = self.files.get(self.path)
+        if body is None:
+            return self._send(404, b"", {})
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED}
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", headers)
+        byte_range = self.headers.get("Range")
+        if byte_range and self.headers.get("If-Range") == etag:
+            start = int(byte_range.split("=")[1].rstrip("-"))
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            return self._send(206, body[start:], headers)
+        self._send(200, body, headers)
+
+    def _send(self, status, body, headers):
+        self.log.append((self.path, status, len(body)))
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FakeMoneyPuck.files = {
+        f"/gbg/2024/regular/{group}/{team}.csv": f"playerId,team,situation\n{i},{team},all\n".encode() * 200
+        for group in ("skaters", "goalies") for i, team in enumerate(("TOR", "EDM", "MTL"))
+    }
+    FakeMoneyPuck.log = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeMoneyPuck)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _sync(root, base):
+    downloader = MoneyPuckDownloader(str(root), workers=4)
+    jobs = downloader.game_by_game_jobs([2024], "regular", base_url=f"{base}/gbg")
+    return downloader.sync(jobs)
+
+
+def test_sync_downloads_once_then_only_revalidates(tmp_path, server):
+    assert _sync(tmp_path, server) == {"downloaded": 6, "skipped": 0, "failed": 0}
+    tor = tmp_path / "teamPlayerGameByGame/2024/regular/skaters/TOR.csv"
+    assert tor.read_bytes() == FakeMoneyPuck.files["/gbg/2024/regular/skaters/TOR.csv"]
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    entry = manifest["teamPlayerGameByGame/2024/regular/skaters/TOR.csv"]
+    assert entry["size"] == tor.stat().st_size and entry["sha256"] == hashlib.sha256(tor.read_bytes()).hexdigest()
+    assert not list(tmp_path.rglob("*.part"))
+
+    # Nightly re-sync: 304s only, no file bodies; a changed file is fetched again
+    FakeMoneyPuck.files["/gbg/2024/regular/goalies/MTL.csv"] += b"9,MTL,all\n"
+    FakeMoneyPuck.log = []
+    assert _sync(tmp_path, server) == {"downloaded": 1, "skipped": 5, "failed": 0}
+    files = [entry for entry in FakeMoneyPuck.log if entry[0].endswith(".csv")]
+    assert sorted(status for _, status, _ in files) == [200] + [304] * 5
+    assert (tmp_path / "teamPlayerGameByGame/2024/regular/goalies/MTL.csv").read_bytes().endswith(b"9,MTL,all\n")
+
+
+def test_interrupted_download_resumes_with_range(tmp_path, server):
+    _sync(tmp_path, server)
+    rel_path = "teamPlayerGameByGame/2024/regular/skaters/EDM.csv"
+    body = FakeMoneyPuck.files["/gbg/2024/regular/skaters/EDM.csv"]
+
+    # State an interrupted run leaves behind: half a body in .part, a partial manifest entry
+    target = tmp_path / rel_path
+    target.unlink()
+    (tmp_path / f"{rel_path}.part").write_bytes(body[:1000])
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    manifest[rel_path]["partial"] = True
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+    FakeMoneyPuck.log = []
+    assert _sync(tmp_path, server) == {"downloaded": 1, "skipped": 5, "failed": 0}
+    assert ("/gbg/2024/regular/skaters/EDM.csv", 206, len(body) - 1000) in FakeMoneyPuck.log
+    assert target.read_bytes() == body
+    assert "partial" not in json.loads((tmp_path / MANIFEST_NAME).read_text())[rel_path]
+
+
+def test_files_from_before_the_manifest_are_adopted(tmp_path, server):
+    # Same size locally and no manifest yet (older downloader): kept, recorded, not rewritten
+    target = tmp_path / "teamPlayerGameByGame/2024/regular/skaters/TOR.csv"
+    target.parent.mkdir(parents=True)
+    target.write_bytes(FakeMoneyPuck.files["/gbg/2024/regular/skaters/TOR.csv"])
+    os.utime(target, (0, 0))
+    assert _sync(tmp_path, server) == {"downloaded": 5, "skipped": 1, "failed": 0}
+    assert os.path.getmtime(target) == 0
+    assert "teamPlayerGameByGame/2024/regular/skaters/TOR.csv" in json.loads((tmp_path / MANIFEST_NAME).read_text())
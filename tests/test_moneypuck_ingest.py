@@ -0,0 +1,105 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.moneypuck_ingest import (
+    INGEST_MANIFEST_TABLE, ingest_group, list_group_files, refresh_dim_games, refresh_skater_game_all,
+    staged_file_path, staged_season_path,
+)
+
+SKATER_HEADER = ("playerId,gameId,gameDate,playerTeam,opposingTeam,home_or_away,position,situation,icetime,"
+                 "I_F_goals,I_F_primaryAssists,I_F_secondaryAssists,I_F_points,I_F_shotsOnGoal,shotsBlockedByPlayer,"
+                 "I_F_shotAttempts,I_F_hits,I_F_takeaways,I_F_giveaways,I_F_dZoneGiveaways,I_F_xGoals,"
+                 "OnIce_F_xGoals,OnIce_F_goals,name")
+GOALIE_HEADER = "playerId,gameId,gameDate,playerTeam,opposingTeam,home_or_away,situation,icetime,ongoal,goals,xGoals"
+TABLES = ["fact_skater_game_situation", "fact_goalie_game_situation", "fact_skater_game_all", "dim_games"]
+
+
+def _skater_rows(player, team, opp, home, games):
+    rows = []
+    for game_id, date, goals in games:
+        for situation, toi in (("all", 1100), ("5on5", 900), ("5on4", 120)):
+            g = goals if situation == "all" else 0
+            rows.append(f"{player},{game_id},{date},{team},{opp},{home},C,{situation},{toi},{g},1,0,{g + 1},3,1,5,2,0,1,0,0.4,1.1,{g},Some Name")
+    return rows
+
+
+def _write(path, header, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join([header] + rows) + "\n")
+
+
+def _build(con, root, incremental, staging_root):
+    files = {group: list_group_files(str(root), 2024, 2024, "regular", group) for group in ("skaters", "goalies")}
+    skaters = ingest_group(con, str(root), "skaters", files["skaters"], incremental, str(staging_root))
+    goalies = ingest_group(con, str(root), "goalies", files["goalies"], incremental, str(staging_root))
+    game_ids = skaters["game_ids"] if incremental else None
+    refresh_skater_game_all(con, game_ids)
+    refresh_dim_games(con, game_ids)
+    return skaters, goalies
+
+
+def _snapshot(con):
+    return {t: con.execute(f"SELECT * FROM {t} ORDER BY ALL").fetchall() for t in TABLES}
+
+
+def test_incremental_ingest_matches_full_rebuild(tmp_path):
+    root = tmp_path / "teamPlayerGameByGame"
+    staging = tmp_path / "staging"
+    skaters = root / "2024" / "regular" / "skaters"
+    tor_games = [(2024020001, 20241008, 1), (2024020015, 20241010, 0)]
+    _write(skaters / "TOR.csv", SKATER_HEADER, _skater_rows(8479318, "TOR", "MTL", "HOME", tor_games))
+    _write(skaters / "EDM.csv", SKATER_HEADER, _skater_rows(8478402, "EDM", "CGY", "AWAY", [(2024020002, 20241009, 2)]))
+    _write(root / "2024" / "regular" / "goalies" / "TOR.csv", GOALIE_HEADER,
+           ["8480045,2024020001,20241008,TOR,MTL,HOME,all,3600,30,2,2.4"])
+
+    con = duckdb.connect()
+    _build(con, root, incremental=False, staging_root=staging)
+    assert con.execute(f"SELECT count(*), sum(row_count) FROM {INGEST_MANIFEST_TABLE}").fetchone() == (3, 10)
+
+    # Staged Parquet: typed, only the kept columns, one file per CSV plus one per season
+    season_file = staged_season_path(str(staging), "skaters", "2024", "regular")
+    schema = dict(con.execute(f"SELECT column_name, column_type FROM (DESCRIBE SELECT * FROM '{season_file}')").fetchall())
+    assert list(schema) == [c[0] for c in con.execute("DESCRIBE fact_skater_game_situation").fetchall()]
+    assert (schema["player_id"], schema["game_date"], schema["goals"]) == ("BIGINT", "TIMESTAMP", "DOUBLE")
+    tor_staged = staged_file_path(str(staging), "2024/regular/skaters/TOR.csv")
+    edm_staged = staged_file_path(str(staging), "2024/regular/skaters/EDM.csv")
+    staged_at = os.path.getmtime(tor_staged)
+    edm_staged_at = os.path.getmtime(edm_staged)
+    season_staged_at = os.path.getmtime(season_file)
+
+    # Nothing new; then the same bytes re-downloaded (new mtime) is neither loaded nor re-parsed
+    assert _build(con, root, incremental=True, staging_root=staging)[0] == {"files": 0, "rows": 0, "game_ids": [],
+                                                                        "changed_from": None}
+    (skaters / "EDM.csv").write_bytes((skaters / "EDM.csv").read_bytes())
+    os.utime(skaters / "EDM.csv", (1_900_000_000, 1_900_000_000))
+    assert _build(con, root, incremental=True, staging_root=staging)[0]["files"] == 0
+    assert os.path.getmtime(edm_staged) == edm_staged_at
+    assert os.path.getmtime(season_file) == season_staged_at
+
+    # TOR's file gains a game and corrects an old one: only its rows and games are replaced
+    assert os.path.getmtime(tor_staged) == staged_at
+    tor_games = [(2024020001, 20241008, 2), (2024020015, 20241010, 0), (2024020030, 20241012, 1)]
+    _write(skaters / "TOR.csv", SKATER_HEADER, _skater_rows(8479318, "TOR", "MTL", "HOME", tor_games))
+    os.utime(skaters / "TOR.csv", (1_900_000_100, 1_900_000_100))
+    result, goalies = _build(con, root, incremental=True, staging_root=staging)
+    # Every game in the file is reloaded, but only the corrected opener and the new game changed
+    assert result == {"files": 1, "rows": 9, "game_ids": [2024020001, 2024020015, 2024020030],
+                      "changed_from": datetime(2024, 10, 8)}
+    assert goalies["files"] == 0
+    assert con.execute("SELECT goals FROM fact_skater_game_all WHERE game_id = 2024020001").fetchone() == (2,)
+    assert con.execute("SELECT home_team, away_team FROM dim_games WHERE game_id = 2024020030").fetchone() == ("TOR", "MTL")
+
+    fresh = duckdb.connect()
+    _build(fresh, root, incremental=False, staging_root=tmp_path / "staging2")
+    assert _snapshot(con) == _snapshot(fresh)
+
+    # A deleted CSV drops out of the season file even though its staged Parquet is left behind
+    (skaters / "EDM.csv").unlink()
+    _build(duckdb.connect(), root, incremental=False, staging_root=staging)
+    assert os.path.exists(edm_staged)
+    assert con.execute(f"SELECT DISTINCT team FROM '{season_file}'").fetchall() == [("TOR",)]
@@ -0,0 +1,340 @@
+import json
+import os
+import sys
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import duckdb
+from tenacity import wait_none
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common import storage
+from nhl_bets.common.db_init import initialize_phase11_tables
+from nhl_bets.scrapers import odds_capture
+from nhl_bets.scrapers.odds_capture import (
+    capture_oddsshark, capture_playnow, capture_unabated, is_noop_cycle, run_capture_cycle,
+)
+from nhl_bets.scrapers.oddsshark_client import OddsSharkClient
+from nhl_bets.scrapers.playnow_api_client import FAILED_EVENTS_KEY, PlayNowAPIClient
+from nhl_bets.scrapers.unabated_client import UnabatedClient
+
+UNABATED_SNAPSHOT = {
+    "people": {"1": {"firstName": "Connor", "lastName": "McDavid"}},
+    "marketSources": [{"id": 1, "name": "Book One"}],
+    "teams": {"10": {"abbreviation": "EDM"}, "11": {"abbreviation": "TOR"}},
+    "odds": {"lg6:pt1:pregame": [{
+        "betTypeId": 86, "personId": 1, "eventId": 5, "eventName": "TOR @ EDM",
+        "eventTeams": {"1": {"id": 10}, "0": {"id": 11}},
+        "sides": {
+            "si1:pid1": {"ms1": {"points": 3.5, "americanPrice": -120}},
+            "si0:pid1": {"ms1": {"points": 3.5, "americanPrice": 100}},
+        },
+    }]},
+}
+PLAYNOW_EVENT_LIST = {"data": {"events": [{"id": 77, "marketCount": 40}]}}
+PLAYNOW_DETAILS = {"data": {"events": [{
+    "id": 77, "name": "Toronto Maple Leafs @ Edmonton Oilers", "startTime": "2026-01-05T00:00:00Z",
+    "markets": [{
+        "id": 1, "name": "Connor McDavid Total Shots on Goal", "handicapValue": 3.5,
+        "outcomes": [
+            {"id": 11, "name": "Over", "prices": [{"decimal": 1.8}]},
+            {"id": 12, "name": "Under", "prices": [{"decimal": 2.0}]},
+        ],
+    }],
+}]}}
+
+# path -> (delay seconds, content type, body)
+ROUTES = {
+    "/unabated.json": (0.5, "application/json", json.dumps(UNABATED_SNAPSHOT)),
+    "/playnow/event-list": (0.25, "application/json", json.dumps(PLAYNOW_EVENT_LIST)),
+    "/playnow/events-by-ids": (0.25, "application/json", json.dumps(PLAYNOW_DETAILS)),
+    "/oddsshark": (2.0, "text/html", "<html></html>"),
+}
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        delay, content_type, body = self.server.routes[path]
+        self.server.hits.append(path)
+        time.sleep(delay)
+        # Only the Unabated stand-in supports validators
+        etag = f'"{len(body)}"' if path == "/unabated.json" else None
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+def _broken(cursor, writer):
+    raise ValueError("vendor down")
+
+
+def _serve(routes):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    server.routes, server.hits = routes, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_vendors_are_captured_concurrently_with_isolated_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    server, base = _serve(ROUTES)
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+    vendors = {
+        "UNABATED": partial(capture_unabated, client=UnabatedClient(url=f"{base}/unabated.json")),
+        "PLAYNOW": partial(capture_playnow, client=PlayNowAPIClient(base_url=f"{base}/playnow")),
+        "ODDSSHARK": partial(capture_oddsshark, client=OddsSharkClient(url=f"{base}/oddsshark")),
+        "BROKEN": _broken,
+    }
+    try:
+        start = time.monotonic()
+        with storage.RawPayloadWriter() as writer:
+            summary = run_capture_cycle(con, writer, vendors, timeouts={"ODDSSHARK": 1.0}, lake_root=lake_root)
+        elapsed = time.monotonic() - start
+
+        assert {v: s["status"] for v, s in summary.items()} == {
+            "UNABATED": "inserted", "PLAYNOW": "inserted", "ODDSSHARK": "timeout", "BROKEN": "failed",
+        }
+        # Sequential would be 0.5 + 0.5 (+ 2.0 for OddsShark); concurrent is bounded by the slowest budget
+        assert summary["UNABATED"]["seconds"] < 0.9 and summary["PLAYNOW"]["seconds"] < 0.9
+        assert elapsed < 1.6
+        assert con.execute("SELECT source_vendor, count(*) FROM fact_prop_odds GROUP BY 1 ORDER BY 1").fetchall() == [
+            ("PLAYNOW", 2), ("UNABATED", 2),
+        ]
+        assert con.execute("SELECT count(*) FROM raw_odds_payloads").fetchone()[0] == 2
+
+        # Same content next cycle: dedup by payload hash, nothing re-inserted
+        del vendors["ODDSSHARK"], vendors["BROKEN"]
+        with storage.RawPayloadWriter() as writer:
+            summary = run_capture_cycle(con, writer, vendors, lake_root=lake_root)
+        assert {v: s["status"] for v, s in summary.items()} == {"UNABATED": "skipped", "PLAYNOW": "skipped"}
+        assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 4
+    finally:
+        server.shutdown()
+        con.close()
+
+
+def test_vendor_is_not_recaptured_while_its_timed_out_worker_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    db_path = str(tmp_path / "odds.duckdb")
+    release, calls = threading.Event(), []
+
+    def stuck(cursor, writer):
+        calls.append(1)
+        release.wait(5)
+        return None
+
+    con = duckdb.connect(db_path)
+    initialize_phase11_tables(con, lake_root=str(tmp_path / "lake"))
+    with storage.RawPayloadWriter() as writer:
+        assert run_capture_cycle(con, writer, {"SLOW": stuck}, timeouts={"SLOW": 0.2})["SLOW"]["status"] == "timeout"
+        # Its worker is still running: the vendor is skipped rather than run on a second thread
+        assert run_capture_cycle(con, writer, {"SLOW": stuck}, timeouts={"SLOW": 0.2})["SLOW"]["status"] == "busy"
+        assert len(calls) == 1
+
+        # The stuck worker does not keep the database file open once the caller closes it
+        con.close()
+        duckdb.connect(db_path).close()
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while not all(f.done() for f in odds_capture._RUNNING.values()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with duckdb.connect(db_path) as con:
+            assert run_capture_cycle(con, writer, {"SLOW": stuck})["SLOW"]["status"] == "empty"
+    assert len(calls) == 2
+
+
+def test_unchanged_snapshots_are_noop_cycles(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    server, base = _serve({path: (0, content_type, body) for path, (_, content_type, body) in ROUTES.items()})
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+    vendors = {
+        "UNABATED": partial(capture_unabated, client=UnabatedClient(url=f"{base}/unabated.json", conditional=True)),
+        "PLAYNOW": partial(capture_playnow, client=PlayNowAPIClient(base_url=f"{base}/playnow", conditional=True)),
+        "ODDSSHARK": partial(capture_oddsshark, client=OddsSharkClient(url=f"{base}/oddsshark", conditional=True)),
+    }
+    try:
+        with storage.RawPayloadWriter() as writer:
+            first = run_capture_cycle(con, writer, vendors, lake_root=lake_root)
+            assert not is_noop_cycle(first)
+            second = run_capture_cycle(con, writer, vendors, lake_root=lake_root)
+
+        # Unabated answered 304 (ETag); the others sent identical bytes
+        assert {v: s["status"] for v, s in second.items()} == {
+            "UNABATED": "unchanged", "PLAYNOW": "unchanged", "ODDSSHARK": "unchanged",
+        }
+        assert is_noop_cycle(second)
+        # Nothing was saved for the no-op cycle: one index line per payload from the first cycle only
+        index_lines = sum(1 for f in (tmp_path / "raw" / "index").rglob("*.jsonl") for _ in open(f))
+        assert index_lines == 4  # UNABATED, PLAYNOW event_list + details, ODDSSHARK
+        assert server.hits.count("/unabated.json") == 2
+    finally:
+        server.shutdown()
+        con.close()
+
+
+def test_failed_store_is_refetched_next_cycle(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    server, base = _serve({path: (0, content_type, body) for path, (_, content_type, body) in ROUTES.items()})
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+    vendors = {
+        "UNABATED": partial(capture_unabated, client=UnabatedClient(url=f"{base}/unabated.json", conditional=True)),
+        "PLAYNOW": partial(capture_playnow, client=PlayNowAPIClient(base_url=f"{base}/playnow", conditional=True)),
+    }
+    insert = odds_capture.insert_odds_records
+
+    def insert_fails_once(*args, **kwargs):
+        monkeypatch.setattr(odds_capture, "insert_odds_records", insert)
+        raise OSError("lake write failed")
+
+    try:
+        monkeypatch.setattr(odds_capture, "insert_odds_records", insert_fails_once)
+        with storage.RawPayloadWriter() as writer:
+            first = run_capture_cycle(con, writer, {"UNABATED": vendors["UNABATED"]}, lake_root=lake_root)
+            assert first["UNABATED"]["status"] == "failed"
+            # The ETag and digest of the failed snapshot were never committed
+            second = run_capture_cycle(con, writer, vendors, lake_root=lake_root)
+            third = run_capture_cycle(con, writer, vendors, lake_root=lake_root)
+
+        assert {v: s["status"] for v, s in second.items()} == {"UNABATED": "inserted", "PLAYNOW": "inserted"}
+        assert {v: s["status"] for v, s in third.items()} == {"UNABATED": "unchanged", "PLAYNOW": "unchanged"}
+        assert con.execute("SELECT count(*) FROM fact_prop_odds WHERE source_vendor = 'UNABATED'").fetchone()[0] == 2
+    finally:
+        server.shutdown()
+        con.close()
+
+
+class _DetailsStandIn(BaseHTTPRequestHandler):
+    """event-list: ids 1-8; events-by-ids: one event per id; id 3 is slow and id 5 always fails."""
+
+    def do_GET(self):
+        if urlparse(self.path).path.endswith("/event-list"):
+            body = {"data": {"events": [{"id": i, "marketCount": 40} for i in range(1, 9)]}}
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode("utf-8"))
+            return
+        query = parse_qs(urlparse(self.path).query)
+        ids = query["eventIds"][0].split(",")
+        self.server.requests.append(ids)
+        if "3" in ids:
+            time.sleep(0.5)
+        if "5" in ids:
+            self.send_response(503)
+            self.end_headers()
+            return
+        market = PLAYNOW_DETAILS["data"]["events"][0]["markets"]
+        body = {"data": {"events": [
+            {"id": int(i), "name": f"Event {i}", "startTime": "2026-01-05T00:00:00Z", "markets": market} for i in ids
+        ]}}
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+def test_playnow_details_are_fetched_in_parallel_chunks(monkeypatch):
+    monkeypatch.setattr(PlayNowAPIClient._fetch_event_chunk.retry, "wait", wait_none())
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DetailsStandIn)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = PlayNowAPIClient(base_url=f"http://127.0.0.1:{server.server_port}")
+        start = time.monotonic()
+        url, data = client.fetch_event_details(list(range(1, 9)), chunk_size=2, max_workers=4)
+        elapsed = time.monotonic() - start
+
+        # Merged in request order; the failing chunk (5, 6) is left out after its retries
+        assert [e["id"] for e in data["data"]["events"]] == [1, 2, 3, 4, 7, 8]
+        assert data[FAILED_EVENTS_KEY] == [5, 6]
+        assert sum(1 for ids in server.requests if ids == ["5", "6"]) == 3
+        assert "eventIds=1%2C2%2C3%2C4%2C5%2C6%2C7%2C8" in url
+        # The slow chunk does not serialize the others
+        assert elapsed < 1.0
+    finally:
+        server.shutdown()
+
+
+def test_playnow_chunks_are_refetched_when_boundaries_shift_back():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DetailsStandIn)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = PlayNowAPIClient(base_url=f"http://127.0.0.1:{server.server_port}", conditional=True,
+                                  detail_chunk_size=2)
+
+        def fetch(ids):
+            data = client.fetch_event_details(ids)[1]
+            client.commit()
+            return data and ([e["id"] for e in data["data"]["events"]], FAILED_EVENTS_KEY in data)
+
+        # (1, 2) and (4, 6) are unchanged on the server but no longer held after the middle snapshot
+        assert fetch([1, 2, 4, 6]) == ([1, 2, 4, 6], False)
+        assert fetch([1, 4, 6, 7]) == ([1, 4, 6, 7], False)
+        assert fetch([1, 2, 4, 6, 7]) == ([1, 2, 4, 6, 7], False)
+        assert fetch([1, 2, 4, 6, 7]) is None
+
+        # A dropped event changes the chunk set even if every chunk reads as unchanged
+        assert fetch([1, 4, 6]) == ([1, 4, 6], False)
+        assert fetch([1, 2, 4, 6]) == ([1, 2, 4, 6], False)
+        assert fetch([1, 2]) == ([1, 2], False)
+    finally:
+        server.shutdown()
+
+
+def test_partial_playnow_snapshots_are_not_registered(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    monkeypatch.setattr(PlayNowAPIClient._fetch_event_chunk.retry, "wait", wait_none())
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DetailsStandIn)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+    client = PlayNowAPIClient(base_url=f"http://127.0.0.1:{server.server_port}", detail_chunk_size=2)
+    vendors = {"PLAYNOW": partial(capture_playnow, client=client)}
+    try:
+        with storage.RawPayloadWriter() as writer:
+            first = run_capture_cycle(con, writer, vendors, lake_root=lake_root)
+            second = run_capture_cycle(con, writer, vendors, lake_root=lake_root)
+
+        # Events 5 and 6 failed: the rows of the others are stored, the payload is not registered
+        # and the same partial content is parsed again rather than skipped as already ingested
+        for summary in (first, second):
+            assert summary["PLAYNOW"] == {**summary["PLAYNOW"], "status": "inserted", "records": 12, "partial": True}
+        assert con.execute("SELECT count(*) FROM raw_odds_payloads").fetchone()[0] == 0
+        assert con.execute("SELECT count(DISTINCT event_id_vendor) FROM fact_prop_odds").fetchone()[0] == 6
+        suffixes = {json.loads(line)["suffix"] for f in (tmp_path / "raw" / "index").rglob("*.jsonl") for line in open(f)}
+        assert suffixes == {"event_list", "details_partial"}
+    finally:
+        server.shutdown()
+        con.close()
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import duckdb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.db_init import FACT_PROP_ODDS_COLUMN_NAMES, initialize_phase11_tables, insert_odds_records
+from nhl_bets.common.odds_columns import FACT_PROP_ODDS_SCHEMA
+from nhl_bets.common.storage import odds_row_key
+from nhl_bets.scrapers import oddsshark_client
+from nhl_bets.scrapers.oddsshark_client import OddsSharkClient
+from nhl_bets.scrapers.playnow_adapter import PlayNowAdapter
+from nhl_bets.scrapers.unabated_client import UnabatedClient
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "odds_payloads")
+CAPTURE_TS = datetime(2026, 1, 5, 18, 30, 15, 250000, tzinfo=timezone.utc)
+
+# Golden files hold the rows the former dict-per-record parsers produced for each
+# payload, as typed by fact_prop_odds (timestamps as naive-UTC ISO strings).
+PARSERS = {
+    "unabated": (lambda: UnabatedClient().parse_snapshot, "json"),
+    "playnow_details": (lambda: PlayNowAdapter().parse_event_details, "json"),
+    "oddsshark": (lambda: OddsSharkClient().parse_snapshot, "html"),
+}
+
+
+def _parse(name):
+    parser, extension = PARSERS[name]
+    with open(os.path.join(FIXTURES, f"{name}.{extension}"), encoding="utf-8") as f:
+        payload = json.load(f) if extension == "json" else f.read()
+    return parser()(payload, f"objects/ab/{name}.gz", f"hash-{name}", CAPTURE_TS)
+
+
+def _golden(name):
+    with open(os.path.join(FIXTURES, f"{name}.golden.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _jsonable(rows):
+    return [{k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()} for row in rows]
+
+
+@pytest.mark.parametrize("name", sorted(PARSERS))
+def test_parsers_match_golden_rows(name):
+    table = _parse(name)
+
+    assert table.schema == FACT_PROP_ODDS_SCHEMA
+    assert table.column_names == FACT_PROP_ODDS_COLUMN_NAMES
+    assert _jsonable(table.to_pylist()) == _golden(name)
+    # Builder row keys are the per-record odds_row_key
+    assert table.column("row_key").to_pylist() == [odds_row_key(r) for r in table.to_pylist()]
+
+
+@pytest.mark.parametrize("backend", ["html.parser", "lxml"])
+def test_oddsshark_backends_match_golden_rows(backend, monkeypatch):
+    if backend == "lxml":
+        pytest.importorskip("lxml")
+    monkeypatch.setattr(oddsshark_client, "HTML_PARSER", backend)
+    assert _jsonable(_parse("oddsshark").to_pylist()) == _golden("oddsshark")
+
+
+def test_parsed_tables_insert_without_conversion(tmp_path):
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC'")
+    initialize_phase11_tables(con, lake_root=str(tmp_path))
+    for name in sorted(PARSERS):
+        insert_odds_records(con, _parse(name), lake_root=str(tmp_path))
+
+    cursor = con.execute(f"SELECT {', '.join(FACT_PROP_ODDS_COLUMN_NAMES)} FROM fact_prop_odds")
+    stored = [dict(zip(FACT_PROP_ODDS_COLUMN_NAMES, row)) for row in cursor.fetchall()]
+    expected = [row for name in sorted(PARSERS) for row in _golden(name)]
+    key = lambda row: row["row_key"]
+    assert sorted(_jsonable(stored), key=key) == sorted(expected, key=key)
@@ -0,0 +1,76 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.db_init import initialize_phase11_tables, insert_odds_deltas
+
+
+def _snapshot(capture_ts, prices):
+    """prices: {player name: Over decimal price}; one event, one book."""
+    return pd.DataFrame([{
+        "source_vendor": "UNABATED",
+        "capture_ts_utc": capture_ts,
+        "event_id_vendor": "E1",
+        "event_name_raw": "EDM @ TOR",
+        "event_start_ts_utc": None,
+        "home_team": "TOR",
+        "away_team": "EDM",
+        "player_id_vendor": None,
+        "player_name_raw": player,
+        "market_type": "SOG",
+        "line": 2.5,
+        "side": "OVER",
+        "book_id_vendor": "1",
+        "book_name_raw": "DraftKings",
+        "odds_american": None,
+        "odds_decimal": price,
+        "is_live": False,
+        "raw_payload_path": "x.json",
+        "raw_payload_hash": f"h{capture_ts:%H%M}",
+    } for player, price in prices.items()])
+
+
+def _asof(con, ts):
+    rows = con.execute("SELECT player_key, odds_decimal FROM prop_odds_asof(?)", [ts]).fetchall()
+    return dict(rows)
+
+
+def test_only_changes_are_stored_and_asof_rebuilds_state(tmp_path):
+    con = duckdb.connect()
+    lake_root = str(tmp_path)
+    initialize_phase11_tables(con, lake_root=lake_root)
+    t0 = datetime(2026, 1, 5, 12, 0)
+    t1, t2, t3 = t0 + timedelta(minutes=1), t0 + timedelta(minutes=2), t0 + timedelta(minutes=61)
+
+    # First snapshot is a keyframe
+    counts = insert_odds_deltas(con, _snapshot(t0, {"A": 2.0, "B": 1.9}), lake_root=lake_root)
+    assert counts == {"inserted": 2, "updated": 0, "removed": 0, "unchanged": 0, "keyframes": 1}
+
+    # A unchanged, B moved, C new
+    counts = insert_odds_deltas(con, _snapshot(t1, {"A": 2.0, "B": 1.8, "C": 3.0}), lake_root=lake_root)
+    assert counts == {"inserted": 1, "updated": 1, "removed": 0, "unchanged": 1, "keyframes": 0}
+
+    # Same prices again, B pulled from the board
+    counts = insert_odds_deltas(con, _snapshot(t2, {"A": 2.0, "C": 3.0}), lake_root=lake_root)
+    assert counts == {"inserted": 0, "updated": 0, "removed": 1, "unchanged": 2, "keyframes": 0}
+
+    # Keyframe interval elapsed: full rows again
+    counts = insert_odds_deltas(con, _snapshot(t3, {"A": 2.0, "C": 3.0}), lake_root=lake_root)
+    assert counts["keyframes"] == 1
+
+    # 2 + 2 + 0 + 2 rows instead of 2 + 3 + 2 + 2
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 6
+    assert con.execute("SELECT player_key FROM fact_prop_odds_latest ORDER BY 1").fetchall() == [("A",), ("C",)]
+    # Latest still tracks the newest capture even for unchanged prices
+    assert con.execute("SELECT DISTINCT capture_ts_utc FROM fact_prop_odds_latest").fetchall() == [(t3,)]
+
+    assert _asof(con, t0) == {"A": 2.0, "B": 1.9}
+    assert _asof(con, t1 + timedelta(seconds=30)) == {"A": 2.0, "B": 1.8, "C": 3.0}
+    assert _asof(con, t2) == {"A": 2.0, "C": 3.0}
+    assert _asof(con, t3) == {"A": 2.0, "C": 3.0}
+    assert _asof(con, t0 - timedelta(minutes=1)) == {}
@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.db_init import initialize_phase11_tables, insert_odds_records
+from nhl_bets.common.odds_lake import compact_partitions, list_partitions, partition_files, prune_partitions
+
+
+def _capture(vendor, capture_ts, payload_hash):
+    return pd.DataFrame([{
+        "source_vendor": vendor,
+        "capture_ts_utc": capture_ts,
+        "event_id_vendor": "E1",
+        "event_name_raw": "EDM @ TOR",
+        "event_start_ts_utc": None,
+        "home_team": "TOR",
+        "away_team": "EDM",
+        "player_id_vendor": None,
+        "player_name_raw": "Connor McDavid",
+        "market_type": "SOG",
+        "line": 3.5,
+        "side": side,
+        "book_id_vendor": "PLAYNOW",
+        "book_name_raw": "PlayNow",
+        "odds_american": -110,
+        "odds_decimal": 1.91,
+        "is_live": False,
+        "raw_payload_path": "x.json",
+        "raw_payload_hash": payload_hash,
+    } for side in ("OVER", "UNDER")])
+
+
+def _lake(tmp_path):
+    con = duckdb.connect()
+    root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=root)
+    insert_odds_records(con, _capture("PLAYNOW", datetime(2026, 1, 5, 12), "a"), lake_root=root)
+    insert_odds_records(con, _capture("PLAYNOW", datetime(2026, 1, 5, 18), "b"), lake_root=root)
+    insert_odds_records(con, _capture("UNABATED", datetime(2026, 1, 5, 12), "c"), lake_root=root)
+    insert_odds_records(con, _capture("PLAYNOW", datetime(2026, 2, 1, 12), "d"), lake_root=root)
+    return con, root
+
+
+def test_view_is_partitioned_by_vendor_and_capture_date(tmp_path):
+    con, root = _lake(tmp_path)
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 8
+    assert len(partition_files(root, "PLAYNOW", "2026-01-05")) == 2
+    assert [(p["source_vendor"], p["capture_date"]) for p in list_partitions(root)] == [
+        ("PLAYNOW", "2026-01-05"), ("UNABATED", "2026-01-05"), ("PLAYNOW", "2026-02-01")
+    ]
+
+    # A query on January never opens February's files (corrupt them to prove it)
+    for path in partition_files(root, "PLAYNOW", "2026-02-01"):
+        with open(path, "wb") as f:
+            f.write(b"not parquet")
+    n = con.execute("""
+        SELECT count(*) FROM fact_prop_odds
+        WHERE capture_date BETWEEN DATE '2026-01-01' AND DATE '2026-01-31' AND source_vendor = 'PLAYNOW'
+    """).fetchone()[0]
+    assert n == 4
+
+
+def test_compaction_and_prune(tmp_path):
+    con, root = _lake(tmp_path)
+    assert compact_partitions(con, root, before_date="2026-02-01") == 1
+    assert len(partition_files(root, "PLAYNOW", "2026-01-05")) == 1
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 8
+
+    # Replaying an already compacted capture is still a no-op
+    insert_odds_records(con, _capture("PLAYNOW", datetime(2026, 1, 5, 12), "a"), lake_root=root)
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 8
+
+    # The compacted file keeps the partition columns in its path only
+    stored = [r[0] for r in con.execute(
+        f"DESCRIBE SELECT * FROM read_parquet('{partition_files(root, 'PLAYNOW', '2026-01-05')[0]}', hive_partitioning = false)"
+    ).fetchall()]
+    assert "capture_date" not in stored and "source_vendor" not in stored
+
+    archive = str(tmp_path / "archive")
+    pruned = prune_partitions(root, "2026-02-01", archive_root=archive)
+    assert len(pruned) == 2
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 2
+    assert len(list_partitions(archive)) == 2
+
+
+def test_lake_with_stored_row_keys_is_rewritten(tmp_path):
+    from nhl_bets.common.db_init import FACT_PROP_ODDS_COLUMNS
+    from nhl_bets.common.odds_lake import SCHEMA_DATE, SCHEMA_VENDOR, partition_dir, write_parquet_file
+    from nhl_bets.common.storage import odds_row_key
+
+    # A lake in the previous layout: row_key stored in every file
+    con = duckdb.connect()
+    root = str(tmp_path / "lake")
+    batch = _capture("PLAYNOW", datetime(2026, 1, 5, 12), "a")
+    batch["row_key"] = [odds_row_key(r) for r in batch.to_dict("records")]
+    con.execute(f"CREATE TABLE typed ({FACT_PROP_ODDS_COLUMNS})")
+    con.register("batch", batch)
+    con.execute("INSERT INTO typed BY NAME SELECT * FROM batch")
+    old_layout = "SELECT * EXCLUDE (source_vendor) FROM typed"
+    write_parquet_file(con, f"{old_layout} LIMIT 0", partition_dir(root, SCHEMA_VENDOR, SCHEMA_DATE))
+    write_parquet_file(con, old_layout, partition_dir(root, "PLAYNOW", "2026-01-05"))
+
+    initialize_phase11_tables(con, lake_root=root)
+    for path in partition_files(root, "PLAYNOW", "2026-01-05") + partition_files(root, SCHEMA_VENDOR, SCHEMA_DATE):
+        stored = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM read_parquet('{path}')").fetchall()]
+        assert "row_key" not in stored
+    assert not os.path.exists(root + ".old") and not os.path.exists(root + ".rewrite")
+
+    # The view derives the same keys, so replaying the capture is still a no-op
+    assert sorted(r[0] for r in con.execute("SELECT row_key FROM fact_prop_odds").fetchall()) == sorted(batch["row_key"])
+    insert_odds_records(con, batch, lake_root=root)
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 2
+
+
+def test_interrupted_rewrite_is_rolled_forward(tmp_path):
+    from nhl_bets.common.odds_lake import REWRITE_JOURNAL, partition_dir
+
+    con, root = _lake(tmp_path)
+    part = partition_dir(root, "PLAYNOW", "2026-01-05")
+    old_files = partition_files(root, "PLAYNOW", "2026-01-05")
+    assert len(old_files) == 2
+
+    # A compaction that crashed after its journal: one old file already retired, the new file still .tmp
+    new_path = os.path.join(part, "compacted-crashed.parquet")
+    con.execute(f"COPY (SELECT * FROM read_parquet({old_files}, hive_partitioning = false)) TO '{new_path}.tmp' (FORMAT PARQUET)")
+    with open(os.path.join(part, REWRITE_JOURNAL), "w", encoding="utf-8") as f:
+        json.dump({"old": [os.path.basename(p) for p in old_files], "new": os.path.basename(new_path)}, f)
+    os.replace(old_files[0], old_files[0] + ".retired")
+    # ...and one that crashed before writing its journal
+    open(os.path.join(part, "compacted-orphan.parquet.tmp"), "wb").close()
+
+    # Recovery leaves a single file, so there is nothing left to compact
+    assert compact_partitions(con, root, before_date="2026-02-01") == 0
+    assert partition_files(root, "PLAYNOW", "2026-01-05") == [new_path]
+    assert sorted(os.listdir(part)) == ["compacted-crashed.parquet"]
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 8
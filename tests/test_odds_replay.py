@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common import storage
+from nhl_bets.common.db_init import initialize_phase11_tables, insert_odds_records
+from nhl_bets.scrapers.odds_replay import _parser, list_stored_payloads, replay_payloads
+from nhl_bets.scrapers.playnow_api_client import FAILED_EVENTS_KEY
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "odds_payloads")
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+def _legacy_file(root, vendor, ts, payload, extension):
+    """A payload as the date-partitioned layout stored it (plain file + .sha256 sidecar)."""
+    content = json.dumps(payload, sort_keys=True, separators=(",", ":")) if extension == "json" else payload
+    dir_path = root / vendor / ts.strftime("%Y/%m/%d")
+    dir_path.mkdir(parents=True)
+    path = dir_path / f"{ts:%H%M%S}_{vendor.lower()}.{extension}"
+    path.write_text(content, encoding="utf-8")
+    (dir_path / f"{path.name}.sha256").write_text(hashlib.sha256(content.encode("utf-8")).hexdigest())
+
+
+def test_replay_rebuilds_fact_prop_odds_idempotently(tmp_path, monkeypatch):
+    raw_root = tmp_path / "raw"
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(raw_root))
+    unabated = _fixture("unabated.json")
+
+    # Content-addressed captures: the Unabated snapshot twice (one object), PlayNow list + details, OddsShark
+    storage.save_raw_payload("UNABATED", unabated, "json")
+    storage.save_raw_payload("UNABATED", unabated, "json")
+    storage.save_raw_payload("PLAYNOW", {"data": {"events": []}}, "json", suffix="event_list")
+    storage.save_raw_payload("PLAYNOW", _fixture("playnow_details.json"), "json", suffix="details")
+    storage.save_raw_payload("ODDSSHARK", _fixture("oddsshark.html"), "html")
+    # An older Unabated snapshot from before content addressing
+    older = dict(unabated, people={**unabated["people"], "1": {"firstName": "Connor", "lastName": "McD"}})
+    _legacy_file(raw_root, "UNABATED", datetime(2025, 12, 1, 23, 5, 9), older, "json")
+
+    payloads = list_stored_payloads(str(raw_root))
+    assert [p["vendor"] for p in payloads] == ["UNABATED", "UNABATED", "PLAYNOW", "ODDSSHARK"]
+    assert payloads[0]["capture_ts"] == datetime.fromisoformat("2025-12-01T23:05:09+00:00")
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+    summary = replay_payloads(con, payloads, lake_root=lake_root, workers=2, chunk_size=1)
+    assert summary == {"payloads": 4, "parsed": 4, "failed": 0, "rows": 12 + 12 + 9 + 8, "deleted": 0}
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 41
+    assert con.execute("SELECT count(*) FROM raw_odds_payloads").fetchone()[0] == 4
+
+    # Replaying again (registered capture times reused) adds nothing
+    payloads = list_stored_payloads(str(raw_root), con=con)
+    assert all(p["registered"] for p in payloads)
+    replay_payloads(con, payloads, lake_root=lake_root, workers=2, chunk_size=3)
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 41
+    assert con.execute("SELECT count(*) FROM raw_odds_payloads").fetchone()[0] == 4
+
+    # Filters
+    assert [p["vendor"] for p in list_stored_payloads(str(raw_root), vendors=["playnow"])] == ["PLAYNOW"]
+    assert len(list_stored_payloads(str(raw_root), end_date=datetime(2025, 12, 31).date())) == 1
+
+
+def test_partial_playnow_payloads_are_replayed_but_not_registered(tmp_path, monkeypatch):
+    raw_root = tmp_path / "raw"
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(raw_root))
+    details = _fixture("playnow_details.json")
+    storage.save_raw_payload("PLAYNOW", dict(details, **{FAILED_EVENTS_KEY: [99]}), "json", suffix="details_partial")
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+    payloads = list_stored_payloads(str(raw_root), con=con)
+    assert [p["vendor"] for p in payloads] == ["PLAYNOW"]
+
+    summary = replay_payloads(con, payloads, lake_root=lake_root, workers=1)
+    assert summary["parsed"] == 1 and summary["rows"] == 9
+    assert con.execute("SELECT count(*) FROM raw_odds_payloads").fetchone()[0] == 0
+
+
+def test_replace_reloads_rows_a_changed_parser_produces(tmp_path, monkeypatch):
+    raw_root = tmp_path / "raw"
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(raw_root))
+    capture_ts = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+    unabated = _fixture("unabated.json")
+    rel_path, sha_hash, _ = storage.save_raw_payload("UNABATED", unabated, "json", capture_ts=capture_ts)
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+
+    # What the current parser makes of the payload, and what an older parser loaded:
+    # every price off by one and a prop the current parser no longer emits
+    current = _parser("UNABATED")(unabated, rel_path, sha_hash, capture_ts).to_pandas()
+    old = current.drop(columns="row_key").assign(odds_decimal=current["odds_decimal"] + 1)
+    dropped = old.iloc[[0]].assign(market_type="OLD_MARKET")
+    insert_odds_records(con, pd.concat([old, dropped]), lake_root=lake_root)
+    con.execute("INSERT INTO raw_odds_payloads (payload_hash, source_vendor, capture_ts_utc, file_path) VALUES (?, ?, ?, ?)",
+                [sha_hash, "UNABATED", capture_ts.replace(tzinfo=None), rel_path])
+    # Same partition, loaded from a payload that is not replayed: an earlier quote of the dropped prop
+    earlier = dropped.assign(capture_ts_utc=datetime(2026, 1, 5, 10), raw_payload_hash="other", odds_decimal=3.0)
+    insert_odds_records(con, earlier, lake_root=lake_root)
+
+    def prices(sql):
+        return sorted(con.execute(sql).fetchall())
+
+    lake_sql = f"SELECT market_type, book_id_vendor, side, line, odds_decimal FROM fact_prop_odds WHERE raw_payload_hash = '{sha_hash}'"
+    latest_sql = "SELECT market_type, book_id_vendor, side, line, odds_decimal FROM fact_prop_odds_latest"
+    con.register("current_parse", current)
+    expected = prices("SELECT market_type, book_id_vendor, side, line, odds_decimal FROM current_parse")
+    best_points_over = con.execute(
+        "SELECT max(odds_decimal) FROM current_parse WHERE side = 'OVER' AND market_type = 'POINTS'"
+    ).fetchone()[0]
+
+    # An append-only replay cannot fix the old rows: row_key has no price
+    payloads = list_stored_payloads(str(raw_root), con=con)
+    replay_payloads(con, payloads, lake_root=lake_root, workers=1)
+    assert prices(lake_sql) != expected
+
+    summary = replay_payloads(con, payloads, lake_root=lake_root, workers=1, replace=True)
+    assert summary["deleted"] == len(current) + 1 and summary["rows"] == len(current)
+    assert prices(lake_sql) == expected
+    # The other payload's row survives; the dropped prop's latest price falls back to it
+    assert prices("SELECT raw_payload_hash, odds_decimal FROM fact_prop_odds WHERE raw_payload_hash = 'other'") == [("other", 3.0)]
+    dropped_key = tuple(dropped[["market_type", "book_id_vendor", "side", "line"]].iloc[0]) + (3.0,)
+    assert prices(latest_sql) == sorted(expected + [dropped_key])
+    assert con.execute("SELECT max(best_over_decimal) FROM fact_prop_consensus WHERE market_type = 'POINTS'").fetchone()[0] \
+        == best_points_over
+
+    # Replacing again is a no-op in effect
+    replay_payloads(con, payloads, lake_root=lake_root, workers=1, replace=True)
+    assert prices(lake_sql) == expected
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == len(current) + 1
+
+
+def test_replace_keeps_rows_of_payloads_that_fail_to_parse(tmp_path, monkeypatch):
+    raw_root = tmp_path / "raw"
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(raw_root))
+    unabated = _fixture("unabated.json")
+    storage.save_raw_payload("UNABATED", unabated, "json", capture_ts=datetime(2026, 1, 5, 12, tzinfo=timezone.utc))
+    later = dict(unabated, people={**unabated["people"], "1": {"firstName": "Connor", "lastName": "McD"}})
+    storage.save_raw_payload("UNABATED", later, "json", capture_ts=datetime(2026, 1, 5, 14, tzinfo=timezone.utc))
+
+    con = duckdb.connect()
+    lake_root = str(tmp_path / "lake")
+    initialize_phase11_tables(con, lake_root=lake_root)
+    payloads = list_stored_payloads(str(raw_root))
+    replay_payloads(con, payloads, lake_root=lake_root, workers=1)
+
+    def snapshot():
+        return (sorted(con.execute("SELECT raw_payload_hash, market_type, book_id_vendor, side, line, odds_decimal "
+                                   "FROM fact_prop_odds").fetchall()),
+                sorted(con.execute("SELECT raw_payload_hash, market_type, book_id_vendor, side, line, odds_decimal "
+                                   "FROM fact_prop_odds_latest").fetchall()))
+    before = snapshot()
+
+    # The later payload (which set every latest price) can no longer be read
+    with open(payloads[1]["path"], "w", encoding="utf-8") as f:
+        f.write("{not json")
+    summary = replay_payloads(con, payloads, lake_root=lake_root, workers=1, chunk_size=1, replace=True)
+    assert (summary["parsed"], summary["failed"]) == (1, 1)
+    assert summary["deleted"] == summary["rows"] == 12
+    assert snapshot() == before
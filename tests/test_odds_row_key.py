@@ -0,0 +1,86 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common.db_init import ODDS_ROW_KEY_SQL, initialize_phase11_tables, insert_odds_records
+from nhl_bets.common.storage import odds_row_key
+
+
+def _record(player_id="P1", capture_ts=datetime(2026, 1, 5, 12, 0, 0, 123456), line=2.5):
+    return {
+        "source_vendor": "PLAYNOW",
+        "capture_ts_utc": capture_ts,
+        "event_id_vendor": "123",
+        "event_name_raw": "EDM @ TOR",
+        "event_start_ts_utc": None,
+        "home_team": "TOR",
+        "away_team": "EDM",
+        "player_id_vendor": player_id,
+        "player_name_raw": "Connor McDavid",
+        "market_type": "SOG",
+        "line": line,
+        "side": "OVER",
+        "book_id_vendor": "PLAYNOW",
+        "book_name_raw": "PlayNow",
+        "odds_american": -110,
+        "odds_decimal": 1.91,
+        "is_live": False,
+        "raw_payload_path": "x.json",
+        "raw_payload_hash": "abc",
+    }
+
+
+def test_python_and_sql_row_keys_match(tmp_path):
+    con = duckdb.connect()
+    initialize_phase11_tables(con, lake_root=str(tmp_path))
+    records = [_record(), _record(player_id=None), _record(line=0.5)]
+    insert_odds_records(con, pd.DataFrame(records), lake_root=str(tmp_path))
+
+    stored = con.execute(f"SELECT row_key, {ODDS_ROW_KEY_SQL} FROM fact_prop_odds").fetchall()
+    assert len(stored) == 3
+    assert all(key == sql_key for key, sql_key in stored)
+    assert {key for key, _ in stored} == {odds_row_key(r) for r in records}
+
+    # Timezone-aware captures hash like their naive UTC equivalent
+    aware = _record(capture_ts=datetime(2026, 1, 5, 12, 0, 0, 123456, tzinfo=timezone.utc))
+    assert odds_row_key(aware) == odds_row_key(_record())
+
+
+def test_replayed_batch_is_not_reinserted(tmp_path):
+    con = duckdb.connect()
+    initialize_phase11_tables(con, lake_root=str(tmp_path))
+    df = pd.DataFrame([_record(), _record(player_id=None)])
+    insert_odds_records(con, df, lake_root=str(tmp_path))
+    insert_odds_records(con, df, lake_root=str(tmp_path))
+    insert_odds_records(con, pd.concat([df, df], ignore_index=True), lake_root=str(tmp_path))
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 2
+
+
+def test_legacy_table_is_migrated_to_row_key(tmp_path):
+    con = duckdb.connect()
+    con.execute("""
+    CREATE TABLE fact_prop_odds (
+        source_vendor TEXT NOT NULL, capture_ts_utc TIMESTAMP NOT NULL, event_id_vendor TEXT NOT NULL,
+        event_name_raw TEXT, event_start_ts_utc TIMESTAMP, home_team TEXT, away_team TEXT,
+        player_id_vendor TEXT, player_name_raw TEXT, market_type TEXT NOT NULL, line DOUBLE NOT NULL,
+        side TEXT NOT NULL, book_id_vendor TEXT NOT NULL, book_name_raw TEXT, odds_american INTEGER,
+        odds_decimal DOUBLE, is_live BOOLEAN DEFAULT FALSE, raw_payload_path TEXT, raw_payload_hash TEXT NOT NULL,
+        CONSTRAINT fact_prop_odds_unique UNIQUE (source_vendor, capture_ts_utc, event_id_vendor, player_id_vendor,
+            player_name_raw, market_type, line, side, book_id_vendor, raw_payload_hash)
+    )
+    """)
+    legacy = pd.DataFrame([_record()])
+    con.register("legacy", legacy)
+    con.execute("INSERT INTO fact_prop_odds SELECT * FROM legacy")
+
+    initialize_phase11_tables(con, lake_root=str(tmp_path))
+    assert con.execute("SELECT row_key FROM fact_prop_odds").fetchone()[0] == odds_row_key(_record())
+
+    # The migrated row is recognised as a duplicate
+    insert_odds_records(con, legacy, lake_root=str(tmp_path))
+    assert con.execute("SELECT count(*) FROM fact_prop_odds").fetchone()[0] == 1
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+import duckdb
+from tenacity import wait_none
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from test_odds_capture import ROUTES, UNABATED_SNAPSHOT, _StandIn
+from nhl_bets.common import storage
+from nhl_bets.common.db_init import initialize_phase11_tables
+from nhl_bets.scrapers.odds_capture import capture_oddsshark, capture_unabated
+from nhl_bets.scrapers.odds_scheduler import OddsPollingDaemon
+from nhl_bets.scrapers.oddsshark_client import OddsSharkClient
+from nhl_bets.scrapers.unabated_client import UnabatedClient
+
+START = datetime(2026, 1, 5, 10, 0, tzinfo=timezone.utc)
+PUCK_DROP = START + timedelta(hours=2)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.t = now
+
+    def now(self):
+        return self.t
+
+    async def sleep(self, seconds):
+        self.t += timedelta(seconds=seconds)
+        await asyncio.sleep(0)
+
+
+class _Blocked(_StandIn):
+    def do_GET(self):
+        if self.path.startswith("/oddsshark"):
+            self.server.hits.append(self.path)
+            self.send_response(403)
+            self.end_headers()
+            return
+        super().do_GET()
+
+
+def _recorded(capture_fn, clock, log):
+    def capture(cursor, writer):
+        log.append(clock.now())
+        return capture_fn(cursor, writer)
+    return capture
+
+
+def _minutes(times):
+    return [(b - a).total_seconds() / 60 for a, b in zip(times, times[1:])]
+
+
+def test_polls_densify_toward_puck_drop_and_back_off_on_403(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    monkeypatch.setattr(OddsSharkClient.fetch_snapshot.retry, "wait", wait_none())
+    snapshot = {**UNABATED_SNAPSHOT, "odds": {"lg6:pt1:pregame": [
+        {**UNABATED_SNAPSHOT["odds"]["lg6:pt1:pregame"][0], "eventStart": PUCK_DROP.strftime("%Y-%m-%dT%H:%M:%SZ")}
+    ]}}
+    routes = {path: (0, content_type, body) for path, (_, content_type, body) in ROUTES.items()}
+    routes["/unabated.json"] = (0, "application/json", json.dumps(snapshot))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Blocked)
+    server.routes, server.hits = routes, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    db_path = str(tmp_path / "odds.duckdb")
+    lake_root = str(tmp_path / "lake")
+    with duckdb.connect(db_path) as con:
+        initialize_phase11_tables(con, lake_root=lake_root)
+    clock = FakeClock(START)
+    unabated_polls, oddsshark_polls = [], []
+    vendors = {
+        "UNABATED": _recorded(partial(capture_unabated, client=UnabatedClient(url=f"{base}/unabated.json", conditional=True)),
+                              clock, unabated_polls),
+        "ODDSSHARK": _recorded(partial(capture_oddsshark, client=OddsSharkClient(url=f"{base}/oddsshark", conditional=True)),
+                               clock, oddsshark_polls),
+    }
+    try:
+        with storage.RawPayloadWriter() as writer:
+            daemon = OddsPollingDaemon(partial(duckdb.connect, db_path), writer, vendors, clock=clock,
+                                       requests_per_minute=10, lake_root=lake_root)
+            asyncio.run(daemon.run(until=START + timedelta(hours=2, minutes=30)))
+
+        # Sparse two hours out, every 2 min inside the last hour, every minute in the last 15,
+        # final capture 30s before puck drop and nothing after it
+        gaps = _minutes(unabated_polls)
+        assert unabated_polls[0] == START
+        assert gaps[:6] == [10] * 6
+        assert gaps[6:29] == [2] * 23
+        assert gaps[29:] == [1] * 13 + [0.5]
+        assert unabated_polls[-1] == PUCK_DROP - timedelta(seconds=30)
+
+        # 403s: back-off from 10 minutes, doubling up to the hourly cap
+        assert _minutes(oddsshark_polls) == [10, 20, 40, 60]
+
+        metrics = daemon.metrics()
+        assert metrics["polls"] == {"UNABATED": len(unabated_polls), "ODDSSHARK": 5}
+        assert metrics["errors"]["ODDSSHARK"] == 5
+        assert metrics["records"] == 2 and metrics["noop_cycles"] > 0
+        assert metrics["max_lag_s"] == 0
+    finally:
+        server.shutdown()
+
+
+def test_request_budget_defers_polls(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    db_path = str(tmp_path / "odds.duckdb")
+    with duckdb.connect(db_path) as con:
+        initialize_phase11_tables(con, lake_root=str(tmp_path / "lake"))
+    clock = FakeClock(START)
+    polls = []
+    vendors = {v: _recorded(lambda cursor, writer: None, clock, polls) for v in ("UNABATED", "ODDSSHARK")}
+
+    with storage.RawPayloadWriter() as writer:
+        daemon = OddsPollingDaemon(partial(duckdb.connect, db_path), writer, vendors, clock=clock, requests_per_minute=1,
+                                   lake_root=str(tmp_path / "lake"), metrics_path=str(tmp_path / "metrics.json"))
+        asyncio.run(daemon.run(until=START + timedelta(minutes=5)))
+
+    # One request per minute: the second vendor waits a minute for its token
+    assert polls[:2] == [START, START + timedelta(minutes=1)]
+    metrics = daemon.metrics()
+    assert metrics["deferred"] == 1 and metrics["max_lag_s"] == 60
+    assert os.path.exists(tmp_path / "metrics.json")
+
+
+def _hold_lock(db_path):
+    """Another process holding the database's write lock until its stdin closes."""
+    holder = subprocess.Popen(
+        [sys.executable, "-c", "import duckdb, sys; con = duckdb.connect(sys.argv[1]); print('held', flush=True); "
+                               "sys.stdin.read()", db_path],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+    assert holder.stdout.readline().strip() == "held"
+    return holder
+
+
+def test_database_is_only_locked_during_a_cycle(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    db_path = str(tmp_path / "odds.duckdb")
+    with duckdb.connect(db_path) as con:
+        initialize_phase11_tables(con, lake_root=str(tmp_path / "lake"))
+    clock = FakeClock(START)
+    polls, cycles = [], []
+    vendors = {"UNABATED": _recorded(lambda cursor, writer: None, clock, polls)}
+
+    with storage.RawPayloadWriter() as writer:
+        daemon = OddsPollingDaemon(partial(duckdb.connect, db_path), writer, vendors, clock=clock,
+                                   lake_root=str(tmp_path / "lake"), after_cycle=lambda con, summary: cycles.append(summary))
+
+        # Another process (e.g. the production pipeline) holds the lock: the cycle is postponed
+        holder = _hold_lock(db_path)
+        try:
+            assert asyncio.run(daemon.run_once()) is None
+        finally:
+            holder.stdin.close()
+            holder.wait()
+        assert polls == [] and daemon.metrics()["db_busy"] == 1
+        assert daemon.next_poll["UNABATED"] == START + timedelta(minutes=1)
+
+        # Once it is released the cycle runs, and the daemon lets go of the file afterwards
+        clock.t += timedelta(minutes=1)
+        assert asyncio.run(daemon.run_once())["UNABATED"]["status"] == "empty"
+        assert len(cycles) == 1 and daemon.failures["UNABATED"] == 0
+        holder = _hold_lock(db_path)
+        holder.stdin.close()
+        assert holder.wait() == 0
@@ -0,0 +1,129 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nhl_bets.common import storage
+from nhl_bets.scrapers import scrape_playnow_api
+from nhl_bets.scrapers.scrape_playnow_api import (
+    FACT_MARKETS_COLUMNS, append_market_changes, compact_playnow_tables, extract_market_rows,
+    init_playnow_tables, register_raw_response,
+)
+
+EVENT = {
+    "id": 77, "name": "Toronto Maple Leafs @ Edmonton Oilers", "startTime": "2026-01-06T02:00:00Z",
+    "markets": [{
+        "id": 1, "name": "Connor McDavid Total Shots on Goal", "handicapValue": 3.5,
+        "outcomes": [
+            {"id": 11, "name": "Over", "prices": [{"decimal": 1.8, "numerator": 4, "denominator": 5}]},
+            {"id": 12, "name": "Under", "prices": [{"decimal": 2.0, "numerator": 1, "denominator": 1}]},
+        ],
+    }],
+}
+
+
+def _rows(ts, over_price=1.8):
+    event = json.loads(json.dumps(EVENT))
+    event["markets"][0]["outcomes"][0]["prices"][0]["decimal"] = over_price
+    return extract_market_rows(event, ts)[0]
+
+
+def test_raw_responses_and_market_rows_are_stored_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    con = duckdb.connect()
+    assert not init_playnow_tables(con)
+
+    # Same body twice: one object, one reference row
+    payload = {"data": {"events": [EVENT]}}
+    t0, t1 = datetime(2026, 1, 5, 18, tzinfo=timezone.utc), datetime(2026, 1, 5, 19, tzinfo=timezone.utc)
+    path, sha, _ = register_raw_response(con, "events-by-ids", "https://x/events-by-ids", payload, t0)
+    register_raw_response(con, "events-by-ids", "https://x/events-by-ids", payload, t1)
+    assert con.execute("SELECT payload_hash, file_path, first_captured_at, last_captured_at, capture_count "
+                       "FROM raw_playnow_responses").fetchall() == [(sha, path, t0.replace(tzinfo=None), t1.replace(tzinfo=None), 2)]
+    assert storage.load_raw_payload(path) == payload
+
+    # Market rows: unchanged prices are not appended again
+    ts = [datetime(2026, 1, 5, h) for h in (18, 19, 20)]
+    assert append_market_changes(con, _rows(ts[0])) == 2
+    assert append_market_changes(con, _rows(ts[1])) == 0
+    assert append_market_changes(con, _rows(ts[2], over_price=1.75)) == 1
+    assert con.execute("SELECT outcome_id, price_decimal, captured_at FROM fact_playnow_markets ORDER BY captured_at, outcome_id").fetchall() == [
+        ("11", 1.8, ts[0]), ("12", 2.0, ts[0]), ("11", 1.75, ts[2]),
+    ]
+
+
+def test_compaction_collapses_legacy_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    con = duckdb.connect()
+
+    # Tables as the scraper used to write them: a JSON body and every outcome row per run
+    con.execute("CREATE TABLE raw_playnow_responses (captured_at TIMESTAMP, endpoint VARCHAR, request_url VARCHAR, payload_json JSON)")
+    con.execute(f"CREATE TABLE fact_playnow_markets ({FACT_MARKETS_COLUMNS})")
+    bodies = [{"data": {"events": [], "n": 1}}, {"data": {"events": [], "n": 1}}, {"data": {"n": 2, "events": []}}]
+    for hour, body in zip((10, 11, 12), bodies):
+        con.execute("INSERT INTO raw_playnow_responses VALUES (?, 'event-list', 'https://x/event-list', ?)",
+                    [datetime(2026, 1, 5, hour), json.dumps(body)])
+    for hour, price in ((10, 1.8), (11, 1.8), (12, 1.75), (13, 1.8)):
+        con.append("fact_playnow_markets", pd.DataFrame(_rows(datetime(2026, 1, 5, hour), price)))
+    assert init_playnow_tables(con)
+
+    # The legacy scraper stamped local time (Pacific); migrated rows are UTC like new captures
+    counts = compact_playnow_tables(con, legacy_timezone="America/Vancouver")
+    assert counts == {"raw_before": 3, "raw_after": 2, "markets_before": 8, "markets_after": 4}
+    rows = con.execute("SELECT endpoint, first_captured_at, last_captured_at, capture_count FROM raw_playnow_responses "
+                       "ORDER BY first_captured_at").fetchall()
+    assert rows == [("event-list", datetime(2026, 1, 5, 18), datetime(2026, 1, 5, 19), 2),
+                    ("event-list", datetime(2026, 1, 5, 20), datetime(2026, 1, 5, 20), 1)]
+    # Over went 1.8 -> 1.75 -> 1.8; Under never changed
+    assert con.execute("SELECT outcome_id, price_decimal, hour(captured_at) FROM fact_playnow_markets "
+                       "ORDER BY outcome_id, captured_at").fetchall() == [
+        ("11", 1.8, 18), ("11", 1.75, 20), ("11", 1.8, 21), ("12", 2.0, 18),
+    ]
+    # Idempotent
+    assert compact_playnow_tables(con) == {"raw_before": 2, "raw_after": 2, "markets_before": 4, "markets_after": 4}
+
+
+def test_interrupted_migration_resumes_from_the_legacy_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path / "raw"))
+    con = duckdb.connect()
+    con.execute("CREATE TABLE raw_playnow_responses (captured_at TIMESTAMP, endpoint VARCHAR, request_url VARCHAR, payload_json JSON)")
+    con.execute(f"CREATE TABLE fact_playnow_markets ({FACT_MARKETS_COLUMNS})")
+    for hour, n in ((10, 1), (11, 2)):
+        con.execute("INSERT INTO raw_playnow_responses VALUES (?, 'event-list', 'https://x/event-list', ?)",
+                    [datetime(2026, 1, 5, hour), json.dumps({"data": {"events": [], "n": n}})])
+    con.append("fact_playnow_markets", pd.DataFrame(_rows(datetime(2026, 1, 5, 10))))
+
+    # The run dies after saving the first payload: the legacy table is set aside, nothing else changed
+    save = scrape_playnow_api.save_raw_payload
+    saved = []
+
+    def save_then_die(*args, **kwargs):
+        if saved:
+            raise KeyboardInterrupt
+        saved.append(args)
+        return save(*args, **kwargs)
+
+    monkeypatch.setattr(scrape_playnow_api, "save_raw_payload", save_then_die)
+    try:
+        compact_playnow_tables(con, legacy_timezone="America/Vancouver")
+    except KeyboardInterrupt:
+        pass
+    assert con.execute("SELECT count(*) FROM raw_playnow_responses_legacy").fetchone()[0] == 2
+    assert con.execute("SELECT count(*) FROM raw_playnow_responses").fetchone()[0] == 0
+    assert init_playnow_tables(con)
+
+    # The next run picks it up and finishes; market times are converted exactly once
+    monkeypatch.setattr(scrape_playnow_api, "save_raw_payload", save)
+    counts = compact_playnow_tables(con, legacy_timezone="America/Vancouver")
+    assert counts == {"raw_before": 2, "raw_after": 2, "markets_before": 2, "markets_after": 2}
+    assert not init_playnow_tables(con)
+    assert con.execute("SELECT min(first_captured_at), max(last_captured_at) FROM raw_playnow_responses").fetchone() == \
+        (datetime(2026, 1, 5, 18), datetime(2026, 1, 5, 19))
+    assert con.execute("SELECT DISTINCT captured_at FROM fact_playnow_markets").fetchall() == [(datetime(2026, 1, 5, 18),)]
+    compact_playnow_tables(con, legacy_timezone="America/Vancouver")
+    assert con.execute("SELECT DISTINCT captured_at FROM fact_playnow_markets").fetchall() == [(datetime(2026, 1, 5, 18),)]
@@ -1,11 +1,165 @@
 import os
 import sys
+from datetime import datetime
+
+import duckdb
+import pandas as pd
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from nhl_bets.analysis.runner_duckdb import normalize_team
+from nhl_bets.analysis.normalize import normalize_name, register_sql_helpers
+from nhl_bets.analysis.runner_duckdb import HISTORY_ODDS_TABLE, MIN_EV, get_ranked_bets, normalize_team
+from nhl_bets.common.db_init import EXCLUDED_BOOK_KEYWORDS, initialize_phase11_tables, insert_odds_records
+from nhl_bets.projections.config import get_production_prob_column
 
 
 def test_normalize_team_abbr():
     assert normalize_team("Boston Bruins") == "BOS"
     assert normalize_team("bos") == "BOS"
+
+
+def test_sql_helpers_match_python_normalizers():
+    con = duckdb.connect()
+    register_sql_helpers(con)
+
+    names = ["Tim Stützle", "Alexis Lafrenière (MTL)", "Elias Pettersson (F)", "  J.T.  Miller ", "Ryan O'Reilly",
+             "Pierre-Luc Dubois", "Zach Werenski", "Mitch Marner (TOR) (F)", "Jesper Bratt_2", "", None]
+    for name in names:
+        assert con.execute("SELECT nhl_normalize_name(?)", [name]).fetchone()[0] == normalize_name(name), name
+
+    teams = ["Boston Bruins", " Toronto Maple Leafs ", "St. Louis Blues", "Utah Hockey Club", "Montréal Canadiens",
+             "bos", "TOR", " edm", "", None]
+    for team in teams:
+        assert con.execute("SELECT nhl_team_abbr(?)", [team]).fetchone()[0] == normalize_team(team), team
+
+
+def _odds(vendor, player_id, player, home, away, market, line, side, book, decimal, capture_ts):
+    return {
+        "source_vendor": vendor, "capture_ts_utc": capture_ts, "event_id_vendor": f"{vendor}-E1",
+        "event_name_raw": f"{away} @ {home}", "event_start_ts_utc": None, "home_team": home, "away_team": away,
+        "player_id_vendor": player_id, "player_name_raw": player, "market_type": market, "line": line,
+        "side": side, "book_id_vendor": book.lower(), "book_name_raw": book,
+        "odds_american": int(round((decimal - 1) * 100)) if decimal >= 2 else int(round(-100 / (decimal - 1))),
+        "odds_decimal": decimal, "is_live": False, "raw_payload_path": "x.json",
+        "raw_payload_hash": f"{vendor}-{capture_ts:%H}",
+    }
+
+
+def _fixture(tmp_path):
+    con = duckdb.connect()
+    initialize_phase11_tables(con, lake_root=str(tmp_path))
+    con.execute("CREATE TABLE dim_players AS SELECT * FROM (VALUES (1, 'Connor McDavid', 'edm'), "
+                "(2, 'Mitch Marner', 'TOR')) t(player_id, player_name, team)")
+    con.execute("INSERT INTO dim_players_mapping (vendor_player_id, vendor_player_name, source_vendor, canonical_player_id) "
+                "VALUES ('P1', 'C. McDavid', 'UNABATED', 1)")
+
+    early, late = datetime(2026, 1, 5, 12), datetime(2026, 1, 5, 14)
+    rows = []
+    for capture_ts, over, under in ((early, 1.90, 1.95), (late, 2.30, 1.60)):
+        for book in ("DraftKings", "Underdog"):
+            rows.append(_odds("UNABATED", "P1", "C. McDavid", "TOR", "EDM", "POINTS", 1.5, "OVER", book, over, capture_ts))
+            rows.append(_odds("UNABATED", "P1", "C. McDavid", "TOR", "EDM", "POINTS", 1.5, "UNDER", book, under, capture_ts))
+    rows += [
+        # Unmapped: joins on the normalized raw name and the event's teams
+        _odds("UNABATED", None, "Mitch Marner", "TOR", "EDM", "SOG", 2.5, "OVER", "FanDuel", 2.20, late),
+        _odds("UNABATED", None, "Mitch Marner", "TOR", "EDM", "SOG", 2.5, "UNDER", "FanDuel", 1.70, late),
+        _odds("UNABATED", None, "Auston Matthews", "TOR", "EDM", "GOALS", 0.5, "OVER", "FanDuel", 3.50, late),
+        # Full team names and a parenthetical in the player name
+        _odds("PLAYNOW", None, "Mitch Marner (TOR)", "Toronto Maple Leafs", "Edmonton Oilers", "ASSISTS", 0.5,
+              "OVER", "PlayNow", 2.40, late),
+        _odds("PLAYNOW", None, "Leon Draisaitl", "Toronto Maple Leafs", "Edmonton Oilers", "POINTS", 0.5,
+              "OVER", "PlayNow", 1.25, late),
+    ]
+    insert_odds_records(con, pd.DataFrame(rows), lake_root=str(tmp_path))
+
+    probs = pd.DataFrame([
+        {"Player": "Connor McDavid", "Team": "EDM", "Date": "2026-01-05", "p_PTS_2plus": 0.50,
+         "p_PTS_2plus_calibrated": 0.48, "p_SOG_3plus": 0.60, "p_A_1plus": 0.70, "p_A_1plus_calibrated": 0.65,
+         "p_G_1plus": 0.45, "p_PTS_1plus": 0.80, "p_PTS_1plus_calibrated": 0.82},
+        # Same name on another team never joins
+        {"Player": "Connor McDavid", "Team": "NYR", "Date": "2026-01-05", "p_PTS_2plus": 0.99,
+         "p_PTS_2plus_calibrated": 0.99, "p_SOG_3plus": 0.99, "p_A_1plus": 0.99, "p_A_1plus_calibrated": 0.99,
+         "p_G_1plus": 0.99, "p_PTS_1plus": 0.99, "p_PTS_1plus_calibrated": 0.99},
+        {"Player": "Mitch Marner", "Team": "TOR", "Date": "2026-01-05", "p_PTS_2plus": 0.30,
+         "p_PTS_2plus_calibrated": 0.31, "p_SOG_3plus": 0.55, "p_A_1plus": 0.52, "p_A_1plus_calibrated": 0.50,
+         "p_G_1plus": 0.35, "p_PTS_1plus": 0.66, "p_PTS_1plus_calibrated": 0.64},
+        {"Player": "Auston Matthews", "Team": "TOR", "Date": "2026-01-05", "p_PTS_2plus": 0.35,
+         "p_PTS_2plus_calibrated": 0.33, "p_SOG_3plus": 0.70, "p_A_1plus": 0.40, "p_A_1plus_calibrated": 0.41,
+         "p_G_1plus": 0.55, "p_PTS_1plus": 0.70, "p_PTS_1plus_calibrated": 0.69},
+        {"Player": "Leon Draisaitl", "Team": "EDM", "Date": "2026-01-05", "p_PTS_2plus": 0.45,
+         "p_PTS_2plus_calibrated": 0.44, "p_SOG_3plus": 0.50, "p_A_1plus": 0.60, "p_A_1plus_calibrated": 0.58,
+         "p_G_1plus": 0.50, "p_PTS_1plus": 0.78, "p_PTS_1plus_calibrated": 0.79},
+    ])
+    return con, probs
+
+
+def _pandas_ranked(con, df_probs, window_days=1, min_ev=MIN_EV):
+    """The pre-pushdown path: mapped odds and probabilities joined and priced in pandas."""
+    df_odds = con.execute("""
+    SELECT o.*, COALESCE(pm_id.canonical_player_id, pm_name.canonical_player_id) AS canonical_player_id
+    FROM fact_prop_odds o
+    LEFT JOIN dim_players_mapping pm_id ON o.player_id_vendor = pm_id.vendor_player_id AND o.source_vendor = pm_id.source_vendor
+    LEFT JOIN dim_players_mapping pm_name ON o.player_name_raw = pm_name.vendor_player_name AND o.source_vendor = pm_name.source_vendor
+    """).df()
+    df_players = con.execute("SELECT player_id, player_name AS canonical_player_name, team AS canonical_team FROM dim_players").df()
+    df_odds = df_odds.merge(df_players, left_on='canonical_player_id', right_on='player_id', how='left')
+    df_odds['join_name'] = df_odds['canonical_player_name'].fillna(df_odds['player_name_raw'])
+    df_odds['join_team'] = df_odds['canonical_team'].str.upper()
+    df_odds['home_abbr'] = df_odds['home_team'].apply(normalize_team)
+    df_odds['away_abbr'] = df_odds['away_team'].apply(normalize_team)
+    df_odds['join_date'] = pd.to_datetime(df_odds['event_start_ts_utc']).fillna(df_odds['capture_ts_utc']).dt.normalize()
+    df_odds['player_key'] = df_odds['canonical_player_id'].astype(object).where(
+        df_odds['canonical_player_id'].notna(), df_odds['join_name']).astype(str)
+    df_odds = df_odds.sort_values('capture_ts_utc').drop_duplicates(
+        subset=['source_vendor', 'book_id_vendor', 'market_type', 'line', 'side', 'player_key', 'home_abbr', 'away_abbr'],
+        keep='last')
+
+    df_probs = df_probs.copy()
+    df_probs['norm_name'] = df_probs['Player'].apply(normalize_name)
+    df_probs['team_abbr'] = df_probs['Team'].astype(str).str.upper()
+    df_probs['prob_date'] = pd.to_datetime(df_probs['Date']).dt.normalize()
+    df_odds['norm_name'] = df_odds['join_name'].apply(normalize_name)
+    merged = df_odds.merge(df_probs, on='norm_name', how='inner')
+    team_match = merged['team_abbr'] == merged['join_team']
+    fallback_match = merged['join_team'].isna() & (
+        (merged['team_abbr'] == merged['home_abbr']) | (merged['team_abbr'] == merged['away_abbr']))
+    merged = merged[team_match | fallback_match]
+    merged = merged[(merged['join_date'] - merged['prob_date']).abs().dt.days <= window_days]
+
+    results = []
+    for _, row in merged.iterrows():
+        if any(kw in row['book_name_raw'].lower() for kw in EXCLUDED_BOOK_KEYWORDS) or row['market_type'] == 'GOALS':
+            continue
+        prob_col = get_production_prob_column(row['market_type'].lower(), row['line'], row.keys())
+        if not prob_col or row['odds_decimal'] <= 1.0:
+            continue
+        p_model = row[prob_col] if row['side'].upper() == 'OVER' else 1.0 - row[prob_col]
+        ev = p_model * row['odds_decimal'] - 1
+        if ev >= min_ev:
+            results.append((row['Player'], row['Team'], row['market_type'], row['line'], row['side'],
+                            row['book_name_raw'], row['odds_decimal'], prob_col, round(ev, 12)))
+    return sorted(results)
+
+
+def test_ranked_bets_match_pandas_path(tmp_path):
+    con, probs = _fixture(tmp_path)
+    ranked = get_ranked_bets(con, probs, "2026-01-05", odds_table=HISTORY_ODDS_TABLE)
+
+    actual = sorted(
+        (r.Player, r.Team, r.market_type, r.line, r.side, r.book_name_raw, r.odds_decimal, r.prob_col, round(r.ev, 12))
+        for r in ranked.itertuples()
+    )
+    expected = _pandas_ranked(con, probs)
+    assert actual == expected
+    # Newest DraftKings price and both Marner rows; no pick'em, blacklisted or wrong-team rows
+    assert [(p, m, s, b) for p, _, m, _, s, b, *_ in expected] == [
+        ("Connor McDavid", "POINTS", "OVER", "DraftKings"),
+        ("Mitch Marner", "ASSISTS", "OVER", "PlayNow"),
+        ("Mitch Marner", "SOG", "OVER", "FanDuel"),
+    ]
+    assert list(ranked["ev"]) == sorted(ranked["ev"], reverse=True)
+
+    # The latest-price table gives the same ranking for the current slate
+    latest = get_ranked_bets(con, probs, "2026-01-05")
+    assert sorted(zip(latest["Player"], latest["book_name_raw"], latest["ev"].round(12))) == \
+        sorted((r[0], r[5], r[8]) for r in expected)
@@ -1,3 +1,5 @@
+import glob
+import json
 import os
 import sys
 
@@ -11,10 +13,53 @@ def test_hash_stability(tmp_path, monkeypatch):
     payload_a = {"b": 2, "a": 1}
     payload_b = {"a": 1, "b": 2}
 
-    _, hash_a, _ = storage.save_raw_payload("TEST", payload_a, "json")
-    _, hash_b, _ = storage.save_raw_payload("TEST", payload_b, "json")
+    path_a, hash_a, _ = storage.save_raw_payload("TEST", payload_a, "json")
+    path_b, hash_b, _ = storage.save_raw_payload("TEST", payload_b, "json")
 
     assert hash_a == hash_b
+    assert path_a == path_b
 
     # Ensure output paths stay within the temp test directory.
     assert os.path.exists(tmp_path)
+
+
+def test_identical_content_is_stored_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path))
+    payload = {"events": [{"id": i, "name": "Oilers @ Leafs"} for i in range(50)]}
+
+    path, sha_hash, _ = storage.save_raw_payload("TEST", payload, "json")
+    storage.save_raw_payload("TEST", payload, "json")
+    storage.save_raw_payload("TEST", "<html>props</html>", "html")
+
+    # One compressed object per distinct content, no sidecars
+    objects = glob.glob(os.path.join(str(tmp_path), "objects", "*", "*"))
+    assert len(objects) == 2
+    assert not glob.glob(os.path.join(str(tmp_path), "**", "*.sha256"), recursive=True)
+    assert storage.load_raw_payload(path) == payload
+
+    # Every capture is indexed
+    index = [json.loads(line) for f in glob.glob(os.path.join(str(tmp_path), "index", "TEST", "*.jsonl"))
+             for line in open(f, encoding="utf-8")]
+    assert [e["new"] for e in index] == [True, False, True]
+    assert index[0]["sha256"] == index[1]["sha256"] == sha_hash
+
+
+def test_background_writer_returns_hash_before_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ROOT", str(tmp_path))
+    payload = {"odds": list(range(100))}
+    expected_path, expected_hash, _ = storage.save_raw_payload("SYNC", payload, "json")
+
+    with storage.RawPayloadWriter(max_pending=2) as writer:
+        path, sha_hash, _, written = writer.submit("TEST", payload, "json")
+        _, _, _, written_new = writer.submit("TEST", {"odds": []}, "json")
+        assert (path, sha_hash) == (expected_path, expected_hash)
+        assert written.result(timeout=5) is False  # content already stored
+        assert written_new.result(timeout=5) is True
+    assert storage.load_raw_payload(path) == payload
+
+    # A failed write surfaces on the Future, so the caller never registers the payload
+    monkeypatch.setattr(storage, "_compressed_writer", lambda raw: 1 / 0)
+    with storage.RawPayloadWriter() as writer:
+        _, _, _, written = writer.submit("TEST", {"fresh": True}, "json")
+        assert isinstance(written.exception(timeout=5), ZeroDivisionError)
+    assert not glob.glob(os.path.join(str(tmp_path), "objects", "*", "*.tmp"))